@@ -0,0 +1,68 @@
+# benchmarks/__main__.py
+"""
+命令行入口：
+
+    python -m benchmarks --sizes 1920x1080,3840x2160 --clients 1,10,50
+    python -m benchmarks --save-baseline           # 把本次结果写为新基线
+
+存在基线时会自动比对，发现超出容差的退化则以退出码 1 结束。
+"""
+import argparse
+import logging
+import sys
+
+from benchmarks.harness import compare_to_baseline, load_results, save_results
+from benchmarks.suite import DEFAULT_CLIENT_COUNTS, DEFAULT_IMAGE_SIZES, run_suite
+
+DEFAULT_BASELINE = "benchmarks/baselines/baseline.json"
+
+
+def _parse_sizes(text: str):
+    sizes = []
+    for item in text.split(","):
+        width, height = item.lower().split("x")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="TranStation 端到端性能基准")
+    parser.add_argument("--sizes", type=_parse_sizes, default=DEFAULT_IMAGE_SIZES,
+                        help="截图尺寸列表，如 1920x1080,3840x2160")
+    parser.add_argument("--clients", type=lambda s: [int(n) for n in s.split(",")],
+                        default=DEFAULT_CLIENT_COUNTS, help="客户端数量列表，如 1,10,50")
+    parser.add_argument("--iterations", type=int, default=20, help="每个场景的迭代次数")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 JSON 文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--output", help="另存本次结果的 JSON 路径")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对退化比例")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_suite(args.sizes, args.clients, args.iterations)
+
+    if args.output:
+        save_results(args.output, results)
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"[bench] 基线已保存至 {args.baseline}")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline is None:
+        print(f"[bench] 未找到基线 {args.baseline}，跳过比对 (使用 --save-baseline 创建)。")
+        return 0
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("[bench] 检测到性能退化:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("[bench] 与基线相比未发现退化。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
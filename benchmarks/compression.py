@@ -0,0 +1,151 @@
+# benchmarks/compression.py
+"""
+压缩方案的 CPU 开销与传输字节数对比：
+
+    python -m benchmarks.compression --sizes 1280x720,1920x1080
+
+对具有代表性的划词文本与截图消息 (与线上相同的 JSON 结构)，分别测量
+不压缩、不同参数的 permessage-deflate 以及 zstd 的单条消息压缩耗时 (CPU 时间)
+和压缩后的字节数。deflate 的实现方式与 websockets 完全一致
+(raw deflate + Z_SYNC_FLUSH，去掉末尾 4 字节)，且每条消息使用新的压缩上下文。
+"""
+import argparse
+import base64
+import json
+import random
+import time
+import zlib
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from PIL import Image, ImageDraw
+
+from benchmarks.fakes import FakeScreen
+from src.server.compression import ZSTD_AVAILABLE, zstd_compress
+
+TIME_BUDGET_S = 0.2
+
+_WORDS = ("translate selection capture screen window latency the of and to in document "
+          "render font layout pipeline server client message").split()
+
+SELECTION_SHORT = "The quick brown fox jumps over the lazy dog."
+SELECTION_PARAGRAPH = (
+    "Performance engineering is the practice of building systems that meet non-functional "
+    "requirements such as throughput, latency and memory usage. Measure first, then optimize "
+    "the hot path; keep the common case fast and the rare case correct. " * 8
+)
+SELECTION_CJK = (
+    "本项目是一个高效、无侵入的桌面信息捕获工具的后端服务。它旨在为上层翻译应用提供稳定、"
+    "精准的屏幕文本及图像源数据。其核心功能是通过全局快捷键触发的跨屏截图，以及通过监听鼠标"
+    "划选操作自动捕获屏幕上任意可选文本。" * 4
+)
+
+
+def _text_message(text: str) -> Dict:
+    return {"type": "text", "timestamp": "2025-10-16T12:00:00.123456Z", "data": text,
+            "metadata": {"source_app_name": "WINWORD.EXE", "source_window_title": "文档1 - Microsoft Word",
+                         "method": "UIA_TextPattern_Precise"}}
+
+
+def _image_message(image: Image.Image) -> Dict:
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return {"type": "image", "timestamp": "2025-10-16T12:01:05.654321Z",
+            "data": base64.b64encode(buffered.getvalue()).decode("utf-8"),
+            "metadata": {"format": "png", "encoding": "base64",
+                         "region": {"x": 0, "y": 0, "width": image.width, "height": image.height}}}
+
+
+def synthetic_ui_capture(width: int, height: int, seed: int = 3) -> Image.Image:
+    """生成近似应用界面的截图：标题栏、侧边栏、大片纯色背景和多行文字。"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (248, 248, 248))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, 32], fill=(40, 44, 52))
+    draw.rectangle([0, 32, min(220, width // 4), height], fill=(230, 231, 235))
+    for y in range(48, height - 16, 18):
+        line = " ".join(rng.choice(_WORDS) for _ in range(max(1, width // 60)))
+        draw.text((min(240, width // 4 + 20), y), line, fill=(30, 30, 30))
+    return image
+
+
+def representative_payloads(image_sizes: Iterable[Tuple[int, int]]) -> Dict[str, str]:
+    """返回 {负载名: 序列化后的 JSON}。"""
+    payloads = {
+        "selection_short": json.dumps(_text_message(SELECTION_SHORT)),
+        "selection_paragraph": json.dumps(_text_message(SELECTION_PARAGRAPH)),
+        "selection_cjk": json.dumps(_text_message(SELECTION_CJK)),
+    }
+    screen = FakeScreen(1, 1)
+    for width, height in image_sizes:
+        payloads[f"capture_ui_{width}x{height}"] = json.dumps(_image_message(synthetic_ui_capture(width, height)))
+        noise = Image.frombytes("RGB", (width, height), screen.frame(width, height), "raw", "BGRX")
+        payloads[f"capture_noise_{width}x{height}"] = json.dumps(_image_message(noise))
+    return payloads
+
+
+def _deflate(level: int, window_bits: int, mem_level: int = 5) -> Callable[[bytes], bytes]:
+    def compress(data: bytes) -> bytes:
+        encoder = zlib.compressobj(level, zlib.DEFLATED, -window_bits, mem_level)
+        return (encoder.compress(data) + encoder.flush(zlib.Z_SYNC_FLUSH))[:-4]
+    return compress
+
+
+def codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    available = {
+        "none": lambda data: data,
+        "deflate-1-w12": _deflate(1, 12),
+        "deflate-6-w12": _deflate(6, 12),
+        "deflate-9-w15": _deflate(9, 15, 8),
+    }
+    if ZSTD_AVAILABLE:
+        for level in (1, 3, 10):
+            available[f"zstd-{level}"] = lambda data, level=level: zstd_compress(data, level)
+    return available
+
+
+def _measure(compress: Callable[[bytes], bytes], data: bytes) -> Tuple[float, int]:
+    """在时间预算内重复压缩，返回 (每次的 CPU 毫秒数, 压缩后字节数)。"""
+    runs, output = 0, b""
+    started = time.process_time()
+    while runs == 0 or time.process_time() - started < TIME_BUDGET_S:
+        output = compress(data)
+        runs += 1
+    return (time.process_time() - started) * 1000.0 / runs, len(output)
+
+
+def bench_compression(image_sizes: Iterable[Tuple[int, int]] = ((1280, 720),)) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for payload_name, text in representative_payloads(image_sizes).items():
+        data = text.encode("utf-8")
+        for codec_name, compress in codecs().items():
+            cpu_ms, wire_bytes = _measure(compress, data)
+            results[f"compression[{payload_name},{codec_name}]"] = {
+                "mean_ms": round(cpu_ms, 4),
+                "raw_bytes": len(data),
+                "wire_bytes": wire_bytes,
+                "ratio": round(wire_bytes / len(data), 4),
+            }
+    return results
+
+
+def format_table(results: Dict[str, Dict[str, float]]) -> List[str]:
+    lines = [f"{'scenario':60} {'cpu_ms':>10} {'raw_bytes':>12} {'wire_bytes':>12} {'ratio':>7}"]
+    for name, row in results.items():
+        lines.append(f"{name:60} {row['mean_ms']:>10.3f} {row['raw_bytes']:>12} {row['wire_bytes']:>12} {row['ratio']:>7.3f}")
+    return lines
+
+
+def main(argv=None) -> int:
+    from benchmarks.__main__ import _parse_sizes
+
+    parser = argparse.ArgumentParser(description="压缩方案 CPU 开销与传输字节数对比")
+    parser.add_argument("--sizes", type=_parse_sizes, default=[(1280, 720)], help="截图尺寸列表，如 1280x720,1920x1080")
+    args = parser.parse_args(argv)
+    for line in format_table(bench_compression(args.sizes)):
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,465 @@
+# benchmarks/fakes.py
+"""
+无头运行所需的假后端：mss、tkinter、PIL.ImageTk、pynput 以及 X11 辅助功能接口 (Xlib)。
+
+这些替身只实现项目实际用到的那部分接口，使真实的采集/编码/推送管线
+能够在没有显示器、没有键鼠钩子的 CI 环境中被完整驱动。
+"""
+import multiprocessing.connection  # noqa: F401
+import multiprocessing.queues  # noqa: F401
+import random
+import sys
+import time
+import types
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from unittest import mock
+
+import PIL
+
+
+# ---------------------------------------------------------------- mss ----
+
+class FakeScreenShot:
+    """模拟 mss.ScreenShot，只提供 size / bgra / raw。与真实的 mss 一样，raw 是每次抓取新分配的 bytearray。"""
+    def __init__(self, monitor: dict, raw: bytearray):
+        self.pos = (monitor["left"], monitor["top"])
+        self.size = (monitor["width"], monitor["height"])
+        self.width, self.height = self.size
+        self.raw = raw
+
+    @property
+    def bgra(self) -> bytes:
+        return bytes(self.raw)
+
+
+class FakeScreen:
+    """
+    假屏幕：保存虚拟桌面尺寸，并为每种截图尺寸缓存一帧确定性的像素数据，
+    以免生成测试数据的开销混入被测时间。
+    """
+    TILE_ROWS = 64
+
+    def __init__(self, width: int, height: int, seed: int = 42):
+        self.width = width
+        self.height = height
+        self.grab_count = 0
+        self._rng = random.Random(seed)
+        self._frames: Dict[Tuple[int, int], bytes] = {}
+
+    @property
+    def monitors(self) -> List[dict]:
+        virtual = {"left": 0, "top": 0, "width": self.width, "height": self.height}
+        return [virtual, dict(virtual)]
+
+    def frame(self, width: int, height: int) -> bytes:
+        key = (width, height)
+        if key not in self._frames:
+            # 随机数据块按行平铺：块高度超出 PNG 的 deflate 窗口，近似真实截图的最坏情况
+            tile = self._rng.randbytes(width * 4 * self.TILE_ROWS)
+            repeats = height // self.TILE_ROWS + 1
+            self._frames[key] = (tile * repeats)[:width * height * 4]
+        return self._frames[key]
+
+
+def _build_mss_module(screen: FakeScreen) -> types.ModuleType:
+    module = types.ModuleType("mss")
+
+    class mss:
+        def __init__(self, **kwargs):
+            self.monitors = screen.monitors
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.close()
+
+        def close(self):
+            pass
+
+        def grab(self, monitor: dict) -> FakeScreenShot:
+            screen.grab_count += 1
+            return FakeScreenShot(monitor, bytearray(screen.frame(monitor["width"], monitor["height"])))
+
+    module.mss = mss
+    module.ScreenShot = FakeScreenShot
+    return module
+
+
+# ------------------------------------------------------------ tkinter ----
+
+class TclError(Exception):
+    pass
+
+
+class _Widget:
+    """所有假控件的基类：记录选项、事件绑定和父子关系，布局方法均为空操作。"""
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.children: List["_Widget"] = []
+        self._options = dict(options)
+        self._bindings: Dict[str, callable] = {}
+        self._destroyed = False
+        if master is not None:
+            master.children.append(self)
+
+    def _noop(self, *args, **kwargs):
+        return None
+
+    pack = grid = pack_propagate = columnconfigure = focus_force = _noop
+    overrideredirect = attributes = protocol = update = update_idletasks = _noop
+    withdraw = post = unpost = add_separator = _noop
+
+    def cget(self, key):
+        return self._options.get(key)
+
+    def config(self, **options):
+        self._options.update(options)
+
+    configure = config
+
+    def place(self, **options):
+        self._options.update({f"place_{k}": v for k, v in options.items()})
+
+    def bind(self, sequence, func=None, add=None):
+        self._bindings[sequence] = func
+
+    bind_all = bind
+
+    def unbind(self, sequence, funcid=None):
+        self._bindings.pop(sequence, None)
+
+    def geometry(self, spec: str = None):
+        if spec is not None:
+            self._options["geometry"] = spec
+        return self._options.get("geometry", "1x1+0+0")
+
+    def after(self, ms, func=None, *args):
+        root = self._root()
+        root.scheduled.append((ms, func, args))
+        return f"after#{len(root.scheduled)}"
+
+    def selection_handle(self, command, selection="PRIMARY", type="STRING", **options):
+        self._root().selection_handlers[(selection, type)] = command
+
+    def selection_own(self, selection="PRIMARY", command=None, **options):
+        self._root().selection_owners[selection] = (self, command)
+
+    def _root(self):
+        root = self
+        while root.master is not None:
+            root = root.master
+        return root
+
+    def add_command(self, **options):
+        self.children.append(_Widget(None, **options))
+
+    def winfo_toplevel(self):
+        widget = self
+        while widget.master is not None and not isinstance(widget, (Toplevel, Tk)):
+            widget = widget.master
+        return widget
+
+    def winfo_exists(self):
+        return not self._destroyed
+
+    def winfo_width(self):
+        return int(self._options.get("width", 1))
+
+    def winfo_height(self):
+        return int(self._options.get("height", 1))
+
+    def winfo_x(self):
+        return int(self._options.get("place_x", 0))
+
+    def winfo_y(self):
+        return int(self._options.get("place_y", 0))
+
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+    def destroy(self):
+        for child in list(self.children):
+            child.destroy()
+        if self.master is not None and self in self.master.children:
+            self.master.children.remove(self)
+        self._destroyed = True
+
+
+class Tk(_Widget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(None)
+        self.scheduled = []
+        self.quit_count = 0
+        # (selection, type) -> 处理函数；selection -> (所有者窗口, 失去所有权时的回调)
+        self.selection_handlers = {}
+        self.selection_owners = {}
+
+    def mainloop(self, n=0):
+        pass
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class Toplevel(_Widget):
+    pass
+
+
+class Canvas(_Widget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self._items = {}
+
+    def create_rectangle(self, *coords, **options):
+        item = len(self._items) + 1
+        self._items[item] = list(coords)
+        return item
+
+    def coords(self, item, *coords):
+        if coords:
+            self._items[item] = list(coords)
+        return self._items.get(item)
+
+
+class Frame(_Widget):
+    pass
+
+
+class Label(_Widget):
+    pass
+
+
+class Button(_Widget):
+    def invoke(self):
+        return self._options["command"]()
+
+
+class Menu(_Widget):
+    pass
+
+
+def _build_tkinter_module() -> types.ModuleType:
+    module = types.ModuleType("tkinter")
+    for cls in (Tk, Toplevel, Canvas, Frame, Label, Button, Menu, TclError):
+        setattr(module, cls.__name__, cls)
+    module.TOP, module.BOTTOM, module.LEFT, module.RIGHT = "top", "bottom", "left", "right"
+    return module
+
+
+def _build_imagetk_module() -> types.ModuleType:
+    module = types.ModuleType("PIL.ImageTk")
+
+    class PhotoImage:
+        def __init__(self, image=None, **kwargs):
+            self._size = image.size if image is not None else (kwargs.get("width", 0), kwargs.get("height", 0))
+
+        def width(self):
+            return self._size[0]
+
+        def height(self):
+            return self._size[1]
+
+    module.PhotoImage = PhotoImage
+    return module
+
+
+def fire(widget: _Widget, sequence: str, **fields):
+    """向假控件派发一个事件，调用其绑定的回调。"""
+    fields.setdefault("x_root", fields.get("x", 0))
+    fields.setdefault("y_root", fields.get("y", 0))
+    return widget._bindings[sequence](types.SimpleNamespace(widget=widget, **fields))
+
+
+def run_scheduled(root: Tk, until=None, timeout: float = 5.0) -> int:
+    """
+    依次执行 after() 排入的回调 (忽略延时)，模拟事件循环，回调中排入的新回调同样会被执行。
+    until() 为真、没有待执行的回调 (给出 until 时改为等待工作线程) 或超过 timeout 秒时返回。返回执行的回调数。
+    """
+    deadline = time.monotonic() + timeout
+    executed = 0
+    while not (until is not None and until()) and time.monotonic() < deadline:
+        if not root.scheduled:
+            if until is None:
+                break
+            time.sleep(0.005)
+            continue
+        _, func, args = root.scheduled.pop(0)
+        if func is not None:
+            func(*args)
+            executed += 1
+    return executed
+
+
+def simulate_region_capture(app, x: int, y: int, width: int, height: int):
+    """
+    在 ModernScreenshot 的蒙版上模拟一次完整的拖拽选区，
+    返回随后弹出的预览窗口 (Toplevel)。
+    """
+    app.start()
+    fire(app.canvas, "<ButtonPress-1>", x=x, y=y)
+    fire(app.canvas, "<B1-Motion>", x=x + width, y=y + height)
+    fire(app.canvas, "<ButtonRelease-1>", x=x + width, y=y + height)
+    if app._image_frame is None:
+        return None
+    return app._image_frame.winfo_toplevel()
+
+
+# ------------------------------------------------------------- pynput ----
+
+class FakeGlobalHotKeys:
+    instances: List["FakeGlobalHotKeys"] = []
+
+    def __init__(self, hotkeys: dict):
+        self.hotkeys = dict(hotkeys)
+        self.running = False
+        FakeGlobalHotKeys.instances.append(self)
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def trigger(self, hotkey: str):
+        self.hotkeys[hotkey]()
+
+
+class FakeMouseListener:
+    instances: List["FakeMouseListener"] = []
+
+    def __init__(self, on_click=None, **kwargs):
+        self.on_click = on_click
+        self.running = False
+        FakeMouseListener.instances.append(self)
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def drag(self, start: Tuple[int, int], end: Tuple[int, int]):
+        """模拟一次按下-拖动-释放的左键划选。"""
+        button = _MouseButton.left
+        self.on_click(start[0], start[1], button, True)
+        self.on_click(end[0], end[1], button, False)
+
+
+class _MouseButton:
+    left = "left"
+    right = "right"
+    middle = "middle"
+
+
+def _build_pynput_modules() -> Dict[str, types.ModuleType]:
+    keyboard = types.ModuleType("pynput.keyboard")
+    keyboard.GlobalHotKeys = FakeGlobalHotKeys
+    mouse = types.ModuleType("pynput.mouse")
+    mouse.Listener = FakeMouseListener
+    mouse.Button = _MouseButton
+    pynput = types.ModuleType("pynput")
+    pynput.keyboard, pynput.mouse = keyboard, mouse
+    return {"pynput": pynput, "pynput.keyboard": keyboard, "pynput.mouse": mouse}
+
+
+# --------------------------------------------------------------- Xlib ----
+
+class FakeSelection:
+    """X11 PRIMARY 选择区的内容；text 为 None 时表示没有选区所有者。"""
+    def __init__(self):
+        self.text = None
+        self.query_count = 0
+
+
+def _build_xlib_modules(selection: FakeSelection) -> Dict[str, types.ModuleType]:
+    X = types.ModuleType("Xlib.X")
+    X.NONE, X.CurrentTime, X.AnyPropertyType, X.SelectionNotify = 0, 0, 0, 31
+
+    error = types.ModuleType("Xlib.error")
+    error.XError = type("XError", (Exception,), {})
+
+    class _Owner:
+        def __init__(self, display):
+            self._display = display
+
+        def convert_selection(self, selection_atom, target, prop, time):
+            self._display._events.append(types.SimpleNamespace(type=X.SelectionNotify, property=prop))
+
+        def get_property(self, prop, prop_type, offset, length):
+            return types.SimpleNamespace(format=8, value=(selection.text or "").encode("utf-8"))
+
+    class Display:
+        def __init__(self, name=None):
+            self._events = []
+
+        def intern_atom(self, name):
+            return name
+
+        def get_selection_owner(self, atom):
+            selection.query_count += 1
+            return _Owner(self) if selection.text is not None else X.NONE
+
+        def pending_events(self):
+            return len(self._events)
+
+        def next_event(self):
+            return self._events.pop(0)
+
+    display = types.ModuleType("Xlib.display")
+    display.Display = Display
+
+    xlib = types.ModuleType("Xlib")
+    xlib.X, xlib.display, xlib.error = X, display, error
+    return {"Xlib": xlib, "Xlib.X": X, "Xlib.display": display, "Xlib.error": error}
+
+
+# ------------------------------------------------------------ 组合入口 ----
+
+class FakeBackends:
+    """一次 fake_backends() 会话中所有替身的句柄。"""
+    def __init__(self, screen_size: Tuple[int, int]):
+        self.screen = FakeScreen(*screen_size)
+        self.selection = FakeSelection()
+        self.tk = _build_tkinter_module()
+        self.modules: Dict[str, types.ModuleType] = {
+            "mss": _build_mss_module(self.screen),
+            "tkinter": self.tk,
+            "PIL.ImageTk": _build_imagetk_module(),
+        }
+        self.modules.update(_build_pynput_modules())
+        self.modules.update(_build_xlib_modules(self.selection))
+
+    @property
+    def mouse_listeners(self) -> List[FakeMouseListener]:
+        return FakeMouseListener.instances
+
+    @property
+    def hotkey_listeners(self) -> List[FakeGlobalHotKeys]:
+        return FakeGlobalHotKeys.instances
+
+
+@contextmanager
+def fake_backends(screen_size: Tuple[int, int] = (1920, 1080)):
+    """
+    在上下文内用假后端替换 mss/tkinter/pynput/Xlib，并让项目模块在其上重新导入。
+    退出时 sys.modules 被完整恢复。
+
+    上下文内首次导入的模块在退出时会被移除；multiprocessing 的子模块若在此期间才导入，
+    之后再次导入会得到新的模块对象，spawn 子进程的参数便无法序列化，因此在本模块顶部预先导入。
+    """
+    backends = FakeBackends(screen_size)
+    FakeMouseListener.instances = []
+    FakeGlobalHotKeys.instances = []
+    with mock.patch.dict(sys.modules), \
+         mock.patch.object(PIL, "ImageTk", backends.modules["PIL.ImageTk"], create=True):
+        # 项目模块在导入时绑定了 mss/tkinter/pynput，需要在假后端上重新导入
+        for name in list(sys.modules):
+            if name == "main" or name.startswith("src."):
+                del sys.modules[name]
+        sys.modules.update(backends.modules)
+        yield backends
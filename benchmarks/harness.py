@@ -0,0 +1,226 @@
+# benchmarks/harness.py
+"""
+基准测试的公共工具：统计汇总、内存测量、本地 WebSocket 客户端池以及 JSON 基线比对。
+"""
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import websockets
+
+# 比对基线时各指标的方向：值越小越好 / 越大越好
+LOWER_IS_BETTER = ("p50_ms", "p90_ms", "p99_ms", "mean_ms", "peak_memory_mb", "wire_bytes")
+HIGHER_IS_BETTER = ("throughput_per_s",)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩法计算百分位数。"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_s: List[float], elapsed_s: float, operations: int) -> Dict[str, float]:
+    """把一组以秒为单位的延迟样本汇总为毫秒级百分位数和吞吐量。"""
+    ms = [value * 1000.0 for value in latencies_s]
+    return {
+        "samples": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+        "throughput_per_s": round(operations / elapsed_s, 3) if elapsed_s > 0 else 0.0,
+    }
+
+
+@contextmanager
+def track_peak_memory():
+    """
+    使用 tracemalloc 记录上下文内 Python 分配的峰值 (MB)。
+    结果写入 yield 出的字典的 "peak_memory_mb" 键。
+    """
+    result = {"peak_memory_mb": 0.0}
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        result["peak_memory_mb"] = round(max(0, peak - baseline) / (1024 * 1024), 3)
+
+
+def current_rss_mb() -> Optional[float]:
+    """
+    当前进程的常驻内存 (MB)。Linux 读取 /proc/self/statm，
+    其他 Unix 退化为 ru_maxrss (历史峰值)，均不可用时返回 None。
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 2)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+    except ImportError:
+        return None
+
+
+class ServerHarness:
+    """在后台线程中运行真实的 WebSocketServer (监听随机端口)。"""
+    def __init__(self, server_cls, host: str = "127.0.0.1", **kwargs):
+        self.server = server_cls(host=host, port=0, **kwargs)
+        self._thread = threading.Thread(target=self.server.run, name="BenchWebSocketThread", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.server.host}:{self.server.port}"
+
+    def __enter__(self):
+        self._thread.start()
+        if not self.server.ready.wait(timeout=10.0):
+            raise RuntimeError("WebSocket 服务器未能在 10 秒内启动")
+        return self
+
+    def __exit__(self, *exc):
+        self.server.stop()
+        self._thread.join(timeout=5.0)
+
+
+class ClientPool:
+    """
+    在独立事件循环线程中维护 N 个本地 WebSocket 客户端，
+    记录每条消息到达每个客户端的时间 (time.perf_counter)。
+    """
+    def __init__(self, url: str, count: int):
+        self.url = url
+        self.count = count
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="BenchClientLoop", daemon=True)
+        self._clients = []
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._arrivals: List[float] = []
+        self._expected = 0
+        self._done = threading.Event()
+        self.bytes_received = 0
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._connect_all(), self._loop).result(timeout=30.0)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._close_all(), self._loop).result(timeout=10.0)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5.0)
+        self._loop.close()
+
+    async def _connect_all(self):
+        for _ in range(self.count):
+            client = await websockets.connect(self.url, max_size=None)
+            self._clients.append(client)
+            self._tasks.append(asyncio.create_task(self._receive(client)))
+        # 等待服务器完成全部注册，避免第一条消息只发给部分客户端
+        await asyncio.sleep(0.05)
+
+    async def _close_all(self):
+        for client in self._clients:
+            await client.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _receive(self, client):
+        async for message in client:
+            arrived = time.perf_counter()
+            with self._lock:
+                self.bytes_received += len(message)
+                self._arrivals.append(arrived)
+                if len(self._arrivals) >= self._expected:
+                    self._done.set()
+
+    def arm(self, messages: int = 1):
+        """准备接收 messages 条消息 (每条需送达全部客户端)。"""
+        with self._lock:
+            self._arrivals = []
+            self._expected = messages * self.count
+            self._done.clear()
+
+    def wait(self, timeout: float = 30.0) -> List[float]:
+        """等待全部送达，返回每次送达的到达时间。"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"仅收到 {len(self._arrivals)}/{self._expected} 次送达")
+        with self._lock:
+            return list(self._arrivals)
+
+
+def environment_info() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": environment_info(), "results": results}, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]],
+                        baseline: Dict[str, Dict[str, float]],
+                        tolerance: float = 0.25,
+                        metrics: Iterable[str] = LOWER_IS_BETTER + HIGHER_IS_BETTER) -> List[str]:
+    """
+    与基线逐项比较，返回超出容差的退化描述列表。
+    仅比较两边都存在的场景和指标；基线中缺失的场景视为新场景。
+    """
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for metric in metrics:
+            if metric not in current or metric not in previous or not previous[metric]:
+                continue
+            old, new = previous[metric], current[metric]
+            if metric in HIGHER_IS_BETTER:
+                change = (old - new) / old
+            else:
+                change = (new - old) / old
+            if change > tolerance:
+                regressions.append(f"{scenario}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
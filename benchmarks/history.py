@@ -0,0 +1,135 @@
+# benchmarks/history.py
+"""
+采集历史库 (src/server/history.py) 的写入速率与查询延迟：
+
+    python -m benchmarks.history --records 1000000
+
+先通过 HistoryStore.record() 写入 N 条合成记录 (约 90% 划词文本、10% 截图元数据，
+时间分布在最近 30 天内)，测量写入吞吐量以及 record() 本身的调用耗时；
+再对常见查询 (某应用最近一小时、全文检索、区域相交、深翻页、流式导出) 测量延迟。
+"""
+import argparse
+import base64
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Iterator, List
+
+from benchmarks.compression import SELECTION_CJK, _WORDS
+from benchmarks.harness import summarize
+from src.server.history import HistoryQuery, HistoryStore
+
+APPS = [f"app{index:02d}.exe" for index in range(20)]
+SPAN_S = 30 * 24 * 3600
+IMAGE_RATIO = 0.1
+
+
+def synthetic_messages(count: int, now: float, seed: int = 11) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    image_data = base64.b64encode(os.urandom(64)).decode()
+    cjk = SELECTION_CJK[:200]
+    for seq in range(1, count + 1):
+        # 时间随 seq 递增，与线上按时间顺序写入一致
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now - SPAN_S * (1 - seq / count))) + "Z"
+        if rng.random() < IMAGE_RATIO:
+            yield {"type": "image", "seq": seq, "timestamp": timestamp, "data": image_data,
+                   "metadata": {"format": "png", "capture_id": f"{seq:032x}",
+                                "region": {"x": rng.randrange(0, 3000), "y": rng.randrange(0, 1600),
+                                           "width": rng.randrange(50, 800), "height": rng.randrange(50, 600)}}}
+        else:
+            if rng.random() < 0.2:
+                start = rng.randrange(0, len(cjk) - 20)
+                text = cjk[start:start + rng.randrange(5, 20)]
+            else:
+                text = " ".join(rng.choice(_WORDS) for _ in range(rng.randrange(3, 30)))
+            app = APPS[min(int(rng.expovariate(0.3)), len(APPS) - 1)]
+            yield {"type": "text", "seq": seq, "timestamp": timestamp, "data": text,
+                   "metadata": {"source_app_name": app, "source_window_title": f"{app} - 文档{seq % 50}",
+                                "method": "UIA_TextPattern_Precise"}}
+
+
+def _timed(func, runs: int) -> Dict[str, float]:
+    latencies = []
+    started = time.perf_counter()
+    for index in range(runs):
+        begin = time.perf_counter()
+        func(index)
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started, runs)
+
+
+def bench_history(records: int = 1_000_000, queries: int = 50, path: str = None, log=print) -> Dict[str, Dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = path or os.path.join(tmp, "history.db")
+        store = HistoryStore(path)
+        now = time.time()
+        rng = random.Random(5)
+
+        # 写入：record() 在广播路径上调用，单独统计其耗时
+        record_latencies: List[float] = []
+        started = time.perf_counter()
+        for index, message in enumerate(synthetic_messages(records, now)):
+            begin = time.perf_counter()
+            store.record(message, block=True)
+            if index % 97 == 0:
+                record_latencies.append(time.perf_counter() - begin)
+        store.flush()
+        elapsed = time.perf_counter() - started
+        ingest = summarize(record_latencies, elapsed, records)
+        ingest["db_mb"] = round(sum(os.path.getsize(path + suffix) for suffix in ("", "-wal")
+                                    if os.path.exists(path + suffix)) / 1024 / 1024, 2)
+        results[f"history[ingest,records={records}]"] = ingest
+        log(f"[bench] history ingest: {ingest}")
+
+        word_pool = [word for word in _WORDS if len(word) >= 3] + ["精准的屏幕", "划选操作"]
+        scenarios = {
+            "app_last_hour": lambda i: store.query(HistoryQuery(source_app=APPS[i % 5], since=now - 3600), 100),
+            "app_last_day_text": lambda i: store.query(HistoryQuery(types="text", source_app=APPS[i % 5],
+                                                                    since=now - 86400, text=rng.choice(word_pool)), 100),
+            "fulltext": lambda i: store.query(HistoryQuery(text=rng.choice(word_pool)), 100),
+            "region_overlap_last_day": lambda i: store.query(HistoryQuery(
+                since=now - 86400, region={"x": rng.randrange(0, 3000), "y": rng.randrange(0, 1600),
+                                           "width": 200, "height": 200}), 100),
+            "region_overlap_all": lambda i: store.query(HistoryQuery(
+                region={"x": rng.randrange(0, 3000), "y": rng.randrange(0, 1600), "width": 200, "height": 200}), 100),
+        }
+        for name, func in scenarios.items():
+            results[f"history[query:{name}]"] = _timed(func, queries)
+            log(f"[bench] history {name}: {results[f'history[query:{name}]']}")
+
+        # 深翻页：连续翻 queries 页，每页耗时应与页码无关
+        cursor_box = [None]
+
+        def next_page(_):
+            _, cursor_box[0] = store.query(None, 100, cursor_box[0])
+        results["history[query:deep_pagination]"] = _timed(next_page, queries)
+
+        # 流式导出某应用最近一天的全部记录
+        started = time.perf_counter()
+        exported = sum(len(page) for page in store.iter_query(HistoryQuery(source_app=APPS[0], since=now - 86400), 500))
+        elapsed = time.perf_counter() - started
+        results["history[stream:app_last_day]"] = {"rows": exported, "mean_ms": round(elapsed * 1000, 3),
+                                                   "throughput_per_s": round(exported / elapsed, 1) if elapsed else 0.0}
+        log(f"[bench] history stream: {results['history[stream:app_last_day]']}")
+        store.close()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="采集历史库写入速率与查询延迟")
+    parser.add_argument("--records", type=int, default=1_000_000, help="写入的合成记录数")
+    parser.add_argument("--queries", type=int, default=50, help="每种查询的执行次数")
+    parser.add_argument("--db", help="数据库文件路径 (默认使用临时目录)")
+    args = parser.parse_args(argv)
+    results = bench_history(args.records, args.queries, args.db)
+    print(f"{'scenario':48} {'p50_ms':>9} {'p99_ms':>9} {'throughput/s':>14}")
+    for name, row in results.items():
+        print(f"{name:48} {row.get('p50_ms', row.get('mean_ms', 0)):>9.3f} {row.get('p99_ms', 0):>9.3f} "
+              f"{row.get('throughput_per_s', 0):>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
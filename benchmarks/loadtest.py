@@ -0,0 +1,376 @@
+# benchmarks/loadtest.py
+"""
+WebSocketServer 的负载生成器与长时间浸泡 (soak) 测试：
+
+    python -m benchmarks.loadtest --clients 300 --slow-clients 30 --rate 50 --duration 600
+
+服务器与消息注入线程运行在当前进程中，数百个本地客户端运行在独立子进程里，
+这样采样到的 RSS 增长只反映服务端自身。周期性输出送达延迟、丢失消息、
+内存增长、事件循环延迟以及 connected_clients 数量，结束时给出汇总并检查连接泄漏。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import websockets
+
+from benchmarks.harness import ServerHarness, current_rss_mb, percentile
+from src.server.websocket_server import WebSocketServer
+
+RESERVOIR_SIZE = 10000
+LAG_PROBE_INTERVAL = 0.05
+# 注入的消息把 metadata 放在 data 之前，客户端只需扫描开头即可取得标记，
+# 避免为解析大负载付出的 CPU 干扰对服务端的测量
+_MARKER_RE = re.compile(r'"loadtest": \{"seq": (\d+), "sent_at": ([0-9.e+-]+)\}')
+
+
+# ------------------------------------------------------ 客户端子进程 ----
+
+class _FleetStats:
+    def __init__(self, seed: int = 7):
+        self.window_latencies: List[float] = []
+        self.window_deliveries = 0
+        self.total_deliveries = 0
+        self.reservoir: List[float] = []
+        self.clients: List[Dict[str, Any]] = []
+        self._rng = random.Random(seed)
+
+    def record(self, latency: float):
+        self.window_deliveries += 1
+        self.total_deliveries += 1
+        if len(self.window_latencies) < RESERVOIR_SIZE:
+            self.window_latencies.append(latency)
+        # 水塘抽样，保证长时间运行时内存有界
+        if len(self.reservoir) < RESERVOIR_SIZE:
+            self.reservoir.append(latency)
+        else:
+            slot = self._rng.randrange(self.total_deliveries)
+            if slot < RESERVOIR_SIZE:
+                self.reservoir[slot] = latency
+
+    def drain_window(self) -> Dict[str, Any]:
+        window = {"deliveries": self.window_deliveries, "latencies": self.window_latencies}
+        self.window_deliveries, self.window_latencies = 0, []
+        return window
+
+
+def _record_seq(record: Dict[str, Any], seq: int):
+    """
+    记录收到的 seq：seen[i] 标记 first_seq + i 是否已收到。不假设按序、恰好一次送达，
+    重复的 seq 计入 duplicates，比之前收到的最大 seq 小的计入 reordered。
+    """
+    seen = record["seen"]
+    if record["first_seq"] is None:
+        record["first_seq"] = record["last_seq"] = seq
+    elif seq < record["first_seq"]:
+        seen[0:0] = bytes(record["first_seq"] - seq)
+        record["first_seq"] = seq
+    index = seq - record["first_seq"]
+    if index >= len(seen):
+        seen.extend(bytes(index + 1 - len(seen)))
+    if seen[index]:
+        record["duplicates"] += 1
+        return
+    seen[index] = 1
+    record["received"] += 1
+    if seq < record["last_seq"]:
+        record["reordered"] += 1
+    record["last_seq"] = max(record["last_seq"], seq)
+
+
+def _missing(record: Dict[str, Any], last_sent_seq: int) -> int:
+    """first_seq 到 last_sent_seq 之间应收到而未收到的 seq 数 (期望集合减去已收到的集合)。"""
+    expected = last_sent_seq - record["first_seq"] + 1
+    if expected <= 0:
+        return 0
+    window = record["seen"][:expected]
+    return window.count(0) + expected - len(window)
+
+
+async def _client(url: str, record: Dict[str, Any], stats: _FleetStats, stop: asyncio.Event,
+                  slow_delay: float, churn_interval: float):
+    while not stop.is_set():
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                record["connects"] += 1
+                reconnect_at = time.monotonic() + churn_interval if churn_interval else None
+                while not stop.is_set():
+                    timeout = 0.5 if reconnect_at is None else max(0.0, min(0.5, reconnect_at - time.monotonic()))
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout)
+                    except asyncio.TimeoutError:
+                        if reconnect_at is not None and time.monotonic() >= reconnect_at:
+                            break
+                        continue
+                    received_at = time.time()
+                    marker = _MARKER_RE.search(raw[:512])
+                    if not marker:
+                        continue
+                    _record_seq(record, int(marker.group(1)))
+                    stats.record(received_at - float(marker.group(2)))
+                    if slow_delay:
+                        await asyncio.sleep(slow_delay)
+        except (OSError, websockets.exceptions.WebSocketException):
+            record["errors"] += 1
+            await asyncio.sleep(0.1)
+
+
+async def _fleet_main(url, clients, slow_clients, slow_delay, churn_clients, churn_interval,
+                      reports, stop_flag, interval):
+    stats = _FleetStats()
+    stop = asyncio.Event()
+    tasks = []
+    for index in range(clients):
+        slow = index < slow_clients
+        churn = not slow and index >= clients - churn_clients
+        record = {"slow": slow, "churn": churn, "received": 0, "first_seq": None, "last_seq": None,
+                  "seen": bytearray(), "duplicates": 0, "reordered": 0, "connects": 0, "errors": 0}
+        stats.clients.append(record)
+        tasks.append(asyncio.create_task(_client(url, record, stats, stop,
+                                                 slow_delay if slow else 0.0,
+                                                 churn_interval if churn else 0.0)))
+    reports.put({"type": "ready"})
+
+    while not stop_flag.is_set():
+        await asyncio.sleep(interval)
+        reports.put({"type": "window", **stats.drain_window()})
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    reports.put({"type": "final", "clients": stats.clients, "reservoir": stats.reservoir,
+                 "total_deliveries": stats.total_deliveries})
+
+
+def _run_fleet(*args):
+    """子进程入口 (spawn 模式下必须是模块级函数)。"""
+    asyncio.run(_fleet_main(*args))
+
+
+# ------------------------------------------------------ 服务端进程 ----
+
+class _LoopLagProbe:
+    """在服务器事件循环上周期性休眠，记录实际唤醒相对预期的延迟。"""
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.samples: List[float] = []
+        self._lock = threading.Lock()
+        self._future = asyncio.run_coroutine_threadsafe(self._probe(), loop)
+
+    async def _probe(self):
+        while True:
+            expected = time.perf_counter() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            with self._lock:
+                self.samples.append(max(0.0, time.perf_counter() - expected))
+
+    def drain(self) -> List[float]:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+    def stop(self):
+        self._future.cancel()
+
+
+class _Injector(threading.Thread):
+    """以固定速率通过 queue_message 注入合成的文本与图像消息。"""
+    def __init__(self, server: WebSocketServer, rate: float, image_ratio: float,
+                 image_bytes: int, text_length: int, seed: int = 11):
+        super().__init__(name="LoadTestInjectorThread", daemon=True)
+        self.server = server
+        self.rate = rate
+        self.image_ratio = image_ratio
+        self.sent = 0
+        self.stop_event = threading.Event()
+        self._rng = random.Random(seed)
+        # 负载内容预先生成，注入时只构造外层字典
+        self._image_data = base64.b64encode(self._rng.randbytes(image_bytes)).decode("ascii")
+        words = ["selection", "translate", "屏幕", "文本", "capture", "latency", "socket", "划词"]
+        self._text_data = " ".join(self._rng.choice(words) for _ in range(text_length))
+
+    def _build(self, seq: int) -> Dict[str, Any]:
+        marker = {"seq": seq, "sent_at": time.time()}
+        if self._rng.random() < self.image_ratio:
+            return {"type": "image", "timestamp": "",
+                    "metadata": {"loadtest": marker, "format": "png", "encoding": "base64"},
+                    "data": self._image_data}
+        return {"type": "text", "timestamp": "",
+                "metadata": {"loadtest": marker, "source_app_name": "LoadTest",
+                             "source_window_title": "LoadTest"},
+                "data": self._text_data}
+
+    def run(self):
+        started = time.perf_counter()
+        while not self.stop_event.is_set():
+            due = started + self.sent / self.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                self.stop_event.wait(delay)
+                continue
+            self.server.queue_message(self._build(self.sent))
+            self.sent += 1
+
+
+def _fmt_ms(samples: List[float], pct: float) -> float:
+    return round(percentile(samples, pct) * 1000.0, 2)
+
+
+def run_loadtest(clients: int = 200, slow_clients: int = 10, slow_delay: float = 0.2,
+                 churn_clients: int = 10, churn_interval: float = 5.0, rate: float = 20.0,
+                 image_ratio: float = 0.1, image_bytes: int = 1_000_000, text_length: int = 40,
+                 duration: float = 60.0, interval: float = 5.0, drain: float = 10.0,
+                 log=print) -> Dict[str, Any]:
+    """
+    运行一次负载/浸泡测试并返回汇总结果。
+    slow_clients 个客户端每收到一条消息后休眠 slow_delay 秒；
+    churn_clients 个客户端每 churn_interval 秒断开重连一次，用于检验 connected_clients 的注册/注销。
+    """
+    ctx = multiprocessing.get_context("spawn")
+    reports = ctx.Queue()
+    stop_flag = ctx.Event()
+
+    with ServerHarness(WebSocketServer) as harness:
+        server = harness.server
+        fleet = ctx.Process(target=_run_fleet, name="LoadTestFleet",
+                            args=(harness.url, clients, slow_clients, slow_delay, churn_clients,
+                                  churn_interval, reports, stop_flag, interval))
+        fleet.start()
+        if reports.get(timeout=60.0)["type"] != "ready":
+            raise RuntimeError("客户端子进程启动失败")
+        deadline = time.monotonic() + 30.0
+        while len(server.connected_clients) < clients and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        probe = _LoopLagProbe(server._loop)
+        injector = _Injector(server, rate, image_ratio, image_bytes, text_length)
+        rss_start = current_rss_mb()
+        timeline = []
+        all_lag: List[float] = []
+        started = time.monotonic()
+        injector.start()
+
+        def report_window(window):
+            lag = probe.drain()
+            all_lag.extend(lag)
+            point = {
+                "t_s": round(time.monotonic() - started, 1),
+                "sent": injector.sent,
+                "deliveries": window["deliveries"],
+                "p50_ms": _fmt_ms(window["latencies"], 50),
+                "p99_ms": _fmt_ms(window["latencies"], 99),
+                "loop_lag_max_ms": round(max(lag, default=0.0) * 1000.0, 2),
+                "rss_mb": current_rss_mb(),
+                "connected_clients": len(server.connected_clients),
+                "queue_depth": server.message_queue.qsize(),
+            }
+            timeline.append(point)
+            log(f"[loadtest] {point}")
+
+        while time.monotonic() - started < duration:
+            try:
+                message = reports.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if message["type"] == "window":
+                report_window(message)
+
+        injector.stop_event.set()
+        injector.join()
+        last_sent_seq = injector.sent - 1
+        drain_deadline = time.monotonic() + drain
+        while server.message_queue.qsize() and time.monotonic() < drain_deadline:
+            time.sleep(0.1)
+        time.sleep(min(drain, 1.0))
+
+        stop_flag.set()
+        final = None
+        while final is None:
+            message = reports.get(timeout=60.0)
+            if message["type"] == "window":
+                report_window(message)
+            elif message["type"] == "final":
+                final = message
+        fleet.join(timeout=10.0)
+        probe.stop()
+
+        # 全部客户端已断开，connected_clients 应回落为 0
+        deadline = time.monotonic() + 5.0
+        while server.connected_clients and time.monotonic() < deadline:
+            time.sleep(0.05)
+        leaked = len(server.connected_clients)
+        rss_end = current_rss_mb()
+
+    # 排空期结束后仍未送达的消息：普通客户端计为 dropped，慢客户端单独统计。乱序与重复另行统计
+    dropped = undelivered_slow = 0
+    for record in final["clients"]:
+        if record["churn"] or record["first_seq"] is None:
+            continue
+        missing = _missing(record, last_sent_seq)
+        if record["slow"]:
+            undelivered_slow += missing
+        else:
+            dropped += missing
+
+    latencies = final["reservoir"]
+    summary = {
+        "duration_s": round(time.monotonic() - started, 1),
+        "messages_sent": injector.sent,
+        "deliveries": final["total_deliveries"],
+        "p50_ms": _fmt_ms(latencies, 50),
+        "p90_ms": _fmt_ms(latencies, 90),
+        "p99_ms": _fmt_ms(latencies, 99),
+        "max_ms": round(max(latencies, default=0.0) * 1000.0, 2),
+        "dropped": dropped,
+        "undelivered_slow": undelivered_slow,
+        "reordered": sum(record["reordered"] for record in final["clients"]),
+        "duplicates": sum(record["duplicates"] for record in final["clients"]),
+        "loop_lag_p99_ms": _fmt_ms(all_lag, 99),
+        "loop_lag_max_ms": round(max(all_lag, default=0.0) * 1000.0, 2),
+        "rss_start_mb": rss_start,
+        "rss_end_mb": rss_end,
+        "rss_growth_mb": round(rss_end - rss_start, 2) if rss_start is not None and rss_end is not None else None,
+        "leaked_clients": leaked,
+        "reconnects": sum(max(0, r["connects"] - 1) for r in final["clients"]),
+        "timeline": timeline,
+    }
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="WebSocketServer 负载与浸泡测试")
+    parser.add_argument("--clients", type=int, default=200, help="客户端总数")
+    parser.add_argument("--slow-clients", type=int, default=10, help="慢客户端数量")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="慢客户端每条消息后的休眠秒数")
+    parser.add_argument("--churn-clients", type=int, default=10, help="周期性重连的客户端数量")
+    parser.add_argument("--churn-interval", type=float, default=5.0, help="重连间隔 (秒)")
+    parser.add_argument("--rate", type=float, default=20.0, help="每秒注入的消息数")
+    parser.add_argument("--image-ratio", type=float, default=0.1, help="图像消息所占比例")
+    parser.add_argument("--image-bytes", type=int, default=1_000_000, help="单张合成图像的原始字节数")
+    parser.add_argument("--duration", type=float, default=60.0, help="注入持续时间 (秒)")
+    parser.add_argument("--interval", type=float, default=5.0, help="周期报告间隔 (秒)")
+    parser.add_argument("--output", help="将汇总结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    summary = run_loadtest(clients=args.clients, slow_clients=args.slow_clients,
+                           slow_delay=args.slow_delay, churn_clients=args.churn_clients,
+                           churn_interval=args.churn_interval, rate=args.rate,
+                           image_ratio=args.image_ratio, image_bytes=args.image_bytes,
+                           duration=args.duration, interval=args.interval)
+    timeline = summary.pop("timeline")
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({**summary, "timeline": timeline}, f, indent=2, ensure_ascii=False)
+    return 1 if summary["dropped"] or summary["duplicates"] or summary["leaked_clients"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
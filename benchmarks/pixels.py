@@ -0,0 +1,108 @@
+# benchmarks/pixels.py
+"""
+NumPy 像素层与 Pillow 整图处理的对比：
+
+    python -m benchmarks.pixels --sizes 1920x1080,3840x2160,7680x4320
+
+对一帧 mss 格式的 BGRA 缓冲 (与 FakeScreen 相同的确定性数据)，分别测量：
+
+- convert: BGRA -> 可编码图像。Pillow 为 frombytes(..., "BGRX") 整图转换；
+  NumPy 为原地交换通道后直接映射缓冲 (JPEG/WebP 可直接编码的 RGBX 图像)。
+- crop:    从整帧中裁出中央 1/4 区域。Pillow 先整图转换再 crop；NumPy 在带步长的视图上只解码该区域。
+- diff:    与改动了一个小块的另一帧比较，找出变化区域。Pillow 为 ImageChops.difference + getbbox
+           (两帧都需先转换)；NumPy 为分块哈希比较 (含计算当前帧的哈希，上一帧的哈希视为已缓存)。
+- gray:    OCR 用的灰度图。Pillow 为整图转换后 convert("L")；NumPy 直接从缓冲计算。
+
+每项输出 p50 耗时 (毫秒) 与 Pillow/NumPy 的加速比。未安装 numpy 时只输出 Pillow 一列。
+"""
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from PIL import Image, ImageChops
+
+from benchmarks.fakes import FakeScreen
+from benchmarks.harness import summarize
+from src.capture.pixels import NUMPY_AVAILABLE, PixelFrame, changed_region
+
+DEFAULT_SIZES = ((1920, 1080), (3840, 2160), (7680, 4320))
+
+
+def _time(operation: Callable[[], object], repeats: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started, repeats)
+
+
+def _pillow(raw, size) -> Image.Image:
+    return Image.frombytes("RGB", size, raw, "raw", "BGRX")
+
+
+def bench_pixels(sizes=DEFAULT_SIZES, repeats: int = 10, log=print) -> Dict[str, Dict]:
+    results = {}
+    for width, height in sizes:
+        source = FakeScreen(width, height).frame(width, height)
+        changed = bytearray(source)
+        # 改动画面中央一个 16x16 的小块
+        for row in range(height // 2, height // 2 + 16):
+            start = (row * width + width // 2) * 4
+            changed[start:start + 64] = bytes(64)
+        crop_box = (width // 4, height // 4, width // 2, height // 2)
+
+        pillow = {
+            "convert": lambda: _pillow(source, (width, height)),
+            "crop": lambda: _pillow(source, (width, height)).crop(
+                (crop_box[0], crop_box[1], crop_box[0] + crop_box[2], crop_box[1] + crop_box[3])),
+            "diff": lambda: ImageChops.difference(_pillow(source, (width, height)),
+                                                  _pillow(changed, (width, height))).getbbox(),
+            "gray": lambda: _pillow(source, (width, height)).convert("L"),
+        }
+        numpy = {}
+        if NUMPY_AVAILABLE:
+            previous = PixelFrame(bytearray(source), width, height).block_hashes()
+            # mss 每次抓取返回的缓冲归调用方所有，可以原地修改；交换两次即复原，同一缓冲可以反复测量
+            scratch = bytearray(source)
+            numpy = {
+                "convert": lambda: PixelFrame(scratch, width, height).swizzle_rgbx().to_image("RGBX"),
+                "crop": lambda: PixelFrame(source, width, height).crop(*crop_box).to_image(),
+                "diff": lambda: changed_region(previous, PixelFrame(changed, width, height).block_hashes(),
+                                               width, height),
+                "gray": lambda: PixelFrame(source, width, height).to_gray(),
+            }
+        for name, operation in pillow.items():
+            key = f"pixels[{name},{width}x{height}]"
+            row = {"pillow_ms": _time(operation, repeats)["p50_ms"]}
+            if name in numpy:
+                row["numpy_ms"] = _time(numpy[name], repeats)["p50_ms"]
+                row["speedup"] = round(row["pillow_ms"] / row["numpy_ms"], 2) if row["numpy_ms"] else 0.0
+            results[key] = row
+            log(f"[bench] {key}: {row}")
+    return results
+
+
+def _parse_sizes(text: str):
+    return [tuple(int(n) for n in item.lower().split("x")) for item in text.split(",")]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="NumPy 像素层与 Pillow 整图处理的对比")
+    parser.add_argument("--sizes", type=_parse_sizes, default=list(DEFAULT_SIZES),
+                        help="画面尺寸列表，如 1920x1080,3840x2160,7680x4320")
+    parser.add_argument("--repeats", type=int, default=10, help="每项的重复次数")
+    args = parser.parse_args(argv)
+    if not NUMPY_AVAILABLE:
+        print("[bench] 未安装 numpy，只测量 Pillow 路径。")
+    results = bench_pixels(args.sizes, args.repeats, log=lambda *_: None)
+    print(f"{'scenario':32} {'pillow_ms':>10} {'numpy_ms':>10} {'speedup':>8}")
+    for name, row in results.items():
+        print(f"{name:32} {row['pillow_ms']:>10.2f} {row.get('numpy_ms', float('nan')):>10.2f} "
+              f"{row.get('speedup', float('nan')):>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+# benchmarks/rpc.py
+"""
+WebSocket 请求/响应层 (src/server/rpc.py) 的吞吐量与延迟：
+
+    python -m benchmarks.rpc --connections 1,10,100 --requests 20000 --pipeline 8
+
+在本地启动真实的 WebSocketServer，由 N 个连接共同发送 --requests 个 ping 请求，
+每个连接保持 --pipeline 个未完成的请求 (不超过 server.rpc.max_in_flight)，
+统计每个请求从发送到收到回复的延迟，以及全部连接合计的每秒请求数。
+另测一组 stats 请求，覆盖参数校验之外的真实处理函数。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import websockets
+
+from benchmarks.harness import ServerHarness, summarize
+from src.server.websocket_server import WebSocketServer
+
+
+async def _drive(url: str, connections: int, requests: int, pipeline: int, action: str) -> Dict[str, float]:
+    clients = [await websockets.connect(url, max_size=None) for _ in range(connections)]
+    latencies: List[float] = []
+    per_client = [requests // connections + (1 if index < requests % connections else 0)
+                  for index in range(connections)]
+
+    async def run(client, count: int):
+        sent_at: Dict[int, float] = {}
+        next_id = 0
+
+        async def send_one():
+            nonlocal next_id
+            sent_at[next_id] = time.perf_counter()
+            await client.send(json.dumps({"action": action, "request_id": next_id}))
+            next_id += 1
+
+        for _ in range(min(pipeline, count)):
+            await send_one()
+        for _ in range(count):
+            reply = json.loads(await client.recv())
+            latencies.append(time.perf_counter() - sent_at.pop(reply["request_id"]))
+            if next_id < count:
+                await send_one()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(client, count) for client, count in zip(clients, per_client)))
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        await client.close()
+    return summarize(latencies, elapsed, requests)
+
+
+def bench_rpc(connection_counts=(1, 10, 100), requests: int = 20000, pipeline: int = 8,
+              actions=("ping", "stats"), log=print) -> Dict[str, Dict]:
+    results = {}
+    with ServerHarness(WebSocketServer) as harness:
+        for action in actions:
+            for connections in connection_counts:
+                name = f"rpc[{action},connections={connections},pipeline={pipeline}]"
+                results[name] = asyncio.run(_drive(harness.url, connections, requests, pipeline, action))
+                log(f"[bench] {name}: {results[name]}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="WebSocket 请求/响应吞吐量")
+    parser.add_argument("--connections", type=lambda s: [int(n) for n in s.split(",")], default=[1, 10, 100],
+                        help="连接数列表，如 1,10,100")
+    parser.add_argument("--requests", type=int, default=20000, help="每个场景的请求总数")
+    parser.add_argument("--pipeline", type=int, default=8, help="每个连接未完成请求的数量")
+    args = parser.parse_args(argv)
+    results = bench_rpc(args.connections, args.requests, args.pipeline, log=lambda *_: None)
+    print(f"{'scenario':44} {'p50_ms':>9} {'p99_ms':>9} {'requests/s':>12}")
+    for name, row in results.items():
+        print(f"{name:44} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['throughput_per_s']:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
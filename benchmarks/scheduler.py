@@ -0,0 +1,79 @@
+# benchmarks/scheduler.py
+"""
+大截图之后紧跟的划词文本要等多久：
+
+    python -m benchmarks.scheduler --image-mb 8,32 --rounds 10 --chunk-size 65536
+
+每轮通过 queue_message 先注入一张大图像消息，紧接着注入一条短文本，测量文本与图像各自从注入到
+客户端收完的延迟。客户端分别以不分块 (整条消息一帧) 和分块接收 (?chunk_size=...) 两种方式连接：
+不分块时文本最多只能排到尚未开始发送的图像之前；分块时文本插在图像的分块之间送达。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import websockets
+
+from benchmarks.harness import ServerHarness, summarize
+from benchmarks.transport import _payload
+from src.server.websocket_server import WebSocketServer
+
+
+async def _rounds(url: str, server: WebSocketServer, image: Dict, rounds: int) -> Dict[str, Dict]:
+    text_latencies: List[float] = []
+    image_latencies: List[float] = []
+    async with websockets.connect(url, max_size=None, compression=None) as client:
+        while not server.connected_clients:
+            await asyncio.sleep(0.001)
+        started = time.perf_counter()
+        for index in range(rounds):
+            begin = time.perf_counter()
+            server.queue_message(dict(image))
+            server.queue_message({"type": "text", "data": f"划词 {index}", "metadata": {}})
+            pending = {"text", "image"}
+            while pending:
+                message = json.loads(await client.recv())
+                kind = message.get("message_type") if message["type"] == "chunk" else message["type"]
+                if message["type"] == "chunk" and message["index"] + 1 < message["count"]:
+                    continue
+                (text_latencies if kind == "text" else image_latencies).append(time.perf_counter() - begin)
+                pending.discard(kind)
+        elapsed = time.perf_counter() - started
+    return {"text": summarize(text_latencies, elapsed, rounds), "image": summarize(image_latencies, elapsed, rounds)}
+
+
+def bench_scheduler(image_mb=(8, 32), rounds: int = 10, chunk_size: int = 65536, log=print) -> Dict[str, Dict]:
+    results = {}
+    with ServerHarness(WebSocketServer) as harness:
+        server = harness.server
+        for size_mb in image_mb:
+            image = _payload(int(size_mb * 1024 * 1024))
+            for mode, query in (("whole", ""), ("chunked", f"/?chunk_size={chunk_size}")):
+                stats = asyncio.run(_rounds(harness.url + query, server, image, rounds))
+                for kind, row in stats.items():
+                    key = f"scheduler[{mode},{size_mb}MB,{kind}]"
+                    results[key] = row
+                    log(f"[bench] {key}: {row}")
+                while server.connected_clients:
+                    time.sleep(0.001)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="优先级调度：大截图之后的划词文本延迟")
+    parser.add_argument("--image-mb", type=lambda s: [float(n) for n in s.split(",")], default=[8, 32],
+                        help="图像负载大小列表 (MB)，如 8,32")
+    parser.add_argument("--rounds", type=int, default=10, help="每种场景的轮数")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="分块接收时的分块大小")
+    args = parser.parse_args(argv)
+    results = bench_scheduler(args.image_mb, args.rounds, args.chunk_size, log=lambda *_: None)
+    print(f"{'scenario':36} {'p50_ms':>9} {'p99_ms':>9}")
+    for name, row in results.items():
+        print(f"{name:36} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,167 @@
+# benchmarks/suite.py
+"""
+端到端基准场景。所有场景都在 fake_backends() 中运行，驱动的是项目的真实代码：
+
+- capture_encode: ModernScreenshot 的抓屏 -> PNG -> Base64 -> 预览生成，直到数据进入 IPC 队列。
+- pipeline:       截图确认 -> src.ipc_queue -> queue_bridge -> WebSocketServer -> N 个客户端。
+- selection:      鼠标划选 -> SelectionListener -> X11 选择区读取 -> WebSocketServer -> N 个客户端。
+- compression:    代表性文本/截图消息在各压缩方案下的 CPU 开销与传输字节数 (见 benchmarks/compression.py)。
+"""
+import importlib
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from benchmarks.compression import bench_compression
+from benchmarks.fakes import fake_backends, simulate_region_capture
+from benchmarks.harness import ClientPool, ServerHarness, summarize, track_peak_memory
+
+DEFAULT_IMAGE_SIZES: List[Tuple[int, int]] = [(1920, 1080), (3840, 2160)]
+DEFAULT_CLIENT_COUNTS: List[int] = [1, 10, 50]
+
+BENCH_CONFIG = {
+    "screenshot": {"overlay_alpha": 0.2, "border_color": "#007aff", "border_width": 2},
+}
+
+
+def _capture_once(screenshot_module, root, ipc_queue, size: Tuple[int, int]):
+    """执行一次完整的交互式截图并点击“确认”，返回鼠标释放时刻。"""
+    app = screenshot_module.ModernScreenshot(root, BENCH_CONFIG, ipc_queue)
+    width, height = size
+    released = time.perf_counter()
+    preview = simulate_region_capture(app, 0, 0, width, height)
+    app._confirm_and_send(preview)
+    return released
+
+
+def bench_capture_encode(size: Tuple[int, int], iterations: int) -> Dict[str, float]:
+    with fake_backends(screen_size=size) as backends:
+        screenshot = importlib.import_module("src.capture.screenshot")
+        root = backends.tk.Tk()
+        sink = queue.Queue()
+
+        latencies = []
+        payload_bytes = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            released = _capture_once(screenshot, root, sink, size)
+            data = sink.get_nowait()
+            latencies.append(time.perf_counter() - released)
+            payload_bytes = len(data["data"])
+        elapsed = time.perf_counter() - started
+
+        with track_peak_memory() as memory:
+            _capture_once(screenshot, root, sink, size)
+            sink.get_nowait()
+
+    result = summarize(latencies, elapsed, iterations)
+    result.update(memory)
+    result["payload_bytes"] = payload_bytes
+    return result
+
+
+def bench_pipeline(size: Tuple[int, int], clients: int, iterations: int) -> Dict[str, float]:
+    with fake_backends(screen_size=size) as backends:
+        screenshot = importlib.import_module("src.capture.screenshot")
+        ipc_queue = importlib.import_module("src.ipc_queue").queue
+        websocket_server = importlib.import_module("src.server.websocket_server")
+        queue_bridge = importlib.import_module("main").queue_bridge
+        root = backends.tk.Tk()
+        shutdown_event = threading.Event()
+
+        with ServerHarness(websocket_server.WebSocketServer) as harness, \
+                ClientPool(harness.url, clients) as pool:
+            bridge = threading.Thread(target=queue_bridge, args=(harness.server.queue_message, shutdown_event),
+                                      name="BenchIPCBridgeThread", daemon=True)
+            bridge.start()
+
+            def deliver_once() -> List[float]:
+                pool.arm()
+                released = _capture_once(screenshot, root, ipc_queue, size)
+                return [arrived - released for arrived in pool.wait()]
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                latencies.extend(deliver_once())
+            elapsed = time.perf_counter() - started
+
+            with track_peak_memory() as memory:
+                deliver_once()
+
+            shutdown_event.set()
+            bridge.join(timeout=3.0)
+
+    result = summarize(latencies, elapsed, iterations)
+    result.update(memory)
+    return result
+
+
+def bench_selection(clients: int, iterations: int) -> Dict[str, float]:
+    with fake_backends() as backends:
+        selection_listener = importlib.import_module("src.listeners.selection_listener")
+        linux_backend = importlib.import_module("src.capture.text_selection.linux")
+        websocket_server = importlib.import_module("src.server.websocket_server")
+        # 不论宿主平台，都走 X11 后端，由假 Xlib 提供选择区内容
+        selection_listener.get_selected_text = linux_backend.get_selected_text_linux
+        shutdown_event = threading.Event()
+
+        with ServerHarness(websocket_server.WebSocketServer) as harness, \
+                ClientPool(harness.url, clients) as pool:
+            listener = selection_listener.SelectionListener(harness.server.queue_message, shutdown_event)
+            thread = threading.Thread(target=listener.run, name="BenchSelectionListenerThread", daemon=True)
+            thread.start()
+            while not backends.mouse_listeners:
+                time.sleep(0.001)
+            mouse = backends.mouse_listeners[-1]
+
+            def select_once(index: int) -> List[float]:
+                # 文本每次不同，否则会被监听器的去重逻辑忽略
+                backends.selection.text = f"The quick brown fox jumps over the lazy dog. #{index}"
+                pool.arm()
+                released = time.perf_counter()
+                mouse.drag((100, 100), (400, 100))
+                return [arrived - released for arrived in pool.wait()]
+
+            latencies = []
+            started = time.perf_counter()
+            for index in range(iterations):
+                latencies.extend(select_once(index))
+            elapsed = time.perf_counter() - started
+
+            with track_peak_memory() as memory:
+                select_once(iterations)
+
+            shutdown_event.set()
+            thread.join(timeout=5.0)
+
+    result = summarize(latencies, elapsed, iterations)
+    result.update(memory)
+    return result
+
+
+def run_suite(image_sizes: Iterable[Tuple[int, int]] = DEFAULT_IMAGE_SIZES,
+              client_counts: Iterable[int] = DEFAULT_CLIENT_COUNTS,
+              iterations: int = 20,
+              log=print) -> Dict[str, Dict[str, float]]:
+    """运行全部场景，返回 {场景名: 指标字典}。"""
+    image_sizes, client_counts = list(image_sizes), list(client_counts)
+    results = {}
+
+    def record(name, func, *args):
+        log(f"[bench] {name} ...")
+        results[name] = func(*args)
+        log(f"[bench] {name}: {results[name]}")
+
+    for width, height in image_sizes:
+        record(f"capture_encode[{width}x{height}]", bench_capture_encode, (width, height), iterations)
+    for width, height in image_sizes:
+        for clients in client_counts:
+            record(f"pipeline[{width}x{height},clients={clients}]", bench_pipeline,
+                   (width, height), clients, iterations)
+    for clients in client_counts:
+        record(f"selection[clients={clients}]", bench_selection, clients, iterations * 5)
+    log("[bench] compression ...")
+    results.update(bench_compression(image_sizes))
+    return results
@@ -0,0 +1,116 @@
+# benchmarks/text_pipeline.py
+"""
+划词文本处理阶段在大语料上的开销：
+
+    python -m benchmarks.text_pipeline --corpus-mb 8 --repeat 0.3
+    python -m benchmarks.text_pipeline --corpus path/to/corpus.txt
+
+语料按空行切分为段落，每段作为一次划词依次送入 TextPipeline。未给出 --corpus 时生成确定性的合成语料：
+带连字符断词与硬换行的英文 (模拟从 PDF 复制)、按固定宽度折行的中文，以及中英混排的段落。
+--repeat 是重复出现的段落比例 (反复划选同一段文字)。分别测量不缓存 (cache_size=0) 与缓存开启时
+每段的处理延迟和 MB/s。
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from benchmarks.harness import summarize
+from src.server.text_pipeline import TextPipeline
+
+_WORDS = ("the translation client receives selected text from documents and renders sentences with "
+          "language specific formatting while the server normalizes whitespace hyphenation and segmentation "
+          "performance matters because every selection is broadcast to many connected clients").split()
+_HAN = "我们在文档中选中一段文字服务器会先统一处理空白与换行然后按句切分并识别语言再推送给所有客户端"
+
+
+def _english(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(40, 120))]
+    lines, line = [], ""
+    for word in words:
+        if len(line) + len(word) > 60:
+            # PDF 折行：约三分之一的行尾单词被连字符断开
+            if len(word) > 6 and rng.random() < 0.3:
+                cut = len(word) // 2
+                lines.append(f"{line} {word[:cut]}-")
+                line = word[cut:]
+                continue
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word.capitalize()
+        if rng.random() < 0.08:
+            line += "."
+    lines.append(line + ".")
+    return "\n".join(lines)
+
+
+def _chinese(rng: random.Random, mixed: bool) -> str:
+    text = "".join(rng.choice(_HAN) + ("。" if rng.random() < 0.05 else "") for _ in range(rng.randint(60, 200)))
+    if mixed:
+        text = text.replace("文", "文 WebSocket ").replace("器", "器 Python 3.11")
+    return "\n".join(text[i:i + 30] for i in range(0, len(text), 30)) + "。"
+
+
+def synthetic_corpus(size_mb: float, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    paragraphs, total = [], 0
+    while total < size_mb * 1024 * 1024:
+        kind = rng.random()
+        paragraph = _english(rng) if kind < 0.5 else _chinese(rng, mixed=kind > 0.8)
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode("utf-8"))
+    return paragraphs
+
+
+def load_corpus(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [paragraph for paragraph in f.read().split("\n\n") if paragraph.strip()]
+
+
+def _with_repeats(paragraphs: List[str], repeat: float, window: int = 256, seed: int = 11) -> List[str]:
+    """按 repeat 的比例把段落替换为最近 window 段中的某一段 (反复划选附近的文字)。"""
+    rng = random.Random(seed)
+    return [rng.choice(paragraphs[max(0, index - window):index]) if index and rng.random() < repeat else paragraph
+            for index, paragraph in enumerate(paragraphs)]
+
+
+def bench_text_pipeline(corpus_mb: float = 8, repeat: float = 0.3, corpus: str = None, cache_size: int = 1024,
+                        log=print) -> Dict[str, Dict]:
+    paragraphs = _with_repeats(load_corpus(corpus) if corpus else synthetic_corpus(corpus_mb), repeat)
+    total_mb = sum(len(paragraph.encode("utf-8")) for paragraph in paragraphs) / (1024 * 1024)
+    results = {}
+    for label, size in (("off", 0), ("on", cache_size)):
+        pipeline = TextPipeline(lambda message: None, cache_size=size)
+        latencies = []
+        started = time.perf_counter()
+        for paragraph in paragraphs:
+            begin = time.perf_counter()
+            pipeline.submit({"type": "text", "data": paragraph, "metadata": {}})
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+        row = summarize(latencies, elapsed, len(paragraphs))
+        row["mb_per_s"] = round(total_mb / elapsed, 3) if elapsed > 0 else 0.0
+        row["cache_hits"] = pipeline.cache.hits
+        key = f"text_pipeline[cache={label}]"
+        results[key] = row
+        log(f"[bench] {key}: {row}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="划词文本处理阶段：规范化、分句与语言识别的吞吐")
+    parser.add_argument("--corpus", help="语料文件 (UTF-8，段落之间空一行)；省略时生成合成语料")
+    parser.add_argument("--corpus-mb", type=float, default=8, help="合成语料的大小 (MB)")
+    parser.add_argument("--repeat", type=float, default=0.3, help="重复段落的比例")
+    parser.add_argument("--cache-size", type=int, default=1024, help="LRU 缓存的条目数")
+    args = parser.parse_args(argv)
+    results = bench_text_pipeline(args.corpus_mb, args.repeat, args.corpus, args.cache_size, log=lambda *_: None)
+    print(f"{'scenario':28} {'p50_ms':>9} {'p99_ms':>9} {'MB/s':>9} {'hits':>7}")
+    for name, row in results.items():
+        print(f"{name:28} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['mb_per_s']:>9.2f} {row['cache_hits']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
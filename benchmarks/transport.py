@@ -0,0 +1,90 @@
+# benchmarks/transport.py
+"""
+TCP 回环与 Unix 域套接字两种传输的吞吐量与延迟：
+
+    python -m benchmarks.transport --sizes-mb 1,8,32 --messages 20
+
+在本地启动同时监听两种传输的 WebSocketServer，分别用一个 TCP 客户端和一个 Unix 域套接字客户端
+接收大图像消息 (Base64 负载)。每次通过 queue_message 注入一条消息并等待客户端收完，
+统计从注入到收完的延迟，以及按负载字节数计算的 MB/s。
+"""
+import argparse
+import asyncio
+import base64
+import os
+import socket
+import tempfile
+import time
+from typing import Dict, List
+
+import websockets
+
+from benchmarks.harness import ServerHarness, summarize
+from src.server.websocket_server import WebSocketServer
+
+
+def _payload(size_bytes: int) -> Dict:
+    # Base64 后约为 size_bytes，与真实截图消息的形态一致 (不可压缩)
+    data = base64.b64encode(os.urandom(size_bytes * 3 // 4)).decode("ascii")
+    return {"type": "image", "timestamp": "2025-01-01T00:00:00Z", "data": data,
+            "metadata": {"format": "png", "encoding": "base64",
+                         "region": {"x": 0, "y": 0, "width": 1, "height": 1}}}
+
+
+async def _receive(connect, server: WebSocketServer, message: Dict, count: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    async with connect() as client:
+        # 等待服务器完成注册，避免第一条消息在连接建立前广播
+        while not server.connected_clients:
+            await asyncio.sleep(0.001)
+        started = time.perf_counter()
+        for _ in range(count):
+            begin = time.perf_counter()
+            server.queue_message(dict(message))
+            await client.recv()
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+    stats = summarize(latencies, elapsed, count)
+    stats["mb_per_s"] = round(len(message["data"]) * count / elapsed / (1024 * 1024), 1) if elapsed else 0.0
+    return stats
+
+
+def bench_transport(sizes_mb=(1, 8, 32), messages: int = 20, log=print) -> Dict[str, Dict]:
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("当前平台不支持 Unix 域套接字")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sock")
+        with ServerHarness(WebSocketServer, unix_socket={"enabled": True, "path": path}) as harness:
+            server = harness.server
+            transports = {
+                "tcp": lambda: websockets.connect(harness.url, max_size=None, compression=None),
+                "uds": lambda: websockets.unix_connect(path, uri="ws://localhost/", max_size=None, compression=None),
+            }
+            for size_mb in sizes_mb:
+                message = _payload(int(size_mb * 1024 * 1024))
+                for name, connect in transports.items():
+                    key = f"transport[{name},{size_mb}MB]"
+                    results[key] = asyncio.run(_receive(connect, server, message, messages))
+                    log(f"[bench] {key}: {results[key]}")
+                    # 等待断开的客户端注销，下一轮只有一个连接
+                    while server.connected_clients:
+                        time.sleep(0.001)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="TCP 与 Unix 域套接字传输对比")
+    parser.add_argument("--sizes-mb", type=lambda s: [float(n) for n in s.split(",")], default=[1, 8, 32],
+                        help="负载大小列表 (MB)，如 1,8,32")
+    parser.add_argument("--messages", type=int, default=20, help="每种场景发送的消息数")
+    args = parser.parse_args(argv)
+    results = bench_transport(args.sizes_mb, args.messages, log=lambda *_: None)
+    print(f"{'scenario':28} {'p50_ms':>9} {'p99_ms':>9} {'MB/s':>9}")
+    for name, row in results.items():
+        print(f"{name:28} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['mb_per_s']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
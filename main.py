@@ -1,69 +1,133 @@
 # main.py
+import argparse
 import threading
 import logging
 import multiprocessing
 import queue
 import time
 from src.config_loader import ConfigLoader
+from src.capture.direct import DirectCapture
+from src.capture.text_selection.strategy import configure_selection_policy, save_selection_policy
 from src.listeners.hotkey_listener import HotkeyListener
 from src.listeners.selection_listener import SelectionListener
+from src.server.text_pipeline import open_text_pipeline
 from src.server.websocket_server import WebSocketServer
-from src.logging_config import setup_logging
+from src.agent.uplink import open_uplink
+from src.logging_config import setup_logging, shutdown_logging
 from src.ipc_queue import queue as ipc_queue
 
-def queue_bridge(ws_server: WebSocketServer, shutdown_event: threading.Event):
+def queue_bridge(sink, shutdown_event: threading.Event):
     """
     一个桥接函数，负责从多进程队列(ipc_queue)中获取截图数据，
-    并将其放入WebSocket服务器的内部队列中。
+    并交给 sink：WebSocket 服务器的 queue_message，或代理模式下到 broker 的上行连接。
     """
     logging.info("IPC队列桥接线程已启动，等待截图数据...")
     while not shutdown_event.is_set():
         try:
             data = ipc_queue.get(timeout=1.0)
-            logging.info(f"截图数据已从IPC队列接收 (类型: {data.get('type')})，准备推送到WebSocket。")
-            ws_server.queue_message(data)
+            logging.debug("截图数据已从IPC队列接收 (类型: %s)，准备推送到WebSocket。", data.get('type'))
+            sink(data)
         except queue.Empty:
             continue
         except Exception as e:
             logging.error(f"队列桥接线程发生错误: {e}", exc_info=True)
     logging.info("IPC队列桥接线程已关闭。")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TranStation 后端服务")
+    parser.add_argument("--role", choices=("all", "broker", "agent"), default="all",
+                        help="all: 单进程运行全部服务；broker: 只运行 WebSocket 服务并接收采集代理；"
+                             "agent: 只运行快捷键与划词监听，把采集结果发送给 broker")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     主函数，负责初始化和管理所有服务。
     """
     multiprocessing.freeze_support()
+    args = parse_args(argv)
     shutdown_event = threading.Event()
+    ws_server = None
+    uplink = None
+    text_pipeline = None
+    threads = []
 
     try:
         setup_logging()
         config_loader = ConfigLoader()
-        config = config_loader.get_config()
+        config = config_loader.config
+        # 按 config.yaml 的 logging 段重建日志管线 (级别、滚动文件、JSON 记录、重复警告限流)
+        setup_logging(config.logging.to_dict())
+        # 修改 logging 段后重建日志管线，已入队的记录先写出
+        config_loader.subscribe(lambda new, old: setup_logging(new.to_dict()), "logging")
 
         logging.info("服务启动中...")
+        # 按应用自适应的划词策略，统计从上次运行保存的文件中恢复
+        configure_selection_policy(config.selection.to_dict())
+        config_loader.subscribe(lambda new, old: configure_selection_policy(new.to_dict()), "selection")
+
+        # 快捷键的直接截图与客户端的远程采集共用同一个 mss 工作线程；broker 进程不在本机截图
+        direct_capture = DirectCapture(ipc_queue, config.screenshot.thumbnail_size) if args.role != "broker" else None
+        if args.role == "agent":
+            # 采集代理：监听器的结果经上行连接发给 broker，由 broker 标记会话并分发给客户端
+            uplink = open_uplink(config.agent.to_dict())
+            config_loader.subscribe(lambda new, old: uplink.update_config(new.to_dict()), "agent")
+            sink = uplink.send
+            threads.append(threading.Thread(target=uplink.run, args=(shutdown_event,), name="AgentUplinkThread",
+                                            daemon=True))
+        else:
+            server_config = config.server
+            agents = server_config.agents
+            if args.role == "broker":
+                agents = dict(agents or {}, enabled=True)
+            ws_server = WebSocketServer(
+                host=server_config.host,
+                port=server_config.port,
+                compression=server_config.compression,
+                artifacts=server_config.artifacts,
+                journal=server_config.journal,
+                history=server_config.history,
+                remote_capture=server_config.remote_capture,
+                rpc=server_config.rpc,
+                unix_socket=server_config.unix_socket,
+                agents=agents,
+                scheduler=server_config.scheduler,
+                direct_capture=direct_capture
+            )
+            sink = ws_server.queue_message
+            config_loader.subscribe(ws_server.update_settings, "server")
+            threads.append(threading.Thread(target=ws_server.run, name="WebSocketThread", daemon=True))
 
-        ws_server = WebSocketServer(
-            host=config['server']['host'],
-            port=config['server']['port']
-        )
-        
-        # --- 关键修复：将shutdown_event传递给监听器 ---
-        selection_listener = SelectionListener(ws_server.queue_message, shutdown_event)
-        hotkey_listener = HotkeyListener(config, shutdown_event)
+        if args.role != "broker":
+            # --- 关键修复：将shutdown_event传递给监听器 ---
+            # 划词文本先经过规范化/分句/语言识别 (以及可选的微批处理) 再推送
+            text_pipeline = open_text_pipeline(config.text_pipeline.to_dict(), sink)
+            if ws_server:
+                ws_server.text_pipeline = text_pipeline
+            config_loader.subscribe(lambda new, old: text_pipeline.update_config(new.to_dict()), "text_pipeline")
+            selection_listener = SelectionListener(text_pipeline.submit, shutdown_event)
+            hotkey_listener = HotkeyListener(config, shutdown_event, selection_listener, direct_capture)
 
-        threads = [
-            threading.Thread(target=ws_server.run, name="WebSocketThread", daemon=True),
-            threading.Thread(target=hotkey_listener.run, name="HotkeyListenerThread"),
-            threading.Thread(target=selection_listener.run, name="SelectionListenerThread"),
-            threading.Thread(target=queue_bridge, args=(ws_server, shutdown_event), name="IPCBridgeThread")
-        ]
+            # 修改 config.yaml 后无需重启：快捷键、截图配置档、截图样式和服务器设置会被推送给对应组件
+            config_loader.subscribe(hotkey_listener.update_config)
+            threads += [
+                threading.Thread(target=hotkey_listener.run, name="HotkeyListenerThread"),
+                threading.Thread(target=selection_listener.run, name="SelectionListenerThread"),
+                threading.Thread(target=queue_bridge, args=(sink, shutdown_event), name="IPCBridgeThread"),
+            ]
+        threads.append(threading.Thread(target=config_loader.watch, args=(shutdown_event,), name="ConfigWatcherThread",
+                                        daemon=True))
 
         for thread in threads:
             thread.start()
 
-        logging.info("所有服务已成功启动。程序正在运行...")
-        logging.info(f"截图快捷键: {config['hotkey']['screenshot']}")
-        logging.info("划词读取功能已激活。")
+        logging.info(f"所有服务已成功启动 (角色: {args.role})。程序正在运行...")
+        if uplink:
+            logging.info(f"采集代理会话 {uplink.session_id}，broker: {uplink.unix_path or uplink.url}")
+        if args.role != "broker":
+            for hotkey, profile in config.hotkey_bindings().items():
+                logging.info(f"快捷键 {hotkey}: 配置档 {profile.name} ({profile.action})")
+            logging.info("划词读取功能已激活。")
         logging.info("按 Ctrl+C 退出程序。")
 
         # 保持主线程活动以响应Ctrl+C
@@ -80,11 +144,20 @@ def main():
         shutdown_event.set()
     finally:
         logging.info("正在等待所有服务线程停止...")
+        if text_pipeline:
+            # 发出微批处理中尚未到期的划词
+            text_pipeline.close()
+        if ws_server:
+            ws_server.stop()
+        if uplink:
+            uplink.stop()
         # 等待所有非守护线程完成
         for thread in threads:
             if thread.is_alive() and not thread.daemon:
                 thread.join(timeout=3.0)
+        save_selection_policy()
         logging.info("服务已关闭。")
+        shutdown_logging()
 
 if __name__ == "__main__":
     main()
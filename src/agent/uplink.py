@@ -0,0 +1,186 @@
+# src/agent/uplink.py
+import asyncio
+import getpass
+import json
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_PENDING_BYTES = 128 * 1024 * 1024
+
+
+def default_session_id() -> str:
+    """当前登录会话的标识：用户名加显示器或终端服务会话名。"""
+    display = os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY") or os.environ.get("SESSIONNAME")
+    session = f"{getpass.getuser()}@{display or socket.gethostname()}"
+    return "".join(c if c.isalnum() or c in ".@:_-" else "_" for c in session)[:128]
+
+
+class AgentUplink:
+    """
+    采集代理到 broker 的上行连接，在独立线程的事件循环中运行，断线后自动重连。
+
+    send() 线程安全且不阻塞：消息先序列化，再进入一个按条数和字节数都有上限的队列；
+    broker 不可达或处理不过来时丢弃最旧的消息并计数，代理进程的内存因此有界。
+    """
+    def __init__(self, session_id: Optional[str] = None, url: str = "ws://127.0.0.1:8765",
+                 unix_path: Optional[str] = None, token: Optional[str] = None,
+                 max_pending: int = DEFAULT_MAX_PENDING, max_pending_bytes: int = DEFAULT_MAX_PENDING_BYTES,
+                 reconnect_delay: float = 1.0):
+        self.session_id = session_id or default_session_id()
+        self.url = url
+        self.unix_path = unix_path
+        self.token = token
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.reconnect_delay = reconnect_delay
+        self.sent = 0
+        self.dropped = 0
+        self.pending_bytes = 0
+        self.connected = threading.Event()
+        # 连接设置被热重载修改后置位，当前连接随即关闭并按新设置重连
+        self._reconnect = False
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _path(self) -> str:
+        query = {"session": self.session_id}
+        if self.token:
+            query["token"] = self.token
+        return f"/agent?{urlencode(query)}"
+
+    def send(self, message: Dict[str, Any]) -> None:
+        """把一条采集消息排入上行队列。"""
+        text = json.dumps(message)
+        with self._lock:
+            self._pending.append(text)
+            self.pending_bytes += len(text)
+            while len(self._pending) > self.max_pending or \
+                    (self.pending_bytes > self.max_pending_bytes and len(self._pending) > 1):
+                self.pending_bytes -= len(self._pending.popleft())
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    logging.warning(f"broker 未及时接收，已丢弃 {self.dropped} 条最旧的消息。")
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    def _connect(self):
+        uri = self.url.rstrip("/") + self._path()
+        if self.unix_path:
+            return websockets.unix_connect(self.unix_path, uri=f"ws://localhost{self._path()}",
+                                           max_size=None, compression=None)
+        return websockets.connect(uri, max_size=None, compression=None)
+
+    async def _pump(self, websocket):
+        while not self._stopping and not self._reconnect:
+            with self._lock:
+                text = self._pending[0] if self._pending else None
+            if text is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await websocket.send(text)
+            with self._lock:
+                # 发送期间该消息可能已因队列溢出被丢弃
+                if self._pending and self._pending[0] is text:
+                    self._pending.popleft()
+                    self.pending_bytes -= len(text)
+            self.sent += 1
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        while not self._stopping:
+            target = self.unix_path or self.url
+            self._reconnect = False
+            try:
+                async with self._connect() as websocket:
+                    logging.info(f"已连接到 broker {target} (会话 {self.session_id})")
+                    self.connected.set()
+                    await self._pump(websocket)
+            except (OSError, ConnectionClosed, InvalidHandshake, asyncio.TimeoutError) as e:
+                if not self._stopping:
+                    logging.warning(f"与 broker {target} 的连接断开，{self.reconnect_delay} 秒后重连: {e}")
+            self.connected.clear()
+            if not self._stopping and not self._reconnect:
+                await asyncio.sleep(self.reconnect_delay)
+
+    def run(self, shutdown_event: Optional[threading.Event] = None):
+        """运行上行连接直到 stop() 或 shutdown_event 置位，应在独立线程中调用。"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        task = loop.create_task(self._run())
+        if shutdown_event is not None:
+            threading.Thread(target=lambda: (shutdown_event.wait(), self.stop()), name="AgentUplinkStop",
+                             daemon=True).start()
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+            logging.info(f"上行连接已关闭 (已发送 {self.sent} 条，丢弃 {self.dropped} 条)。")
+
+    def stop(self):
+        self._stopping = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            def cancel():
+                for task in asyncio.all_tasks(loop):
+                    task.cancel()
+            try:
+                loop.call_soon_threadsafe(cancel)
+            except RuntimeError:
+                pass
+
+    def update_config(self, config: Optional[Dict[str, Any]]):
+        """
+        热重载 agent 段：积压上限与重连间隔立即生效；broker 地址、会话或令牌变化时断开当前连接，
+        按新设置重连 (积压的消息保留)。
+        """
+        options = {"session_id": None, "url": "ws://127.0.0.1:8765", "unix_path": None, "token": None,
+                   "max_pending": DEFAULT_MAX_PENDING, "max_pending_bytes": DEFAULT_MAX_PENDING_BYTES,
+                   "reconnect_delay": 1.0, **(config or {})}
+        connection = (options["session_id"] or default_session_id(), options["url"], options["unix_path"],
+                      options["token"])
+        reconnect = connection != (self.session_id, self.url, self.unix_path, self.token)
+        with self._lock:
+            self.session_id, self.url, self.unix_path, self.token = connection
+            self.max_pending = options["max_pending"]
+            self.max_pending_bytes = options["max_pending_bytes"]
+            self.reconnect_delay = options["reconnect_delay"]
+        if reconnect:
+            logging.info("agent 连接设置已修改，重新连接 broker。")
+            self._reconnect = True
+            self._wake()
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "dropped": self.dropped, "pending": self.pending,
+                "pending_bytes": self.pending_bytes}
+
+
+def open_uplink(config: Optional[Dict[str, Any]]) -> AgentUplink:
+    """按 agent 配置创建上行连接。"""
+    options = dict(config or {})
+    return AgentUplink(**options)
@@ -0,0 +1,285 @@
+# src/capture/clipboard.py
+"""
+把截图复制到系统剪贴板。
+
+编码整张截图 (PNG / DIB) 以及写入剪贴板可能要几十到几百毫秒，ClipboardService 把这些工作放到工作线程，
+Tk 线程只通过 after() 轮询结果，复制期间预览窗口照常响应。可用的后端：
+
+  windows  win32clipboard，同时放入 CF_DIB 与注册格式 "PNG"
+  wl-copy  Wayland，wl-copy 在后台持有剪贴板 (只提供 image/png)
+  xclip    X11，xclip 在后台持有 CLIPBOARD (只提供 image/png)
+  tk       X11，由一个隐藏的常驻 Tk 窗口持有 CLIPBOARD，提供 image/png 与 image/bmp；
+           进程退出时剪贴板随之清空，因此截图进程关闭预览后会继续持有一段时间 (clipboard_hold_seconds)。
+           Tk 只能以 STRING 类型应答 (字节按 ISO-8859-1 原样传递)，严格检查类型的程序可能拒绝粘贴，
+           因此 auto 不会选择它，需要显式配置
+"""
+import functools
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+from PIL import Image
+
+from src.config_schema import CLIPBOARD_TARGETS
+
+# windows 后端需要 pywin32；未安装时 detect_backend 不会选择它
+IS_WINDOWS = sys.platform == "win32"
+if IS_WINDOWS:
+    try:
+        import win32clipboard
+        import win32con
+    except ImportError:
+        logging.warning("pywin32 未安装, “复制到剪贴板”功能将不可用。")
+        IS_WINDOWS = False
+
+_BMP_FILE_HEADER_SIZE = 14
+
+
+def encode_clipboard_targets(image: Image.Image, targets: Iterable[str] = CLIPBOARD_TARGETS) -> Dict[str, bytes]:
+    """按剪贴板格式编码：png 为完整的 PNG 文件，dib 为去掉 14 字节文件头的 BMP (即 CF_DIB)。"""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    payloads = {}
+    for target in targets:
+        output = BytesIO()
+        if target == "png":
+            # 剪贴板数据只在本机传递，用最快的压缩级别
+            image.save(output, "PNG", compress_level=1)
+            payloads[target] = output.getvalue()
+        elif target == "dib":
+            (image if image.mode == "RGB" else image.convert("RGB")).save(output, "BMP")
+            payloads[target] = output.getbuffer()[_BMP_FILE_HEADER_SIZE:].tobytes()
+        else:
+            raise ValueError(f"未知的剪贴板格式: {target}")
+        output.close()
+    return payloads
+
+
+def bmp_file(dib: bytes) -> bytes:
+    """给 24 位无调色板的 DIB 补上 BITMAPFILEHEADER (X11 的 image/bmp 需要完整的 BMP 文件)。"""
+    info_size, = struct.unpack_from("<I", dib)
+    return struct.pack("<2sIHHI", b"BM", _BMP_FILE_HEADER_SIZE + len(dib), 0, 0,
+                       _BMP_FILE_HEADER_SIZE + info_size) + dib
+
+
+class _WindowsBackend:
+    name = "windows"
+    targets = ("png", "dib")
+    # 可以在任意线程中写入
+    ui_thread = False
+
+    def publish(self, payloads: Dict[str, bytes]):
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            if "dib" in payloads:
+                win32clipboard.SetClipboardData(win32con.CF_DIB, payloads["dib"])
+            if "png" in payloads:
+                win32clipboard.SetClipboardData(win32clipboard.RegisterClipboardFormat("PNG"), payloads["png"])
+        finally:
+            win32clipboard.CloseClipboard()
+
+
+class _CommandBackend:
+    """通过 wl-copy / xclip 写入：工具读完标准输入后转入后台持有剪贴板，直到被其他程序取代。"""
+    targets = ("png",)
+    ui_thread = False
+
+    def __init__(self, name: str, command: Sequence[str]):
+        self.name = name
+        self.command = list(command)
+
+    def publish(self, payloads: Dict[str, bytes]):
+        # 转入后台的进程继承标准输出/错误，接管道的话 run() 会一直等到剪贴板被取代
+        subprocess.run(self.command, input=payloads["png"], stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True, timeout=10)
+
+
+class TkSelectionOwner:
+    """
+    X11 上由隐藏的 Toplevel 持有 CLIPBOARD，其他程序粘贴时 Tk 调用 _serve 分段取数据。
+    只能在 Tk 线程中使用。owned 在被其他程序取代后变为 False。
+    """
+    name = "tk"
+    targets = ("png", "dib")
+    ui_thread = True
+    MIME_TYPES = {"png": "image/png", "dib": "image/bmp"}
+
+    def __init__(self, root):
+        self.root = root
+        self.window = None
+        self.payloads: Dict[str, bytes] = {}
+        self.owned = False
+
+    def _ensure_window(self):
+        if self.window is not None and self.window.winfo_exists():
+            return
+        self.window = tk.Toplevel(self.root)
+        self.window.withdraw()
+        for target, mime_type in self.MIME_TYPES.items():
+            self.window.selection_handle(functools.partial(self._serve, target), selection="CLIPBOARD",
+                                         type=mime_type)
+
+    def publish(self, payloads: Dict[str, bytes]):
+        self._ensure_window()
+        self.payloads = {target: bmp_file(data) if target == "dib" else data for target, data in payloads.items()}
+        self.window.selection_own(selection="CLIPBOARD", command=self._lost)
+        self.owned = True
+
+    def _serve(self, target: str, offset, length) -> str:
+        # 处理函数的返回值是字符串；默认的 STRING 格式按 ISO-8859-1 转换，每个字符对应一个原始字节
+        start = int(offset)
+        return self.payloads.get(target, b"")[start:start + int(length)].decode("latin-1")
+
+    def _lost(self):
+        self.owned = False
+        self.payloads = {}
+
+
+def detect_backend(name: str = "auto", root=None):
+    """
+    按 screenshot.clipboard_backend 选择后端，没有可用后端时返回 None。
+    tk 后端只在显式配置且 root 不为 None (所在线程有 Tk 事件循环) 时使用；auto 在 X11 上只选择 xclip，
+    它以正确的 MIME 类型应答，并在截图进程退出后仍然持有剪贴板。
+    """
+    if name in ("auto", "windows"):
+        if IS_WINDOWS:
+            return _WindowsBackend()
+        if name == "windows":
+            return None
+    if name == "wl-copy" or (name == "auto" and os.environ.get("WAYLAND_DISPLAY")):
+        if shutil.which("wl-copy"):
+            return _CommandBackend("wl-copy", ["wl-copy", "--type", "image/png"])
+        if name == "wl-copy":
+            return None
+    if name in ("auto", "xclip") and shutil.which("xclip"):
+        return _CommandBackend("xclip", ["xclip", "-selection", "clipboard", "-t", "image/png", "-i"])
+    if name == "tk" and root is not None and sys.platform.startswith("linux"):
+        return TkSelectionOwner(root)
+    return None
+
+
+def _targets_for(backend, targets: Iterable[str]) -> tuple:
+    """配置的格式中后端支持的部分；一个都不支持时使用后端的全部格式。"""
+    supported = tuple(target for target in targets if target in backend.targets)
+    return supported or backend.targets
+
+
+def copy_image_to_clipboard(image: Image.Image, config: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    同步地编码并放入系统剪贴板，成功返回 True。用于没有 Tk 事件循环的工作线程 (直接截图)；
+    config 为 screenshot 段，读取 clipboard_backend 与 clipboard_targets。
+    """
+    config = config or {}
+    backend = detect_backend(config.get("clipboard_backend", "auto"))
+    if backend is None:
+        logging.warning("当前平台不支持复制图片到剪贴板。")
+        return False
+    try:
+        backend.publish(encode_clipboard_targets(image, _targets_for(backend, config.get("clipboard_targets",
+                                                                                         CLIPBOARD_TARGETS))))
+        return True
+    except Exception as e:
+        logging.error(f"复制到剪贴板失败: {e}")
+        return False
+
+
+class ClipboardService:
+    """
+    Tk 线程使用的剪贴板导出：copy() 立即返回，编码 (以及 Windows / 命令行后端的写入) 在工作线程中进行，
+    结果由 after() 轮询交回 Tk 线程，tk 后端在 Tk 线程中接管 CLIPBOARD。
+    """
+    POLL_MS = 15
+
+    def __init__(self, root, targets: Iterable[str] = CLIPBOARD_TARGETS, backend: str = "auto",
+                 hold_seconds: float = 60):
+        self.root = root
+        self.targets = tuple(targets)
+        self.hold_seconds = hold_seconds
+        self.backend = detect_backend(backend, root)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @classmethod
+    def from_config(cls, root, config: Dict[str, Any]) -> "ClipboardService":
+        """按 screenshot 段 (ScreenshotConfig.to_dict() 的结果) 创建。"""
+        return cls(root, config.get("clipboard_targets", CLIPBOARD_TARGETS), config.get("clipboard_backend", "auto"),
+                   config.get("clipboard_hold_seconds", 60))
+
+    @property
+    def available(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def holding(self) -> bool:
+        """tk 后端是否仍持有剪贴板 (进程退出会清空剪贴板)。"""
+        return getattr(self.backend, "owned", False)
+
+    def copy(self, image: Image.Image, on_done: Optional[Callable[[bool], None]] = None) -> bool:
+        """开始复制并立即返回；完成后在 Tk 线程中调用 on_done(是否成功)。没有可用后端时返回 False。"""
+        if self.backend is None:
+            logging.warning("当前平台不支持复制图片到剪贴板。")
+            return False
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ClipboardExport")
+        self._pending += 1
+        future = self._executor.submit(self._export, image)
+        self.root.after(self.POLL_MS, self._poll, future, on_done)
+        return True
+
+    def _export(self, image: Image.Image) -> Dict[str, bytes]:
+        payloads = encode_clipboard_targets(image, _targets_for(self.backend, self.targets))
+        if not self.backend.ui_thread:
+            self.backend.publish(payloads)
+        return payloads
+
+    def _poll(self, future: Future, on_done: Optional[Callable[[bool], None]]):
+        if not future.done():
+            self.root.after(self.POLL_MS, self._poll, future, on_done)
+            return
+        self._pending -= 1
+        try:
+            payloads = future.result()
+            if self.backend.ui_thread:
+                self.backend.publish(payloads)
+            success = True
+        except Exception as e:
+            logging.error(f"复制到剪贴板失败: {e}")
+            success = False
+        if on_done is not None:
+            on_done(success)
+
+    def close(self, callback: Callable[[], None], on_hold: Optional[Callable[[], None]] = None):
+        """
+        等进行中的复制完成后调用 callback。tk 后端仍持有剪贴板时先调用 on_hold，
+        再继续持有至多 hold_seconds 秒 (被其他程序取代时提前结束)。
+        """
+        deadline = time.monotonic() + self.hold_seconds
+        held = []
+
+        def check():
+            if self._pending:
+                self.root.after(self.POLL_MS, check)
+                return
+            if self.holding and time.monotonic() < deadline:
+                if not held:
+                    held.append(True)
+                    logging.info(f"截图已在剪贴板中，继续持有至多 {self.hold_seconds} 秒。")
+                    if on_hold is not None:
+                        on_hold()
+                self.root.after(200, check)
+                return
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            callback()
+
+        check()
@@ -0,0 +1,116 @@
+# src/capture/direct.py
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from mss import mss
+
+from src.capture.clipboard import copy_image_to_clipboard
+from src.capture.encoding import DEFAULT_PROFILE, build_image_message, log_capture
+from src.capture.memory import CaptureBudget, FrameBuffer, grab_image
+from src.capture.pixels import NUMPY_AVAILABLE, RGBX_FORMATS, PixelFrame, changed_region
+
+
+class DirectCapture:
+    """
+    不经过选区遮罩和截图子进程，直接通过 mss 抓取指定区域 (整个显示器、重复上次区域)。
+    所有抓取都在同一个工作线程中进行并复用同一个 mss 实例 (部分平台的 mss 句柄不能跨线程使用)，
+    省去了启动子进程和 Tk 的开销。同尺寸的连续截图复用同一块 RGB 转换缓冲 (见 FrameBuffer)。
+
+    安装了 NumPy 且截图无需分块时，像素处理在 mss 缓冲的视图上进行 (见 PixelFrame)：JPEG/WebP 原地交换通道后
+    直接编码，不再转换；每次截图计算分块哈希，与同一区域的上一次截图相比，metadata.changed_region
+    给出变化区域的外接矩形 (完全相同时为 null，并直接复用上次的编码结果)。
+    """
+    def __init__(self, sink, thumbnail_size: int = 256, budget: Optional[CaptureBudget] = None):
+        self.sink = sink
+        self.thumbnail_size = thumbnail_size
+        self.budget = budget or CaptureBudget()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DirectCapture")
+        self._frame_buffer = FrameBuffer()
+        # screenshot 段，复制到剪贴板时读取 clipboard_backend 与 clipboard_targets
+        self.clipboard_config: Dict[str, Any] = {}
+        # 上一次截图的 (区域, 分块哈希, 编码参数, 编码结果)，只保留一份
+        self._last = None
+        self._sct = None
+
+    def _grabber(self):
+        if self._sct is None:
+            self._sct = mss()
+        return self._sct
+
+    def monitor_region(self, index: int) -> Dict[str, int]:
+        """mss 的显示器几何信息，序号 0 为所有显示器组成的虚拟屏幕；序号越界时退回主显示器。"""
+        monitors = self._grabber().monitors
+        monitor = monitors[index] if index < len(monitors) else monitors[min(1, len(monitors) - 1)]
+        return {"x": monitor["left"], "y": monitor["top"], "width": monitor["width"], "height": monitor["height"]}
+
+    def capture(self, region: Optional[Dict[str, int]], profile: Dict[str, Any], deliver: bool = True) -> Dict[str, Any]:
+        """
+        抓取并按配置档投递一张截图，返回图像消息。应在工作线程中调用 (见 submit)。
+        region 为 None 时截取配置档指定的显示器；deliver 为 False 时只返回消息，由调用方处理。
+        """
+        started = time.perf_counter()
+        if region is None:
+            region = self.monitor_region(profile.get("monitor", 1))
+        plan = self.budget.plan(region["width"], region["height"])
+        if NUMPY_AVAILABLE and not plan.tiled:
+            image, message = self._capture_pixels(region, profile)
+        else:
+            image = grab_image(self._grabber(), region, self.budget, self._frame_buffer, plan)
+            message = build_image_message(image, region, profile, self.thumbnail_size)
+        captured = time.perf_counter()
+        if deliver:
+            destination = profile.get("destination", "broadcast")
+            if destination in ("broadcast", "both"):
+                self.sink.put(message)
+            if destination in ("clipboard", "both"):
+                copy_image_to_clipboard(image, self.clipboard_config)
+        finished = time.perf_counter()
+        log_capture(message, "direct_capture", {"capture_ms": round((captured - started) * 1000, 2),
+                                                "deliver_ms": round((finished - captured) * 1000, 2),
+                                                "total_ms": round((finished - started) * 1000, 2)})
+        return message
+
+    def _capture_pixels(self, region: Dict[str, int], profile: Dict[str, Any]):
+        width, height = region["width"], region["height"]
+        sct_img = self._grabber().grab({"left": region["x"], "top": region["y"], "width": width, "height": height})
+        frame = PixelFrame.from_screenshot(sct_img)
+        hashes = frame.block_hashes()
+        settings = {**DEFAULT_PROFILE, **profile}
+        encoding = (settings["format"], settings["quality"], self.thumbnail_size)
+        key = (region["x"], region["y"], width, height)
+
+        previous = self._last if self._last is not None and self._last[0] == key else None
+        changed = changed_region(previous[1], hashes, width, height) if previous is not None else None
+        encoded = previous[3] if previous is not None and changed is None and previous[2] == encoding else None
+
+        if settings["format"] in RGBX_FORMATS:
+            image = frame.swizzle_rgbx().to_image("RGBX")
+        else:
+            image = frame.to_image("RGB", into=self._frame_buffer.acquire(width, height))
+        message = build_image_message(image, region, profile, self.thumbnail_size, encoded=encoded)
+        if previous is not None:
+            message["metadata"]["changed_region"] = changed
+        self._last = (key, hashes, encoding, (message["data"], message["artifacts"]["thumbnail"]))
+        return image, message
+
+    def submit(self, region: Optional[Dict[str, int]], profile: Dict[str, Any], deliver: bool = True) -> Future:
+        future = self._executor.submit(self.capture, region, profile, deliver)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"直接截图失败: {future.exception()}", exc_info=future.exception())
+
+    def close(self):
+        def release():
+            if self._sct is not None:
+                self._sct.close()
+                self._sct = None
+            self._frame_buffer.release()
+            self._last = None
+        self._executor.submit(release)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,105 @@
+# src/capture/encoding.py
+import base64
+import binascii
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+DEFAULT_PROFILE = {"name": "screenshot", "format": "png", "quality": 90, "destination": "broadcast",
+                   "preview": True, "ocr": False}
+
+_PIL_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+
+
+class _Base64Writer:
+    """
+    供 Image.save 写入的文件对象：收到的数据按 3 字节对齐后立即转为 Base64 文本分片，
+    编码后的完整图像不会以二进制形式整体驻留内存。
+    """
+    def __init__(self):
+        self._pieces: List[str] = []
+        self._tail = b""
+        self._position = 0
+
+    def write(self, data) -> int:
+        size = len(data)
+        self._position += size
+        if self._tail:
+            data = self._tail + bytes(data)
+        cut = len(data) - len(data) % 3
+        if cut:
+            self._pieces.append(binascii.b2a_base64(memoryview(data)[:cut], newline=False).decode("ascii"))
+        self._tail = bytes(data[cut:])
+        return size
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        if self._tail:
+            self._pieces.append(base64.b64encode(self._tail).decode("ascii"))
+            self._tail = b""
+        pieces, self._pieces = self._pieces, []
+        return "".join(pieces)
+
+
+def encode_image(image: Image.Image, fmt: str = "png", quality: int = 90) -> str:
+    """按配置档的格式和质量编码图像，返回 Base64 字符串。"""
+    writer = _Base64Writer()
+    if fmt == "png":
+        image.save(writer, format="PNG")
+    else:
+        image.save(writer, format=_PIL_FORMATS[fmt], quality=quality)
+    return writer.getvalue()
+
+
+def make_thumbnail_artifact(image: Image.Image, max_size: int) -> Dict[str, Any]:
+    """
+    趁原图还在内存中时生成缩略图，服务器先推送它，完整图像随后按需获取，
+    避免服务器再解码一次图像。
+    """
+    scale = min(1.0, max_size / max(image.width, image.height))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    thumbnail = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0) if scale < 1.0 else image
+    if thumbnail.mode != "RGB":
+        # 直接映射 mss 缓冲的 RGBX 图像 (见 PixelFrame) 不能编码为 PNG
+        thumbnail = thumbnail.convert("RGB")
+    return {"data": encode_image(thumbnail), "max_size": max_size, "width": thumbnail.width, "height": thumbnail.height}
+
+
+def log_capture(message: Dict[str, Any], stage: str, timings: Dict[str, float]):
+    """每次截图一条结构化记录 (开启 logging.json 时写入 JSON lines)：截图 id、尺寸与各阶段耗时 (毫秒)。"""
+    metadata = message["metadata"]
+    size = [metadata["region"]["width"], metadata["region"]["height"]]
+    logging.info("截图 %s 完成: %dx%d %s, 耗时 %.1f ms", metadata["capture_id"], size[0], size[1],
+                 metadata["format"], timings["total_ms"],
+                 extra={"capture_id": metadata["capture_id"], "stage": stage, "size": size,
+                        "format": metadata["format"], "timings": timings})
+
+
+def build_image_message(image: Image.Image, region: Dict[str, int], profile: Optional[Dict[str, Any]] = None,
+                        thumbnail_size: int = 256, encoded: Optional[Tuple[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    把一次截图组装成推送给服务器的图像消息。metadata.profile 记录触发它的配置档，
+    配置档要求 OCR 时带上 ocr_requested，由订阅方完成识别。
+    画面与上一次完全相同时，调用方可通过 encoded 传入上次的 (Base64 数据, 缩略图)，跳过编码。
+    """
+    profile = {**DEFAULT_PROFILE, **(profile or {})}
+    metadata = {"format": profile["format"], "encoding": "base64", "capture_id": uuid.uuid4().hex,
+                "region": region, "profile": profile["name"]}
+    if profile["ocr"]:
+        metadata["ocr_requested"] = True
+    if encoded is None:
+        encoded = (encode_image(image, profile["format"], profile["quality"]),
+                   make_thumbnail_artifact(image, thumbnail_size))
+    data, thumbnail = encoded
+    return {"type": "image", "timestamp": datetime.utcnow().isoformat() + "Z",
+            "data": data,
+            "metadata": metadata,
+            "artifacts": {"thumbnail": dict(thumbnail)}}
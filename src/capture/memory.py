@@ -0,0 +1,130 @@
+# src/capture/memory.py
+import logging
+import math
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# 超过一块 4K 屏的截图按行分块抓取，完整的 BGRA 帧不会同时驻留内存
+DEFAULT_TILE_THRESHOLD = 3840 * 2160
+DEFAULT_TILE_ROWS = 256
+
+# 估算用的每像素字节数：RGB 图像 3 字节；PNG 最坏情况与 RGB 一样大，
+# 流式 Base64 的分片与最终字符串各为其 4/3，合计 8 字节
+_RGB_BYTES = 3
+_ENCODED_BYTES = 8
+
+
+class CaptureTooLarge(RuntimeError):
+    """截图的预计峰值内存超出 screenshot.memory_budget_mb。"""
+
+
+class CapturePlan:
+    """一次截图的抓取方式与预计峰值内存。"""
+    def __init__(self, width: int, height: int, tile_rows: Optional[int], estimated_bytes: int):
+        self.width = width
+        self.height = height
+        self.tile_rows = tile_rows
+        self.estimated_bytes = estimated_bytes
+
+    @property
+    def tiled(self) -> bool:
+        return self.tile_rows is not None
+
+
+class CaptureBudget:
+    """
+    截图内存的估算与硬上限。每次截图先按尺寸估算峰值 (抓取缓冲 + RGB 图像 + 编码输出)，
+    超过 max_bytes 时直接拒绝；像素数超过 tile_threshold 的截图按 tile_rows 行分块抓取，
+    抓取缓冲只有一块的大小。
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, tile_threshold: int = DEFAULT_TILE_THRESHOLD,
+                 tile_rows: int = DEFAULT_TILE_ROWS):
+        self.max_bytes = max_bytes
+        self.tile_threshold = tile_threshold
+        self.tile_rows = tile_rows
+        self.captures = 0
+        self.tiled = 0
+        self.rejected = 0
+        self.peak_estimated_bytes = 0
+
+    @classmethod
+    def from_config(cls, screenshot: Optional[Dict[str, Any]]) -> "CaptureBudget":
+        """按 screenshot 段 (ScreenshotConfig.to_dict() 的结果) 创建。"""
+        screenshot = screenshot or {}
+        return cls(max_bytes=int(screenshot.get("memory_budget_mb", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+                   tile_threshold=int(screenshot.get("tile_threshold_pixels", DEFAULT_TILE_THRESHOLD)))
+
+    def plan(self, width: int, height: int) -> CapturePlan:
+        pixels = width * height
+        tile_rows = min(self.tile_rows, height) if pixels > self.tile_threshold else None
+        grab_bytes = width * (tile_rows or height) * 4
+        estimated = grab_bytes + pixels * (_RGB_BYTES + _ENCODED_BYTES)
+        if estimated > self.max_bytes:
+            self.rejected += 1
+            raise CaptureTooLarge(f"{width}x{height} 的截图预计需要 {estimated // (1024 * 1024)} MB 内存，"
+                                  f"超出上限 {self.max_bytes // (1024 * 1024)} MB")
+        self.captures += 1
+        self.tiled += tile_rows is not None
+        self.peak_estimated_bytes = max(self.peak_estimated_bytes, estimated)
+        return CapturePlan(width, height, tile_rows, estimated)
+
+    def preview_zoom_limit(self, width: int, height: int) -> float:
+        """预览窗口的最大缩放倍数，使缩放后的图像不超过 tile_threshold 个像素。"""
+        return math.sqrt(self.tile_threshold / max(1, width * height))
+
+    def stats(self) -> Dict[str, int]:
+        return {"captures": self.captures, "tiled": self.tiled, "rejected": self.rejected,
+                "peak_estimated_bytes": self.peak_estimated_bytes}
+
+
+class FrameBuffer:
+    """
+    复用的 RGB 转换缓冲。相同尺寸的连续截图 (整屏、重复上次区域) 直接解码进同一张图像，
+    不再每次分配；超过分块阈值的大图用完即释放，不长期占用内存。
+    图像在下一次 grab() 时会被覆盖，调用方须在此之前用完 (DirectCapture 在同一工作线程中顺序处理)。
+    """
+    def __init__(self):
+        self._image: Optional[Image.Image] = None
+
+    def acquire(self, width: int, height: int) -> Image.Image:
+        if self._image is None or self._image.size != (width, height):
+            self._image = None
+            self._image = Image.new("RGB", (width, height))
+        return self._image
+
+    def release(self):
+        self._image = None
+
+
+def grab_image(sct, region: Dict[str, int], budget: Optional[CaptureBudget] = None,
+               frame_buffer: Optional[FrameBuffer] = None, plan: Optional[CapturePlan] = None) -> Image.Image:
+    """
+    用 mss 抓取区域并转换为 RGB 图像。直接读取 ScreenShot.raw (bgra 属性会再复制一份)，
+    每块抓取缓冲在转换后立即释放。已由调用方按预算规划过时传入 plan。
+    """
+    width, height = region["width"], region["height"]
+    plan = plan or (budget or CaptureBudget()).plan(width, height)
+    image = frame_buffer.acquire(width, height) if frame_buffer is not None else None
+    if not plan.tiled:
+        sct_img = sct.grab({"left": region["x"], "top": region["y"], "width": width, "height": height})
+        if image is None:
+            return Image.frombytes("RGB", (width, height), sct_img.raw, "raw", "BGRX")
+        image.frombytes(sct_img.raw, "raw", "BGRX")
+        return image
+
+    logging.info(f"截图 {width}x{height} 超过分块阈值，按每块 {plan.tile_rows} 行抓取。")
+    image = image if image is not None else Image.new("RGB", (width, height))
+    strip = None
+    for top in range(0, height, plan.tile_rows):
+        rows = min(plan.tile_rows, height - top)
+        sct_img = sct.grab({"left": region["x"], "top": region["y"] + top, "width": width, "height": rows})
+        if strip is None or strip.height != rows:
+            strip = Image.new("RGB", (width, rows))
+        strip.frombytes(sct_img.raw, "raw", "BGRX")
+        sct_img = None
+        image.paste(strip, (0, top))
+    if frame_buffer is not None:
+        frame_buffer.release()
+    return image
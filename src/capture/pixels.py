@@ -0,0 +1,154 @@
+# src/capture/pixels.py
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+# NumPy 为可选依赖：未安装时截图路径退回 Pillow 的整图转换 (见 src/capture/memory.py)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+# 可以直接编码 RGBX 图像的格式；PNG 编码器只接受 RGB，仍需转换一次
+RGBX_FORMATS = ("jpeg", "webp")
+DEFAULT_BLOCK = 64
+# 逐块处理的行数：临时数组只有一块大小，且能留在 CPU 缓存中
+_BAND_ROWS = 16
+
+
+class PixelFrame:
+    """
+    mss BGRA 缓冲上的 NumPy 视图。裁剪得到的仍是同一缓冲上的带步长视图，不复制像素；
+    通道交换与涂抹直接在缓冲中进行；只有在编码边界 (to_image) 才交给 Pillow。
+
+    order 记录缓冲当前的通道顺序 ("BGRX" 或原地交换后的 "RGBX")，第 4 个通道的值不被使用。
+    """
+    def __init__(self, buffer, width: int, height: int, stride: Optional[int] = None, offset: int = 0,
+                 order: str = "BGRX"):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("PixelFrame 需要安装 numpy")
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.stride = stride or width * 4
+        self.offset = offset
+        self.order = order
+        self.array = np.ndarray((height, width, 4), dtype=np.uint8, buffer=buffer, offset=offset,
+                                strides=(self.stride, 4, 1))
+
+    @classmethod
+    def from_screenshot(cls, sct_img) -> "PixelFrame":
+        """直接映射 ScreenShot.raw (bytearray，可写)；bgra 属性会复制一份，不使用。"""
+        width, height = sct_img.size
+        return cls(sct_img.raw, width, height)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "PixelFrame":
+        """返回共享同一缓冲的子区域视图；区域超出范围时抛出 ValueError。"""
+        if width <= 0 or height <= 0 or x < 0 or y < 0 or x + width > self.width or y + height > self.height:
+            raise ValueError(f"裁剪区域超出范围 ({self.width}x{self.height})")
+        return PixelFrame(self.buffer, width, height, self.stride, self.offset + y * self.stride + x * 4, self.order)
+
+    def _bands(self):
+        for top in range(0, self.height, _BAND_ROWS):
+            yield top, self.array[top:top + _BAND_ROWS]
+
+    def swizzle_rgbx(self) -> "PixelFrame":
+        """原地把 BGRX 交换为 RGBX，之后 to_image("RGBX") 可以零复制映射。"""
+        if self.order == "BGRX":
+            # 按 32 位像素处理：保留 G/X，交换最低与第三字节；两个临时数组在各块间复用
+            low, high = (np.empty((_BAND_ROWS, self.width), dtype=np.uint32) for _ in range(2))
+            for _, band in self._bands():
+                pixels = band.view(np.uint32)[..., 0]
+                rows = pixels.shape[0]
+                np.right_shift(pixels, 16, out=low[:rows])
+                low[:rows] &= 0xFF
+                np.left_shift(pixels, 16, out=high[:rows])
+                high[:rows] &= 0xFF0000
+                low[:rows] |= high[:rows]
+                pixels &= 0xFF00FF00
+                pixels |= low[:rows]
+            self.order = "RGBX"
+        return self
+
+    def fill(self, x: int, y: int, width: int, height: int, color: Tuple[int, int, int] = (0, 0, 0)):
+        """原地把区域涂成纯色 (color 为 RGB)，用于遮盖敏感内容。"""
+        red, green, blue = color
+        region = self.crop(x, y, width, height).array
+        region[..., :3] = (blue, green, red) if self.order == "BGRX" else (red, green, blue)
+
+    def block_hashes(self, block: int = DEFAULT_BLOCK) -> "np.ndarray":
+        """
+        每 block×block 像素一个 64 位哈希 (忽略第 4 个通道)，形状为 (块行数, 块列数)。
+        像素值乘以与行、列位置相关的奇数权重后求和，交换或移动像素也会改变哈希。
+        """
+        columns = np.arange(0, self.width, block)
+        column_weights = (np.arange(self.width, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        rows = []
+        for top in range(0, self.height, block):
+            band = self.array[top:top + block].view(np.uint32)[..., 0].astype(np.uint64)
+            band &= np.uint64(0x00FFFFFF)
+            row_weights = (np.arange(top, top + band.shape[0], dtype=np.uint64)
+                           * np.uint64(0xC2B2AE3D27D4EB4F)) | np.uint64(1)
+            band *= column_weights
+            band *= row_weights[:, None]
+            rows.append(np.add.reduceat(band.sum(axis=0), columns))
+        return np.stack(rows)
+
+    def to_image(self, mode: str = "RGB", into: Optional[Image.Image] = None) -> Image.Image:
+        """
+        在编码边界转换为 Pillow 图像。mode 为 "RGBX" 且缓冲已交换为 RGBX 时直接映射缓冲，不复制
+        (映射要求缓冲在视图末行之后仍有完整的一个步长，紧贴缓冲末尾的裁剪除外)；
+        否则解码一次，into 为同尺寸同模式的图像时解码进该图像，复用其内存。
+        """
+        buffer = memoryview(self.buffer)
+        if mode == "RGBX" and self.order == "RGBX" and self.offset + self.stride * self.height <= buffer.nbytes:
+            return Image.frombuffer("RGBX", self.size, buffer[self.offset:self.offset + self.stride * self.height],
+                                    "raw", "RGBX", self.stride, 1)
+        memory = buffer[self.offset:self.offset + self.stride * (self.height - 1) + self.width * 4]
+        if into is not None and into.mode == mode and into.size == self.size:
+            into.frombytes(memory, "raw", self.order, self.stride, 1)
+            return into
+        return Image.frombytes(mode, self.size, memory, "raw", self.order, self.stride, 1)
+
+    def to_gray(self) -> Image.Image:
+        """
+        灰度图，供 OCR 使用。系数为 ITU-R 601 的 8 位定点近似 (77/150/29)，
+        用 16 位整数计算，与 Pillow convert("L") 的结果最多相差 1。
+        """
+        red, blue = (2, 0) if self.order == "BGRX" else (0, 2)
+        gray = np.empty((self.height, self.width), dtype=np.uint8)
+        luma, term = (np.empty((_BAND_ROWS, self.width), dtype=np.uint16) for _ in range(2))
+        for top, band in self._bands():
+            rows = band.shape[0]
+            np.multiply(band[..., red], 77, out=luma[:rows], dtype=np.uint16)
+            np.multiply(band[..., 1], 150, out=term[:rows], dtype=np.uint16)
+            luma[:rows] += term[:rows]
+            np.multiply(band[..., blue], 29, out=term[:rows], dtype=np.uint16)
+            luma[:rows] += term[:rows]
+            luma[:rows] += 128
+            luma[:rows] >>= 8
+            gray[top:top + rows] = luma[:rows]
+        return Image.frombuffer("L", self.size, gray, "raw", "L", 0, 1)
+
+
+def changed_region(previous: "np.ndarray", current: "np.ndarray", width: int, height: int,
+                   block: int = DEFAULT_BLOCK) -> Optional[Dict[str, Any]]:
+    """
+    比较两组 block_hashes，返回变化块的外接矩形 (像素坐标，裁剪到画面内)；没有变化时返回 None。
+    """
+    if previous.shape != current.shape:
+        return {"x": 0, "y": 0, "width": width, "height": height}
+    changed = previous != current
+    if not changed.any():
+        return None
+    rows = np.flatnonzero(changed.any(axis=1))
+    columns = np.flatnonzero(changed.any(axis=0))
+    x, y = int(columns[0]) * block, int(rows[0]) * block
+    return {"x": x, "y": y, "width": min(width, (int(columns[-1]) + 1) * block) - x,
+            "height": min(height, (int(rows[-1]) + 1) * block) - y}
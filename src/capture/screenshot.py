@@ -2,31 +2,30 @@
 import tkinter as tk
 from mss import mss
 from PIL import Image, ImageTk
-import base64
-from io import BytesIO
-from datetime import datetime
 import logging
 import time
-import sys
-
-# 尝试为Windows的“复制到剪贴板”功能导入必要的库
-IS_WINDOWS = sys.platform == "win32"
-if IS_WINDOWS:
-    try:
-        import win32clipboard
-        import win32con
-    except ImportError:
-        logging.warning("pywin32 未安装, “复制到剪贴板”功能将不可用。")
-        IS_WINDOWS = False
+from src.capture.clipboard import ClipboardService
+from src.capture.encoding import DEFAULT_PROFILE, build_image_message, log_capture
+from src.capture.memory import CaptureBudget, CaptureTooLarge, grab_image
+from src.logging_config import configure_child_logging
 
 class ModernScreenshot:
     """
     一个现代化的截图工具，具有跨屏智能定位、可拖动/平移预览、缩放和复制功能。
     """
-    def __init__(self, root: tk.Tk, config: dict, ipc_queue: callable):
+    def __init__(self, root: tk.Tk, config: dict, ipc_queue: callable, last_region=None, clipboard_holding=None):
         self.root = root
         self.config = config.get('screenshot', {})
+        # 触发本次截图的配置档：输出格式、质量、去向以及是否显示预览
+        self.profile = {**DEFAULT_PROFILE, **config.get('profile', {})}
         self.ipc_queue = ipc_queue
+        self.budget = CaptureBudget.from_config(self.config)
+        # 与主进程共享的 [x, y, width, height]，供“重复上次区域”使用
+        self.last_region = last_region
+        # 编码与写入剪贴板在工作线程中进行；tk 后端持有剪贴板期间设置 clipboard_holding (multiprocessing.Event)，
+        # 主进程据此知道子进程只是在保留剪贴板，新的框选可以直接取代它
+        self.clipboard = ClipboardService.from_config(root, self.config)
+        self.clipboard_holding = clipboard_holding
         
         self.overlay = None
         self.canvas = None
@@ -47,6 +46,7 @@ class ModernScreenshot:
         
         # 缩放相关属性
         self._zoom_level = 1.0
+        self._fit_zoom = 1.0 # 预览窗口初始的缩放级别，超大截图会缩小显示
         self._zoom_step = 0.1
         self._min_zoom, self._max_zoom = 0.1, 5.0
         self._zoom_label = None
@@ -104,17 +104,31 @@ class ModernScreenshot:
             self._exit_process()
 
     def _capture_and_preview(self, x, y, width, height):
-        with mss() as sct:
-            monitor = {"top": y, "left": x, "width": width, "height": height}
-            sct_img = sct.grab(monitor)
-            self._captured_image = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-
-        buffered = BytesIO()
-        self._captured_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        self._captured_data = {"type": "image", "timestamp": datetime.utcnow().isoformat() + "Z", "data": img_str,
-                               "metadata": {"format": "png", "encoding": "base64", "region": {"x": x, "y": y, "width": width, "height": height}}}
-        self._create_stylish_preview(x, y, width, height)
+        region = {"x": x, "y": y, "width": width, "height": height}
+        started = time.perf_counter()
+        try:
+            with mss() as sct:
+                self._captured_image = grab_image(sct, region, self.budget)
+        except CaptureTooLarge as e:
+            logging.error(f"截图已取消: {e}")
+            self._exit_process()
+            return
+        captured = time.perf_counter()
+
+        if self.last_region is not None:
+            self.last_region[:] = [x, y, width, height]
+        self._captured_data = build_image_message(self._captured_image, region,
+                                                  self.profile, int(self.config.get('thumbnail_size', 256)))
+        finished = time.perf_counter()
+        log_capture(self._captured_data, "interactive_capture",
+                    {"capture_ms": round((captured - started) * 1000, 2),
+                     "encode_ms": round((finished - captured) * 1000, 2),
+                     "total_ms": round((finished - started) * 1000, 2)})
+        if self.profile['preview']:
+            self._create_stylish_preview(x, y, width, height)
+        else:
+            self._deliver()
+            self._exit_process()
 
     def _create_stylish_preview(self, sel_x, sel_y, sel_w, sel_h):
         preview = tk.Toplevel(self.root)
@@ -123,7 +137,12 @@ class ModernScreenshot:
         BG_COLOR = self.config.get('preview_bg', '#2e2e2e')
         preview.config(bg=BG_COLOR, bd=2, relief="solid", highlightcolor=BG_COLOR, highlightbackground=BG_COLOR)
         
-        img_w, img_h = self._captured_image.width, self._captured_image.height
+        # 缩放后的图像不超过分块阈值的像素数，超大截图初始即缩小显示，避免为预览再复制一份全尺寸图像
+        zoom_limit = self.budget.preview_zoom_limit(self._captured_image.width, self._captured_image.height)
+        self._max_zoom = max(self._min_zoom, min(self._max_zoom, zoom_limit))
+        self._fit_zoom = self._zoom_level = max(self._min_zoom, min(1.0, round(zoom_limit, 2)))
+        img_w = int(self._captured_image.width * self._zoom_level)
+        img_h = int(self._captured_image.height * self._zoom_level)
         
         # 1. 按钮栏 (底部)
         button_frame = self._add_buttons(preview)
@@ -183,8 +202,12 @@ class ModernScreenshot:
                 
                 if new_width < 1 or new_height < 1: return
 
+                # 先释放上一个缩放级别的图像，新旧两份不同时驻留内存
+                self._image_label.config(image="")
+                self._tk_image = None
                 resized_image = self._captured_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
                 self._tk_image = ImageTk.PhotoImage(resized_image)
+                del resized_image
                 self._image_label.config(image=self._tk_image)
                 
                 # --- 最终修复: ---
@@ -217,21 +240,10 @@ class ModernScreenshot:
                 self._zoom_label.place(relx=0.5, rely=0.5, anchor='se', x=-5, y=-5)
         
     def _copy_image_to_clipboard(self, window):
-        if not IS_WINDOWS: return
-        output = BytesIO()
-        self._captured_image.convert("RGB").save(output, "BMP")
-        data = output.getvalue()[14:] # DIB
-        output.close()
-        try:
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32con.CF_DIB, data)
-            win32clipboard.CloseClipboard()
-            self._show_copy_feedback(window)
-        except Exception as e:
-            logging.error(f"复制到剪贴板失败: {e}")
-            try: win32clipboard.CloseClipboard()
-            except: pass
+        def on_done(success):
+            if success and window.winfo_exists():
+                self._show_copy_feedback(window)
+        self.clipboard.copy(self._captured_image, on_done)
 
     def _show_copy_feedback(self, window):
         FEEDBACK_BG = self.config.get('preview_button_active_bg', '#5a5a5a')
@@ -242,7 +254,7 @@ class ModernScreenshot:
     def _add_context_menu(self, window):
         BG, FG, ACTIVE_BG = self.config.get('preview_bg', '#2e2e2e'), self.config.get('preview_button_fg', '#ffffff'), self.config.get('preview_button_active_bg', '#5a5a5a')
         menu = tk.Menu(window, tearoff=0, bg=BG, fg=FG, activebackground=ACTIVE_BG, activeforeground=FG, relief='flat')
-        if IS_WINDOWS:
+        if self.clipboard.available:
             copy_command = lambda: (menu.unpost(), self._copy_image_to_clipboard(window))
             menu.add_command(label="复制图片 (Copy)", command=copy_command)
             menu.add_separator()
@@ -314,7 +326,7 @@ class ModernScreenshot:
         self._start_win_y = toplevel_window.winfo_y()
         
         # 3. 记录 image start pos (for panning)
-        if self._zoom_level > 1.0:
+        if self._zoom_level > self._fit_zoom:
             self._pan_start_image_x = self._image_label.winfo_x()
             self._pan_start_image_y = self._image_label.winfo_y()
 
@@ -325,7 +337,7 @@ class ModernScreenshot:
         dx = event.x_root - self._drag_start_root_x
         dy = event.y_root - self._drag_start_root_y
         
-        if self._zoom_level <= 1.0:
+        if self._zoom_level <= self._fit_zoom:
             # --- 模式1: 拖动整个窗口 ---
             new_x = self._start_win_x + dx
             new_y = self._start_win_y + dy
@@ -351,18 +363,32 @@ class ModernScreenshot:
             
             self._image_label.place(x=final_x, y=final_y)
 
-    def _fade_out_and_close(self, window):
-        alpha = 1.0
-        while alpha > 0.0:
-            alpha -= 0.1; alpha = max(0.0, alpha)
-            try:
-                window.attributes('-alpha', alpha); window.update()
-            except tk.TclError: break
-            time.sleep(0.02)
-        self._close_preview(window)
+    def _fade_out_and_close(self, window, alpha=1.0):
+        """每 20 毫秒降低一次透明度，由 after() 调度，淡出期间事件循环照常运行。"""
+        if not window.winfo_exists():
+            return
+        alpha = max(0.0, round(alpha - 0.1, 2))
+        try:
+            window.attributes('-alpha', alpha)
+        except tk.TclError:
+            alpha = 0.0
+        if alpha > 0.0:
+            window.after(20, self._fade_out_and_close, window, alpha)
+        else:
+            self._close_preview(window)
         
+    def _deliver(self):
+        """按配置档的 destination 把截图推送给服务器和/或放入剪贴板。"""
+        destination = self.profile['destination']
+        if destination in ("broadcast", "both") and self.ipc_queue and self._captured_data:
+            self.ipc_queue.put(self._captured_data)
+        # 消息已交给队列，不再保留 Base64 副本
+        self._captured_data = None
+        if destination in ("clipboard", "both") and self._captured_image is not None:
+            self.clipboard.copy(self._captured_image)
+
     def _confirm_and_send(self, window: tk.Toplevel):
-        if self.ipc_queue and self._captured_data: self.ipc_queue.put(self._captured_data)
+        self._deliver()
         self._close_preview(window)
 
     def _close_preview(self, window: tk.Toplevel):
@@ -370,16 +396,26 @@ class ModernScreenshot:
         self._exit_process()
         
     def _exit_process(self):
+        # 等剪贴板的复制完成 (以及 tk 后端持有剪贴板的时间) 之后再结束事件循环
+        self.clipboard.close(self._quit, on_hold=self._on_clipboard_hold)
+
+    def _on_clipboard_hold(self):
+        if self.clipboard_holding is not None:
+            self.clipboard_holding.set()
+
+    def _quit(self):
         if self.root.winfo_exists(): self.root.quit()
 
     def start(self):
         self._setup_overlay()
 
-def take_screenshot_multiprocess(config: dict, ipc_queue: callable):
+def take_screenshot_multiprocess(config: dict, ipc_queue: callable, last_region=None, log_queue=None,
+                                 clipboard_holding=None, log_level=logging.INFO):
+    configure_child_logging(log_queue, log_level)
     try:
         root = tk.Tk()
         root.withdraw()
-        app = ModernScreenshot(root, config, ipc_queue)
+        app = ModernScreenshot(root, config, ipc_queue, last_region, clipboard_holding)
         app.start()
         root.mainloop()
     except Exception as e:
@@ -1,20 +1,39 @@
 # src/capture/text_selection/__init__.py
+import logging
 import sys
+import time
+import uuid
 from typing import Dict, Any
 
-def get_selected_text() -> Dict[str, Any] | None:
-    """
-    根据当前操作系统调用相应的函数来获取选中文本。
-    """
+def _platform_getter():
     platform = sys.platform
     if platform == "win32":
         from . import windows
-        return windows.get_selected_text_windows()
+        return windows.get_selected_text_windows
     elif platform == "darwin":
         from . import macos
-        return macos.get_selected_text_macos()
+        return macos.get_selected_text_macos
     elif platform.startswith("linux"):
         from . import linux
-        return linux.get_selected_text_linux()
+        return linux.get_selected_text_linux
     else:
         raise NotImplementedError(f"Unsupported platform: {platform}")
+
+
+def get_selected_text() -> Dict[str, Any] | None:
+    """
+    根据当前操作系统调用相应的函数来获取选中文本。
+    取到文本时在 metadata 中加上 capture_id，并记录一条带耗时的结构化日志，与截图的记录格式一致。
+    """
+    getter = _platform_getter()
+    started = time.perf_counter()
+    selection = getter()
+    if selection and selection.get("data"):
+        total_ms = round((time.perf_counter() - started) * 1000, 2)
+        metadata = selection.setdefault("metadata", {})
+        capture_id = metadata.setdefault("capture_id", uuid.uuid4().hex)
+        logging.info("划词 %s 完成: %d 字符 (%s), 耗时 %.1f ms", capture_id, len(selection["data"]),
+                     metadata.get("method", "unknown"), total_ms,
+                     extra={"capture_id": capture_id, "stage": "text_selection", "size": len(selection["data"]),
+                            "timings": {"total_ms": total_ms}})
+    return selection
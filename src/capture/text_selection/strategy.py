@@ -0,0 +1,323 @@
+# src/capture/text_selection/strategy.py
+"""
+按应用自适应的划词策略。纯 Python 实现，不依赖任何平台接口，可以在 Linux 上用记录的结果轨迹测试：
+
+    python -m src.capture.text_selection.strategy selection_stats.json
+
+打印各应用的统计 (成功率、平均耗时、最近成功的策略以及被跳过的策略)。
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Windows 上的取词策略，按开销从低到高：只查焦点元素的 TextPattern；遍历焦点元素的整棵子树
+STRATEGIES = ("focused", "tree")
+
+DEFAULT_SELECTION_CONFIG: Dict[str, Any] = {
+    "adaptive": True,
+    "stats_path": "selection_stats.json",
+    "failure_streak": 8,
+    "probe_every": 20,
+    "max_apps": 500,
+    "save_interval": 30.0,
+    "trace_path": None,
+}
+
+_STATS_VERSION = 1
+
+_policy: Optional["SelectionPolicy"] = None
+_policy_lock = threading.Lock()
+
+
+class StrategyStats:
+    """一个应用上一种策略的累计结果。empty 为策略可用但选区为空的次数，不计入成功率和连续失败。"""
+    def __init__(self, attempts: int = 0, successes: int = 0, total_ms: float = 0.0, failure_streak: int = 0,
+                 last_success: Optional[float] = None, empty: int = 0):
+        self.attempts = attempts
+        self.successes = successes
+        self.empty = empty
+        self.total_ms = total_ms
+        self.failure_streak = failure_streak
+        self.last_success = last_success
+
+    @property
+    def success_rate(self) -> float:
+        selected = self.attempts - self.empty
+        return self.successes / selected if selected else 0.0
+
+    @property
+    def average_ms(self) -> float:
+        return self.total_ms / self.attempts if self.attempts else 0.0
+
+    def record(self, success: Optional[bool], latency_ms: float, now: float):
+        self.attempts += 1
+        self.total_ms += latency_ms
+        if success is None:
+            self.empty += 1
+        elif success:
+            self.successes += 1
+            self.failure_streak = 0
+            self.last_success = now
+        else:
+            self.failure_streak += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"attempts": self.attempts, "successes": self.successes, "total_ms": round(self.total_ms, 3),
+                "failure_streak": self.failure_streak, "last_success": self.last_success, "empty": self.empty}
+
+
+class AppProfile:
+    """一个应用 (进程名或控件类名) 的统计：调用次数、取到文本的次数、被跳过的策略次数以及最近成功的策略。"""
+    def __init__(self, calls: int = 0, hits: int = 0, skipped: int = 0, winner: Optional[str] = None,
+                 last_seen: float = 0.0, strategies: Optional[Dict[str, StrategyStats]] = None):
+        self.calls = calls
+        self.hits = hits
+        self.skipped = skipped
+        self.winner = winner
+        self.last_seen = last_seen
+        self.strategies = strategies or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AppProfile":
+        return cls(calls=int(data.get("calls", 0)), hits=int(data.get("hits", 0)), skipped=int(data.get("skipped", 0)),
+                   winner=data.get("winner"),
+                   last_seen=float(data.get("last_seen", 0.0)),
+                   strategies={name: StrategyStats(**stats) for name, stats in (data.get("strategies") or {}).items()})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "hits": self.hits, "skipped": self.skipped, "winner": self.winner, "last_seen": self.last_seen,
+                "strategies": {name: stats.to_dict() for name, stats in self.strategies.items()}}
+
+    def summary(self) -> Dict[str, Any]:
+        """供查看的摘要：总体成功率与各策略的成功率和平均耗时。"""
+        attempts = sum(stats.attempts for stats in self.strategies.values())
+        return {"calls": self.calls, "success_rate": round(self.hits / self.calls, 3) if self.calls else 0.0,
+                "winner": self.winner, "skipped": self.skipped, "attempts": attempts,
+                "strategies": {name: {"success_rate": round(stats.success_rate, 3),
+                                      "average_ms": round(stats.average_ms, 2), "attempts": stats.attempts,
+                                      "empty": stats.empty, "failure_streak": stats.failure_streak}
+                               for name, stats in self.strategies.items()}}
+
+
+class SelectionPolicy:
+    """
+    为每个应用决定本次划词依次尝试哪些策略，并根据结果更新统计。
+
+    - 最近成功的策略排在最前，其余按默认顺序 (开销从低到高)。
+    - 某策略连续失败 failure_streak 次后降级为跳过；该应用每 probe_every 次调用仍试探一次，
+      应用更新后开始支持时可以恢复。所有策略都被跳过时本次直接返回，不再付出遍历的开销。
+    - 统计保存在 path 指向的 JSON 文件中 (每 save_interval 秒最多写一次，关闭时再写一次)，重启后继续使用。
+    - trace_path 非空时每次尝试追加一行 JSON 结果记录，可在其他平台上用 replay_trace() 重放。
+    调用方式：plan() 取得本次的策略顺序，依次尝试直到成功或确认选区为空，再把全部尝试交给 record()。
+
+    线程安全：划词工作线程与远程采集可能同时调用。
+    """
+    def __init__(self, strategies: Iterable[str] = STRATEGIES, path: Optional[str] = None, adaptive: bool = True,
+                 failure_streak: int = 8, probe_every: int = 20, max_apps: int = 500, save_interval: float = 30.0,
+                 trace_path: Optional[str] = None):
+        self.strategies = tuple(strategies)
+        self.path = path
+        self.adaptive = adaptive
+        self.failure_streak = failure_streak
+        self.probe_every = probe_every
+        self.max_apps = max_apps
+        self.save_interval = save_interval
+        self.trace_path = trace_path
+        self.apps: Dict[str, AppProfile] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self.load()
+
+    def plan(self, app: str) -> List[str]:
+        """本次依次尝试的策略；返回空列表表示该应用的所有策略都已降级，本次跳过。"""
+        with self._lock:
+            profile = self._profile(app)
+            profile.calls += 1
+            if not self.adaptive:
+                return list(self.strategies)
+            ordered = sorted(self.strategies, key=lambda name: name != profile.winner)
+            probing = profile.calls % self.probe_every == 0
+            planned = []
+            for name in ordered:
+                stats = profile.strategies.get(name)
+                if stats is not None and stats.failure_streak >= self.failure_streak and not probing:
+                    profile.skipped += 1
+                    continue
+                planned.append(name)
+            return planned
+
+    def record(self, app: str, attempts: Iterable[Tuple[str, bool, float]]):
+        """
+        记录一次划词调用中按顺序进行的各次尝试 [(策略, 结果, 耗时秒数)]。结果为 True 表示取到文本，
+        False 表示策略在该应用上不可用 (没有找到 TextPattern)，None 表示找到了 TextPattern 但选区为空
+        (拖动窗口、滚动条等)：None 不算失败，不会让策略降级。开启 trace_path 时整次调用写成一行轨迹。
+        """
+        now = time.time()
+        attempts = list(attempts)
+        with self._lock:
+            profile = self._profile(app)
+            for strategy, success, latency in attempts:
+                profile.strategies.setdefault(strategy, StrategyStats()).record(success, latency * 1000, now)
+                if success:
+                    profile.winner = strategy
+            profile.hits += any(success for _, success, _ in attempts)
+            self._dirty = True
+            # 在锁内认领到期的保存，并发的调用方不会各自再写一次
+            due = bool(self.path) and time.monotonic() - self._saved_at >= self.save_interval
+            if due:
+                self._saved_at = time.monotonic()
+        if self.trace_path:
+            self._append_trace({"app": app, "time": now, "attempts": [
+                {"strategy": strategy, "success": success, "latency_ms": round(latency * 1000, 3)}
+                for strategy, success, latency in attempts]})
+        if due:
+            self.save()
+
+    def _profile(self, app: str) -> AppProfile:
+        profile = self.apps.get(app)
+        if profile is None:
+            if len(self.apps) >= self.max_apps:
+                # 淘汰最久未出现的应用
+                del self.apps[min(self.apps, key=lambda name: self.apps[name].last_seen)]
+            profile = self.apps[app] = AppProfile()
+        profile.last_seen = time.time()
+        return profile
+
+    def _append_trace(self, record: Dict[str, Any]):
+        try:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logging.warning(f"写入划词结果轨迹失败: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各应用的统计摘要，按调用次数从多到少排列。"""
+        with self._lock:
+            ordered = sorted(self.apps.items(), key=lambda item: -item[1].calls)
+            return {app: profile.summary() for app, profile in ordered}
+
+    def load(self):
+        """读取统计文件；文件不存在或内容无效时从空白开始。"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            apps = {app: AppProfile.from_dict(profile) for app, profile in data.get("apps", {}).items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"划词策略统计文件 {self.path} 无法读取，将重新统计: {e}")
+            return
+        with self._lock:
+            self.apps = apps
+
+    def save(self):
+        """
+        原子地写入统计文件 (先写临时文件再替换)。取快照与写文件都在 _save_lock 内完成，
+        保存依次进行，后一次写出的快照总是更新，不会被较早的快照覆盖。
+        """
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with self._save_lock:
+            with self._lock:
+                self._saved_at = time.monotonic()
+                if not self._dirty:
+                    return
+                data = {"version": _STATS_VERSION,
+                        "apps": {app: profile.to_dict() for app, profile in self.apps.items()}}
+                self._dirty = False
+            try:
+                with open(temporary, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                with self._lock:
+                    self._dirty = True
+                logging.warning(f"保存划词策略统计失败: {e}")
+
+
+def replay_trace(policy: SelectionPolicy, records: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    用记录的轨迹 (trace_path 写出的 JSON lines，已逐行解析) 重放策略：每次调用先取 plan()，
+    只把计划中且轨迹里有结果的尝试交给 record()。返回重放期间的调用数、尝试数、成功数与总耗时，
+    可用来比较不同参数在同一份轨迹上的开销。轨迹中没有结果的策略 (当时在成功或确认选区为空之后，或被跳过) 视为未尝试。
+    """
+    totals = {"calls": 0, "attempts": 0, "hits": 0, "latency_ms": 0.0}
+    for record in records:
+        outcomes = {attempt["strategy"]: attempt for attempt in record["attempts"]}
+        attempts = []
+        for strategy in policy.plan(record["app"]):
+            outcome = outcomes.get(strategy)
+            if outcome is None:
+                continue
+            success = None if outcome["success"] is None else bool(outcome["success"])
+            attempts.append((strategy, success, outcome["latency_ms"] / 1000))
+            if success is not False:
+                break
+        policy.record(record["app"], attempts)
+        totals["calls"] += 1
+        totals["attempts"] += len(attempts)
+        totals["hits"] += any(success for _, success, _ in attempts)
+        totals["latency_ms"] += sum(latency for _, _, latency in attempts) * 1000
+    totals["latency_ms"] = round(totals["latency_ms"], 3)
+    return totals
+
+
+def configure_selection_policy(config: Optional[Dict[str, Any]] = None) -> SelectionPolicy:
+    """
+    按 config.yaml 的 selection 段创建全局策略 (替换已有的，旧策略先保存)。
+    也用于热重载：新策略从 stats_path 读回统计；不保存统计时沿用旧策略内存中的统计。
+    """
+    global _policy
+    options = {**DEFAULT_SELECTION_CONFIG, **(config or {})}
+    with _policy_lock:
+        previous = _policy
+        if previous is not None:
+            previous.save()
+        _policy = SelectionPolicy(path=options["stats_path"], adaptive=options["adaptive"],
+                                  failure_streak=options["failure_streak"], probe_every=options["probe_every"],
+                                  max_apps=options["max_apps"], save_interval=options["save_interval"],
+                                  trace_path=options["trace_path"])
+        if previous is not None and not _policy.path:
+            _policy.apps = previous.apps
+        return _policy
+
+
+def selection_policy() -> SelectionPolicy:
+    """全局策略；未经 configure_selection_policy 配置时使用不持久化的默认策略。"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = SelectionPolicy()
+        return _policy
+
+
+def save_selection_policy():
+    with _policy_lock:
+        if _policy is not None:
+            _policy.save()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="查看各应用的划词策略统计")
+    parser.add_argument("path", nargs="?", default=DEFAULT_SELECTION_CONFIG["stats_path"], help="统计文件路径")
+    args = parser.parse_args(argv)
+    policy = SelectionPolicy(path=args.path)
+    print(f"{'app':32} {'calls':>7} {'success':>8} {'winner':>8} {'skipped':>8}  strategies")
+    for app, summary in policy.snapshot().items():
+        strategies = ", ".join(f"{name} {row['success_rate']:.0%}/{row['average_ms']:.1f}ms"
+                               for name, row in summary["strategies"].items())
+        print(f"{app[:32]:32} {summary['calls']:>7} {summary['success_rate']:>8.0%} {summary['winner'] or '-':>8} "
+              f"{summary['skipped']:>8}  {strategies}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
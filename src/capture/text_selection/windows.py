@@ -1,5 +1,7 @@
 # src/capture/text_selection/windows.py
 import logging
+import os
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
 import comtypes.client
@@ -8,6 +10,7 @@ import ctypes
 from ctypes import wintypes
 # 关键修复：导入COM初始化所需的常量
 from comtypes import BSTR, COINIT_APARTMENTTHREADED
+from .strategy import selection_policy
 
 # IAccessible 接口定义，当前版本中未使用，但保留用于未来可能的扩展
 # 为MSAA定义必要的常量和接口
@@ -58,13 +61,15 @@ def _initialize_uia():
             _uia_module = None
     return _uia_module
 
-def _find_text_selection_recursive(uia_element, uia_interface, tree_walker):
+# 找到了 TextPattern 但选区为空 (没有选中任何文字)，与根本找不到 TextPattern 区分开
+EMPTY_SELECTION = object()
+
+
+def _selection_of(uia_element, uia_interface):
     """
-    递归遍历UI元素树，查找支持文本模式并有内容的选区。
+    元素支持文本模式 (TextPattern) 且有非空选区时返回 (文本, 元素)；
+    支持 TextPattern 但选区为空时返回 EMPTY_SELECTION；不支持时返回 None。
     """
-    if not uia_element:
-        return None
-    
     try:
         # 检查当前元素是否支持文本模式 (TextPattern)
         text_pattern_unknown = uia_element.GetCurrentPattern(10014) # TextPattern ID
@@ -77,27 +82,102 @@ def _find_text_selection_recursive(uia_element, uia_interface, tree_walker):
                     full_text = "\n".join(filter(None, texts))
                     if full_text:
                         return full_text, uia_element
+                return EMPTY_SELECTION
     except comtypes.COMError:
         pass
+    return None
+
+
+def _find_text_selection_recursive(uia_element, uia_interface, tree_walker):
+    """
+    递归遍历UI元素树，查找支持文本模式并有内容的选区。
+    没有找到选区但子树中有元素支持 TextPattern 时返回 EMPTY_SELECTION。
+    """
+    if not uia_element:
+        return None
+
+    result = _selection_of(uia_element, uia_interface)
+    if result is not None and result is not EMPTY_SELECTION:
+        return result
+    empty = result is EMPTY_SELECTION
 
     if tree_walker:
         try:
             child = tree_walker.GetFirstChildElement(uia_element)
             while child:
                 result = _find_text_selection_recursive(child, uia_interface, tree_walker)
-                if result:
+                if result is EMPTY_SELECTION:
+                    empty = True
+                elif result:
                     return result
                 child = tree_walker.GetNextSiblingElement(child)
         except comtypes.COMError:
             pass
         
-    return None
+    return EMPTY_SELECTION if empty else None
+
+
+def _search_descendants(uia_element, uia_interface, tree_walker):
+    """遍历焦点元素的子树 (不含其自身，"focused" 策略已检查过)。"""
+    empty = False
+    try:
+        child = tree_walker.GetFirstChildElement(uia_element)
+        while child:
+            result = _find_text_selection_recursive(child, uia_interface, tree_walker)
+            if result is EMPTY_SELECTION:
+                empty = True
+            elif result:
+                return result
+            child = tree_walker.GetNextSiblingElement(child)
+    except comtypes.COMError:
+        pass
+    return EMPTY_SELECTION if empty else None
+
+
+# 进程 ID -> 可执行文件名，进程退出后 ID 可能被复用，缓存有上限
+_process_names: Dict[int, str] = {}
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+
+def _process_name(pid: int) -> Optional[str]:
+    if pid in _process_names:
+        return _process_names[pid]
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        size = wintypes.DWORD(260)
+        buffer = ctypes.create_unicode_buffer(size.value)
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+            return None
+        name = os.path.basename(buffer.value).lower()
+    finally:
+        kernel32.CloseHandle(handle)
+    if len(_process_names) >= 256:
+        _process_names.clear()
+    _process_names[pid] = name
+    return name
+
+
+def _app_key(uia_element) -> str:
+    """统计用的应用标识：焦点元素所属进程的可执行文件名，取不到时用控件类名。"""
+    try:
+        name = _process_name(uia_element.CurrentProcessId)
+        if name:
+            return name
+        return uia_element.CurrentClassName or "Unknown"
+    except comtypes.COMError:
+        return "Unknown"
 
 
 def get_selected_text_windows() -> Optional[Dict[str, Any]]:
     """
     在 Windows 上通过 UI Automation (UIA) 的 TextPattern 精准获取选中的文本。
     此版本已修复COM初始化问题，并增加了详细的调试日志。
+
+    依次尝试的策略 (只查焦点元素 / 遍历子树) 由 SelectionPolicy 按应用决定：从不提供 TextPattern 的应用
+    (资源管理器、游戏等) 连续失败后不再遍历，见 strategy.py。
     """
     UIAutomationClient = _initialize_uia()
     if not UIAutomationClient:
@@ -119,12 +199,27 @@ def get_selected_text_windows() -> Optional[Dict[str, Any]]:
                 raise
         
         if focused_element:
-            tree_walker = uia.RawViewWalker
-            result = _find_text_selection_recursive(focused_element, UIAutomationClient, tree_walker)
+            app = _app_key(focused_element)
+            policy = selection_policy()
+            strategies = {
+                "focused": lambda: _selection_of(focused_element, UIAutomationClient),
+                "tree": lambda: _search_descendants(focused_element, UIAutomationClient, uia.RawViewWalker),
+            }
+            result, attempts = None, []
+            for strategy in policy.plan(app):
+                started = time.perf_counter()
+                result = strategies[strategy]()
+                # 选区为空说明这次没有选中文字，而不是策略失败；也不必再尝试开销更大的策略
+                success = None if result is EMPTY_SELECTION else result is not None
+                attempts.append((strategy, success, time.perf_counter() - started))
+                if success is not False:
+                    break
+            policy.record(app, attempts)
             
-            if result:
+            if result and result is not EMPTY_SELECTION:
                 full_text, element = result
-                logging.info(f"成功捕获文本: '{full_text[:70].strip().replace('\n', ' ')}...'")
+                # 每次划词都会执行，默认级别下不输出，也不拼接字符串
+                logging.debug("成功捕获文本: '%s...'", full_text[:70].strip().replace("\n", " "))
                 try:
                     window_title = element.CurrentName
                     app_name = element.CurrentClassName
@@ -138,7 +233,9 @@ def get_selected_text_windows() -> Optional[Dict[str, Any]]:
                     "metadata": {
                         "source_app_name": app_name,
                         "source_window_title": window_title,
-                        "method": "UIA_TextPattern_Precise"
+                        "method": "UIA_TextPattern_Precise",
+                        "source_process": app,
+                        "strategy": attempts[-1][0]
                     }
                 }
     except Exception as e:
@@ -1,65 +1,144 @@
 # src/config_loader.py
-import yaml
+import logging
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from src.config_schema import AppConfig, ConfigError
+
+# 订阅回调: callback(新配置段, 旧配置段)
+ConfigCallback = Callable[[Any, Any], None]
+
 
 class ConfigLoader:
     """
-    一个单例类，用于加载、解析和提供对 `config.yaml` 的访问。
-    """
-    _instance = None
-    _config = None
+    加载、校验 `config.yaml` 并提供访问，支持热重载。
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ConfigLoader, cls).__new__(cls)
-            cls._instance._load_config()
-        return cls._instance
+    文件变化时 (watch() 轮询修改时间) 重新解析并按 schema 校验，校验通过后
+    把变化的配置段推送给订阅者；解析或校验失败时记录错误并继续使用上一份有效配置。
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or self._find_config_path()
+        if not self.path:
+            raise FileNotFoundError("config.yaml not found in project root.")
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[Optional[str], ConfigCallback]] = []
+        self._signature = self._stat()
+        # 首次加载失败时直接抛出，此时没有可以退回的配置
+        self._config = self._load_config()
 
-    def _load_config(self) -> None:
+    def _load_config(self) -> AppConfig:
         """
-        加载并解析 YAML 配置文件。
+        加载并解析 YAML 配置文件，校验失败时抛出 ConfigError。
         """
-        config_path = self._find_config_path()
-        if not config_path:
-            raise FileNotFoundError("config.yaml not found in project root.")
+        with open(self.path, 'r', encoding='utf-8') as f:
+            raw = yaml.safe_load(f)
+        return AppConfig.from_dict(raw)
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self._config = yaml.safe_load(f)
-
-    def _find_config_path(self) -> str | None:
+    @staticmethod
+    def _find_config_path() -> str | None:
         """
-        从当前工作目录向上查找 config.yaml 文件。
+        从当前工作目录向上查找 config.yaml 文件 (最多4层)。
         """
-        # 通常脚本在项目根目录运行
-        if os.path.exists("config.yaml"):
-            return "config.yaml"
-        # 兼容从其他目录运行测试等情况
         path = os.getcwd()
-        for _ in range(4): # 向上查找最多4层
-            if "config.yaml" in os.listdir(path):
-                return os.path.join(path, "config.yaml")
+        for _ in range(4):
+            candidate = os.path.join(path, "config.yaml")
+            if os.path.isfile(candidate):
+                return candidate
             path = os.path.dirname(path)
         return None
 
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def config(self) -> AppConfig:
+        """当前生效的类型化配置。"""
+        return self._config
 
     def get_config(self) -> Dict[str, Any]:
         """
-        返回已加载的配置字典。
+        返回当前生效的原始配置字典。
         """
-        if self._config is None:
-            self._load_config()
-        return self._config
+        return self._config.raw
 
     def get_property(self, property_path: str) -> Any:
         """
         使用点表示法获取嵌套的配置属性。
         例如: "server.host"
         """
-        keys = property_path.split('.')
-        value = self.get_config()
-        for key in keys:
-            value = value.get(key)
-            if value is None:
-                return None
-        return value
+        return self._config.get(property_path)
+
+    def subscribe(self, callback: ConfigCallback, section: Optional[str] = None) -> None:
+        """
+        订阅配置变化。section 为 "hotkey"、"server"、"screenshot" 等顶层段名，
+        该段变化时以 (新配置段, 旧配置段) 调用 callback；为 None 时以整份 AppConfig 调用。
+        回调在监视线程中执行。
+        """
+        with self._lock:
+            self._subscribers.append((section, callback))
+
+    def reload(self) -> bool:
+        """
+        重新加载配置文件。成功时通知订阅者并返回 True；失败时保留上一份有效配置并返回 False。
+        """
+        self._signature = self._stat()
+        try:
+            new_config = self._load_config()
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            self.last_error = str(e)
+            logging.error(f"配置重载失败，继续使用上一份有效配置: {e}")
+            return False
+
+        with self._lock:
+            old_config, self._config = self._config, new_config
+            subscribers = list(self._subscribers)
+        self.last_error = None
+        changed = new_config.changed_sections(old_config)
+        if not changed:
+            return True
+        logging.info(f"配置已重新加载，变化的配置段: {', '.join(changed)}")
+
+        for section, callback in subscribers:
+            if section is not None and section not in changed:
+                continue
+            try:
+                if section is None:
+                    callback(new_config, old_config)
+                else:
+                    callback(new_config.section(section), old_config.section(section))
+            except Exception as e:
+                logging.error(f"配置变更回调 {getattr(callback, '__qualname__', callback)} 出错: {e}", exc_info=True)
+        return True
+
+    def check_for_changes(self) -> bool:
+        """文件修改时间或大小发生变化时重新加载，返回是否尝试了重载。"""
+        signature = self._stat()
+        # 文件暂时不存在 (编辑器先删除再写入) 时等待下一次检查
+        if signature is None or signature == self._signature:
+            return False
+        self.reload()
+        return True
+
+    def watch(self, shutdown_event: threading.Event, interval: float = 1.0, settle: float = 0.2) -> None:
+        """
+        轮询配置文件直到 shutdown_event 置位，应在独立线程中运行。
+        检测到变化后再等待 settle 秒，避免读到编辑器写了一半的文件。
+        """
+        logging.info(f"正在监视配置文件: {self.path}")
+        while not shutdown_event.wait(interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            if shutdown_event.wait(settle):
+                break
+            self.check_for_changes()
+        logging.info("配置文件监视已停止。")
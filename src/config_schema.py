@@ -0,0 +1,495 @@
+# src/config_schema.py
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+_HOTKEY_TOKEN = r"(<[a-z0-9_]+>|[^+<>\s])"
+_HOTKEY_RE = re.compile(rf"^{_HOTKEY_TOKEN}(\+{_HOTKEY_TOKEN})*$", re.IGNORECASE)
+_COLOR_RE = re.compile(r"^(#[0-9a-fA-F]{3}|#[0-9a-fA-F]{6}|[a-zA-Z]+)$")
+
+_REQUIRED = object()
+
+
+class ConfigError(ValueError):
+    """
+    配置内容不符合约定。errors 为逐项的错误描述，形如 "server.port: 必须是 0-65535 之间的整数"。
+    """
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class _Section:
+    """
+    读取并校验一个配置段，错误累积到 errors 中，以便一次报告全部问题。
+    嵌套的段 (如 server.compression) 以上一级的数据为 raw，path 为错误信息中使用的完整路径。
+    """
+    def __init__(self, raw: Dict[str, Any], name: str, errors: List[str], path: Optional[str] = None):
+        self.name = path or name
+        self.errors = errors
+        data = raw.get(name, {})
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            errors.append(f"{self.name}: 必须是映射")
+            data = {}
+        self.data = data
+
+    def field(self, key: str, kinds, default: Any = _REQUIRED, check=None, hint: str = "") -> Any:
+        path = f"{self.name}.{key}"
+        if key not in self.data or self.data[key] is None:
+            if default is _REQUIRED:
+                self.errors.append(f"{path}: 缺少必填项")
+            return None if default is _REQUIRED else default
+        value = self.data[key]
+        # bool 是 int 的子类，数值项不接受 true/false
+        if not isinstance(value, kinds) or (isinstance(value, bool) and bool not in _as_tuple(kinds)):
+            self.errors.append(f"{path}: 类型错误 ({type(value).__name__})，{hint or '取值无效'}")
+            return default if default is not _REQUIRED else None
+        if check is not None and not check(value):
+            self.errors.append(f"{path}: {hint or '取值无效'} (当前为 {value!r})")
+            return default if default is not _REQUIRED else None
+        return value
+
+    def mapping(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.field(key, dict, None, hint="必须是映射")
+
+
+def _as_tuple(kinds) -> Tuple:
+    return kinds if isinstance(kinds, tuple) else (kinds,)
+
+
+_NUMBER = (int, float)
+_NULLABLE_STR = (str, type(None))
+
+
+def _options(section: _Section, specs: Dict[str, Tuple[Any, Any, str]]) -> Dict[str, Any]:
+    """
+    按 {键: (类型, 检查, 提示)} 校验段中给出的各项。未给出的项不出现在结果中，由使用方按各自的默认值补齐；
+    类型包含 None 的项可以显式设为 null。
+    """
+    options = {}
+    for key, (kinds, check, hint) in specs.items():
+        if key not in section.data:
+            continue
+        if section.data[key] is None:
+            if type(None) in _as_tuple(kinds):
+                options[key] = None
+            continue
+        value = section.field(key, kinds, _REQUIRED, check=check, hint=hint)
+        if value is not None:
+            options[key] = value
+    return options
+
+
+def _is_color(value: str) -> bool:
+    return bool(_COLOR_RE.match(value))
+
+
+def parse_hotkey(value: str) -> Tuple[str, ...]:
+    """
+    拆分 pynput 格式的快捷键 (如 "<ctrl>+<alt>+x")，格式不正确时抛出 ValueError。
+    """
+    if not _HOTKEY_RE.match(value):
+        raise ValueError(f"快捷键格式无效: {value!r}")
+    return tuple(value.lower().split("+"))
+
+
+class HotkeyConfig:
+    def __init__(self, screenshot: str):
+        self.screenshot = screenshot
+        self.screenshot_keys = parse_hotkey(screenshot)
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "HotkeyConfig":
+        section = _Section(raw, "hotkey", errors)
+        screenshot = section.field("screenshot", str, "<alt>+q", check=_HOTKEY_RE.match,
+                                   hint="必须是 pynput 格式的快捷键，如 \"<ctrl>+<alt>+x\"")
+        return cls(screenshot)
+
+
+PROFILE_ACTIONS = ("region", "monitor", "repeat_last_region", "toggle_selection")
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+# server.scheduler 的优先级，从高到低
+PRIORITY_CLASSES = ("interactive", "capture", "bulk")
+DESTINATIONS = ("broadcast", "clipboard", "both")
+# 截图复制到剪贴板时放入的格式，以及可选的剪贴板后端 (见 src/capture/clipboard.py)
+CLIPBOARD_TARGETS = ("png", "dib")
+CLIPBOARD_BACKENDS = ("auto", "windows", "wl-copy", "xclip", "tk")
+# text_pipeline.hyphenation 的取值 (见 src/server/text_pipeline.py)
+HYPHENATION_MODES = ("auto", "join", "keep")
+
+
+class CaptureProfile:
+    """
+    一个截图配置档：触发它的快捷键、执行的动作以及截图的处理方式。
+
+    action:
+      region             交互式框选 (遮罩 + 预览)
+      monitor            直接截取整个显示器 (monitor 为 mss 的显示器序号，0 表示全部显示器)
+      repeat_last_region 跳过遮罩，直接重新截取上一次框选的区域
+      toggle_selection   开启/暂停划词捕获
+    """
+    def __init__(self, name: str, hotkey: str, action: str = "region", format: str = "png", quality: int = 90,
+                 destination: str = "broadcast", preview: bool = True, ocr: bool = False, monitor: int = 1):
+        self.name = name
+        self.hotkey = hotkey
+        self.keys = parse_hotkey(hotkey)
+        self.action = action
+        self.format = format
+        self.quality = quality
+        self.destination = destination
+        self.preview = preview
+        self.ocr = ocr
+        self.monitor = monitor
+
+    @classmethod
+    def from_raw(cls, name: str, data: Any, errors: List[str]) -> Optional["CaptureProfile"]:
+        section = _Section({f"profiles.{name}": data}, f"profiles.{name}", errors)
+        hotkey = section.field("hotkey", str, check=_HOTKEY_RE.match, hint="必须是 pynput 格式的快捷键，如 \"<ctrl>+<alt>+x\"")
+        profile = dict(
+            action=section.field("action", str, "region", check=PROFILE_ACTIONS.__contains__,
+                                 hint=f"必须是 {', '.join(PROFILE_ACTIONS)} 之一"),
+            format=section.field("format", str, "png", check=IMAGE_FORMATS.__contains__,
+                                 hint=f"必须是 {', '.join(IMAGE_FORMATS)} 之一"),
+            quality=section.field("quality", int, 90, check=lambda q: 1 <= q <= 100, hint="必须在 1-100 之间"),
+            destination=section.field("destination", str, "broadcast", check=DESTINATIONS.__contains__,
+                                      hint=f"必须是 {', '.join(DESTINATIONS)} 之一"),
+            preview=section.field("preview", bool, True, hint="必须是 true 或 false"),
+            ocr=section.field("ocr", bool, False, hint="必须是 true 或 false"),
+            monitor=section.field("monitor", int, 1, check=lambda m: m >= 0, hint="必须是非负整数"),
+        )
+        return cls(name, hotkey, **profile) if hotkey else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """传给截图子进程的处理方式设置。"""
+        return {"name": self.name, "action": self.action, "format": self.format, "quality": self.quality,
+                "destination": self.destination, "preview": self.preview, "ocr": self.ocr, "monitor": self.monitor}
+
+
+def _profiles_from_raw(raw: Dict[str, Any], hotkey: HotkeyConfig, errors: List[str]) -> Dict[str, CaptureProfile]:
+    data = raw.get("profiles") or {}
+    if not isinstance(data, dict):
+        errors.append("profiles: 必须是映射")
+        data = {}
+    profiles = {}
+    # hotkey.screenshot 是默认的交互式截图档，可被同名配置档覆盖
+    if "screenshot" not in data and hotkey.screenshot:
+        profiles["screenshot"] = CaptureProfile("screenshot", hotkey.screenshot)
+    for name, profile_data in data.items():
+        profile = CaptureProfile.from_raw(str(name), profile_data, errors)
+        if profile is not None:
+            profiles[profile.name] = profile
+
+    owners: Dict[Tuple[str, ...], str] = {}
+    for profile in profiles.values():
+        # 修饰键的书写顺序不影响组合，比较时忽略顺序
+        keys = tuple(sorted(profile.keys))
+        if keys in owners:
+            errors.append(f"profiles.{profile.name}.hotkey: 快捷键 {profile.hotkey} 与配置档 {owners[keys]} 冲突")
+        else:
+            owners[keys] = profile.name
+    return profiles
+
+
+class ServerConfig:
+    # server.compression 各项；超出范围的值会在重新监听时才由 zlib / websockets 报错
+    COMPRESSION_SPECS = {
+        "deflate": (bool, None, "必须是 true 或 false"),
+        "level": (int, lambda v: 1 <= v <= 9, "必须在 1-9 之间"),
+        "memory_level": (int, lambda v: 1 <= v <= 9, "必须在 1-9 之间"),
+        "window_bits": (int, lambda v: 9 <= v <= 15, "必须在 9-15 之间"),
+        "min_size": (int, lambda v: v >= 0, "必须是非负整数"),
+        "per_type": (dict, lambda types: all(isinstance(k, str) and isinstance(v, bool) for k, v in types.items()),
+                     "必须是 消息类型: true/false 的映射"),
+        "zstd": (bool, None, "必须是 true 或 false"),
+        "zstd_level": (int, lambda v: 1 <= v <= 22, "必须在 1-22 之间"),
+    }
+
+    def __init__(self, host: str, port: int, compression: Optional[Dict[str, Any]] = None,
+                 artifacts: Optional[Dict[str, Any]] = None, journal: Optional[Dict[str, Any]] = None,
+                 history: Optional[Dict[str, Any]] = None, remote_capture: Optional[Dict[str, Any]] = None,
+                 rpc: Optional[Dict[str, Any]] = None, unix_socket: Optional[Dict[str, Any]] = None,
+                 agents: Optional[Dict[str, Any]] = None, scheduler: Optional[Dict[str, Any]] = None):
+        self.host = host
+        self.port = port
+        self.compression = compression
+        self.artifacts = artifacts
+        self.journal = journal
+        self.history = history
+        self.remote_capture = remote_capture
+        self.rpc = rpc
+        self.unix_socket = unix_socket
+        self.agents = agents
+        self.scheduler = scheduler
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "ServerConfig":
+        section = _Section(raw, "server", errors)
+        host = section.field("host", str, check=bool, hint="必须是非空字符串")
+        port = section.field("port", int, check=lambda p: 0 <= p <= 65535, hint="必须是 0-65535 之间的整数")
+        compression = section.mapping("compression")
+        if compression:
+            _options(_Section(section.data, "compression", errors, path="server.compression"), cls.COMPRESSION_SPECS)
+        artifacts = section.mapping("artifacts")
+        for key in ("max_bytes", "max_items"):
+            if artifacts and key in artifacts and (not isinstance(artifacts[key], int) or artifacts[key] <= 0):
+                errors.append(f"server.artifacts.{key}: 必须是正整数")
+        remote_capture = section.mapping("remote_capture")
+        rpc = section.mapping("rpc")
+        unix_socket = section.mapping("unix_socket")
+        if unix_socket and unix_socket.get("enabled", True) and not isinstance(unix_socket.get("path"), str):
+            errors.append("server.unix_socket.path: 启用 Unix 域套接字时必须给出路径")
+        agents = section.mapping("agents")
+        scheduler = section.mapping("scheduler")
+        classes = (scheduler or {}).get("classes") or {}
+        if not isinstance(classes, dict):
+            errors.append("server.scheduler.classes: 必须是映射")
+            classes = {}
+        for key, name in [*classes.items(), ("default_class", (scheduler or {}).get("default_class", "bulk"))]:
+            if name not in PRIORITY_CLASSES:
+                errors.append(f"server.scheduler.{'classes.' if key != 'default_class' else ''}{key}: "
+                              f"必须是 {', '.join(PRIORITY_CLASSES)} 之一")
+        limits = (("remote_capture", remote_capture, ("rate", "burst", "max_queue", "max_per_client", "timeout")),
+                  ("rpc", rpc, ("max_in_flight", "timeout")),
+                  ("agents", agents, ("max_message_bytes", "max_queue")),
+                  ("scheduler", scheduler, ("max_delay_ms", "max_pending_bytes", "slow_client_timeout_ms")))
+        for name, options, keys in limits:
+            for key in keys:
+                value = (options or {}).get(key)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                    errors.append(f"server.{name}.{key}: 必须是正数")
+        return cls(host, port, compression=compression, artifacts=artifacts,
+                   journal=section.mapping("journal"), history=section.mapping("history"),
+                   remote_capture=remote_capture, rpc=rpc, unix_socket=unix_socket, agents=agents,
+                   scheduler=scheduler)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.host, self.port
+
+
+class ScreenshotConfig:
+    # 各项的默认值与 ModernScreenshot 中的回退值一致
+    COLORS = {"border_color": "#007aff", "preview_bg": "#2e2e2e", "preview_button_bg": "#4a4a4a",
+              "preview_button_fg": "#ffffff", "preview_button_active_bg": "#5a5a5a"}
+
+    def __init__(self, overlay_alpha: float = 0.2, border_width: int = 2, thumbnail_size: int = 256,
+                 memory_budget_mb: int = 1024, tile_threshold_pixels: int = 3840 * 2160,
+                 clipboard_backend: str = "auto", clipboard_targets: Tuple[str, ...] = CLIPBOARD_TARGETS,
+                 clipboard_hold_seconds: float = 60, **colors: str):
+        self.overlay_alpha = overlay_alpha
+        self.border_width = border_width
+        self.thumbnail_size = thumbnail_size
+        self.memory_budget_mb = memory_budget_mb
+        self.tile_threshold_pixels = tile_threshold_pixels
+        self.clipboard_backend = clipboard_backend
+        self.clipboard_targets = tuple(clipboard_targets)
+        self.clipboard_hold_seconds = clipboard_hold_seconds
+        self.colors = {**self.COLORS, **colors}
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "ScreenshotConfig":
+        section = _Section(raw, "screenshot", errors)
+        colors = {key: section.field(key, str, default, check=_is_color, hint="必须是 #rrggbb 或颜色名")
+                  for key, default in cls.COLORS.items()}
+        return cls(
+            overlay_alpha=section.field("overlay_alpha", (int, float), 0.2, check=lambda a: 0 <= a <= 1,
+                                        hint="必须在 0-1 之间"),
+            border_width=section.field("border_width", int, 2, check=lambda w: 0 <= w <= 20, hint="必须在 0-20 之间"),
+            thumbnail_size=section.field("thumbnail_size", int, 256, check=lambda s: 16 <= s <= 1024,
+                                         hint="必须在 16-1024 之间"),
+            memory_budget_mb=section.field("memory_budget_mb", int, 1024, check=lambda m: m >= 64,
+                                           hint="必须不小于 64"),
+            tile_threshold_pixels=section.field("tile_threshold_pixels", int, 3840 * 2160,
+                                                check=lambda p: p >= 1920 * 1080, hint="必须不小于 2073600 (1920x1080)"),
+            clipboard_backend=section.field("clipboard_backend", str, "auto", check=lambda b: b in CLIPBOARD_BACKENDS,
+                                            hint=f"必须是 {', '.join(CLIPBOARD_BACKENDS)} 之一"),
+            clipboard_targets=section.field("clipboard_targets", list, list(CLIPBOARD_TARGETS),
+                                            check=lambda t: t and all(x in CLIPBOARD_TARGETS for x in t),
+                                            hint=f"必须是 {', '.join(CLIPBOARD_TARGETS)} 组成的非空列表"),
+            clipboard_hold_seconds=section.field("clipboard_hold_seconds", (int, float), 60,
+                                                 check=lambda h: 0 <= h <= 3600, hint="必须在 0-3600 之间"),
+            **colors,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """传给截图子进程的精简配置 (ModernScreenshot 读取的 screenshot 段)。"""
+        return {"overlay_alpha": self.overlay_alpha, "border_width": self.border_width,
+                "thumbnail_size": self.thumbnail_size, "memory_budget_mb": self.memory_budget_mb,
+                "tile_threshold_pixels": self.tile_threshold_pixels, "clipboard_backend": self.clipboard_backend,
+                "clipboard_targets": list(self.clipboard_targets),
+                "clipboard_hold_seconds": self.clipboard_hold_seconds, **self.colors}
+
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+class LoggingConfig:
+    """logging 段：传给 setup_logging() 的选项，未给出的项使用 src/logging_config.py 中的 DEFAULTS。"""
+    SPECS = {
+        "level": (str, lambda level: level.upper() in LOG_LEVELS, f"必须是 {', '.join(LOG_LEVELS)} 之一"),
+        "directory": (_NULLABLE_STR, None, "必须是目录路径或 null"),
+        "file": (str, bool, "必须是非空的文件名"),
+        "max_bytes": (int, lambda size: size >= 0, "必须是非负整数 (0 表示不滚动)"),
+        "backup_count": (int, lambda count: count >= 0, "必须是非负整数"),
+        "console": (bool, None, "必须是 true 或 false"),
+        "json": (bool, None, "必须是 true 或 false"),
+        "queue_size": (int, lambda size: size > 0, "必须是正整数"),
+        "rate_limit_seconds": (_NUMBER, lambda seconds: seconds >= 0, "必须是非负数 (0 表示不限流)"),
+        "rate_limit_burst": (int, lambda burst: burst >= 1, "必须是正整数"),
+    }
+
+    def __init__(self, **options: Any):
+        self.options = options
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "LoggingConfig":
+        return cls(**_options(_Section(raw, "logging", errors), cls.SPECS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.options)
+
+
+class SelectionConfig:
+    """selection 段：传给 configure_selection_policy() 的选项，未给出的项使用 DEFAULT_SELECTION_CONFIG。"""
+    SPECS = {
+        "adaptive": (bool, None, "必须是 true 或 false"),
+        "stats_path": (_NULLABLE_STR, None, "必须是文件路径或 null"),
+        "failure_streak": (int, lambda streak: streak >= 1, "必须是正整数"),
+        "probe_every": (int, lambda every: every >= 1, "必须是正整数"),
+        "max_apps": (int, lambda count: count >= 1, "必须是正整数"),
+        "save_interval": (_NUMBER, lambda seconds: seconds >= 0, "必须是非负数"),
+        "trace_path": (_NULLABLE_STR, None, "必须是文件路径或 null"),
+    }
+
+    def __init__(self, **options: Any):
+        self.options = options
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "SelectionConfig":
+        return cls(**_options(_Section(raw, "selection", errors), cls.SPECS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.options)
+
+
+class TextPipelineConfig:
+    """text_pipeline 段：传给 open_text_pipeline() 的选项，未给出的项使用 DEFAULT_TEXT_PIPELINE_CONFIG。"""
+    SPECS = {
+        "enabled": (bool, None, "必须是 true 或 false"),
+        "cache_size": (int, lambda size: size >= 0, "必须是非负整数 (0 表示不缓存)"),
+        "batch_window_ms": (_NUMBER, lambda window: 0 <= window <= 10000, "必须在 0-10000 之间 (0 表示不合并)"),
+        "max_batch": (int, lambda count: count >= 1, "必须是正整数"),
+        "cjk_latin_spacing": (bool, None, "必须是 true 或 false"),
+        "hyphenation": (str, lambda mode: mode in HYPHENATION_MODES, f"必须是 {', '.join(HYPHENATION_MODES)} 之一"),
+        "keep_raw": (bool, None, "必须是 true 或 false"),
+    }
+
+    def __init__(self, **options: Any):
+        self.options = options
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "TextPipelineConfig":
+        return cls(**_options(_Section(raw, "text_pipeline", errors), cls.SPECS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.options)
+
+
+_WS_URL_RE = re.compile(r"^wss?://[^/\s]+")
+_SESSION_ID_RE = re.compile(r"^[\w.@:\-]{1,128}$")
+
+
+class AgentConfig:
+    """agent 段 (--role agent)：传给 open_uplink() 的选项，未给出的项使用 AgentUplink 的默认值。"""
+    SPECS = {
+        "url": (str, _WS_URL_RE.match, "必须是 ws:// 或 wss:// 地址"),
+        "unix_path": (_NULLABLE_STR, None, "必须是套接字路径或 null"),
+        "session_id": (_NULLABLE_STR, _SESSION_ID_RE.match, "只能包含字母、数字与 . @ : _ -，最长 128 个字符"),
+        "token": (_NULLABLE_STR, None, "必须是字符串或 null"),
+        "max_pending": (int, lambda count: count >= 1, "必须是正整数"),
+        "max_pending_bytes": (int, lambda size: size >= 1, "必须是正整数"),
+        "reconnect_delay": (_NUMBER, lambda seconds: 0 < seconds <= 3600, "必须在 (0, 3600] 之间"),
+    }
+
+    def __init__(self, **options: Any):
+        self.options = options
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any], errors: List[str]) -> "AgentConfig":
+        return cls(**_options(_Section(raw, "agent", errors), cls.SPECS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.options)
+
+
+class AppConfig:
+    """
+    校验后的完整配置。各段为预先解析好的类型化对象，raw 保留原始字典以兼容旧代码。
+    """
+    SECTIONS = ("hotkey", "server", "screenshot", "profiles", "logging", "selection", "text_pipeline", "agent")
+
+    def __init__(self, raw: Dict[str, Any], hotkey: HotkeyConfig, server: ServerConfig,
+                 screenshot: ScreenshotConfig, profiles: Optional[Dict[str, CaptureProfile]] = None,
+                 logging: Optional[LoggingConfig] = None, selection: Optional[SelectionConfig] = None,
+                 text_pipeline: Optional[TextPipelineConfig] = None, agent: Optional[AgentConfig] = None):
+        self.raw = raw
+        self.hotkey = hotkey
+        self.server = server
+        self.screenshot = screenshot
+        self.profiles = profiles if profiles is not None else {"screenshot": CaptureProfile("screenshot", hotkey.screenshot)}
+        self.logging = logging or LoggingConfig()
+        self.selection = selection or SelectionConfig()
+        self.text_pipeline = text_pipeline or TextPipelineConfig()
+        self.agent = agent or AgentConfig()
+
+    @classmethod
+    def from_dict(cls, raw: Any) -> "AppConfig":
+        """校验原始配置字典，存在任何错误时抛出 ConfigError (包含全部错误)。"""
+        if not isinstance(raw, dict):
+            raise ConfigError(["配置文件顶层必须是映射"])
+        errors: List[str] = []
+        hotkey = HotkeyConfig.from_raw(raw, errors)
+        server = ServerConfig.from_raw(raw, errors)
+        screenshot = ScreenshotConfig.from_raw(raw, errors)
+        profiles = _profiles_from_raw(raw, hotkey, errors)
+        logging = LoggingConfig.from_raw(raw, errors)
+        selection = SelectionConfig.from_raw(raw, errors)
+        text_pipeline = TextPipelineConfig.from_raw(raw, errors)
+        agent = AgentConfig.from_raw(raw, errors)
+        if errors:
+            raise ConfigError(errors)
+        return cls(raw, hotkey, server, screenshot, profiles, logging=logging, selection=selection,
+                   text_pipeline=text_pipeline, agent=agent)
+
+    def hotkey_bindings(self) -> Dict[str, CaptureProfile]:
+        """{快捷键: 配置档}，编译为一张 GlobalHotKeys 映射表。"""
+        return {profile.hotkey: profile for profile in self.profiles.values()}
+
+    def section(self, name: str) -> Any:
+        """类型化的配置段；没有对应类型的段返回原始字典。"""
+        if name in self.SECTIONS:
+            return getattr(self, name)
+        return self.raw.get(name)
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """使用点表示法读取原始配置，例如 "server.host"。"""
+        value = self.raw
+        for key in _split_path(path):
+            if not isinstance(value, dict) or key not in value:
+                return default
+            value = value[key]
+        return value
+
+    def changed_sections(self, other: Optional["AppConfig"]) -> List[str]:
+        """与另一份配置相比发生变化的顶层段。"""
+        if other is None:
+            return sorted(self.raw)
+        names = set(self.raw) | set(other.raw)
+        return sorted(name for name in names if self.raw.get(name) != other.raw.get(name))
+
+
+@lru_cache(maxsize=256)
+def _split_path(path: str) -> Tuple[str, ...]:
+    return tuple(path.split("."))
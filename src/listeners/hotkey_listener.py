@@ -1,52 +1,141 @@
 # src/listeners/hotkey_listener.py
+import functools
 import logging
 import multiprocessing
 import threading
+from typing import Callable, Dict
 from pynput import keyboard
+from src.capture.direct import DirectCapture
+from src.capture.memory import CaptureBudget
 from src.capture.screenshot import take_screenshot_multiprocess
+from src.config_schema import AppConfig, CaptureProfile
 from src.ipc_queue import queue as ipc_queue
+from src.logging_config import child_log_level, child_log_queue
 
 class HotkeyListener:
     """
     监听全局快捷键，并支持优雅地停止。
+    config.yaml 中的全部配置档被编译为一张 {快捷键: 回调} 映射表，注册到同一个 GlobalHotKeys；
+    配置变化时通过 update_config() 重新编译并注册，无需重启。
     """
-    def __init__(self, config: dict, shutdown_event: threading.Event):
-        self.config = config
+    def __init__(self, config, shutdown_event: threading.Event, selection_listener=None, direct_capture=None):
+        app_config = config if isinstance(config, AppConfig) else AppConfig.from_dict(config)
         self.shutdown_event = shutdown_event
+        self.selection_listener = selection_listener
         self.screenshot_process = None
+        # 最近一次框选的 [x, y, width, height]，由截图子进程写入；宽度为 0 表示还没有框选过
+        self.last_region = multiprocessing.Array("i", 4)
+        # 截图子进程关闭预览后仍替剪贴板保留截图时 (tk 后端) 被设置，见 ClipboardService.close
+        self.clipboard_holding = multiprocessing.Event()
+        # 直接截图的工作线程可与远程采集共用 (见 main.py)
+        self.direct_capture = direct_capture or DirectCapture(ipc_queue, app_config.screenshot.thumbnail_size)
+        self._actions: Dict[str, Callable[[CaptureProfile], None]] = {
+            "region": self._capture_region,
+            "monitor": self._capture_monitor,
+            "repeat_last_region": self._repeat_last_region,
+            "toggle_selection": self._toggle_selection,
+        }
+        self._listener = None
+        self._lock = threading.Lock()
+        self._apply(app_config)
 
-    def _on_screenshot(self):
-        """截图快捷键被触发时的回调函数。"""
+    def _apply(self, app_config: AppConfig):
+        """预先生成快捷键映射表以及每个配置档传给截图子进程的精简配置。"""
+        self.config = app_config
+        self.direct_capture.thumbnail_size = app_config.screenshot.thumbnail_size
+        screenshot = app_config.screenshot.to_dict()
+        self.direct_capture.budget = CaptureBudget.from_config(screenshot)
+        self.direct_capture.clipboard_config = screenshot
+        self._child_configs = {name: {"screenshot": screenshot, "profile": profile.to_dict()}
+                               for name, profile in app_config.profiles.items()}
+        self.hotkeys = {hotkey: functools.partial(self._dispatch, profile)
+                        for hotkey, profile in app_config.hotkey_bindings().items()}
+
+    def _dispatch(self, profile: CaptureProfile):
+        logging.debug(f"快捷键 {profile.hotkey} 已被触发 (配置档: {profile.name})。")
+        try:
+            self._actions[profile.action](profile)
+        except Exception as e:
+            logging.error(f"执行配置档 {profile.name} 时发生错误: {e}", exc_info=True)
+
+    def _capture_region(self, profile: CaptureProfile):
+        """交互式框选：在子进程中显示遮罩和预览。"""
         # 防止重复启动截图进程
         if self.screenshot_process and self.screenshot_process.is_alive():
-            logging.warning("截图进程已在运行中，请勿重复触发。")
+            if not self.clipboard_holding.is_set():
+                logging.warning("截图进程已在运行中，请勿重复触发。")
+                return
+            # 上一个截图进程只是在保留剪贴板中的截图，由新的截图取代
+            self.screenshot_process.terminate()
+            self.screenshot_process.join(timeout=1)
+        self.clipboard_holding.clear()
+
+        logging.info("正在启动截图进程...")
+        self.screenshot_process = multiprocessing.Process(
+            target=take_screenshot_multiprocess,
+            # 子进程的日志经父进程的日志队列写出，与其他记录进入同一组文件
+            args=(self._child_configs[profile.name], ipc_queue, self.last_region, child_log_queue(),
+                  self.clipboard_holding, child_log_level())
+        )
+        self.screenshot_process.start()
+
+    def _capture_monitor(self, profile: CaptureProfile):
+        self.direct_capture.submit(None, self._child_configs[profile.name]["profile"])
+
+    def _repeat_last_region(self, profile: CaptureProfile):
+        """跳过遮罩，直接重新截取上一次框选的区域。"""
+        x, y, width, height = self.last_region[:]
+        if width <= 0 or height <= 0:
+            logging.warning("还没有框选过区域，无法重复截取。")
             return
-            
-        logging.info("截图快捷键已被触发，正在启动截图进程...")
-        try:
-            self.screenshot_process = multiprocessing.Process(
-                target=take_screenshot_multiprocess,
-                args=(self.config, ipc_queue)
-            )
-            self.screenshot_process.start()
-        except Exception as e:
-            logging.error(f"启动截图进程时发生错误: {e}", exc_info=True)
+        self.direct_capture.submit({"x": x, "y": y, "width": width, "height": height},
+                                   self._child_configs[profile.name]["profile"])
 
-    def run(self):
-        """启动快捷键监听器，并等待关闭信号。"""
-        hotkey_str = self.config['hotkey']['screenshot']
-        hotkeys = {hotkey_str: self._on_screenshot}
+    def _toggle_selection(self, profile: CaptureProfile):
+        if self.selection_listener is None:
+            logging.warning("划词监听器未启用，无法切换。")
+            return
+        self.selection_listener.toggle()
+
+    @staticmethod
+    def _binding_specs(app_config: AppConfig):
+        return {hotkey: profile.to_dict() for hotkey, profile in app_config.hotkey_bindings().items()}
 
-        listener = keyboard.GlobalHotKeys(hotkeys)
+    def _start_listener(self):
+        listener = keyboard.GlobalHotKeys(self.hotkeys)
         listener.start()
-        
-        logging.info(f"正在注册快捷键: {hotkey_str}")
+        for hotkey, callback in self.hotkeys.items():
+            logging.info(f"正在注册快捷键: {hotkey} -> {callback.args[0].name}")
+        return listener
+
+    def update_config(self, config: AppConfig, old: AppConfig = None):
+        """应用新的配置；快捷键映射变化时重新注册，注册失败则恢复原来的映射。"""
+        with self._lock:
+            previous = self.config
+            self._apply(config)
+            # 映射表中的回调绑定了配置档对象，配置档内容变化时也要重新注册
+            if self._listener is None or self._binding_specs(previous) == self._binding_specs(config):
+                return
+            self._listener.stop()
+            try:
+                self._listener = self._start_listener()
+            except Exception as e:
+                logging.error(f"注册新快捷键失败，恢复为原来的设置: {e}")
+                self._apply(previous)
+                self._listener = self._start_listener()
+
+    def run(self):
+        """启动快捷键监听器，并等待关闭信号。"""
+        with self._lock:
+            self._listener = self._start_listener()
         logging.info("快捷键监听器正在运行...")
-        
+
         # 等待主线程发出关闭信号
         self.shutdown_event.wait()
-        
+
         # 停止监听
-        listener.stop()
+        with self._lock:
+            self._listener.stop()
+            self._listener = None
+        self.direct_capture.close()
         logging.info("快捷键监听器已停止。")
-
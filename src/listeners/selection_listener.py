@@ -18,6 +18,15 @@ class SelectionListener:
         self.task_queue = queue.Queue()
         self._press_pos: Optional[Tuple[int, int]] = None
         self.MIN_DRAG_DISTANCE = 10
+        # 可通过快捷键暂停划词捕获，暂停期间忽略所有鼠标拖选
+        self.enabled = True
+
+    def toggle(self) -> bool:
+        """开启/暂停划词捕获，返回切换后的状态。"""
+        self.enabled = not self.enabled
+        self._press_pos = None
+        logging.info(f"划词捕获已{'开启' if self.enabled else '暂停'}。")
+        return self.enabled
 
     def _selection_worker(self):
         """在独立线程中运行的工作函数，安全地执行划词捕获。"""
@@ -52,7 +61,7 @@ class SelectionListener:
 
     def _on_click(self, x, y, button, pressed):
         """pynput 鼠标事件回调。"""
-        if button == mouse.Button.left:
+        if button == mouse.Button.left and self.enabled:
             if pressed:
                 self._press_pos = (x, y)
             else:
@@ -1,12 +1,241 @@
+# src/logging_config.py
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
 import sys
+import threading
+import time
+from typing import Any, Dict, Optional
 
-def setup_logging():
+CONSOLE_FORMAT = "%(asctime)s [%(threadName)-25.25s] [%(levelname)-5.5s]  %(message)s"
+FILE_FORMAT = "%(asctime)s - [%(levelname)s] - %(processName)s/%(threadName)s - %(message)s"
+
+DEFAULTS = {"level": "INFO", "directory": "logs", "file": "app.log", "max_bytes": 10 * 1024 * 1024,
+            "backup_count": 3, "console": True, "json": False, "queue_size": 10000,
+            "rate_limit_seconds": 10.0, "rate_limit_burst": 1}
+
+# 结构化字段：通过 logging 的 extra 传入，JSON 记录中原样输出
+STRUCTURED_FIELDS = ("capture_id", "session_id", "timings", "size", "format", "stage")
+
+_pipeline: Optional["LogPipeline"] = None
+_pipeline_lock = threading.Lock()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    限制重复的警告：同一位置的同一条消息在 interval 秒内最多输出 burst 次，其余计数后丢弃，
+    下一次放行时在消息末尾注明被抑制的条数。在调用方线程中执行，只做字典查找。
+    """
+    def __init__(self, interval: float = 10.0, burst: int = 1, level: int = logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.level = level
+        self.suppressed_total = 0
+        self._windows: Dict[Any, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level or self.interval <= 0:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 1024:
+                    self._windows = {k: w for k, w in self._windows.items() if now - w[0] < self.interval}
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                self.suppressed_total += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} (过去 {self.interval:g} 秒内另有 {suppressed} 条相同消息被抑制)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列已满时丢弃记录并计数，调用方线程永不阻塞。"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    """停止时阻塞地放入结束标记：队列已满时等待监听线程腾出位置，而不是抛出 queue.Full。"""
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class _ChildListener(_Listener):
+    """转发子进程记录的监听器：与主进程的记录一样先检查级别并限流，再交给处理器。"""
+    def __init__(self, log_queue, level: int, rate_limit: RateLimitFilter, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.level = level
+        self.rate_limit = rate_limit
+
+    def handle(self, record: logging.LogRecord):
+        if record.levelno >= self.level and self.rate_limit.filter(record):
+            super().handle(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON，附带 capture_id、timings 等结构化字段。"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+                 "level": record.levelname, "logger": record.name, "process": record.processName,
+                 "thread": record.threadName, "message": record.getMessage()}
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogPipeline:
+    """
+    异步日志管线：各线程的记录经 QueueHandler 进入内存队列，由后台 QueueListener 写入控制台
+    与 logs/ 下的滚动文件 (可选再写一份 JSON lines)。慢的控制台或管道只会让队列积压，
+    不会阻塞采集线程；队列满时丢弃并计数。
+
+    截图子进程通过 child_queue (multiprocessing.Queue) 把记录转发回来，由另一个监听线程写入同一组处理器。
+    """
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULTS, **(config or {})}
+        self.level = logging.getLevelName(str(self.config["level"]).upper())
+        self.handlers = self._build_handlers()
+        self.queue: queue.Queue = queue.Queue(self.config["queue_size"])
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.rate_limit = RateLimitFilter(self.config["rate_limit_seconds"], self.config["rate_limit_burst"])
+        self.queue_handler.addFilter(self.rate_limit)
+        self._listener = _Listener(self.queue, *self.handlers, respect_handler_level=True)
+        self._child_queue = None
+        self._child_listener = None
+        self._replaced = []
+
+    def _build_handlers(self):
+        handlers = []
+        if self.config["console"]:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(console)
+        directory = self.config["directory"]
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            rotating = logging.handlers.RotatingFileHandler(
+                os.path.join(directory, self.config["file"]), maxBytes=self.config["max_bytes"],
+                backupCount=self.config["backup_count"], encoding="utf-8", delay=True)
+            rotating.setFormatter(logging.Formatter(FILE_FORMAT))
+            handlers.append(rotating)
+            if self.config["json"]:
+                stem = os.path.splitext(self.config["file"])[0]
+                records = logging.handlers.RotatingFileHandler(
+                    os.path.join(directory, stem + ".jsonl"), maxBytes=self.config["max_bytes"],
+                    backupCount=self.config["backup_count"], encoding="utf-8", delay=True)
+                records.setFormatter(JsonFormatter())
+                handlers.append(records)
+        return handlers
+
+    def start(self) -> "LogPipeline":
+        root = logging.getLogger()
+        self._replaced = list(root.handlers)
+        for handler in self._replaced:
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        root.setLevel(self.level)
+        self._listener.start()
+        return self
+
+    @property
+    def child_queue(self):
+        """子进程日志转发用的队列，首次访问时创建并启动对应的监听线程。"""
+        if self._child_queue is None:
+            self._child_queue = multiprocessing.Queue(self.config["queue_size"])
+            self._child_listener = _ChildListener(self._child_queue, self.level, self.rate_limit, *self.handlers)
+            self._child_listener.start()
+        return self._child_queue
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self.queue.qsize(), "dropped": self.queue_handler.dropped,
+                "suppressed": self.rate_limit.suppressed_total}
+
+    def stop(self):
+        """停止监听线程并写出队列中剩余的记录，恢复 start() 之前的处理器。"""
+        root = logging.getLogger()
+        if self.queue_handler in root.handlers:
+            root.removeHandler(self.queue_handler)
+            for handler in self._replaced:
+                root.addHandler(handler)
+        self._listener.stop()
+        if self._child_listener is not None:
+            self._child_listener.stop()
+            self._child_queue.close()
+            self._child_queue.join_thread()
+        for handler in self.handlers:
+            handler.close()
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None) -> LogPipeline:
+    """
+    配置全局日志记录器。再次调用时 (例如读取 config.yaml 的 logging 段之后) 先停止旧的管线，
+    已入队的记录会先写出。
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
+        _pipeline = LogPipeline(config).start()
+        return _pipeline
+
+
+def shutdown_logging():
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
+
+
+def child_log_queue():
+    """传给截图子进程的日志队列；未通过 setup_logging 配置时返回 None。"""
+    return _pipeline.child_queue if _pipeline is not None else None
+
+
+def child_log_level() -> int:
+    """传给截图子进程的日志级别，与当前管线的 logging.level 一致。"""
+    return _pipeline.level if _pipeline is not None else logging.getLevelName(DEFAULTS["level"])
+
+
+def configure_child_logging(log_queue, level: int = logging.INFO):
     """
-    配置全局日志记录器。
+    在子进程中把日志转发到父进程的队列，level 由父进程通过 child_log_level() 传入。
+    fork 出的子进程继承了父进程的 QueueHandler，但父进程的内存队列在子进程中无人读取，因此先清除已有的处理器。
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(threadName)-25.25s] [%(levelname)-5.5s]  %(message)s",
-        stream=sys.stdout
-    )
\ No newline at end of file
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if log_queue is None:
+        logging.basicConfig(level=level, format=CONSOLE_FORMAT, stream=sys.stdout)
+        return
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
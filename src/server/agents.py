@@ -0,0 +1,129 @@
+# src/server/agents.py
+import hmac
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.server.subscriptions import MESSAGE_TYPES
+
+AGENT_PATH = "/agent"
+DEFAULT_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_QUEUE = 4
+
+_SESSION_RE = re.compile(r"^[\w.@:\-]{1,128}$")
+_SCALARS = (str, int, float, bool, type(None))
+# 订阅过滤与历史记录直接使用的元数据字段，代理发来的值必须是标量
+SCALAR_METADATA = ("source_app_name", "source_window_title", "method", "capture_id", "format", "encoding", "profile")
+REGION_KEYS = ("x", "y", "width", "height")
+
+
+def _is_valid(message) -> bool:
+    """代理发来的消息是否符合采集消息的格式：data 为字符串，已知的元数据字段类型正确。"""
+    if not isinstance(message, dict) or message.get("type") not in MESSAGE_TYPES \
+            or not isinstance(message.get("data"), str) or not isinstance(message.get("timestamp"), _SCALARS):
+        return False
+    metadata = message.setdefault("metadata", {})
+    if not isinstance(metadata, dict) or not all(isinstance(metadata.get(key), _SCALARS) for key in SCALAR_METADATA):
+        return False
+    region = metadata.get("region")
+    return region is None or (isinstance(region, dict) and all(
+        isinstance(region.get(key), (int, float, type(None))) and not isinstance(region.get(key), bool)
+        for key in REGION_KEYS))
+
+
+class AgentSession:
+    """一个已连接的采集代理及其统计。"""
+    def __init__(self, session_id: str, remote_address: Any):
+        self.session_id = session_id
+        self.remote_address = remote_address
+        self.connected_at = time.time()
+        self.received = 0
+        self.received_bytes = 0
+        self.rejected = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"session_id": self.session_id, "connected_at": self.connected_at, "received": self.received,
+                "received_bytes": self.received_bytes, "rejected": self.rejected}
+
+
+class AgentRegistry:
+    """
+    broker 端的采集代理登记表。代理以 ws://<broker>/agent?session=<会话 ID> 连接 (TCP 或 Unix 域套接字)，
+    之后发送的每一帧都是一条采集消息 (与 queue_message 的格式相同)，broker 在 metadata.session_id
+    中标记来源会话后按订阅分发给客户端。代理连接不接收广播。
+
+    每个代理连接在 broker 中最多缓冲 max_queue 条、每条不超过 max_message_bytes 字节的消息；
+    broker 处理不过来时停止读取，压力通过套接字传回代理，由代理端的有界队列吸收。
+    只在 WebSocket 服务器的事件循环线程中访问。
+    """
+    def __init__(self, max_message_bytes: int = DEFAULT_MAX_MESSAGE_BYTES, max_queue: int = DEFAULT_MAX_QUEUE,
+                 token: Optional[str] = None):
+        self.max_message_bytes = max_message_bytes
+        self.max_queue = max_queue
+        self.token = token
+        self.sessions: Dict[Any, AgentSession] = {}
+
+    def serve_kwargs(self) -> Dict[str, Any]:
+        """websockets.serve 的入站消息上限；对普通客户端的请求同样适用。"""
+        return {"max_size": self.max_message_bytes, "max_queue": self.max_queue}
+
+    def match(self, path: Optional[str]) -> Optional[str]:
+        """
+        连接路径是代理入口时返回会话 ID，否则返回 None。会话 ID 缺失、格式不对或令牌错误时抛出 ValueError。
+        """
+        parts = urlsplit(path or "")
+        if parts.path.rstrip("/") != AGENT_PATH:
+            return None
+        query = parse_qs(parts.query)
+        if self.token is not None and not hmac.compare_digest(query.get("token", [""])[0], self.token):
+            raise ValueError("代理令牌无效")
+        session_id = query.get("session", [""])[0]
+        if not _SESSION_RE.match(session_id):
+            raise ValueError("session 必须是 1-128 个字母、数字或 . @ : _ - 字符")
+        return session_id
+
+    def connect(self, websocket, session_id: str) -> AgentSession:
+        agent = self.sessions[websocket] = AgentSession(session_id, websocket.remote_address)
+        logging.info(f"采集代理已连接: 会话 {session_id}")
+        return agent
+
+    def disconnect(self, websocket):
+        agent = self.sessions.pop(websocket, None)
+        if agent is not None:
+            logging.info(f"采集代理已断开: 会话 {agent.session_id} (共接收 {agent.received} 条消息)")
+
+    def accept(self, agent: AgentSession, raw) -> Optional[Dict[str, Any]]:
+        """解析代理发来的一帧并标记会话；不是 JSON 或格式不对时计数并返回 None。"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            message = None
+        if not _is_valid(message):
+            self.reject(agent, "格式不对")
+            return None
+        # 会话来自连接时的认证信息，不信任消息自带的值
+        message["metadata"]["session_id"] = agent.session_id
+        agent.received += 1
+        agent.received_bytes += len(raw)
+        return message
+
+    def reject(self, agent: AgentSession, reason: str):
+        agent.rejected += 1
+        logging.warning(f"忽略会话 {agent.session_id} 的无效消息 ({reason})。")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connected": len(self.sessions),
+                "sessions": [agent.to_dict() for agent in self.sessions.values()]}
+
+
+def open_agents(config: Optional[Dict[str, Any]]) -> Optional[AgentRegistry]:
+    """
+    按 server.agents 配置创建代理登记表；未配置或 enabled 为 false 时返回 None。
+    """
+    if not config or not config.get("enabled", True):
+        return None
+    options = {key: value for key, value in config.items() if key != "enabled"}
+    return AgentRegistry(**options)
@@ -0,0 +1,102 @@
+# src/server/artifacts.py
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.server.imaging import thumbnail_message
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ITEMS = 64
+
+
+class CaptureArtifacts:
+    """
+    一次截图的全部产物：完整图像消息，以及按最长边尺寸缓存的缩略图消息。
+    """
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self.thumbnails: Dict[int, Dict[str, Any]] = {}
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.message.get("data", "")) + sum(len(t.get("data", "")) for t in self.thumbnails.values())
+
+
+class ArtifactStore:
+    """
+    有界的内存截图存储，按 capture_id 索引，超出字节数或条目数上限时按 LRU 淘汰。
+    只在 WebSocket 服务器的事件循环线程中访问，因此不加锁。
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_items: int = DEFAULT_MAX_ITEMS):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.total_bytes = 0
+        self.evictions = 0
+        self._items: "OrderedDict[str, CaptureArtifacts]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, capture_id: str) -> bool:
+        return capture_id in self._items
+
+    def ingest(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        保存一条图像消息并返回去掉附带产物后的消息。
+        截图进程附带的缩略图 (message["artifacts"]["thumbnail"]) 被拆出单独保存；
+        没有 capture_id 的消息会被分配一个。
+        """
+        extras = message.pop("artifacts", None) or {}
+        metadata = message.setdefault("metadata", {})
+        capture_id = metadata.setdefault("capture_id", uuid.uuid4().hex)
+
+        artifacts = CaptureArtifacts(message)
+        thumbnail = extras.get("thumbnail")
+        if thumbnail:
+            original_size = {"width": metadata.get("region", {}).get("width"),
+                             "height": metadata.get("region", {}).get("height")}
+            artifacts.thumbnails[int(thumbnail["max_size"])] = thumbnail_message(message, thumbnail["data"], original_size)
+
+        if capture_id in self._items:
+            self.total_bytes -= self._items.pop(capture_id).size_bytes
+        self._items[capture_id] = artifacts
+        self.total_bytes += artifacts.size_bytes
+        self._evict()
+        return message
+
+    def get(self, capture_id: str) -> Optional[CaptureArtifacts]:
+        artifacts = self._items.get(capture_id)
+        if artifacts is not None:
+            self._items.move_to_end(capture_id)
+        return artifacts
+
+    def thumbnail(self, capture_id: str, max_size: int) -> Optional[Dict[str, Any]]:
+        artifacts = self._items.get(capture_id)
+        return artifacts.thumbnails.get(max_size) if artifacts else None
+
+    def add_thumbnail(self, capture_id: str, max_size: int, message: Dict[str, Any]) -> None:
+        artifacts = self._items.get(capture_id)
+        if artifacts is None or max_size in artifacts.thumbnails:
+            return
+        artifacts.thumbnails[max_size] = message
+        self.total_bytes += len(message.get("data", ""))
+        self._evict()
+
+    def resize(self, max_bytes: int = DEFAULT_MAX_BYTES, max_items: int = DEFAULT_MAX_ITEMS) -> None:
+        """调整容量上限，超出新上限的部分立即淘汰。"""
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._evict()
+
+    def _evict(self) -> None:
+        # 至少保留最新的一条，即使它本身超出了字节上限
+        while len(self._items) > 1 and (len(self._items) > self.max_items or self.total_bytes > self.max_bytes):
+            capture_id, artifacts = self._items.popitem(last=False)
+            self.total_bytes -= artifacts.size_bytes
+            self.evictions += 1
+            logging.debug(f"截图 {capture_id} 已从缓存中淘汰。")
+
+    def stats(self) -> Dict[str, int]:
+        return {"items": len(self._items), "bytes": self.total_bytes, "evictions": self.evictions,
+                "max_items": self.max_items, "max_bytes": self.max_bytes}
@@ -0,0 +1,158 @@
+# src/server/compression.py
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from websockets.extensions.permessage_deflate import (
+    PerMessageDeflate,
+    ServerPerMessageDeflateFactory,
+)
+from websockets.frames import CONT, CTRL_OPCODES
+
+# zstd 为可选依赖：优先使用 zstandard，其次是 Python 3.14+ 自带的 compression.zstd
+try:
+    import zstandard as _zstd
+
+    def zstd_compress(data: bytes, level: int) -> bytes:
+        return _zstd.ZstdCompressor(level=level).compress(data)
+except ImportError:
+    try:
+        from compression import zstd as _zstd
+
+        def zstd_compress(data: bytes, level: int) -> bytes:
+            return _zstd.compress(data, level=level)
+    except ImportError:
+        zstd_compress = None
+
+ZSTD_AVAILABLE = zstd_compress is not None
+
+# 客户端通过 Sec-WebSocket-Protocol 提议该子协议即表示能解码 zstd 二进制帧
+ZSTD_SUBPROTOCOL = "transtation.zstd"
+
+DEFAULT_COMPRESSION_CONFIG: Dict[str, Any] = {
+    "deflate": True,
+    "level": 6,
+    "memory_level": 5,
+    "window_bits": 12,
+    "min_size": 256,
+    "per_type": {"text": True, "image": False},
+    "zstd": True,
+    "zstd_level": 3,
+}
+
+
+class SelectivePerMessageDeflate(PerMessageDeflate):
+    """
+    可以逐条消息决定是否压缩的 permessage-deflate。
+
+    RFC 7692 允许在已协商的连接上发送 RSV1=0 的未压缩消息，
+    因此对已经压缩过的 PNG/Base64 负载可以直接跳过 deflate。
+    发送方需在调用 send() 之前设置 compress_next；同一连接上的发送是串行的。
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compress_next = True
+        self._compressing = True
+
+    def encode(self, frame):
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if frame.opcode is not CONT:
+            self._compressing = self.compress_next
+        return super().encode(frame) if self._compressing else frame
+
+
+class SelectiveServerPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """协商结果与标准工厂一致，但返回 SelectivePerMessageDeflate 实例。"""
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, SelectivePerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            self.compress_settings,
+        )
+
+
+class EncodedMessage:
+    """
+    一条待广播消息的各种编码形式：JSON 文本只序列化一次，
+    zstd 二进制帧在第一个需要它的客户端出现时才压缩，并在所有客户端间共享。
+    """
+    def __init__(self, policy: "CompressionPolicy", message: Dict[str, Any], text: Optional[str] = None):
+        self.message_type = message.get("type")
+        self.text = json.dumps(message) if text is None else text
+        self.deflate = policy.should_deflate(self.message_type, len(self.text))
+        self._policy = policy
+        self._zstd: Optional[bytes] = None
+
+    @property
+    def zstd(self) -> bytes:
+        if self._zstd is None:
+            self._zstd = zstd_compress(self.text.encode("utf-8"), self._policy.zstd_level)
+        return self._zstd
+
+
+class CompressionPolicy:
+    """
+    根据 config.yaml 中 server.compression 的设置，
+    提供 websockets.serve 的压缩参数并为每条消息选择编码方式。
+    """
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        merged = dict(DEFAULT_COMPRESSION_CONFIG)
+        merged.update(config or {})
+        merged["per_type"] = {**DEFAULT_COMPRESSION_CONFIG["per_type"], **(merged.get("per_type") or {})}
+
+        self.deflate_enabled = bool(merged["deflate"])
+        self.level = int(merged["level"])
+        self.memory_level = int(merged["memory_level"])
+        self.window_bits = int(merged["window_bits"])
+        self.min_size = int(merged["min_size"])
+        self.per_type = merged["per_type"]
+        self.zstd_level = int(merged["zstd_level"])
+        self.zstd_enabled = bool(merged["zstd"]) and ZSTD_AVAILABLE
+        if (config or {}).get("zstd") and not ZSTD_AVAILABLE:
+            logging.warning("未安装 zstandard，zstd 压缩将不可用。")
+
+    def serve_kwargs(self) -> Dict[str, Any]:
+        """传给 websockets.serve 的关键字参数。"""
+        kwargs: Dict[str, Any] = {"compression": None}
+        if self.deflate_enabled:
+            kwargs["extensions"] = self.extension_factories()
+        if self.zstd_enabled:
+            kwargs["select_subprotocol"] = self._select_subprotocol
+        return kwargs
+
+    def extension_factories(self) -> List[ServerPerMessageDeflateFactory]:
+        return [SelectiveServerPerMessageDeflateFactory(
+            server_max_window_bits=self.window_bits,
+            client_max_window_bits=self.window_bits,
+            compress_settings={"level": self.level, "memLevel": self.memory_level},
+        )]
+
+    @staticmethod
+    def _select_subprotocol(connection, subprotocols):
+        # 与默认行为不同：客户端不提议子协议时照常接受连接
+        return ZSTD_SUBPROTOCOL if ZSTD_SUBPROTOCOL in subprotocols else None
+
+    def should_deflate(self, message_type: Optional[str], size: int) -> bool:
+        if size < self.min_size:
+            return False
+        return bool(self.per_type.get(message_type, True))
+
+    def encode(self, message: Dict[str, Any], text: Optional[str] = None) -> EncodedMessage:
+        """text 为消息已序列化好的 JSON (例如从日志中读出) 时直接复用。"""
+        return EncodedMessage(self, message, text)
+
+    async def send(self, websocket, encoded: EncodedMessage):
+        """按该连接协商出的能力发送消息：zstd 二进制帧，或按类型决定是否 deflate 的文本帧。"""
+        use_zstd = self.zstd_enabled and getattr(websocket, "subprotocol", None) == ZSTD_SUBPROTOCOL
+        deflate = encoded.deflate and not use_zstd
+        for extension in websocket.protocol.extensions:
+            if isinstance(extension, SelectivePerMessageDeflate):
+                extension.compress_next = deflate
+        if use_zstd:
+            await websocket.send(encoded.zstd)
+        else:
+            await websocket.send(encoded.text)
@@ -0,0 +1,302 @@
+# src/server/history.py
+import base64
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+_COLUMNS = ("seq", "capture_id", "type", "ts", "timestamp", "source_app", "window_title", "method", "text",
+            "region_x", "region_y", "region_w", "region_h", "format", "hash", "bytes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER,
+    capture_id TEXT,
+    type TEXT NOT NULL,
+    ts REAL NOT NULL,
+    timestamp TEXT,
+    source_app TEXT,
+    window_title TEXT,
+    method TEXT,
+    text TEXT,
+    region_x INTEGER, region_y INTEGER, region_w INTEGER, region_h INTEGER,
+    format TEXT,
+    hash TEXT,
+    bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS captures_type_ts ON captures (type, ts);
+CREATE INDEX IF NOT EXISTS captures_app_ts ON captures (source_app COLLATE NOCASE, ts);
+CREATE INDEX IF NOT EXISTS captures_capture_id ON captures (capture_id);
+"""
+
+
+def _parse_time(value: Any) -> Optional[float]:
+    """接受 Unix 秒数或 ISO 8601 字符串 (可带 Z)，返回 Unix 秒数。"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析的时间: {value}")
+
+
+def _row(message: Dict[str, Any]) -> Tuple:
+    """把一条广播消息转换为 captures 表的一行。截图只保存元数据和内容哈希，不保存图像本身。"""
+    metadata = message.get("metadata", {})
+    message_type = message.get("type")
+    try:
+        ts = _parse_time(message.get("timestamp")) or time.time()
+    except ValueError:
+        ts = time.time()
+    text = region = image_hash = size = None
+    if message_type == "image":
+        region = metadata.get("region") or {}
+        image = base64.b64decode(message.get("data", ""))
+        image_hash, size = hashlib.sha256(image).hexdigest(), len(image)
+    else:
+        text = message.get("data")
+    region = region or {}
+    return (message.get("seq"), metadata.get("capture_id"), message_type, ts, message.get("timestamp"),
+            metadata.get("source_app_name"), metadata.get("source_window_title"), metadata.get("method"), text,
+            region.get("x"), region.get("y"), region.get("width"), region.get("height"),
+            metadata.get("format"), image_hash, size)
+
+
+def _item(row: sqlite3.Row) -> Dict[str, Any]:
+    item = {"id": row["id"], "type": row["type"], "timestamp": row["timestamp"], "seq": row["seq"],
+            "capture_id": row["capture_id"]}
+    if row["type"] == "image":
+        item.update({"region": {"x": row["region_x"], "y": row["region_y"],
+                                "width": row["region_w"], "height": row["region_h"]},
+                     "format": row["format"], "hash": row["hash"], "bytes": row["bytes"]})
+    else:
+        item.update({"data": row["text"], "source_app_name": row["source_app"],
+                     "source_window_title": row["window_title"], "method": row["method"]})
+    return item
+
+
+class HistoryQuery:
+    """
+    历史查询条件，全部可选：
+    types、source_app (不区分大小写)、since/until (Unix 秒数或 ISO 8601)、
+    text (全文检索)、region (与截图区域相交的矩形 {x, y, width, height})。
+    """
+    def __init__(self, types=None, source_app=None, since=None, until=None, text=None, region=None):
+        if isinstance(types, str):
+            types = [types]
+        if isinstance(source_app, str):
+            source_app = [source_app]
+        self.types = list(types) if types else None
+        self.source_apps = list(source_app) if source_app else None
+        self.since = _parse_time(since)
+        self.until = _parse_time(until)
+        self.text = str(text) if text else None
+        self.region = None
+        if region:
+            try:
+                self.region = tuple(int(region[key]) for key in ("x", "y", "width", "height"))
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("region 必须包含整数 x、y、width、height")
+
+    @classmethod
+    def from_request(cls, filters: Optional[Dict[str, Any]]) -> "HistoryQuery":
+        filters = filters or {}
+        unknown = set(filters) - {"types", "source_app", "since", "until", "text", "region"}
+        if unknown:
+            raise ValueError(f"未知的查询条件: {sorted(unknown)}")
+        return cls(**filters)
+
+    def sql(self, limit: int, cursor: Optional[int] = None) -> Tuple[str, List[Any]]:
+        """
+        生成按 id 倒序 (即最新的在前) 的分页查询。
+        带全文条件时由 FTS 索引按 rowid 倒序驱动，匹配项再多也只需读取一页；
+        没有时间范围时不使用 type/source_app 索引，直接倒序扫描主键，凑满一页即可停止，
+        避免把某个类型或应用的全部记录取出再排序。
+        """
+        indexed = "" if self.since is not None or self.until is not None else "+"
+        clauses, params = [], []
+        if self.text:
+            # 作为短语检索，避免用户输入被解释为 FTS5 查询语法
+            sql = "SELECT c.* FROM captures_fts JOIN captures c ON c.id = captures_fts.rowid"
+            order = "captures_fts.rowid"
+            clauses.append("captures_fts MATCH ?")
+            params.append('"' + self.text.replace('"', '""') + '"')
+        else:
+            sql = "SELECT c.* FROM captures c"
+            order = "c.id"
+        if self.types:
+            clauses.append(f"{indexed}c.type IN ({','.join('?' * len(self.types))})")
+            params += self.types
+        if self.source_apps:
+            clauses.append(f"{indexed}c.source_app COLLATE NOCASE IN ({','.join('?' * len(self.source_apps))})")
+            params += self.source_apps
+        if self.since is not None:
+            clauses.append("c.ts >= ?")
+            params.append(self.since)
+        if self.until is not None:
+            clauses.append("c.ts < ?")
+            params.append(self.until)
+        if self.region:
+            x, y, width, height = self.region
+            clauses.append(f"{indexed}c.type = 'image' AND c.region_x < ? AND c.region_x + c.region_w > ? "
+                           "AND c.region_y < ? AND c.region_y + c.region_h > ?")
+            params += [x + width, x, y + height, y]
+        if cursor is not None:
+            clauses.append(f"{order} < ?")
+            params.append(int(cursor))
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+
+class HistoryStore:
+    """
+    基于 SQLite 的本地采集历史，文本内容建有 FTS5 全文索引。
+
+    record() 只把消息转换为一行放入内存队列，由后台写线程批量插入 (一次事务写入队列中积压的全部记录)，
+    不增加广播路径的延迟。截图在入队前就只剩元数据和哈希，写线程积压时也不会占住图像数据。查询使用独立的只读连接 (WAL 模式下与写入互不阻塞)，
+    会访问磁盘，应在线程池中调用。
+    """
+    def __init__(self, path: str = "history.db", batch_size: int = DEFAULT_BATCH_SIZE,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+        connection = self._connect()
+        self.fts_tokenizer = self._create_schema(connection)
+        connection.close()
+        self._reader = self._connect()
+        self._reader.row_factory = sqlite3.Row
+        self._reader_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="HistoryWriterThread", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection) -> str:
+        # trigram 分词支持中日韩文本的子串检索 (SQLite >= 3.34)；不可用时退回 unicode61
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS captures_fts USING fts5("
+                                   f"text, content='captures', content_rowid='id', tokenize='{tokenizer}')")
+                break
+            except sqlite3.OperationalError:
+                continue
+        connection.executescript(_SCHEMA)
+        connection.commit()
+        sql = connection.execute("SELECT sql FROM sqlite_master WHERE name = 'captures_fts'").fetchone()[0]
+        return "trigram" if "trigram" in sql else "unicode61"
+
+    def record(self, message: Dict[str, Any], block: bool = False) -> None:
+        """
+        登记一条消息。默认不阻塞，写线程积压过多时丢弃并计数；
+        批量导入时可传 block=True 等待队列腾出空间。
+        """
+        try:
+            row = _row(message)
+        except Exception as e:
+            logging.error(f"无法登记历史记录: {e}")
+            return
+        try:
+            self._queue.put(row, block=block)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logging.warning(f"历史记录写入积压，已丢弃 {self.dropped} 条。")
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        insert = f"INSERT INTO captures ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:  # 哨兵值，由 close() 放入
+                running = False
+            rows = [row for row in batch if row is not None]
+            try:
+                with connection:
+                    last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM captures").fetchone()[0]
+                    connection.executemany(insert, rows)
+                    # 全文索引按批写入：一条 INSERT ... SELECT 比逐行触发器快约 3 倍
+                    connection.execute("INSERT INTO captures_fts (rowid, text) "
+                                       "SELECT id, text FROM captures WHERE id > ? AND text IS NOT NULL", (last_id,))
+            except sqlite3.Error as e:
+                logging.error(f"写入历史记录失败 ({len(rows)} 条): {e}", exc_info=True)
+            for _ in batch:
+                self._queue.task_done()
+        connection.close()
+
+    def flush(self) -> None:
+        """阻塞直到已登记的消息全部写入。"""
+        self._queue.join()
+
+    def query(self, query: Optional[HistoryQuery] = None, limit: int = DEFAULT_PAGE_SIZE,
+              cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        按时间倒序 (最新的在前) 返回一页结果和下一页的游标；没有更多结果时游标为 None。
+        游标基于自增 id (keyset 分页)，翻页代价与页码无关。
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql, params = (query or HistoryQuery()).sql(limit + 1, cursor)
+        with self._reader_lock:
+            rows = self._reader.execute(sql, params).fetchall()
+        items = [_item(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return items, next_cursor
+
+    def iter_query(self, query: Optional[HistoryQuery] = None,
+                   page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """逐页产出全部匹配结果。"""
+        cursor = None
+        while True:
+            items, cursor = self.query(query, page_size, cursor)
+            if items:
+                yield items
+            if cursor is None:
+                return
+
+    def count(self) -> int:
+        with self._reader_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join(timeout=10.0)
+        with self._reader_lock:
+            self._reader.close()
+
+
+def open_history(config: Optional[Dict[str, Any]]) -> Optional[HistoryStore]:
+    """
+    按 server.history 配置打开历史库；未配置或 enabled 为 false 时返回 None。
+    """
+    if not config or not config.get("enabled", True):
+        return None
+    options = {key: value for key, value in config.items() if key != "enabled"}
+    return HistoryStore(**options)
@@ -0,0 +1,75 @@
+# src/server/imaging.py
+import base64
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+from src.capture.encoding import encode_image, make_thumbnail_artifact
+
+# 本模块中的函数都会解码/编码图像，应在线程池中调用，避免阻塞事件循环
+
+
+def thumbnail_message(message: Dict[str, Any], data: str, original_size: Dict[str, int]) -> Dict[str, Any]:
+    """
+    用给定的 Base64 缩略图数据构造原消息的缩略图版本。
+    """
+    metadata = message.get("metadata", {})
+    return {
+        **message,
+        "data": data,
+        "metadata": {**metadata, "format": "png", "thumbnail": True, "original_size": original_size},
+    }
+
+
+def make_thumbnail(message: Dict[str, Any], max_size: int) -> Dict[str, Any]:
+    """
+    将图像消息缩放到最长边不超过 max_size 像素，与采集端生成的缩略图使用同一实现。
+    """
+    with Image.open(BytesIO(base64.b64decode(message["data"]))) as image:
+        original_size = {"width": image.width, "height": image.height}
+        artifact = make_thumbnail_artifact(image, max_size)
+    return thumbnail_message(message, artifact["data"], original_size)
+
+
+def render_capture(message: Dict[str, Any], crop: Optional[Dict[str, int]] = None,
+                   scale: Optional[float] = None, max_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    从已保存的截图中裁剪和/或缩放出一张新图。
+    crop 使用截图内的像素坐标 {"x", "y", "width", "height"}；
+    scale 为 (0, 1] 的缩放比例，max_size 限制最长边，两者可同时给出，取较小者。
+    参数非法时抛出 ValueError。
+    """
+    metadata = message.get("metadata", {})
+    with Image.open(BytesIO(base64.b64decode(message["data"]))) as image:
+        image.load()
+        result = image
+        if crop:
+            x, y = int(crop.get("x", 0)), int(crop.get("y", 0))
+            width, height = int(crop["width"]), int(crop["height"])
+            if width <= 0 or height <= 0 or x < 0 or y < 0 or x + width > image.width or y + height > image.height:
+                raise ValueError(f"裁剪区域超出截图范围 ({image.width}x{image.height})")
+            result = result.crop((x, y, x + width, y + height))
+
+        factor = 1.0
+        if scale is not None:
+            if not 0 < float(scale) <= 1:
+                raise ValueError("scale 必须在 (0, 1] 之间")
+            factor = float(scale)
+        if max_size is not None:
+            factor = min(factor, int(max_size) / max(result.width, result.height))
+        if factor < 1.0:
+            size = (max(1, round(result.width * factor)), max(1, round(result.height * factor)))
+            result = result.resize(size, Image.Resampling.LANCZOS)
+        data = encode_image(result)
+
+    region = dict(metadata.get("region", {}))
+    if crop and region:
+        region = {"x": region.get("x", 0) + int(crop.get("x", 0)), "y": region.get("y", 0) + int(crop.get("y", 0)),
+                  "width": int(crop["width"]), "height": int(crop["height"])}
+    return {
+        **message,
+        "data": data,
+        "metadata": {**metadata, "format": "png", "region": region, "fetched": True,
+                     "size": {"width": result.width, "height": result.height}},
+    }
@@ -0,0 +1,315 @@
+# src/server/journal.py
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_HOURS = 168
+
+# 日志记录: 头部 (seq, 写入时间, 负载长度, 负载 CRC32) + UTF-8 JSON 负载
+RECORD_HEADER = struct.Struct("<QdII")
+# 索引项: 记录在日志文件中的偏移、负载长度和写入时间；段内 seq 连续，第 i 项的 seq 为 first_seq + i
+INDEX_ENTRY = struct.Struct("<QId")
+
+
+class _Segment:
+    """
+    日志的一个分段：<first_seq>.log 保存记录，<first_seq>.idx 保存紧凑的偏移索引。
+    读取通过 mmap 进行，文件增长后按需重新映射。
+    """
+    def __init__(self, directory: str, first_seq: int):
+        self.first_seq = first_seq
+        self.log_path = os.path.join(directory, f"{first_seq:020d}.log")
+        self.index_path = os.path.join(directory, f"{first_seq:020d}.idx")
+        self.offsets = array("Q")
+        self.first_timestamp = 0.0
+        self.last_timestamp = 0.0
+        self.size = 0
+        self._log_file = None
+        self._index_file = None
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self.first_seq + len(self.offsets) - 1
+
+    def load(self) -> None:
+        """
+        读取索引并与日志文件核对：补上崩溃前已写入日志但未写入索引的记录，
+        截掉末尾不完整或校验失败的记录。
+        """
+        with open(self.log_path, "ab"):
+            pass
+        log_size = os.path.getsize(self.log_path)
+        entries = b""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                entries = f.read()
+        indexed = len(entries) // INDEX_ENTRY.size
+
+        # 索引项必须首尾相接且不超出日志文件；遇到不一致的项即从该处起重新扫描日志
+        offset = 0
+        for entry_offset, length, timestamp in INDEX_ENTRY.iter_unpack(entries[:indexed * INDEX_ENTRY.size]):
+            end = entry_offset + RECORD_HEADER.size + length
+            if entry_offset != offset or end > log_size:
+                break
+            if not self.offsets:
+                self.first_timestamp = timestamp
+            self.offsets.append(entry_offset)
+            self.last_timestamp = timestamp
+            offset = end
+
+        rebuilt = []
+        with open(self.log_path, "rb") as f:
+            # 最后一条已索引的记录也可能只写了一半，校验后再信任
+            if self.offsets and not self._valid_at(f, self.offsets[-1], self.last_seq):
+                offset = self.offsets.pop()
+            f.seek(offset)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                seq, timestamp, length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if seq != self.first_seq + len(self.offsets) or len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                if not self.offsets:
+                    self.first_timestamp = timestamp
+                self.offsets.append(offset)
+                self.last_timestamp = timestamp
+                rebuilt.append(INDEX_ENTRY.pack(offset, length, timestamp))
+                offset += RECORD_HEADER.size + length
+
+        self.size = offset
+        if offset != log_size:
+            logging.warning(f"日志分段 {self.log_path} 末尾有 {log_size - offset} 字节不完整的数据，已截断。")
+            with open(self.log_path, "r+b") as f:
+                f.truncate(offset)
+        kept = (len(self.offsets) - len(rebuilt)) * INDEX_ENTRY.size
+        if rebuilt or kept != len(entries):
+            with open(self.index_path, "r+b" if os.path.exists(self.index_path) else "wb") as f:
+                f.truncate(kept)
+                f.seek(kept)
+                f.write(b"".join(rebuilt))
+        if rebuilt:
+            logging.info(f"从日志分段 {self.log_path} 恢复了 {len(rebuilt)} 条未索引的记录。")
+
+    def _valid_at(self, f, offset: int, expected_seq: int) -> bool:
+        f.seek(offset)
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return False
+        seq, _, length, crc = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        return seq == expected_seq and len(payload) == length and zlib.crc32(payload) == crc
+
+    def append(self, seq: int, payload: bytes, timestamp: float, fsync: bool) -> None:
+        if self._log_file is None:
+            self._log_file = open(self.log_path, "ab")
+            self._index_file = open(self.index_path, "ab")
+        header = RECORD_HEADER.pack(seq, timestamp, len(payload), zlib.crc32(payload))
+        self._log_file.write(header)
+        self._log_file.write(payload)
+        self._log_file.flush()
+        self._index_file.write(INDEX_ENTRY.pack(self.size, len(payload), timestamp))
+        self._index_file.flush()
+        if fsync:
+            os.fsync(self._log_file.fileno())
+            os.fsync(self._index_file.fileno())
+        if not self.offsets:
+            self.first_timestamp = timestamp
+        self.offsets.append(self.size)
+        self.last_timestamp = timestamp
+        self.size += len(header) + len(payload)
+
+    def read(self, seq: int) -> bytes:
+        offset = self.offsets[seq - self.first_seq]
+        if self._map is None or len(self._map) < self.size:
+            self._unmap()
+            with open(self.log_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+        _, _, length, _ = RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + RECORD_HEADER.size
+        return self._map[start:start + length]
+
+    def seal(self) -> None:
+        """不再追加写入：关闭写文件句柄。"""
+        for f in (self._log_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._log_file = self._index_file = None
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self) -> None:
+        self.seal()
+        self._unmap()
+
+    def delete(self) -> None:
+        self.close()
+        for path in (self.log_path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class CaptureJournal:
+    """
+    只追加的采集消息日志。每条广播消息分配一个单调递增的序号 (seq) 并写入分段日志，
+    断线重连或迟到的客户端可以从指定 seq 开始补收错过的消息。
+    总大小和最旧记录的存活时间都有上限，超出时整段删除最旧的分段：每次写入都会检查，
+    没有新消息时由 expire() 定期检查。当前写入段跨越的时间超过存活时间时提前换段，使旧记录能够按时删除。
+
+    seq 由 reserve() 在事件循环线程中分配；append()/read() 会访问磁盘，
+    应在同一个单线程执行器中调用，以保证读取能看到之前提交的全部写入。
+    """
+    def __init__(self, directory: str = "journal", segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age_hours: float = DEFAULT_MAX_AGE_HOURS,
+                 fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_hours * 3600
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._segments: List[_Segment] = []
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(name)
+            if ext == ".log" and stem.isdigit():
+                segment = _Segment(directory, int(stem))
+                segment.load()
+                self._segments.append(segment)
+        # 崩溃后可能留下空分段；保留最后一个作为当前写入段
+        for segment in self._segments[:-1]:
+            if not segment.offsets:
+                segment.delete()
+        self._segments = [s for s in self._segments[:-1] if s.offsets] + self._segments[-1:]
+        # 最后一个分段可能是 expire() 留下的空段，其文件名记录了下一个 seq
+        self.next_seq = self._segments[-1].last_seq + 1 if self._segments else 1
+        self._apply_retention(time.time())
+        logging.info(f"消息日志已打开: {directory} (seq {self.first_seq}-{self.last_seq})")
+
+    @property
+    def first_seq(self) -> int:
+        """最旧的可读记录的 seq；日志为空时为 0。"""
+        for segment in self._segments:
+            if segment.offsets:
+                return segment.first_seq
+        return 0
+
+    @property
+    def last_seq(self) -> int:
+        """最新的已写入记录的 seq；日志为空时为 0。"""
+        for segment in reversed(self._segments):
+            if segment.offsets:
+                return segment.last_seq
+        return 0
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(segment.size for segment in self._segments)
+
+    def reserve(self) -> int:
+        """为下一条消息分配 seq (只操作内存)。"""
+        seq = self.next_seq
+        self.next_seq += 1
+        return seq
+
+    def append(self, seq: int, text: str, timestamp: Optional[float] = None) -> None:
+        """写入一条记录。seq 不连续 (例如之前的写入失败) 时另起一个分段。"""
+        payload = text.encode("utf-8")
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            active = self._segments[-1] if self._segments else None
+            if active is None or (active.offsets and (active.last_seq + 1 != seq or active.size >= self.segment_bytes
+                                                      or timestamp - active.first_timestamp > self.max_age_s)) \
+                    or (not active.offsets and active.first_seq != seq):
+                active = self._roll(seq)
+            active.append(seq, payload, timestamp, self.fsync)
+            self._apply_retention(timestamp)
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """
+        按保留策略删除旧分段，供没有新消息写入时定期调用。当前写入段的记录全部过期时先换段，
+        之后的写入从空段继续，seq 不会重复。
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            active = self._segments[-1] if self._segments else None
+            if active is not None and active.offsets and now - active.last_timestamp > self.max_age_s:
+                self._roll(active.last_seq + 1)
+            self._apply_retention(now)
+
+    def read(self, from_seq: int, limit: int = 64, max_bytes: int = 16 * 1024 * 1024,
+             until_seq: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        读取 seq >= from_seq 的记录，最多 limit 条或约 max_bytes 字节 (至少一条)。
+        已因保留策略被删除的 seq 直接跳过。
+        """
+        records = []
+        total = 0
+        with self._lock:
+            for segment in self._segments:
+                if not segment.offsets or segment.last_seq < from_seq:
+                    continue
+                seq = max(from_seq, segment.first_seq)
+                while seq <= segment.last_seq and (until_seq is None or seq <= until_seq):
+                    payload = segment.read(seq)
+                    records.append((seq, payload.decode("utf-8")))
+                    total += len(payload)
+                    if len(records) >= limit or total >= max_bytes:
+                        return records
+                    seq += 1
+        return records
+
+    def _roll(self, first_seq: int) -> _Segment:
+        if self._segments:
+            active = self._segments[-1]
+            if active.offsets:
+                active.seal()
+            else:
+                active.delete()
+                self._segments.pop()
+        segment = _Segment(self.directory, first_seq)
+        segment.load()
+        self._segments.append(segment)
+        return segment
+
+    def _apply_retention(self, now: float) -> None:
+        # 当前写入段永远保留
+        while len(self._segments) > 1:
+            oldest = self._segments[0]
+            if self.size_bytes > self.max_bytes or now - oldest.last_timestamp > self.max_age_s:
+                logging.info(f"删除过期的日志分段 {oldest.log_path} (seq {oldest.first_seq}-{oldest.last_seq})")
+                oldest.delete()
+                self._segments.pop(0)
+            else:
+                break
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+
+
+def open_journal(config: Optional[Dict[str, Any]]) -> Optional[CaptureJournal]:
+    """
+    按 server.journal 配置打开消息日志；未配置或 enabled 为 false 时返回 None。
+    """
+    if not config or not config.get("enabled", True):
+        return None
+    options = {key: value for key, value in config.items() if key != "enabled"}
+    return CaptureJournal(**options)
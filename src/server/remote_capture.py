@@ -0,0 +1,173 @@
+# src/server/remote_capture.py
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.capture.text_selection import get_selected_text
+from src.config_schema import IMAGE_FORMATS
+from src.server.rpc import RpcError
+
+TARGETS = ("region", "monitor", "selection")
+# 单次请求允许的最大区域 (像素)，防止误传的参数让服务抓取并编码一张巨大的图像
+MAX_REGION_PIXELS = 16384 * 16384
+
+
+class RemoteCaptureError(RpcError):
+    """
+    远程截图请求被拒绝或执行失败。code 供客户端程序判断是否重试:
+    invalid (参数错误)、rate_limited (附 retry_after 秒数)、busy、timeout、failed。
+    """
+    def __init__(self, code: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(code, message, **({"retry_after": retry_after} if retry_after is not None else {}))
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶限流：平均每秒 rate 次，允许最多 burst 次的突发。"""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """取一个令牌，成功返回 0，否则返回需要等待的秒数。"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def _int_field(data: Dict[str, Any], key: str, minimum: int) -> int:
+    value = data.get(key)
+    if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+        raise RemoteCaptureError("invalid", f"{key} 必须是不小于 {minimum} 的整数")
+    return value
+
+
+class RemoteCapture:
+    """
+    执行客户端通过 WebSocket 发起的采集请求：截取指定区域、截取整个显示器或读取当前选中的文本。
+    截图不显示遮罩和预览，直接通过 DirectCapture (与快捷键共用的 mss 工作线程) 抓取。
+
+    同一时刻只执行一个远程请求，其余请求在有界队列中等待，因此快捷键触发的截图
+    最多只需等待一次正在进行的远程抓取；每个客户端另有令牌桶限流和排队数上限。
+    只在 WebSocket 服务器的事件循环线程中调用。
+    """
+    def __init__(self, direct_capture, read_selection=get_selected_text, rate: float = 5.0, burst: int = 10,
+                 max_queue: int = 8, max_per_client: int = 4, timeout: float = 10.0):
+        self.direct_capture = direct_capture
+        self.read_selection = read_selection
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.timeout = timeout
+        self._buckets: Dict[Any, TokenBucket] = {}
+        self._pending: Dict[Any, int] = {}
+        self._lock = asyncio.Lock()
+        # 读取选区会访问剪贴板或无障碍接口，放在独立线程中，不占用截图工作线程
+        self._selection_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="RemoteSelection")
+
+    def update(self, config: Optional[Dict[str, Any]]):
+        """热重载时更新限流与排队参数，已有的令牌桶按新速率重新开始。"""
+        config = {key: value for key, value in (config or {}).items() if key != "enabled"}
+        for key in ("rate", "burst", "max_queue", "max_per_client", "timeout"):
+            if key in config:
+                setattr(self, key, config[key])
+        self._buckets.clear()
+
+    def forget(self, client):
+        """客户端断开时释放其限流状态。"""
+        self._buckets.pop(client, None)
+
+    @property
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    def _admit(self, client):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait:
+            raise RemoteCaptureError("rate_limited", "请求过于频繁", retry_after=round(wait, 3))
+        if self._pending.get(client, 0) >= self.max_per_client:
+            raise RemoteCaptureError("busy", f"该连接已有 {self.max_per_client} 个请求在排队")
+        if self.pending >= self.max_queue:
+            raise RemoteCaptureError("busy", "截图请求队列已满")
+
+    @staticmethod
+    def _parse(request: Dict[str, Any]):
+        target = request.get("target", "region")
+        if target not in TARGETS:
+            raise RemoteCaptureError("invalid", f"target 必须是 {', '.join(TARGETS)} 之一")
+        profile = {"name": "remote", "format": request.get("format", "png"), "quality": request.get("quality", 90),
+                   "ocr": bool(request.get("ocr", False))}
+        if profile["format"] not in IMAGE_FORMATS:
+            raise RemoteCaptureError("invalid", f"format 必须是 {', '.join(IMAGE_FORMATS)} 之一")
+        if not isinstance(profile["quality"], int) or not 1 <= profile["quality"] <= 100:
+            raise RemoteCaptureError("invalid", "quality 必须在 1-100 之间")
+
+        region = None
+        if target == "region":
+            data = request.get("region")
+            if not isinstance(data, dict):
+                raise RemoteCaptureError("invalid", "region 必须是 {x, y, width, height}")
+            region = {"x": _int_field(data, "x", -2 ** 31), "y": _int_field(data, "y", -2 ** 31),
+                      "width": _int_field(data, "width", 1), "height": _int_field(data, "height", 1)}
+            if region["width"] * region["height"] > MAX_REGION_PIXELS:
+                raise RemoteCaptureError("invalid", "region 过大")
+        elif target == "monitor":
+            profile["monitor"] = _int_field({"monitor": request.get("monitor", 1)}, "monitor", 0)
+        return target, region, profile
+
+    async def handle(self, client, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行一个请求并返回采集到的消息 (图像或文本)，被拒绝或失败时抛出 RemoteCaptureError。
+        """
+        target, region, profile = self._parse(request)
+        self._admit(client)
+        self._pending[client] = self._pending.get(client, 0) + 1
+        try:
+            return await asyncio.wait_for(self._run(target, region, profile), self.timeout)
+        except asyncio.TimeoutError:
+            raise RemoteCaptureError("timeout", f"请求在 {self.timeout} 秒内未完成")
+        finally:
+            self._pending[client] -= 1
+            if not self._pending[client]:
+                del self._pending[client]
+
+    async def _run(self, target: str, region, profile) -> Dict[str, Any]:
+        async with self._lock:
+            try:
+                if target == "selection":
+                    loop = asyncio.get_running_loop()
+                    message = await loop.run_in_executor(self._selection_executor, self.read_selection)
+                    if not message or not message.get("data", "").strip():
+                        raise RemoteCaptureError("failed", "当前没有选中的文本")
+                    return message
+                return await asyncio.wrap_future(self.direct_capture.submit(region, profile, deliver=False))
+            except RemoteCaptureError:
+                raise
+            except Exception as e:
+                logging.error(f"远程采集请求失败: {e}", exc_info=True)
+                raise RemoteCaptureError("failed", f"采集失败: {e}")
+
+    def close(self):
+        self._selection_executor.shutdown(wait=False)
+
+
+def open_remote_capture(config: Optional[Dict[str, Any]], direct_capture) -> Optional[RemoteCapture]:
+    """
+    按 server.remote_capture 配置创建远程采集服务；未配置或 enabled 为 false 时返回 None。
+    """
+    if not config or not config.get("enabled", True):
+        return None
+    options = {key: value for key, value in config.items() if key != "enabled"}
+    return RemoteCapture(direct_capture, **options)
@@ -0,0 +1,200 @@
+# src/server/rpc.py
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from websockets.exceptions import ConnectionClosed
+
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_TIMEOUT = 30.0
+
+_DEFAULT = object()
+
+
+class RpcError(Exception):
+    """
+    请求被拒绝或执行失败，回复给客户端 {"type": "error", "code": ..., "error": ...}。
+    code: invalid (参数错误)、unknown_action、busy、timeout、failed 等；details 会并入回复。
+    """
+    def __init__(self, code: str, message: str, **details: Any):
+        super().__init__(message)
+        self.code = code
+        self.details = details
+
+
+class Param:
+    """请求参数的约束：类型、是否必填，以及可选的取值检查。"""
+    def __init__(self, kinds, required: bool = False, check: Optional[Callable[[Any], bool]] = None,
+                 hint: str = ""):
+        self.kinds = kinds if isinstance(kinds, tuple) else (kinds,)
+        self.required = required
+        self.check = check
+        self.hint = hint
+
+    def validate(self, name: str, request: Dict[str, Any]) -> Optional[str]:
+        if request.get(name) is None:
+            return f"{name}: 缺少必填参数" if self.required else None
+        value = request[name]
+        # bool 是 int 的子类，数值参数不接受 true/false
+        if not isinstance(value, self.kinds) or (isinstance(value, bool) and bool not in self.kinds):
+            return f"{name}: 类型错误 ({type(value).__name__})，{self.hint or '取值无效'}"
+        if self.check is not None and not self.check(value):
+            return f"{name}: {self.hint or '取值无效'} (当前为 {value!r})"
+        return None
+
+
+class RpcCall:
+    """一次请求：发起的客户端、action 名称以及原始请求字典。"""
+    __slots__ = ("client", "action", "request", "reply_base")
+
+    def __init__(self, client, action: str, request: Dict[str, Any]):
+        self.client = client
+        self.action = action
+        self.request = request
+        # 每条回复都带上 action 与 request_id，客户端据此对应请求
+        self.reply_base = {"action": action}
+        if "request_id" in request:
+            self.reply_base["request_id"] = request["request_id"]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.request.get(key, default)
+
+
+class _Method:
+    __slots__ = ("handler", "schema", "timeout", "ordered")
+
+    def __init__(self, handler, schema, timeout, ordered):
+        self.handler = handler
+        self.schema = schema
+        self.timeout = timeout
+        self.ordered = ordered
+
+
+class RpcRouter:
+    """
+    WebSocket 上的请求/响应层。客户端发送 {"action": 名称, "request_id": ..., ...参数}，
+    服务器按 action 找到注册的处理函数，校验参数后执行，回复中带回 action 与 request_id。
+
+    处理函数 handler(call) 返回字典时由路由器作为回复发送；返回 None 表示已自行回复
+    (如大图像或分页推送)；抛出 RpcError 时回复错误。
+    默认每个请求在独立任务中执行，同一连接上的请求可以并发，回复按完成顺序到达；
+    每个连接同时执行的请求数有上限，超出时立即回复 busy。ordered 的方法在读取循环中
+    直接执行，保证在其后收到的请求和推送之前生效 (如 subscribe)。
+    只在 WebSocket 服务器的事件循环线程中使用。
+    """
+    def __init__(self, send: Callable[[Any, Dict[str, Any]], Awaitable[None]],
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, timeout: float = DEFAULT_TIMEOUT):
+        self.send = send
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.requests = 0
+        self.errors = 0
+        self._methods: Dict[str, _Method] = {}
+        self._tasks: Dict[Any, Set[asyncio.Task]] = {}
+
+    def register(self, action: str, handler, schema: Optional[Dict[str, Param]] = None,
+                 timeout: Any = _DEFAULT, ordered: bool = False) -> None:
+        """
+        注册处理函数。timeout 为 None 表示不限时 (流式推送等长时间请求)，省略时使用默认超时。
+        """
+        self._methods[action] = _Method(handler, schema or {}, timeout, ordered)
+
+    @property
+    def actions(self):
+        return sorted(self._methods)
+
+    def in_flight(self, client=None) -> int:
+        if client is not None:
+            return len(self._tasks.get(client, ()))
+        return sum(len(tasks) for tasks in self._tasks.values())
+
+    def update(self, config: Optional[Dict[str, Any]]):
+        """热重载时更新并发上限和默认超时，已在执行的请求不受影响。"""
+        config = config or {}
+        self.max_in_flight = config.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT)
+        self.timeout = config.get("timeout", DEFAULT_TIMEOUT)
+
+    async def dispatch(self, client, raw) -> None:
+        """处理客户端发来的一帧原始数据。"""
+        try:
+            request = json.loads(raw)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            await self.send_error(client, RpcError("invalid", "请求必须是 JSON 对象"))
+            return
+        await self.handle(client, request)
+
+    async def handle(self, client, request: Dict[str, Any]) -> None:
+        """处理一个已解析的请求。"""
+        self.requests += 1
+        call = RpcCall(client, request.get("action"), request)
+        if call.action is not None and not isinstance(call.action, str):
+            await self._send_error(call, RpcError("invalid", "action 必须是字符串"))
+            return
+        method = self._methods.get(call.action)
+        if method is None:
+            await self._send_error(call, RpcError("unknown_action", f"未知的 action: {call.action}"))
+            return
+        errors = [error for error in (param.validate(name, request) for name, param in method.schema.items())
+                  if error]
+        if errors:
+            await self._send_error(call, RpcError("invalid", "; ".join(errors)))
+            return
+
+        if method.ordered:
+            await self._invoke(call, method)
+            return
+        tasks = self._tasks.setdefault(client, set())
+        if len(tasks) >= self.max_in_flight:
+            await self._send_error(call, RpcError("busy", f"该连接已有 {self.max_in_flight} 个请求在执行"))
+            return
+        task = asyncio.create_task(self._invoke(call, method))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _invoke(self, call: RpcCall, method: _Method) -> None:
+        timeout = self.timeout if method.timeout is _DEFAULT else method.timeout
+        try:
+            if timeout is None:
+                result = await method.handler(call)
+            else:
+                result = await asyncio.wait_for(method.handler(call), timeout)
+        except RpcError as e:
+            await self._send_error(call, e)
+        except asyncio.TimeoutError:
+            await self._send_error(call, RpcError("timeout", f"请求在 {timeout} 秒内未完成"))
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logging.error(f"处理请求 {call.action} 时发生错误: {e}", exc_info=True)
+            await self._send_error(call, RpcError("failed", "服务器内部错误"))
+        else:
+            if result is not None:
+                await self.send(call.client, {**result, **call.reply_base})
+
+    @staticmethod
+    def error_reply(error: RpcError, **base: Any) -> Dict[str, Any]:
+        """错误回复 {"type": "error", ...base, "code": ..., "error": ...}；base 为 action、request_id 等。"""
+        return {"type": "error", **base, "code": error.code, "error": str(error), **error.details}
+
+    async def send_error(self, client, error: RpcError, **base: Any) -> None:
+        """向客户端回复一个错误并计数，也用于不经过 handle() 的请求 (如连接 URL 中的参数)。"""
+        self.errors += 1
+        await self.send(client, self.error_reply(error, **base))
+
+    async def _send_error(self, call: RpcCall, error: RpcError) -> None:
+        await self.send_error(call.client, error, **call.reply_base)
+
+    def forget(self, client) -> None:
+        """客户端断开时取消其尚未完成的请求。"""
+        for task in self._tasks.pop(client, ()):
+            task.cancel()
+
+    def close(self) -> None:
+        for client in list(self._tasks):
+            self.forget(client)
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors, "in_flight": self.in_flight()}
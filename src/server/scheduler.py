@@ -0,0 +1,285 @@
+# src/server/scheduler.py
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from websockets.exceptions import ConnectionClosed
+
+from src.config_schema import PRIORITY_CLASSES
+
+# 优先级从高到低：交互式的划词文本、截图、其余后台消息
+INTERACTIVE, CAPTURE, BULK = range(len(PRIORITY_CLASSES))
+
+DEFAULT_SCHEDULER_CONFIG: Dict[str, Any] = {
+    "classes": {"text": "interactive", "image": "capture"},
+    "default_class": "bulk",
+    "max_delay_ms": 2000,
+    "max_pending_bytes": 32 * 1024 * 1024,
+    "slow_client_timeout_ms": 10000,
+}
+
+# 每个优先级保留最近多少次发送的延迟，用于计算分位数
+_LATENCY_WINDOW = 2048
+
+
+class PriorityLanes:
+    """
+    按优先级分道的 FIFO 队列，不加锁。总是先取优先级最高的非空队列；
+    低优先级队首等待超过 max_delay 秒时先取它，持续的高优先级流量不会让后台消息无限期等待。
+    """
+    def __init__(self, max_delay: float = 2.0):
+        self.max_delay = max_delay
+        self._lanes: List[deque] = [deque() for _ in PRIORITY_CLASSES]
+
+    def push(self, priority: int, item: Any, enqueued_at: Optional[float] = None):
+        self._lanes[priority].append((item, time.monotonic() if enqueued_at is None else enqueued_at))
+
+    def push_front(self, priority: int, item: Any, enqueued_at: float):
+        """放回队首，用于分块发送中的消息：同一优先级的后续消息不会插到它的分块之间。"""
+        self._lanes[priority].appendleft((item, enqueued_at))
+
+    def pop(self) -> Tuple[int, Any, float]:
+        """返回 (优先级, 条目, 入队时间)；队列为空时抛出 IndexError。"""
+        now = time.monotonic()
+        chosen = None
+        for priority, lane in enumerate(self._lanes):
+            if not lane:
+                continue
+            if chosen is None:
+                chosen = priority
+            elif now - lane[0][1] > self.max_delay:
+                chosen = priority
+                break
+        if chosen is None:
+            raise IndexError("队列为空")
+        item, enqueued_at = self._lanes[chosen].popleft()
+        return chosen, item, enqueued_at
+
+    def depths(self) -> Dict[str, int]:
+        return {name: len(lane) for name, lane in zip(PRIORITY_CLASSES, self._lanes)}
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+
+class LatencyStats:
+    """各优先级从入队到发送完成的延迟 (每个客户端每条消息一个样本)。"""
+    def __init__(self):
+        self._samples = [deque(maxlen=_LATENCY_WINDOW) for _ in PRIORITY_CLASSES]
+        self._counts = [0] * len(PRIORITY_CLASSES)
+
+    def record(self, priority: int, seconds: float):
+        self._samples[priority].append(seconds * 1000)
+        self._counts[priority] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, samples, count in zip(PRIORITY_CLASSES, self._samples, self._counts):
+            ordered = sorted(samples)
+            entry: Dict[str, float] = {"sent": count}
+            if ordered:
+                entry.update(p50_ms=round(ordered[len(ordered) // 2], 2),
+                             p95_ms=round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                             max_ms=round(ordered[-1], 2))
+            result[name] = entry
+        return result
+
+
+class SchedulerPolicy:
+    """
+    根据 config.yaml 中 server.scheduler 的设置为消息分配优先级，并持有延迟统计。
+    classes 把消息类型映射到优先级名，未列出的类型使用 default_class。
+    """
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        merged = {**DEFAULT_SCHEDULER_CONFIG, **(config or {})}
+        classes = {**DEFAULT_SCHEDULER_CONFIG["classes"], **(merged.get("classes") or {})}
+        self.classes = {message_type: PRIORITY_CLASSES.index(name) for message_type, name in classes.items()}
+        self.default_priority = PRIORITY_CLASSES.index(merged["default_class"])
+        self.max_delay = merged["max_delay_ms"] / 1000
+        self.max_pending_bytes = int(merged["max_pending_bytes"])
+        self.slow_client_timeout = merged["slow_client_timeout_ms"] / 1000
+        self.latency = LatencyStats()
+        # 因积压超时被断开的慢客户端数
+        self.slow_clients_closed = 0
+
+    def classify(self, message: Optional[Dict[str, Any]]) -> int:
+        return self.classes.get((message or {}).get("type"), self.default_priority)
+
+
+class PriorityMessageQueue:
+    """
+    线程安全的待发布消息队列，取代单一 FIFO 的 queue.Queue：划词文本不会排在之前入队的截图后面。
+    get() 返回 (消息, 入队时间)；close() (或兼容旧用法的 put(None)) 之后返回 (None, 0)。
+    """
+    def __init__(self, policy: Optional[SchedulerPolicy] = None):
+        self.policy = policy or SchedulerPolicy()
+        self._lanes = PriorityLanes(self.policy.max_delay)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, message: Optional[Dict[str, Any]], enqueued_at: Optional[float] = None):
+        if message is None:
+            self.close()
+            return
+        with self._condition:
+            self._lanes.push(self.policy.classify(message), message, enqueued_at)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._closed or len(self._lanes), timeout):
+                return None, 0.0
+            if self._closed:
+                return None, 0.0
+            _, message, enqueued_at = self._lanes.pop()
+            return message, enqueued_at
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def qsize(self) -> int:
+        with self._condition:
+            return len(self._lanes)
+
+    def depths(self) -> Dict[str, int]:
+        with self._condition:
+            return self._lanes.depths()
+
+
+class _Chunked:
+    """一条正在分块发送的消息：JSON 文本按 chunk_size 切分，每块包装为 {"type": "chunk", ...} 单独发送。"""
+    def __init__(self, encoded, chunk_size: int):
+        self.encoded = encoded
+        self.chunk_size = chunk_size
+        self.chunk_id = uuid.uuid4().hex
+        self.count = -(-len(encoded.text) // chunk_size)
+        self.index = 0
+
+    def next_piece(self, policy) -> Any:
+        start = self.index * self.chunk_size
+        envelope = {"type": "chunk", "chunk_id": self.chunk_id, "index": self.index, "count": self.count,
+                    "message_type": self.encoded.message_type,
+                    "data": self.encoded.text[start:start + self.chunk_size]}
+        self.index += 1
+        # 是否 deflate 仍按原消息的类型决定 (图像的 Base64 分块不压缩)
+        return policy.encode({"type": self.encoded.message_type}, json.dumps(envelope))
+
+    @property
+    def done(self) -> bool:
+        return self.index >= self.count
+
+
+class ClientOutbox:
+    """
+    单个客户端的发送队列与发送任务，只在事件循环线程中使用。
+
+    消息按优先级排队，由独立的任务逐条发送。发布用的 push() 从不等待，慢客户端不会拖住发布流程：
+    积压超过 max_pending_bytes 后 slow_client_timeout 秒内仍未降下来，连接即被关闭 (1013)。
+    单个客户端的回复 (fetch、补发等) 用 put()，积压过多时等待。客户端订阅时给出 chunk_size 后，超过该大小的消息拆成多个 chunk 消息发送，
+    每发送一块都重新挑选优先级最高的条目，因此划词文本可以插在一张大截图的分块之间送达。
+    """
+    def __init__(self, websocket, compression: Callable[[], Any], policy: SchedulerPolicy, chunk_size: int = 0):
+        self.websocket = websocket
+        # 返回当前压缩策略的函数：热重载会替换服务器的 CompressionPolicy
+        self._compression = compression
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.pending_bytes = 0
+        self.chunks_sent = 0
+        self._lanes = PriorityLanes(policy.max_delay)
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        # 队列为空且没有正在发送的消息时置位，join() 据此等待已入队的消息全部发出
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+        self._watchdog: Optional[asyncio.Future] = None
+        self._task = asyncio.ensure_future(self._run())
+
+    async def put(self, priority: int, encoded, enqueued_at: Optional[float] = None):
+        while self.pending_bytes > self.policy.max_pending_bytes and not self._closed:
+            self._drained.clear()
+            await self._drained.wait()
+        self.push(priority, encoded, enqueued_at)
+
+    def push(self, priority: int, encoded, enqueued_at: Optional[float] = None):
+        """不等待地入队；积压超过上限时开始计时，超时仍未发出足够的数据就断开该客户端。"""
+        if self._closed:
+            return
+        self._lanes.push(priority, encoded, enqueued_at)
+        self.pending_bytes += len(encoded.text)
+        self._idle.clear()
+        self._wakeup.set()
+        if self.pending_bytes > self.policy.max_pending_bytes:
+            self._drained.clear()
+            if self._watchdog is None:
+                self._watchdog = asyncio.ensure_future(self._close_if_stalled())
+
+    async def _close_if_stalled(self):
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.policy.slow_client_timeout)
+        except asyncio.TimeoutError:
+            if self._closed:
+                return
+            logging.warning(f"客户端 {getattr(self.websocket, 'remote_address', None)} 积压 {self.pending_bytes} 字节"
+                            f"超过 {self.policy.slow_client_timeout} 秒，断开连接")
+            self.policy.slow_clients_closed += 1
+            self.close()
+            await self.websocket.close(1013, "客户端接收过慢")
+        finally:
+            self._watchdog = None
+
+    async def join(self):
+        """等待已入队的消息 (包括正在分块发送的) 全部发出；发送队列关闭时立即返回。"""
+        await self._idle.wait()
+
+    async def _run(self):
+        while not self._closed:
+            if not self._lanes:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            priority, item, enqueued_at = self._lanes.pop()
+            if not isinstance(item, _Chunked) and self.chunk_size and len(item.text) > self.chunk_size:
+                item = _Chunked(item, self.chunk_size)
+            encoded = item.encoded if isinstance(item, _Chunked) else item
+            compression = self._compression()
+            try:
+                if isinstance(item, _Chunked):
+                    await compression.send(self.websocket, item.next_piece(compression))
+                    self.chunks_sent += 1
+                    if not item.done:
+                        self._lanes.push_front(priority, item, enqueued_at)
+                        continue
+                else:
+                    await compression.send(self.websocket, encoded)
+                self.policy.latency.record(priority, time.monotonic() - enqueued_at)
+            except ConnectionClosed:
+                self.close()
+                return
+            except Exception as e:
+                logging.error(f"向客户端发送消息失败: {e}", exc_info=True)
+            self.pending_bytes -= len(encoded.text)
+            if self.pending_bytes <= self.policy.max_pending_bytes:
+                self._drained.set()
+
+    def depths(self) -> Dict[str, int]:
+        return self._lanes.depths()
+
+    def close(self):
+        """丢弃未发送的消息并结束发送任务；等待中的 put() 随即返回。"""
+        self._closed = True
+        self._drained.set()
+        self._idle.set()
+        self._wakeup.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
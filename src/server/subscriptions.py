@@ -0,0 +1,175 @@
+# src/server/subscriptions.py
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from src.server.imaging import make_thumbnail
+
+# 服务器已知的消息类型；"ocr" 为后续功能预留
+MESSAGE_TYPES = ("text", "image", "ocr")
+
+DEFAULT_THUMBNAIL_SIZE = 256
+MIN_THUMBNAIL_SIZE, MAX_THUMBNAIL_SIZE = 16, 1024
+
+FULL = "full"
+
+# 分块接收时的分块大小下限 (字符)；更小的分块只会增加帧头与 JSON 包装的开销
+MIN_CHUNK_SIZE = 4096
+
+
+def _string_list(value: Any, name: str) -> Optional[list]:
+    """单个字符串或字符串列表统一为列表，其他类型抛出 ValueError。"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} 必须是字符串或字符串列表")
+    return list(value)
+
+
+class Subscription:
+    """
+    单个客户端的订阅条件：关心的消息类型以及附加的过滤规则。
+    默认订阅全部类型且不过滤，与旧客户端的行为保持一致。
+    """
+    def __init__(self, types: Optional[Iterable[str]] = None, source_apps: Optional[Iterable[str]] = None,
+                 min_text_length: int = 0, thumbnail_only: bool = False,
+                 thumbnail_size: int = DEFAULT_THUMBNAIL_SIZE, progressive: bool = False,
+                 sessions: Optional[Iterable[str]] = None, chunk_size: int = 0):
+        self.types = frozenset(types) if types is not None else None
+        self.source_apps = frozenset(app.lower() for app in source_apps) if source_apps else None
+        self.min_text_length = min_text_length
+        self.thumbnail_only = thumbnail_only
+        self.thumbnail_size = thumbnail_size
+        self.progressive = progressive
+        # 多会话部署时只接收这些会话 (metadata.session_id) 的消息
+        self.sessions = frozenset(sessions) if sessions else None
+        # 大于 0 时，超过该长度的消息拆成 {"type": "chunk", ...} 分块发送 (见 src/server/scheduler.py)
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_request(cls, payload: Dict[str, Any]) -> "Subscription":
+        """
+        根据客户端的 subscribe 请求构造订阅，参数非法时抛出 ValueError。
+        """
+        types = _string_list(payload.get("types"), "types")
+        if types is not None:
+            unknown = set(types) - set(MESSAGE_TYPES)
+            if unknown:
+                raise ValueError(f"未知的消息类型: {sorted(unknown)}")
+
+        filters = payload.get("filters") or {}
+        if not isinstance(filters, dict):
+            raise ValueError("filters 必须是 JSON 对象")
+        source_apps = _string_list(filters.get("source_app"), "source_app")
+        sessions = _string_list(filters.get("session"), "session")
+        try:
+            min_text_length = int(filters.get("min_text_length", 0))
+            thumbnail_size = int(filters.get("thumbnail_size", DEFAULT_THUMBNAIL_SIZE))
+            chunk_size = int(filters.get("chunk_size") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("min_text_length、thumbnail_size 和 chunk_size 必须是整数")
+        if min_text_length < 0:
+            raise ValueError("min_text_length 不能为负数")
+        if not MIN_THUMBNAIL_SIZE <= thumbnail_size <= MAX_THUMBNAIL_SIZE:
+            raise ValueError(f"thumbnail_size 必须在 {MIN_THUMBNAIL_SIZE}-{MAX_THUMBNAIL_SIZE} 之间")
+        if chunk_size and chunk_size < MIN_CHUNK_SIZE:
+            raise ValueError(f"chunk_size 为 0 (不分块) 或不小于 {MIN_CHUNK_SIZE}")
+
+        return cls(types=types, source_apps=source_apps, min_text_length=min_text_length,
+                   thumbnail_only=bool(filters.get("thumbnail_only", False)),
+                   thumbnail_size=thumbnail_size,
+                   progressive=bool(filters.get("progressive", False)),
+                   sessions=sessions, chunk_size=chunk_size)
+
+    @classmethod
+    def from_path(cls, path: Optional[str]) -> "Subscription":
+        """
+        从连接 URL 的查询参数构造订阅，例如
+        ws://127.0.0.1:8765/?types=text&source_app=WINWORD.EXE&min_text_length=3
+        """
+        query = parse_qs(urlsplit(path or "").query)
+        if not query:
+            return cls()
+
+        def first(key, default=None):
+            return query[key][0] if key in query else default
+
+        def flag(key):
+            return first(key, "0").lower() in ("1", "true", "yes")
+
+        def split(key):
+            if key not in query:
+                return None
+            return [item for value in query[key] for item in value.split(",") if item]
+
+        return cls.from_request({
+            "types": split("types"),
+            "filters": {
+                "source_app": split("source_app"),
+                "session": split("session"),
+                "min_text_length": first("min_text_length", 0),
+                "thumbnail_only": flag("thumbnail_only"),
+                "thumbnail_size": first("thumbnail_size", DEFAULT_THUMBNAIL_SIZE),
+                "progressive": flag("progressive"),
+                "chunk_size": first("chunk_size", 0),
+            },
+        })
+
+    def variants(self, message: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        判断消息是否发送给该客户端，按推送顺序返回需要的消息变体 (FULL 或缩略图变体)；
+        不发送时返回空元组。渐进模式下图像先推送缩略图，再推送完整图像。
+        """
+        message_type = message.get("type")
+        if self.types is not None and message_type not in self.types:
+            return ()
+        if self.sessions is not None and message.get("metadata", {}).get("session_id") not in self.sessions:
+            return ()
+        if message_type == "text":
+            if self.source_apps is not None:
+                app = str(message.get("metadata", {}).get("source_app_name", "")).lower()
+                if app not in self.source_apps:
+                    return ()
+            if self.min_text_length and len(message.get("data", "").strip()) < self.min_text_length:
+                return ()
+        elif message_type == "image":
+            thumbnail = thumbnail_variant(self.thumbnail_size)
+            if self.thumbnail_only:
+                return (thumbnail,)
+            if self.progressive:
+                return (thumbnail, FULL)
+        return (FULL,)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "types": sorted(self.types) if self.types is not None else list(MESSAGE_TYPES),
+            "filters": {
+                "source_app": sorted(self.source_apps) if self.source_apps else None,
+                "min_text_length": self.min_text_length,
+                "thumbnail_only": self.thumbnail_only,
+                "thumbnail_size": self.thumbnail_size,
+                "progressive": self.progressive,
+                "session": sorted(self.sessions) if self.sessions else None,
+                "chunk_size": self.chunk_size,
+            },
+        }
+
+
+def thumbnail_variant(max_size: int) -> str:
+    return f"thumbnail:{max_size}"
+
+
+def thumbnail_size_of(variant: str) -> Optional[int]:
+    """缩略图变体对应的最长边尺寸；FULL 返回 None。"""
+    if variant == FULL:
+        return None
+    return int(variant.split(":")[1])
+
+
+def build_variant(message: Dict[str, Any], variant: str) -> Dict[str, Any]:
+    """
+    生成消息的指定变体。FULL 原样返回；"thumbnail:<N>" 将图像缩放到最长边不超过 N 像素。
+    该函数可能涉及图像解码，应在线程池中调用。
+    """
+    size = thumbnail_size_of(variant)
+    return message if size is None else make_thumbnail(message, size)
@@ -0,0 +1,395 @@
+# src/server/text_pipeline.py
+"""
+划词文本的处理阶段，位于 SelectionListener 与 WebSocketServer.queue_message (代理模式下为上行连接) 之间。
+每个客户端不必再各自清理一遍 UIA/X11 取到的原始文本：
+
+- 规范化：统一换行与空白，去掉零宽字符，合并 PDF 中被连字符断开的单词 (复合词保留连字符)；段落内的硬换行在
+  拉丁文字之间换成空格、在汉字/假名之间直接去掉；汉字/假名与拉丁字母、数字之间留一个空格
+- 分句：metadata.sentences 给出每句在规范化文本中的 [起, 止) 偏移
+- 语言识别：metadata.language，按文字系统判断 (假名 ja、谚文 ko、汉字 zh、西里尔字母 ru ...)，
+  拉丁字母的文本按常用虚词在 en/fr/de/es 中选择，无法判断时为 "und"
+
+结果按文本的哈希缓存在有界 LRU 中，重复划选同一段文字不再重新处理。
+batch_window_ms 大于 0 时，同一应用在该时间窗内的连续划词合并为一条消息 (metadata.batch 列出各段)。
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config_schema import HYPHENATION_MODES
+
+DEFAULT_TEXT_PIPELINE_CONFIG: Dict[str, Any] = {
+    "enabled": True,
+    "cache_size": 1024,
+    "batch_window_ms": 0,
+    "max_batch": 16,
+    "cjk_latin_spacing": True,
+    "hyphenation": "auto",
+    "keep_raw": False,
+}
+
+
+# 汉字与假名：词之间不用空格分隔 (谚文用空格分词，不在此列)
+_HAN_KANA = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+# 另含中日韩标点与全角字符
+_CJK_NO_SPACE = _HAN_KANA + "\u3000-\u303f\uff00-\uffef"
+_LATIN = "A-Za-z\u00c0-\u024f"
+
+_ZERO_WIDTH_RE = re.compile("\u00ad\n|[\u00ad\u200b\u2060\ufeff]")
+_SPACES_RE = re.compile("[\t\v\f\u00a0\u1680\u2000-\u200a\u202f\u205f\u3000]")
+_PARAGRAPH_RE = re.compile(r"\n[ ]*\n\s*")
+# 行尾连字符前后的两段 (前一段可以本身含连字符，如 state-of-the-)
+_HYPHEN_BREAK_RE = re.compile(f"([{_LATIN}][{_LATIN}-]*(?<=[{_LATIN}]))-[ ]*\n[ ]*([a-z\u00df-\u00ff][{_LATIN}]*)")
+# 常作为复合词前半部分的独立单词：其后的行尾连字符通常是复合词本身的 (well-known、self-aware)
+# (pre-、non- 等前缀不在此列：pre-vious 这样的断词同样常见)
+_COMPOUND_HEADS = {"well", "self", "ill", "all", "half", "cross", "ever", "full", "high", "low", "long", "short",
+                   "best", "better", "first", "great", "open", "user", "world", "one", "two", "three"}
+# 断开位置之后是这些后缀时仍是普通的断词 (high-ly、self-ish)
+_SUFFIXES = {"ly", "ish", "ness", "er", "ers", "est", "ed", "es", "s", "ing", "ings", "less", "ful", "ward", "wards"}
+_CJK_BREAK_RE = re.compile(f"([{_CJK_NO_SPACE}])[ ]*(?:\n[ ]*)+(?=[{_CJK_NO_SPACE}])")
+_CJK_GAP_RE = re.compile(f"([{_CJK_NO_SPACE}])[ ]+(?=[{_CJK_NO_SPACE}])")
+_LINE_BREAK_RE = re.compile(r"[ ]*\n[ ]*")
+_MULTI_SPACE_RE = re.compile(r"[ ]{2,}")
+_CJK_THEN_LATIN_RE = re.compile(f"([{_HAN_KANA}])(?=[{_LATIN}0-9])")
+_LATIN_THEN_CJK_RE = re.compile(f"([{_LATIN}0-9])(?=[{_HAN_KANA}])")
+
+_CLOSERS = "”’\"'」』）)\\]】"
+# 中日文的句末标点后不需要空格；拉丁文字的句末标点后必须是空白或文本结尾
+_BOUNDARY_RE = re.compile(f"[。！？]+[{_CLOSERS}]*|…+[{_CLOSERS}]*|[.!?]+[{_CLOSERS}]*(?=\\s|$)|\n")
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "etc", "e.g", "i.e", "fig", "no",
+                  "vol", "inc", "ltd", "co", "cf", "al"}
+_WORD_BEFORE_RE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+
+# 语言识别只看开头的这么多字符，长文本的开销不随长度增长
+_DETECT_SAMPLE = 4096
+_SCRIPTS = {
+    "kana": re.compile("[\u3040-\u30ff]"),
+    "han": re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"),
+    "hangul": re.compile("[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]"),
+    "cyrillic": re.compile("[\u0400-\u04ff]"),
+    "greek": re.compile("[\u0370-\u03ff]"),
+    "arabic": re.compile("[\u0600-\u06ff]"),
+    "hebrew": re.compile("[\u0590-\u05ff]"),
+    "thai": re.compile("[\u0e00-\u0e7f]"),
+    "devanagari": re.compile("[\u0900-\u097f]"),
+    "latin": re.compile(f"[{_LATIN}]"),
+}
+# 以上除拉丁字母外的全部文字，纯拉丁文本只需一次扫描
+_NON_LATIN_RE = re.compile("[" + "".join(pattern.pattern[1:-1] for script, pattern in _SCRIPTS.items()
+                                         if script != "latin") + "]")
+_SCRIPT_LANGUAGES = {"hangul": "ko", "cyrillic": "ru", "greek": "el", "arabic": "ar", "hebrew": "he",
+                     "thai": "th", "devanagari": "hi"}
+_STOPWORDS = {
+    "en": {"the", "and", "of", "to", "is", "in", "that", "it", "for", "with", "as", "was", "on", "are", "this"},
+    "fr": {"le", "la", "les", "et", "des", "est", "une", "un", "du", "que", "dans", "pour", "pas", "sur", "au"},
+    "de": {"der", "die", "und", "das", "ist", "nicht", "ein", "eine", "zu", "den", "mit", "sich", "von", "auf"},
+    "es": {"el", "la", "los", "las", "y", "que", "es", "un", "una", "por", "para", "con", "del", "se", "no"},
+}
+_WORD_RE = re.compile(f"[{_LATIN}]+")
+
+
+def _is_split_word(before: str, after: str) -> bool:
+    """行尾连字符是否是排版断词：前一段已含连字符 (state-of-the-art) 或是常见的复合词前半部分时不是。"""
+    if "-" in before:
+        return False
+    return before.lower() not in _COMPOUND_HEADS or after.lower() in _SUFFIXES
+
+
+def _hyphen_break(match: "re.Match", hyphenation: str) -> str:
+    before, after = match.group(1), match.group(2)
+    if hyphenation == "join" or (hyphenation == "auto" and _is_split_word(before, after)):
+        return before + after
+    return f"{before}-{after}"
+
+
+def normalize_text(text: str, cjk_latin_spacing: bool = True, hyphenation: str = "auto") -> str:
+    """
+    规范化划词文本，段落之间保留一个换行。hyphenation 决定行尾连字符的处理 (HYPHENATION_MODES)：
+    auto 只合并看起来是被断开的单词，join 总是合并，keep 保留连字符、只去掉换行。
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _SPACES_RE.sub(" ", _ZERO_WIDTH_RE.sub("", text))
+    text = _HYPHEN_BREAK_RE.sub(lambda match: _hyphen_break(match, hyphenation), text)
+    paragraphs = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = _CJK_BREAK_RE.sub(r"\1", paragraph)
+        paragraph = _LINE_BREAK_RE.sub(" ", paragraph)
+        paragraph = _CJK_GAP_RE.sub(r"\1", paragraph)
+        if cjk_latin_spacing:
+            paragraph = _LATIN_THEN_CJK_RE.sub(r"\1 ", _CJK_THEN_LATIN_RE.sub(r"\1 ", paragraph))
+        paragraph = _MULTI_SPACE_RE.sub(" ", paragraph).strip()
+        if paragraph:
+            paragraphs.append(paragraph)
+    return "\n".join(paragraphs)
+
+
+def _is_abbreviation(text: str, start: int) -> bool:
+    """start 处的句点是否属于缩写 (Dr.、e.g.) 或姓名首字母 (J. Smith)。"""
+    word = _WORD_BEFORE_RE.search(text, max(0, start - 12), start)
+    if word is None:
+        return False
+    word = word.group(1)
+    return word.lower().rstrip(".") in _ABBREVIATIONS or (len(word) == 1 and word.isupper())
+
+
+def _append_span(spans: List[List[int]], text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        spans.append([start, end])
+
+
+def split_sentences(text: str) -> List[List[int]]:
+    """按句末标点与换行切分，返回各句的 [起, 止) 偏移，不含句间空白。"""
+    spans: List[List[int]] = []
+    start = 0
+    for match in _BOUNDARY_RE.finditer(text):
+        if match.group().startswith(".") and _is_abbreviation(text, match.start()):
+            continue
+        _append_span(spans, text, start, match.end())
+        start = match.end()
+    _append_span(spans, text, start, len(text))
+    return spans
+
+
+def detect_language(text: str) -> str:
+    """按文字系统 (及拉丁文字的常用虚词) 推断语言代码，无法判断时返回 "und"。"""
+    sample = text[:_DETECT_SAMPLE]
+    if _NON_LATIN_RE.search(sample) is None:
+        script, count = "latin", 1
+    else:
+        counts = {script: len(pattern.findall(sample)) for script, pattern in _SCRIPTS.items()}
+        # 日文混用汉字与假名，两者合计与其他文字比较
+        counts["cjk"] = counts.pop("han") + counts.pop("kana")
+        script, count = max(counts.items(), key=lambda item: item[1])
+    if count == 0:
+        return "und"
+    if script == "cjk":
+        return "ja" if _SCRIPTS["kana"].search(sample) else "zh"
+    if script != "latin":
+        return _SCRIPT_LANGUAGES[script]
+    words = Counter(word.lower() for word in _WORD_RE.findall(sample))
+    scores = {language: sum(words[word] for word in stopwords) for language, stopwords in _STOPWORDS.items()}
+    language, score = max(scores.items(), key=lambda item: item[1])
+    return language if score else "und"
+
+
+class TextCache:
+    """
+    按文本哈希 (blake2b) 索引的有界 LRU，只保存处理结果，不保存原文。
+    会在多个线程中访问，操作都在锁内进行。
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._items), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+class TextPipeline:
+    """
+    submit() 替代 sink 交给 SelectionListener：文本消息经规范化、分句与语言识别后交给 sink，
+    其他类型原样转发。开启微批处理时消息在计时线程中发出。
+    """
+    def __init__(self, sink: Callable[[Dict[str, Any]], None], enabled: bool = True, cache_size: int = 1024,
+                 batch_window_ms: float = 0, max_batch: int = 16, cjk_latin_spacing: bool = True,
+                 keep_raw: bool = False, hyphenation: str = "auto"):
+        self.sink = sink
+        self.enabled = enabled
+        self.cache = TextCache(cache_size)
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, int(max_batch))
+        self.cjk_latin_spacing = cjk_latin_spacing
+        self.hyphenation = hyphenation
+        self.keep_raw = keep_raw
+        self.batches_sent = 0
+        self._batch: List[Dict[str, Any]] = []
+        # 当前批次的代数，计时器只发出自己启动时的那一批
+        self._generation = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def analyze(self, text: str) -> Tuple[str, List[List[int]], str]:
+        """返回 (规范化文本, 分句偏移, 语言)，结果按原文哈希缓存。"""
+        key = TextCache.key(text)
+        result = self.cache.get(key)
+        if result is None:
+            normalized = normalize_text(text, self.cjk_latin_spacing, self.hyphenation)
+            result = (normalized, split_sentences(normalized), detect_language(normalized))
+            self.cache.put(key, result)
+        return result
+
+    def process(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """返回处理后的新消息，不修改传入的消息。"""
+        raw = message.get("data", "")
+        normalized, sentences, language = self.analyze(raw)
+        metadata = {**message.get("metadata", {}), "language": language,
+                    "sentences": [list(span) for span in sentences]}
+        if self.keep_raw and normalized != raw:
+            metadata["raw_text"] = raw
+        return {**message, "data": normalized, "metadata": metadata}
+
+    def prepare(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """单独处理一条消息，不经过微批处理，也不交给 sink (用于只回复给请求方的远程划词)。"""
+        if not self.enabled or message.get("type") != "text":
+            return message
+        return self.process(message)
+
+    def submit(self, message: Dict[str, Any]):
+        if not self.enabled or message.get("type") != "text":
+            self.sink(message)
+            return
+        processed = self.process(message)
+        if not processed["data"]:
+            logging.debug("规范化后的划词文本为空，已忽略。")
+            return
+        if not self.batch_window:
+            self.sink(processed)
+            return
+        ready = []
+        with self._lock:
+            if self._batch and _source_app(self._batch[-1]) != _source_app(processed):
+                # 换了应用，先发出之前的批次，批次内的划词始终来自同一应用
+                ready.append(self._take_batch())
+            self._batch.append(processed)
+            if len(self._batch) >= self.max_batch:
+                ready.append(self._take_batch())
+            elif len(self._batch) == 1:
+                self._timer = threading.Timer(self.batch_window, self._expire, args=(self._generation,))
+                self._timer.daemon = True
+                self._timer.start()
+        for batch in ready:
+            self._emit(batch)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """在锁内取走当前批次并取消其计时器；批次代数加一，已触发的旧计时器随之失效。"""
+        batch, self._batch = self._batch, []
+        self._generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _expire(self, generation: int):
+        """时间窗到期 (计时线程)。该批次已因换应用或达到上限被发出时什么也不做。"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            batch = self._take_batch()
+        if batch:
+            self._emit(batch)
+
+    def flush(self):
+        """立即发出正在累积的批次。"""
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._emit(batch)
+
+    def _emit(self, batch: List[Dict[str, Any]]):
+        try:
+            self.sink(merge_batch(batch))
+            self.batches_sent += 1
+        except Exception as e:
+            logging.error(f"发送合并的划词文本失败: {e}", exc_info=True)
+
+    def close(self):
+        self.flush()
+
+    def update_config(self, config: Optional[Dict[str, Any]]):
+        """热重载 text_pipeline 段：先发出正在累积的批次；规范化方式或缓存容量变化时换用新的缓存。"""
+        options = _pipeline_options(config)
+        self.flush()
+        if options["cache_size"] != self.cache.max_entries or options["cjk_latin_spacing"] != self.cjk_latin_spacing \
+                or options["hyphenation"] != self.hyphenation:
+            self.cache = TextCache(options["cache_size"])
+        self.enabled = options["enabled"]
+        self.batch_window = options["batch_window_ms"] / 1000
+        self.max_batch = max(1, options["max_batch"])
+        self.cjk_latin_spacing = options["cjk_latin_spacing"]
+        self.hyphenation = options["hyphenation"]
+        self.keep_raw = options["keep_raw"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache": self.cache.stats(), "batches_sent": self.batches_sent, "pending": len(self._batch)}
+
+
+def _source_app(message: Dict[str, Any]) -> Any:
+    return message.get("metadata", {}).get("source_app_name")
+
+
+def merge_batch(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    把同一应用的多条已处理的文本消息合并为一条：各段以换行连接，分句偏移平移到合并后的文本中，
+    语言取字数最多的一种；metadata.batch 按顺序给出每段的 range、timestamp 与 language。
+    """
+    if len(batch) == 1:
+        return batch[0]
+    sentences, items = [], []
+    weights: Counter = Counter()
+    offset = 0
+    for message in batch:
+        metadata = message["metadata"]
+        length = len(message["data"])
+        sentences += [[start + offset, end + offset] for start, end in metadata["sentences"]]
+        item = {"range": [offset, offset + length], "timestamp": message.get("timestamp"),
+                "language": metadata["language"]}
+        if "raw_text" in metadata:
+            item["raw_text"] = metadata["raw_text"]
+        items.append(item)
+        weights[metadata["language"]] += length
+        offset += length + 1
+    metadata = {key: value for key, value in batch[-1]["metadata"].items() if key != "raw_text"}
+    metadata.update(language=weights.most_common(1)[0][0], sentences=sentences, batch=items)
+    return {**batch[-1], "data": "\n".join(message["data"] for message in batch), "metadata": metadata}
+
+
+def _pipeline_options(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    options = {**DEFAULT_TEXT_PIPELINE_CONFIG, **(config or {})}
+    return {"enabled": bool(options["enabled"]), "cache_size": int(options["cache_size"]),
+            "batch_window_ms": float(options["batch_window_ms"]), "max_batch": int(options["max_batch"]),
+            "cjk_latin_spacing": bool(options["cjk_latin_spacing"]), "hyphenation": str(options["hyphenation"]),
+            "keep_raw": bool(options["keep_raw"])}
+
+
+def open_text_pipeline(config: Optional[Dict[str, Any]], sink: Callable[[Dict[str, Any]], None]) -> TextPipeline:
+    """按 config.yaml 的 text_pipeline 段创建处理阶段，输出交给 sink。"""
+    return TextPipeline(sink, **_pipeline_options(config))
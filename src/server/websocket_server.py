@@ -1,25 +1,164 @@
 # src/server/websocket_server.py
 import asyncio
+import errno
+import os
+import socket
 import websockets
 import logging
 import json
-from queue import Queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
 from websockets.exceptions import ConnectionClosed
+from src.server.compression import CompressionPolicy
+from src.server.subscriptions import Subscription, build_variant, thumbnail_size_of, FULL
+from src.server.artifacts import ArtifactStore
+from src.server.imaging import render_capture
+from src.server.journal import open_journal
+from src.server.history import HistoryQuery, open_history, DEFAULT_PAGE_SIZE
+from src.server.agents import open_agents
+from src.server.remote_capture import open_remote_capture
+from src.server.rpc import Param, RpcCall, RpcError, RpcRouter
+from src.capture.text_selection.strategy import selection_policy
+from src.server.scheduler import ClientOutbox, PriorityMessageQueue, SchedulerPolicy
+
+# 补发时每批从日志读取的记录数
+REPLAY_BATCH = 64
+# 没有新消息时检查日志保留策略的间隔 (秒)
+JOURNAL_EXPIRE_INTERVAL_S = 60
+
+
+def _load_journal_batch(journal, from_seq: int, until_seq: int):
+    """读取一批日志记录并解析，返回 [(seq, JSON 文本, 消息)]。涉及磁盘与大段 JSON 解析，应在执行器中调用。"""
+    return [(seq, text, json.loads(text)) for seq, text in journal.read(from_seq, REPLAY_BATCH, until_seq=until_seq)]
+
+def _address_in_use(e: OSError) -> bool:
+    # Windows 上 winerror 10048 (WSAEADDRINUSE) 对应的 errno 不一定是 EADDRINUSE
+    return e.errno == errno.EADDRINUSE or getattr(e, "winerror", None) == 10048
+
+
+def _unix_path(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """server.unix_socket 配置中的套接字路径；未配置或未启用时为 None。"""
+    if not config or not config.get("enabled", True):
+        return None
+    return config.get("path")
+
+
+def _remove_stale_socket(path: str):
+    """
+    删除上次异常退出遗留的套接字文件。若仍有进程在该路径上监听，抛出 OSError(EADDRINUSE)。
+    """
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"已有进程在 {path} 上监听")
+
 
 class WebSocketServer:
     """
     管理 WebSocket 连接并向上层应用推送数据。
     """
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, compression: Optional[Dict[str, Any]] = None,
+                 artifacts: Optional[Dict[str, Any]] = None, journal: Optional[Dict[str, Any]] = None,
+                 history: Optional[Dict[str, Any]] = None, remote_capture: Optional[Dict[str, Any]] = None,
+                 direct_capture=None, rpc: Optional[Dict[str, Any]] = None,
+                 unix_socket: Optional[Dict[str, Any]] = None, agents: Optional[Dict[str, Any]] = None,
+                 scheduler: Optional[Dict[str, Any]] = None):
         self.host = host
         self.port = port
+        # 本机客户端可改用 Unix 域套接字连接，省去 TCP 回环的开销，也不会与其他程序争用端口
+        self.unix_path = _unix_path(unix_socket)
+        self.compression = CompressionPolicy(compression)
+        # 启动时的原始配置，热重载时用于判断哪些设置发生了变化
+        self._settings = {"bind": (host, port), "compression": compression, "artifacts": artifacts,
+                          "journal": journal, "history": history, "remote_capture": remote_capture, "rpc": rpc,
+                          "unix_socket": self.unix_path, "agents": agents,
+                          "scheduler": scheduler}
+        self.artifacts = ArtifactStore(**(artifacts or {}))
+        self.journal = open_journal(journal)
+        # 日志的写入与补发读取都在这个单线程执行器中进行：不阻塞事件循环，且读取总能看到之前提交的写入
+        self._journal_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="JournalWriter") \
+            if self.journal is not None else None
+        self.history = open_history(history)
+        # 远程采集需要与快捷键共用的 DirectCapture，未提供时不启用
+        self.remote_capture = open_remote_capture(remote_capture, direct_capture) if direct_capture is not None else None
+        # 与划词监听共用的文本处理阶段 (TextPipeline)，由 main 创建后设置；远程划词的结果同样经它处理
+        self.text_pipeline = None
+        # 多进程部署时，各会话的采集代理连接到本服务器 (broker)，由它统一分发
+        self.agents = open_agents(agents)
         self.connected_clients = set()
-        self.message_queue = Queue()
+        self.subscriptions: Dict[Any, Subscription] = {}
+        # 正在补发历史消息的客户端，以及补发期间为其暂存的实时消息
+        self._replaying: Dict[Any, List] = {}
+        # 各客户端最近一次补发覆盖到的 seq：正在发布的消息可能已分配 seq、写入日志但还没推送，
+        # 补发已包含它时实时推送跳过该客户端 (无论补发是否已经结束)
+        self._replayed_through: Dict[Any, int] = {}
+        # 待发布的消息与每个客户端的发送队列都按优先级排队：划词文本 > 截图 > 其他后台消息
+        self.scheduler = SchedulerPolicy(scheduler)
+        self.message_queue = PriorityMessageQueue(self.scheduler)
+        self.outboxes: Dict[Any, ClientOutbox] = {}
+        # 本地队列与各代理连接的消息依次发布，保证每个客户端收到的顺序与 seq 一致
+        self._publish_lock = asyncio.Lock()
+        # 客户端请求 {"action": 名称, "request_id": ..., ...} 经 RPC 路由器分派到各处理函数
+        self.rpc = RpcRouter(self._reply, **(rpc or {}))
+        self._register_methods()
+        # 服务器开始监听后置位；port 为 0 时 self.port 会被更新为实际端口
+        self.ready = threading.Event()
+        self._loop = None
+        self._server = None
+        self._unix_server = None
+        # 正在监听的 TCP / Unix 监听器；热重载更换监听地址后，旧监听器上的连接仍然保持，
+        # 旧监听器移入 _retiring，关闭服务器时一并关闭其上的连接
+        self._servers = []
+        self._retiring = set()
+        self._stopped = None
+
+    def _register_methods(self):
+        """注册客户端可调用的方法及其参数约束。"""
+        positive = lambda value: value > 0
+        self.rpc.register("ping", self._on_ping)
+        self.rpc.register("stats", self._on_stats)
+        self.rpc.register("selection_stats", self._on_selection_stats)
+        # 订阅必须在其后的推送之前生效，因此在读取循环中按顺序执行
+        self.rpc.register("subscribe", self._on_subscribe, ordered=True, schema={
+            "types": Param((list, str)), "filters": Param(dict)})
+        self.rpc.register("fetch", self._on_fetch, schema={
+            "capture_id": Param(str, required=True), "crop": Param(dict),
+            "scale": Param((int, float), check=positive, hint="必须是 (0, 1] 之间的数"),
+            "max_size": Param(int, check=positive, hint="必须是正整数")})
+        # 补发与流式历史查询可能持续很久，不设超时
+        self.rpc.register("resume", self._on_resume, timeout=None, schema={
+            "from_seq": Param(int, required=True, hint="必须是整数")})
+        self.rpc.register("history", self._on_history, timeout=None, schema={
+            "filters": Param(dict), "page_size": Param(int, check=positive, hint="必须是正整数"),
+            "cursor": Param(int), "stream": Param(bool), "limit": Param(int, check=positive, hint="必须是正整数")})
+        # 远程采集自带排队超时 (server.remote_capture.timeout)
+        self.rpc.register("capture", self._on_capture, timeout=None, schema={
+            "target": Param(str), "region": Param(dict), "monitor": Param(int), "format": Param(str),
+            "quality": Param(int), "ocr": Param(bool)})
 
-    async def _register(self, websocket):
+    async def _register(self, websocket, path=None):
         """
-        注册新的客户端连接。
+        注册新的客户端连接。连接 URL 的查询参数可携带初始订阅条件。
         """
+        request = getattr(websocket, "request", None)
+        try:
+            subscription = Subscription.from_path(path or getattr(request, "path", None))
+        except ValueError as e:
+            subscription = Subscription()
+            await self.rpc.send_error(websocket, RpcError("invalid", f"订阅参数无效: {e}"), action="subscribe")
+        self.subscriptions[websocket] = subscription
+        self.outboxes[websocket] = ClientOutbox(websocket, lambda: self.compression, self.scheduler,
+                                                subscription.chunk_size)
         self.connected_clients.add(websocket)
         logging.info(f"新客户端连接: {websocket.remote_address}")
 
@@ -28,38 +167,487 @@ class WebSocketServer:
         注销断开的客户端连接。
         """
         self.connected_clients.remove(websocket)
+        self.subscriptions.pop(websocket, None)
+        self._replaying.pop(websocket, None)
+        self._replayed_through.pop(websocket, None)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
+        self.rpc.forget(websocket)
+        if self.remote_capture is not None:
+            self.remote_capture.forget(websocket)
         logging.info(f"客户端断开连接: {websocket.remote_address}")
 
+    async def _reply(self, websocket, message: dict):
+        """
+        仅向单个客户端发送一条消息，连接已关闭时静默忽略。
+        """
+        try:
+            await websocket.send(json.dumps(message))
+        except ConnectionClosed:
+            pass
+
+    async def _send_encoded(self, websocket, message: dict):
+        """按压缩策略向单个客户端发送一条 (可能很大的) 数据消息，与广播一样经该客户端的发送队列按优先级排队。"""
+        encoded = self.compression.encode(message)
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            await self.compression.send(websocket, encoded)
+        else:
+            await outbox.put(self.scheduler.classify(message), encoded)
+
+    async def _on_subscribe(self, call: RpcCall):
+        """
+        更新客户端的订阅条件，可在连接后的任意时刻调用。
+        """
+        try:
+            subscription = Subscription.from_request(call.request)
+        except ValueError as e:
+            raise RpcError("invalid", str(e))
+        self.subscriptions[call.client] = subscription
+        if call.client in self.outboxes:
+            self.outboxes[call.client].chunk_size = subscription.chunk_size
+        return {"type": "subscribed", "subscription": subscription.to_dict()}
+
+    async def _on_ping(self, call: RpcCall):
+        return {"type": "pong"}
+
+    async def _on_stats(self, call: RpcCall):
+        """服务器运行状态，便于排查问题。"""
+        stats = {"clients": len(self.connected_clients), "queued_messages": self.message_queue.qsize(),
+                 "artifacts": self.artifacts.stats(), "rpc": self.rpc.stats(),
+                 "scheduler": {"queued": self.message_queue.depths(), "latency": self.scheduler.latency.snapshot(),
+                               "pending_bytes": sum(outbox.pending_bytes for outbox in self.outboxes.values()),
+                               "slow_clients_closed": self.scheduler.slow_clients_closed}}
+        if self.journal is not None:
+            stats["journal"] = {"first_seq": self.journal.first_seq, "last_seq": self.journal.last_seq,
+                                "size_bytes": self.journal.size_bytes}
+        if self.remote_capture is not None:
+            stats["remote_capture"] = {"pending": self.remote_capture.pending}
+        if self.agents is not None:
+            stats["agents"] = self.agents.stats()
+        return {"type": "stats", "stats": stats}
+
+    async def _on_selection_stats(self, call: RpcCall):
+        """本进程中各应用的划词策略统计 (成功率、平均耗时、最近成功与被跳过的策略)。"""
+        return {"type": "selection_stats", "apps": selection_policy().snapshot()}
+
     async def _producer(self):
         """
-        从队列中获取消息。
+        从队列中按优先级获取 (消息, 入队时间)。
         """
         loop = asyncio.get_event_loop()
         while True:
-            message = await loop.run_in_executor(None, self.message_queue.get)
-            yield message
+            message, enqueued_at = await loop.run_in_executor(None, self.message_queue.get)
+            if message is None: # 队列已由 stop() 关闭
+                return
+            yield message, enqueued_at
 
-    async def _handler(self, websocket, path):
+    async def _handler(self, websocket, path=None):
         """
-        处理单个客户端连接的主循环。
+        处理单个客户端连接的主循环：读取客户端请求并交给 RPC 路由器。
         """
-        await self._register(websocket)
+        if self.agents is not None:
+            try:
+                session_id = self.agents.match(path or getattr(getattr(websocket, "request", None), "path", None))
+            except ValueError as e:
+                await websocket.close(1008, str(e))
+                return
+            if session_id is not None:
+                await self._agent_handler(websocket, session_id)
+                return
+        await self._register(websocket, path)
         try:
-            await websocket.wait_closed()
+            request = getattr(websocket, "request", None)
+            resume_from = parse_qs(urlsplit(path or getattr(request, "path", None) or "").query).get("resume_from")
+            if resume_from:
+                try:
+                    await self.rpc.handle(websocket, {"action": "resume", "from_seq": int(resume_from[0])})
+                except ValueError:
+                    await self.rpc.send_error(websocket, RpcError("invalid", "resume_from 必须是整数"), action="resume")
+            async for raw in websocket:
+                await self.rpc.dispatch(websocket, raw)
+        except ConnectionClosed:
+            pass
         finally:
             await self._unregister(websocket)
 
+    async def _agent_handler(self, websocket, session_id: str):
+        """
+        接收一个采集代理发来的消息并发布。发布完一条才读取下一条，
+        broker 忙时代理的发送会被套接字的流量控制阻塞。一条消息处理出错只跳过该条，不断开代理。
+        """
+        agent = self.agents.connect(websocket, session_id)
+        try:
+            async for raw in websocket:
+                message = self.agents.accept(agent, raw)
+                if message is None:
+                    continue
+                try:
+                    await self._publish(message)
+                except Exception as e:
+                    logging.error(f"发布会话 {session_id} 的消息时出错: {e}", exc_info=True)
+                    self.agents.reject(agent, "发布失败")
+        except ConnectionClosed:
+            pass
+        finally:
+            self.agents.disconnect(websocket)
+
+    async def _on_fetch(self, call: RpcCall):
+        """
+        按 capture_id 从截图缓存中取回完整图像，或其裁剪/缩放版本，只回复给请求方。
+        请求: {"action": "fetch", "capture_id": ..., "crop": {x, y, width, height}, "scale": 0.5, "max_size": 1024}
+        """
+        capture_id = call.get("capture_id")
+        reply_base = {**call.reply_base, "capture_id": capture_id}
+        artifacts = self.artifacts.get(capture_id)
+        if artifacts is None:
+            raise RpcError("not_found", "截图不存在或已被淘汰", capture_id=capture_id)
+
+        crop, scale, max_size = call.get("crop"), call.get("scale"), call.get("max_size")
+        if crop or scale is not None or max_size is not None:
+            loop = asyncio.get_event_loop()
+            try:
+                message = await loop.run_in_executor(None, render_capture, artifacts.message, crop, scale, max_size)
+            except (ValueError, KeyError, TypeError) as e:
+                raise RpcError("invalid", f"参数无效: {e}", capture_id=capture_id)
+        else:
+            message = artifacts.message
+        await self._send_encoded(call.client, {**message, **reply_base})
+
+    async def _on_resume(self, call: RpcCall):
+        """
+        从消息日志中补发 seq >= from_seq 的消息 (同样按该客户端的订阅过滤)，
+        补发完成后回复 {"type": "resumed", ...}，再继续推送实时消息。
+        """
+        websocket = call.client
+        if self.journal is None:
+            raise RpcError("unavailable", "服务器未启用消息日志")
+        from_seq = max(1, call.get("from_seq"))
+        if websocket in self._replaying:
+            raise RpcError("busy", "上一次补发尚未完成")
+
+        # 补发范围截止到当前已分配的 seq；之后的实时消息先暂存，补发完再按顺序发送
+        until_seq = self._replayed_through[websocket] = self.journal.next_seq - 1
+        pending = self._replaying[websocket] = []
+        loop = asyncio.get_event_loop()
+        subscription = self.subscriptions.get(websocket, Subscription())
+        outbox = self.outboxes.get(websocket)
+        seq, first_available, count = from_seq, None, 0
+        try:
+            while seq <= until_seq and outbox is not None:
+                records = await loop.run_in_executor(self._journal_executor, _load_journal_batch,
+                                                     self.journal, seq, until_seq)
+                if not records:
+                    break
+                if first_available is None:
+                    first_available = records[0][0]
+                for _, text, message in records:
+                    for variant in subscription.variants(message):
+                        if variant == FULL:
+                            encoded = self.compression.encode(message, text)
+                        else:
+                            encoded = self.compression.encode(await self._variant_message(message, variant))
+                        # 与实时消息一样经发送队列按优先级排队、按 chunk_size 分块，不会插进进行中的分块序列
+                        await outbox.put(self.scheduler.classify(message), encoded)
+                        count += 1
+                seq = records[-1][0] + 1
+
+            # 补发内容全部发出后再回复 resumed
+            if outbox is not None:
+                await outbox.join()
+            await self._reply(websocket, {
+                "type": "resumed", **call.reply_base, "from_seq": from_seq, "last_seq": until_seq, "count": count,
+                # 请求的起点已被保留策略删除，中间有消息无法补发
+                "truncated": from_seq <= until_seq and (first_available is None or first_available > from_seq),
+            })
+            while pending and outbox is not None:
+                outbox.push(*pending.pop(0))
+        finally:
+            self._replaying.pop(websocket, None)
+
+    async def _on_history(self, call: RpcCall):
+        """
+        查询采集历史。请求:
+        {"action": "history", "filters": {...}, "page_size": 100, "cursor": null, "stream": false, "limit": null}
+        非流式时回复一页结果和 next_cursor；流式时逐页推送直到结果取完或达到 limit，最后一页带 done: true。
+        """
+        if self.history is None:
+            raise RpcError("unavailable", "服务器未启用历史记录")
+        try:
+            query = HistoryQuery.from_request(call.get("filters"))
+        except (TypeError, ValueError) as e:
+            raise RpcError("invalid", f"查询参数无效: {e}")
+        page_size, cursor, limit = call.get("page_size", DEFAULT_PAGE_SIZE), call.get("cursor"), call.get("limit")
+
+        loop = asyncio.get_event_loop()
+        sent = 0
+        while True:
+            size = page_size if limit is None else min(page_size, limit - sent)
+            try:
+                items, cursor = await loop.run_in_executor(None, self.history.query, query, size, cursor)
+            except Exception as e:
+                logging.error(f"历史查询失败: {e}", exc_info=True)
+                raise RpcError("failed", "历史查询失败")
+            sent += len(items)
+            done = not call.get("stream") or cursor is None or (limit is not None and sent >= limit)
+            await self._reply(call.client, {"type": "history", **call.reply_base, "items": items,
+                                            "next_cursor": cursor, "done": done})
+            if done or call.client not in self.connected_clients:
+                return
+
+    async def _on_capture(self, call: RpcCall):
+        """
+        远程采集，结果只回复给请求方。请求:
+        {"action": "capture", "request_id": ..., "target": "region" | "monitor" | "selection",
+         "region": {x, y, width, height}, "monitor": 2, "format": "png", "quality": 90}
+        """
+        if self.remote_capture is None:
+            raise RpcError("unavailable", "服务器未启用远程采集")
+        message = await self.remote_capture.handle(call.client, call.request)
+        if message.get("type") == "image":
+            # 与快捷键截图一样进入缓存，之后可通过 fetch 取回裁剪/缩放版本
+            message = self.artifacts.ingest(message)
+        elif self.text_pipeline is not None:
+            # 与划词监听推送的文本一样规范化、分句并识别语言 (共用缓存)
+            message = await asyncio.get_event_loop().run_in_executor(None, self.text_pipeline.prepare, message)
+        await self._send_encoded(call.client, {**message, **call.reply_base})
+
+    async def _expire_journal(self):
+        """定期按保留策略删除旧分段：写入时也会检查，这里覆盖长时间没有新消息的情况。"""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(JOURNAL_EXPIRE_INTERVAL_S)
+            try:
+                await loop.run_in_executor(self._journal_executor, self.journal.expire)
+            except Exception as e:
+                logging.error(f"清理消息日志失败: {e}")
+
+    def _journal_append(self, seq: int, text: str):
+        """在日志执行器中写入一条记录，写入失败只记录错误，不影响广播。"""
+        def done(future):
+            if future.exception() is not None:
+                logging.error(f"写入消息日志失败 (seq {seq}): {future.exception()}")
+        self._journal_executor.submit(self.journal.append, seq, text).add_done_callback(done)
+
+    async def _variant_message(self, message: dict, variant: str) -> dict:
+        """
+        取得消息的指定变体：优先使用缓存中已有的缩略图，否则在线程池中生成并缓存。
+        """
+        size = thumbnail_size_of(variant)
+        if size is None:
+            return message
+        capture_id = message.get("metadata", {}).get("capture_id")
+        cached = self.artifacts.thumbnail(capture_id, size)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_event_loop()
+        try:
+            # 缩略图需要解码图像，放到线程池中避免阻塞事件循环
+            thumbnail = await loop.run_in_executor(None, build_variant, message, variant)
+        except Exception as e:
+            logging.error(f"生成缩略图失败，改为推送完整图像: {e}", exc_info=True)
+            return message
+        self.artifacts.add_thumbnail(capture_id, size, thumbnail)
+        return thumbnail
+
     async def _broadcast_messages(self):
         """
-        从生成器获取消息并广播给所有连接的客户端。
+        从生成器获取本地消息并广播给所有连接的客户端。
         """
-        async for message in self._producer():
-            if self.connected_clients:
-                message_json = json.dumps(message)
-                await asyncio.gather(
-                    *[client.send(message_json) for client in self.connected_clients],
-                    return_exceptions=True
-                )
+        async for message, enqueued_at in self._producer():
+            await self._publish(message, enqueued_at)
+
+    async def _publish(self, message: dict, enqueued_at: Optional[float] = None):
+        """
+        发布一条采集消息：写入缓存、日志和历史，再按订阅放入各客户端的发送队列。
+        enqueued_at 为消息进入服务器的时间 (time.monotonic())，用于统计各优先级的延迟。
+        """
+        enqueued_at = time.monotonic() if enqueued_at is None else enqueued_at
+        priority = self.scheduler.classify(message)
+        async with self._publish_lock:
+            default_subscription = Subscription()
+            if message.get("type") == "image":
+                # 截图先进入缓存，之后可通过 fetch 按 capture_id 取回
+                message = self.artifacts.ingest(message)
+
+            encoded_variants = {}
+            if self.journal is not None:
+                # 分配 seq 并写入日志；完整消息只序列化一次，日志与广播共用
+                message["seq"] = self.journal.reserve()
+                encoded_variants[FULL] = self.compression.encode(message)
+                self._journal_append(message["seq"], encoded_variants[FULL].text)
+            if self.history is not None:
+                self.history.record(message)
+
+            # 按订阅筛选客户端并分阶段推送：先推送每个客户端的首个变体 (如缩略图)，
+            # 再推送后续变体 (渐进模式下的完整图像)。每种变体只生成、序列化和压缩一次。
+            # 发送由各客户端的发送队列完成，这里只入队、从不等待：积压不下的慢客户端由发送队列自行断开。
+            phases = []
+            for client in list(self.connected_clients):
+                for index, variant in enumerate(self.subscriptions.get(client, default_subscription).variants(message)):
+                    if index == len(phases):
+                        phases.append([])
+                    phases[index].append((client, variant))
+
+            for phase in phases:
+                for client, variant in phase:
+                    if variant not in encoded_variants:
+                        encoded_variants[variant] = self.compression.encode(await self._variant_message(message, variant))
+                    item = (priority, encoded_variants[variant], enqueued_at)
+                    if "seq" in message and message["seq"] <= self._replayed_through.get(client, 0):
+                        continue
+                    if client in self._replaying:
+                        self._replaying[client].append(item)
+                    elif client in self.outboxes:
+                        self.outboxes[client].push(*item)
+
+    def update_settings(self, server, old=None):
+        """
+        线程安全地应用新的 server 配置 (ServerConfig)，供配置热重载调用。
+        监听地址或压缩设置变化时在新地址上重新监听，已有连接不受影响；
+        截图缓存上限立即生效；journal、history、agents 和 scheduler 的修改需要重启。
+        """
+        if self._loop is None or self._loop.is_closed() or not self.ready.is_set():
+            logging.warning("WebSocket 服务器尚未运行，新的 server 配置将在重启后生效。")
+            return None
+        return asyncio.run_coroutine_threadsafe(self._apply_settings(server), self._loop)
+
+    async def _apply_settings(self, server) -> bool:
+        artifacts = server.artifacts or {}
+        if artifacts != (self._settings["artifacts"] or {}):
+            self.artifacts.resize(**artifacts)
+            self._settings["artifacts"] = server.artifacts
+            logging.info(f"截图缓存上限已更新: {self.artifacts.stats()}")
+        if server.rpc != self._settings["rpc"]:
+            self.rpc.update(server.rpc)
+            self._settings["rpc"] = server.rpc
+        if server.remote_capture != self._settings["remote_capture"] and self.remote_capture is not None:
+            self.remote_capture.update(server.remote_capture)
+            self._settings["remote_capture"] = server.remote_capture
+        for name in ("journal", "history", "agents", "scheduler"):
+            if getattr(server, name) != self._settings[name]:
+                logging.warning(f"server.{name} 的修改需要重启服务后才能生效。")
+
+        compression_changed = server.compression != self._settings["compression"]
+        unix_path = _unix_path(server.unix_socket)
+        old_policy = self.compression
+        # 先构造新的压缩参数，出错时原来的监听器还没有关闭
+        try:
+            policy = CompressionPolicy(server.compression)
+            policy.serve_kwargs()
+        except Exception as e:
+            logging.error(f"server.compression 无效，继续使用原来的设置: {e}")
+            return False
+        self.compression = policy
+        ok = True
+        if compression_changed or server.address != self._settings["bind"]:
+            ok = await self._rebind_tcp(server.address)
+        if ok and (compression_changed or unix_path != self.unix_path):
+            ok = await self._rebind_unix(unix_path)
+        if not ok and compression_changed:
+            # 回到原来的压缩设置和监听地址
+            self.compression = old_policy
+            await self._rebind_tcp(self._settings["bind"])
+            await self._rebind_unix(self.unix_path)
+        elif ok:
+            self._settings["compression"] = server.compression
+        return ok
+
+    async def _rebind_tcp(self, address) -> bool:
+        """在新地址上重新监听 TCP，已有连接不受影响；失败时回到原来的地址。"""
+        old_bind = self._settings["bind"]
+        # 同一端口需要先释放才能重新监听
+        if self._server is not None:
+            self._retire(self._server)
+            self._server = None
+        try:
+            await self._listen(*address)
+        except Exception as e:
+            logging.error(f"无法在 {address[0]}:{address[1]} 上监听，继续使用原来的设置: {e}")
+            try:
+                await self._listen(*old_bind)
+            except Exception as e:
+                logging.error(f"无法恢复在 {old_bind[0]}:{old_bind[1]} 上的监听: {e}")
+            return False
+        self._settings["bind"] = address
+        return True
+
+    async def _rebind_unix(self, path: Optional[str]) -> bool:
+        """重新监听 Unix 域套接字 (path 为 None 时停止监听)，已有连接不受影响。"""
+        old_path = self.unix_path
+        self._close_unix()
+        try:
+            if path:
+                await self._listen_unix(path)
+        except Exception as e:
+            logging.error(f"无法在 {path} 上监听，继续使用原来的设置: {e}")
+            if old_path:
+                try:
+                    await self._listen_unix(old_path)
+                except Exception as e:
+                    logging.error(f"无法恢复在 Unix 域套接字 {old_path} 上的监听: {e}")
+                    self.unix_path = self._settings["unix_socket"] = None
+            return False
+        self.unix_path = path
+        self._settings["unix_socket"] = path
+        return True
+
+    def _serve_kwargs(self) -> Dict[str, Any]:
+        kwargs = self.compression.serve_kwargs()
+        if self.agents is not None:
+            kwargs.update(self.agents.serve_kwargs())
+        return kwargs
+
+    async def _listen(self, host: str, port: int):
+        server = await websockets.serve(self._handler, host, port, **self._serve_kwargs())
+        self._server = server
+        self._servers.append(server)
+        self.host, self.port = host, server.sockets[0].getsockname()[1]
+        logging.info(f"WebSocket 服务器已在 ws://{self.host}:{self.port} 上启动")
+
+    async def _listen_unix(self, path: str):
+        if not hasattr(socket, "AF_UNIX") or not hasattr(asyncio.get_running_loop(), "create_unix_server"):
+            raise OSError(errno.EAFNOSUPPORT, "当前平台的事件循环不支持 Unix 域套接字")
+        _remove_stale_socket(path)
+        server = await websockets.unix_serve(self._handler, path, **self._serve_kwargs())
+        # 只允许当前用户连接
+        os.chmod(path, 0o600)
+        self._unix_server = server
+        self._servers.append(server)
+        logging.info(f"WebSocket 服务器已在 Unix 域套接字 {path} 上启动")
+
+    def _close_unix(self):
+        if self._unix_server is None:
+            return
+        self._retire(self._unix_server)
+        self._unix_server = None
+        try:
+            os.remove(self.unix_path)
+        except OSError:
+            pass
+
+    def _retire(self, server):
+        """停止在该监听器上接受新连接；其上的已有连接继续服务，全部断开后从 _retiring 中移除。"""
+        server.close(close_connections=False)
+        self._servers.remove(server)
+        self._retiring.add(server)
+        asyncio.ensure_future(server.wait_closed()).add_done_callback(lambda _: self._retiring.discard(server))
+
+    def _close(self):
+        for server in self._servers:
+            server.close()
+        # 已停止监听的旧监听器不会再响应 close()，直接关闭其上的连接
+        for server in self._retiring:
+            for connection in server.connections:
+                asyncio.ensure_future(connection.close(1001))
+        if self._unix_server is not None:
+            self._unix_server = None
+            try:
+                os.remove(self.unix_path)
+            except OSError:
+                pass
+        self._stopped.set()
 
     def queue_message(self, message: dict):
         """
@@ -67,33 +655,69 @@ class WebSocketServer:
         """
         self.message_queue.put(message)
 
+    def stop(self):
+        """
+        线程安全地关闭服务器，并唤醒阻塞在队列上的生产者。
+        """
+        self.message_queue.put(None)
+        if self._loop and self.ready.is_set() and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._close)
+
     def run(self):
         """
         启动 WebSocket 服务器。
         """
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self._loop = loop
 
         async def start_server():
             """
             一个 async 的入口点，用于正确启动服务器和任务。
             """
-            server = await websockets.serve(self._handler, self.host, self.port)
-            logging.info(f"WebSocket 服务器已在 ws://{self.host}:{self.port} 上启动")
-            asyncio.create_task(self._broadcast_messages())
-            await server.wait_closed()
+            self._stopped = asyncio.Event()
+            if self.unix_path:
+                try:
+                    await self._listen_unix(self.unix_path)
+                except OSError as e:
+                    logging.error(f"无法在 Unix 域套接字 {self.unix_path} 上监听: {e}")
+                    self.unix_path = None
+            try:
+                await self._listen(self.host, self.port)
+            except OSError as e:
+                # 端口被占用时，本机客户端仍可通过 Unix 域套接字连接
+                if not (_address_in_use(e) and self._unix_server is not None):
+                    raise
+                logging.error(f"端口 {self.port} 已被占用，仅在 Unix 域套接字 {self.unix_path} 上提供服务。")
+            broadcast_task = asyncio.create_task(self._broadcast_messages())
+            expire_task = asyncio.create_task(self._expire_journal()) if self.journal is not None else None
+            self.ready.set()
+            await self._stopped.wait()
+            for server in [*self._servers, *self._retiring]:
+                await server.wait_closed()
+            broadcast_task.cancel()
+            if expire_task is not None:
+                expire_task.cancel()
+            self.rpc.close()
 
         try:
             loop.run_until_complete(start_server())
         # 关键修复：捕获端口占用错误并提供清晰的提示
         except OSError as e:
-            if e.winerror == 10048:
+            if _address_in_use(e):
                 logging.error(f"!!!!!!!!!! 端口 {self.port} 已被占用 !!!!!!!!!!")
-                logging.error("请关闭其他正在使用此端口的程序，或使用 'taskkill' 命令强制释放端口。")
+                logging.error("请关闭其他正在使用此端口的程序，或在 config.yaml 中改用其他端口或启用 server.unix_socket。")
             else:
                 logging.error(f"WebSocket 服务器启动时发生未知OSError: {e}", exc_info=True)
         except Exception as e:
             logging.error(f"WebSocket 服务器运行时出错: {e}", exc_info=True)
         finally:
+            if self.journal is not None:
+                self._journal_executor.shutdown(wait=True)
+                self.journal.close()
+            if self.history is not None:
+                self.history.close()
+            if self.remote_capture is not None:
+                self.remote_capture.close()
             loop.close()
             logging.info("WebSocket 服务器已关闭。")
\ No newline at end of file
@@ -0,0 +1,144 @@
+# tests/test_agents.py
+import asyncio
+import json
+import socket
+import threading
+import time
+import pytest
+import websockets
+from benchmarks.harness import ServerHarness
+from src.agent.uplink import AgentUplink
+from src.server.websocket_server import WebSocketServer
+
+
+def _start(uplink: AgentUplink) -> threading.Thread:
+    thread = threading.Thread(target=uplink.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+
+def test_many_agents_fan_in_with_session_filter():
+    agents, per_agent = 20, 5
+
+    async def receive(url, count):
+        async with websockets.connect(url) as client:
+            return [json.loads(await client.recv()) for _ in range(count)]
+
+    with ServerHarness(WebSocketServer, agents={"max_queue": 2}) as harness:
+        results = {}
+
+        def client(name, url, count):
+            results[name] = asyncio.run(receive(url, count))
+        threads = [threading.Thread(target=client, args=("all", harness.url, agents * per_agent), daemon=True),
+                   threading.Thread(target=client, args=("one", harness.url + "?session=agent-3", per_agent),
+                                    daemon=True)]
+        for thread in threads:
+            thread.start()
+        _wait(lambda: len(harness.server.connected_clients) == 2)
+
+        uplinks = [AgentUplink(f"agent-{i}", url=harness.url) for i in range(agents)]
+        for uplink in uplinks:
+            _start(uplink)
+            for n in range(per_agent):
+                uplink.send({"type": "text", "data": f"{uplink.session_id}/{n}", "metadata": {"session_id": "spoof"}})
+        for thread in threads:
+            thread.join(10.0)
+        stats = harness.server.agents.stats()
+        for uplink in uplinks:
+            uplink.stop()
+
+    assert {message["metadata"]["session_id"] for message in results["all"]} == {f"agent-{i}" for i in range(agents)}
+    assert all(message["data"].startswith(message["metadata"]["session_id"] + "/") for message in results["all"])
+    assert [message["data"] for message in results["one"]] == [f"agent-3/{n}" for n in range(per_agent)]
+    assert stats["connected"] == agents and sum(s["received"] for s in stats["sessions"]) == agents * per_agent
+    assert all(uplink.stats() == {"sent": per_agent, "dropped": 0, "pending": 0, "pending_bytes": 0}
+               for uplink in uplinks)
+
+
+def test_agent_rejects_bad_session_token_and_messages():
+    async def run(url, server):
+        results = []
+        for path in ("/agent?session=a%20b&token=secret", "/agent?session=ok&token=wrong"):
+            async with websockets.connect(url + path) as agent:
+                with pytest.raises(websockets.ConnectionClosed) as closed:
+                    await agent.recv()
+                results.append(closed.value.rcvd.code)
+        async with websockets.connect(url + "/?min_text_length=2") as client, \
+                websockets.connect(url + "/agent?session=ok&token=secret") as agent:
+            while not server.connected_clients:
+                await asyncio.sleep(0.001)
+            await agent.send("not json")
+            await agent.send(json.dumps({"type": "unknown"}))
+            # data 或已知元数据字段的类型不对：计数后跳过，代理连接不断开
+            await agent.send(json.dumps({"type": "text", "data": 123}))
+            await agent.send(json.dumps({"type": "text", "data": "ab", "metadata": {"source_app_name": ["a"]}}))
+            await agent.send(json.dumps({"type": "image", "data": "", "metadata": {"region": {"x": "0"}}}))
+            await agent.send(json.dumps({"type": "text", "data": "valid", "metadata": {}}))
+            results.append(json.loads(await client.recv())["data"])
+            results.append(next(iter(server.agents.sessions.values())).to_dict()["rejected"])
+        return results
+
+    with ServerHarness(WebSocketServer, agents={"token": "secret"}) as harness:
+        assert asyncio.run(run(harness.url, harness.server)) == [1008, 1008, "valid", 5]
+
+
+def test_agent_survives_a_message_that_fails_to_publish():
+    async def run(url, server):
+        publish = server._publish
+
+        async def flaky_publish(message, *args):
+            if message["data"] == "boom":
+                raise RuntimeError("boom")
+            await publish(message, *args)
+
+        server._publish = flaky_publish
+        async with websockets.connect(url) as client, websockets.connect(url + "/agent?session=ok") as agent:
+            while not server.connected_clients:
+                await asyncio.sleep(0.001)
+            for data in ("boom", "after"):
+                await agent.send(json.dumps({"type": "text", "data": data, "metadata": {}}))
+            return json.loads(await client.recv())["data"], server.agents.stats()["sessions"][0]["rejected"]
+
+    with ServerHarness(WebSocketServer, agents={"enabled": True}) as harness:
+        assert asyncio.run(run(harness.url, harness.server)) == ("after", 1)
+
+
+def test_uplink_memory_is_bounded_while_broker_is_unreachable():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    uplink = AgentUplink("offline", url=f"ws://127.0.0.1:{port}", max_pending=50, max_pending_bytes=20_000,
+                         reconnect_delay=0.05)
+    thread = _start(uplink)
+    for n in range(200):
+        uplink.send({"type": "image", "data": "x" * 1000, "metadata": {"n": n}})
+    stats = uplink.stats()
+    uplink.stop()
+    thread.join(5.0)
+    assert stats["pending_bytes"] <= 20_000 and stats["pending"] < 50
+    assert stats["dropped"] == 200 - stats["pending"] and stats["sent"] == 0
+    # 保留的是最新的消息
+    assert json.loads(uplink._pending[-1])["metadata"]["n"] == 199
+    assert not thread.is_alive()
+
+
+def test_uplink_reconnects_after_config_reload():
+    with ServerHarness(WebSocketServer, agents={"enabled": True}) as first, \
+            ServerHarness(WebSocketServer, agents={"enabled": True}) as second:
+        uplink = AgentUplink("moving", url=first.url, reconnect_delay=0.05)
+        thread = _start(uplink)
+        _wait(uplink.connected.is_set)
+        # 修改 agent 段后断开并按新的 broker 地址重连
+        uplink.update_config({"session_id": "moving", "url": second.url, "max_pending": 10})
+        _wait(lambda: second.server.agents.sessions)
+        assert uplink.max_pending == 10 and uplink.url == second.url
+        uplink.stop()
+        thread.join(5.0)
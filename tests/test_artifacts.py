@@ -0,0 +1,77 @@
+# tests/test_artifacts.py
+import asyncio
+import base64
+import json
+from io import BytesIO
+import websockets
+from PIL import Image
+from benchmarks.harness import ServerHarness
+from src.server.artifacts import ArtifactStore
+from src.server.websocket_server import WebSocketServer
+
+
+def _image(width=640, height=480, capture_id=None):
+    buffered = BytesIO()
+    Image.new("RGB", (width, height), (10, 120, 200)).save(buffered, format="PNG")
+    message = {"type": "image", "timestamp": "", "data": base64.b64encode(buffered.getvalue()).decode(),
+               "metadata": {"format": "png", "encoding": "base64",
+                            "region": {"x": 100, "y": 50, "width": width, "height": height}}}
+    if capture_id:
+        message["metadata"]["capture_id"] = capture_id
+    return message
+
+
+def _size(message):
+    with Image.open(BytesIO(base64.b64decode(message["data"]))) as image:
+        return image.size
+
+
+def test_store_evicts_least_recently_used():
+    store = ArtifactStore(max_items=2)
+    for capture_id in ("a", "b"):
+        store.ingest(_image(20, 20, capture_id))
+    store.get("a")
+    store.ingest(_image(20, 20, "c"))
+
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.stats()["evictions"] == 1
+
+    message = store.ingest({**_image(20, 20), "artifacts": {"thumbnail": {"data": "AAAA", "max_size": 8}}})
+    assert "artifacts" not in message
+    assert store.thumbnail(message["metadata"]["capture_id"], 8)["metadata"]["thumbnail"] is True
+
+    tiny = ArtifactStore(max_bytes=1)
+    tiny.ingest(_image(20, 20, "x"))
+    tiny.ingest(_image(20, 20, "y"))
+    assert len(tiny) == 1 and "y" in tiny
+
+
+def test_progressive_delivery_and_fetch():
+    """
+    渐进客户端先收到缩略图再收到完整图像；之后可按 capture_id 取回裁剪/缩放后的图像。
+    """
+    async def run(harness):
+        async with websockets.connect(harness.url + "/?progressive=1&thumbnail_size=64", max_size=None) as client:
+            harness.server.queue_message(_image(capture_id="cap1"))
+            thumb, full = json.loads(await client.recv()), json.loads(await client.recv())
+
+            await client.send(json.dumps({"action": "fetch", "capture_id": "cap1", "request_id": 7,
+                                          "crop": {"x": 10, "y": 20, "width": 200, "height": 100}, "scale": 0.5}))
+            fetched = json.loads(await client.recv())
+            await client.send(json.dumps({"action": "fetch", "capture_id": "cap1",
+                                          "crop": {"x": 600, "y": 0, "width": 100, "height": 100}}))
+            bad_crop = json.loads(await client.recv())
+            await client.send(json.dumps({"action": "fetch", "capture_id": "missing", "request_id": 8}))
+            missing = json.loads(await client.recv())
+            return thumb, full, fetched, bad_crop, missing
+
+    with ServerHarness(WebSocketServer) as harness:
+        thumb, full, fetched, bad_crop, missing = asyncio.run(run(harness))
+
+    assert thumb["metadata"]["thumbnail"] is True and max(_size(thumb)) == 64
+    assert full["metadata"]["capture_id"] == "cap1" and _size(full) == (640, 480)
+    assert fetched["request_id"] == 7 and fetched["metadata"]["fetched"] is True
+    assert _size(fetched) == (100, 50)
+    assert fetched["metadata"]["region"] == {"x": 110, "y": 70, "width": 200, "height": 100}
+    assert bad_crop["type"] == "error"
+    assert missing["type"] == "error" and missing["request_id"] == 8
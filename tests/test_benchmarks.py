@@ -0,0 +1,75 @@
+# tests/test_benchmarks.py
+from benchmarks.harness import compare_to_baseline, percentile, summarize
+from benchmarks.suite import run_suite
+
+
+def test_suite_smoke():
+    """
+    以极小规模跑通全部场景，确保基准管线本身可用。
+    """
+    results = run_suite(image_sizes=[(320, 240)], client_counts=[2], iterations=2, log=lambda *_: None)
+
+    assert {
+        "capture_encode[320x240]",
+        "pipeline[320x240,clients=2]",
+        "selection[clients=2]",
+        "compression[capture_ui_320x240,none]",
+        "compression[selection_short,deflate-6-w12]",
+    } <= set(results)
+    assert results["pipeline[320x240,clients=2]"]["samples"] == 4 # 每条消息送达每个客户端各计一次
+    for name, metrics in results.items():
+        if name.startswith("compression["):
+            continue
+        assert metrics["p50_ms"] > 0
+        assert metrics["throughput_per_s"] > 0
+        assert metrics["peak_memory_mb"] >= 0
+
+
+def test_summarize_percentiles():
+    stats = summarize([i / 1000.0 for i in range(1, 101)], elapsed_s=2.0, operations=100)
+    assert stats["p50_ms"] == 50
+    assert stats["p99_ms"] == 99
+    assert stats["throughput_per_s"] == 50
+    assert percentile([], 50) == 0.0
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {"s": {"p50_ms": 10.0, "throughput_per_s": 100.0, "peak_memory_mb": 5.0}}
+    current = {"s": {"p50_ms": 14.0, "throughput_per_s": 70.0, "peak_memory_mb": 5.5},
+               "new": {"p50_ms": 1.0}}
+
+    regressions = compare_to_baseline(current, baseline, tolerance=0.25)
+
+    assert len(regressions) == 2
+    assert any("p50_ms" in line for line in regressions)
+    assert any("throughput_per_s" in line for line in regressions)
+
+
+def test_loadtest_counts_missing_seqs_as_a_set():
+    from benchmarks.loadtest import _missing, _record_seq
+
+    record = {"first_seq": None, "last_seq": None, "seen": bytearray(), "received": 0, "duplicates": 0,
+              "reordered": 0}
+    for seq in (5, 7, 6, 7, 4, 9):
+        _record_seq(record, seq)
+    # 期望 4..10，收到 4、5、6、7、9：缺 8 与 10；重复的 7 不会抵消缺失
+    assert _missing(record, 10) == 2
+    assert (record["received"], record["duplicates"], record["reordered"]) == (5, 1, 2)
+
+
+def test_loadtest_short_soak_has_no_leaks():
+    """
+    短时间浸泡：包含慢客户端与周期性重连的客户端，结束后 connected_clients 应清空且无丢失。
+    """
+    from benchmarks.loadtest import run_loadtest
+
+    summary = run_loadtest(clients=12, slow_clients=2, slow_delay=0.01, churn_clients=2,
+                           churn_interval=0.5, rate=40, image_ratio=0.2, image_bytes=20000,
+                           duration=2.0, interval=0.5, drain=5.0, log=lambda *_: None)
+
+    assert summary["messages_sent"] > 0
+    assert summary["deliveries"] > 0
+    assert summary["dropped"] == 0 and summary["duplicates"] == 0
+    assert summary["leaked_clients"] == 0
+    assert summary["reconnects"] > 0
+    assert summary["timeline"]
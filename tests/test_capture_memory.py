@@ -0,0 +1,74 @@
+# tests/test_capture_memory.py
+import base64
+import importlib
+import queue
+import tracemalloc
+from io import BytesIO
+import pytest
+from PIL import Image
+from benchmarks.fakes import fake_backends
+from src.capture.encoding import encode_image
+from src.capture.memory import CaptureBudget, CaptureTooLarge
+
+
+def test_streaming_encoder_matches_pillow():
+    image = Image.frombytes("RGB", (301, 97), bytes(range(256)) * (301 * 97 * 3 // 256 + 1))
+    for fmt, options in (("png", {}), ("jpeg", {"quality": 80}), ("webp", {"quality": 80})):
+        expected = BytesIO()
+        image.save(expected, format=fmt.upper(), **options)
+        assert base64.b64decode(encode_image(image, fmt, 80)) == expected.getvalue()
+
+
+def test_tiled_grab_reuses_buffer_and_enforces_budget():
+    with fake_backends(screen_size=(1024, 768)) as backends:
+        direct = importlib.import_module("src.capture.direct")
+        capture = direct.DirectCapture(queue.Queue(), thumbnail_size=64,
+                                       budget=CaptureBudget(max_bytes=64 * 1024 * 1024, tile_threshold=640 * 480,
+                                                            tile_rows=128))
+        region = {"x": 0, "y": 0, "width": 1024, "height": 768}
+        grabs = backends.screen.grab_count
+        message = capture.capture(region, {"format": "png"}, deliver=False)
+        tiled_grabs = backends.screen.grab_count - grabs
+        # 假屏幕按抓取尺寸生成像素，每一块都是同一帧 1024x128 的数据
+        expected = Image.frombytes("RGB", (1024, 768), backends.screen.frame(1024, 128) * 6, "raw", "BGRX")
+        decoded = Image.open(BytesIO(base64.b64decode(message["data"])))
+
+        small = {"x": 0, "y": 0, "width": 320, "height": 200}
+        first = capture.capture(small, {"format": "png"}, deliver=False)
+        buffer = capture._frame_buffer._image
+        second = capture.capture(small, {"format": "png"}, deliver=False)
+        reused = capture._frame_buffer._image is buffer
+
+        with pytest.raises(CaptureTooLarge):
+            capture.budget.plan(8192, 8192)
+        stats = capture.budget.stats()
+        capture.close()
+
+    assert tiled_grabs == 6 and decoded.tobytes() == expected.tobytes()
+    assert reused and first["data"] == second["data"]
+    assert stats["tiled"] == 1 and stats["rejected"] == 1 and stats["captures"] == 3
+
+
+def test_peak_memory_for_triple_4k_capture():
+    width, height = 11520, 2160
+    with fake_backends(screen_size=(width, height)) as backends:
+        direct = importlib.import_module("src.capture.direct")
+        capture = direct.DirectCapture(queue.Queue(), thumbnail_size=256)
+        region = {"x": 0, "y": 0, "width": width, "height": height}
+        # 预热：假屏幕为每种抓取尺寸缓存的像素数据不计入测量
+        rows = capture.budget.tile_rows
+        backends.screen.frame(width, rows)
+        backends.screen.frame(width, height % rows)
+        tracemalloc.start()
+        try:
+            message = capture.capture(region, {"format": "png"}, deliver=False)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            capture.close()
+
+    output = len(message["data"])
+    tile = width * capture.budget.tile_rows * 4
+    # 完整的 BGRA 帧 (约 100 MB) 与二进制 PNG 从未整体驻留；峰值只有 Base64 分片加最终字符串
+    assert peak < 2 * output + tile + 8 * 1024 * 1024
+    assert peak < capture.budget.peak_estimated_bytes
@@ -0,0 +1,135 @@
+# tests/test_clipboard.py
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from benchmarks.fakes import fake_backends, run_scheduled, simulate_region_capture
+from src.capture.clipboard import ClipboardService, bmp_file, encode_clipboard_targets
+
+
+def _image():
+    image = Image.new("RGB", (37, 21), (10, 200, 30))
+    image.putpixel((3, 4), (255, 0, 0))
+    return image
+
+
+def test_clipboard_targets_round_trip():
+    image = _image()
+    payloads = encode_clipboard_targets(image)
+    assert Image.open(BytesIO(payloads["png"])).convert("RGB").tobytes() == image.tobytes()
+    # CF_DIB 不带文件头；补上文件头后 (X11 的 image/bmp) 是完整的 BMP 文件
+    assert payloads["dib"][:4] == (40).to_bytes(4, "little")
+    assert Image.open(BytesIO(bmp_file(payloads["dib"]))).tobytes() == image.tobytes()
+
+
+def test_service_encodes_off_the_tk_thread(monkeypatch):
+    with fake_backends() as backends:
+        from src.capture import clipboard
+        encode = clipboard.encode_clipboard_targets
+        threads = []
+        monkeypatch.setattr(clipboard, "encode_clipboard_targets",
+                            lambda *args: threads.append(threading.current_thread().name) or encode(*args))
+        root = backends.tk.Tk()
+        service = clipboard.ClipboardService(root, backend="tk")
+        results = []
+        assert service.copy(_image(), results.append) and not service.holding
+        run_scheduled(root, until=lambda: results)
+
+        assert results == [True] and service.holding
+        assert threads and threads[0].startswith("ClipboardExport")
+        png = clipboard.encode_clipboard_targets(_image(), ("png",))["png"]
+        serve = root.selection_handlers[("CLIPBOARD", "image/png")]
+        # 粘贴方按偏移分段读取
+        assert (serve("0", "100") + serve("100", str(len(png)))).encode("latin-1") == png
+        assert root.selection_handlers[("CLIPBOARD", "image/bmp")]("0", "2") == "BM"
+
+        # 被其他程序取代后不再持有
+        _, on_lost = root.selection_owners["CLIPBOARD"]
+        on_lost()
+        assert not service.holding
+
+        # tk 后端需要显式选择，auto 在没有 xclip 时不使用它
+        monkeypatch.setattr(clipboard.shutil, "which", lambda name: None)
+        assert clipboard.detect_backend("auto", root) is None and clipboard.detect_backend("tk", root) is not None
+
+
+def test_preview_fades_and_holds_clipboard_without_blocking():
+    config = {"screenshot": {"clipboard_backend": "tk", "clipboard_hold_seconds": 60}}
+    holding = threading.Event()
+    with fake_backends(screen_size=(800, 600)) as backends:
+        from src.capture.screenshot import ModernScreenshot
+        root = backends.tk.Tk()
+        app = ModernScreenshot(root, config, queue.Queue(), clipboard_holding=holding)
+        preview = simulate_region_capture(app, 100, 150, 320, 200)
+
+        app._copy_image_to_clipboard(preview)
+        run_scheduled(root, until=lambda: app.clipboard.holding)
+        assert any(child.cget("text") == "已复制!" for child in preview.children)
+
+        # 淡出由 after() 逐步推进，调用本身立即返回
+        started = time.perf_counter()
+        app._fade_out_and_close(preview)
+        assert time.perf_counter() - started < 0.05 and preview.winfo_exists()
+        run_scheduled(root, until=holding.is_set)
+        assert not preview.winfo_exists() and root.quit_count == 0
+
+        # 剪贴板被取代后截图进程才退出
+        _, on_lost = root.selection_owners["CLIPBOARD"]
+        on_lost()
+        run_scheduled(root, until=lambda: root.quit_count)
+        assert root.quit_count == 1
+
+
+# 另一个 X 客户端读取 CLIPBOARD：同一进程内的 selection_get 不经过 X11 的格式转换
+_READ_WITH_TK = """
+import sys, tkinter
+root = tkinter.Tk()
+root.withdraw()
+sys.stdout.buffer.write(root.selection_get(selection="CLIPBOARD", type=sys.argv[1]).encode("latin-1"))
+"""
+
+
+def _read_clipboard(root, mime_type: str) -> bytes:
+    if shutil.which("xclip"):
+        command = ["xclip", "-o", "-selection", "clipboard", "-t", mime_type]
+    else:
+        command = [sys.executable, "-c", _READ_WITH_TK, mime_type]
+    reader = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # 读取方等待本进程应答，期间必须继续处理 Tk 事件
+    deadline = time.monotonic() + 10
+    while reader.poll() is None and time.monotonic() < deadline:
+        root.update()
+        time.sleep(0.01)
+    output, errors = reader.communicate(timeout=1)
+    assert reader.returncode == 0, errors
+    return output
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux") or not os.environ.get("DISPLAY"),
+                    reason="需要 X11 显示，可用 xvfb-run python -m pytest 运行")
+def test_tk_owner_serves_x11_clipboard():
+    import tkinter
+    root = tkinter.Tk()
+    root.withdraw()
+    try:
+        service = ClipboardService(root, backend="tk")
+        results = []
+        service.copy(_image(), results.append)
+        deadline = time.monotonic() + 5
+        while not results and time.monotonic() < deadline:
+            root.update()
+            time.sleep(0.01)
+        assert results == [True]
+        payloads = encode_clipboard_targets(_image())
+        assert _read_clipboard(root, "image/png") == payloads["png"]
+        assert _read_clipboard(root, "image/bmp") == bmp_file(payloads["dib"])
+    finally:
+        root.destroy()
@@ -0,0 +1,68 @@
+# tests/test_compression.py
+import asyncio
+import json
+import pytest
+import websockets
+from websockets.frames import Frame, Opcode
+from benchmarks.harness import ServerHarness
+from src.server.compression import (
+    ZSTD_SUBPROTOCOL,
+    CompressionPolicy,
+    SelectivePerMessageDeflate,
+)
+from src.server.websocket_server import WebSocketServer
+
+TEXT_MESSAGE = {"type": "text", "timestamp": "", "data": "hello world " * 100, "metadata": {}}
+IMAGE_MESSAGE = {"type": "image", "timestamp": "", "data": "iVBORw0KGgo" * 200, "metadata": {"format": "png"}}
+
+
+def test_policy_per_type_and_min_size():
+    policy = CompressionPolicy({"per_type": {"image": False}, "min_size": 100})
+
+    assert policy.should_deflate("text", 1000)
+    assert not policy.should_deflate("text", 50)
+    assert not policy.should_deflate("image", 10_000)
+    assert policy.should_deflate("ocr", 1000) # 未配置的类型默认压缩
+
+
+def test_selective_deflate_skips_flagged_messages():
+    extension = SelectivePerMessageDeflate(False, False, 15, 15)
+    payload = b"x" * 1000
+
+    extension.compress_next = False
+    plain = extension.encode(Frame(Opcode.TEXT, payload))
+    extension.compress_next = True
+    compressed = extension.encode(Frame(Opcode.TEXT, payload))
+
+    assert plain.data == payload and not plain.rsv1
+    assert compressed.rsv1 and len(compressed.data) < len(payload)
+
+
+def _deliver_both(harness, **connect_kwargs):
+    """连接一个客户端，推送一条文本和一条图像消息，返回 (协商的子协议, 收到的两帧)。"""
+    async def run():
+        async with websockets.connect(harness.url, **connect_kwargs) as ws:
+            await asyncio.sleep(0.1)
+            harness.server.queue_message(TEXT_MESSAGE)
+            harness.server.queue_message(IMAGE_MESSAGE)
+            return ws.subprotocol, [await ws.recv() for _ in range(2)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("config", [None, {"deflate": False}, {"level": 1, "window_bits": 9}])
+def test_server_delivers_with_deflate_settings(config):
+    with ServerHarness(WebSocketServer, compression=config) as harness:
+        subprotocol, frames = _deliver_both(harness)
+
+    assert subprotocol is None
+    assert [json.loads(frame) for frame in frames] == [TEXT_MESSAGE, IMAGE_MESSAGE]
+
+
+def test_server_sends_zstd_frames_to_opted_in_clients():
+    zstandard = pytest.importorskip("zstandard")
+    with ServerHarness(WebSocketServer, compression={"zstd": True}) as harness:
+        subprotocol, frames = _deliver_both(harness, subprotocols=[ZSTD_SUBPROTOCOL])
+
+    assert subprotocol == ZSTD_SUBPROTOCOL
+    decoded = [json.loads(zstandard.ZstdDecompressor().decompress(frame)) for frame in frames]
+    assert decoded == [TEXT_MESSAGE, IMAGE_MESSAGE]
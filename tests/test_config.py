@@ -0,0 +1,183 @@
+# tests/test_config.py
+import asyncio
+import importlib
+import os
+import threading
+import time
+import pytest
+import websockets
+import yaml
+from benchmarks.fakes import fake_backends
+from benchmarks.harness import ServerHarness
+from src.config_loader import ConfigLoader
+from src.config_schema import AppConfig, ConfigError, ServerConfig
+from src.server.websocket_server import WebSocketServer
+
+BASE = {
+    "hotkey": {"screenshot": "<alt>+q"},
+    "server": {"host": "127.0.0.1", "port": 8765},
+    "screenshot": {"overlay_alpha": 0.2, "border_color": "#007aff"},
+}
+
+
+def _write(path, config):
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    # 保证修改时间与上一次不同
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_schema_reports_all_errors():
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({"hotkey": {"screenshot": "alt q"}, "server": {"host": "", "port": 70000},
+                             "screenshot": {"overlay_alpha": 2, "border_color": "not a color!"}})
+    assert len(info.value.errors) == 5
+    assert any(error.startswith("server.port") for error in info.value.errors)
+
+    config = AppConfig.from_dict(BASE)
+    assert config.hotkey.screenshot_keys == ("<alt>", "q")
+    assert config.screenshot.to_dict()["preview_bg"] == "#2e2e2e"
+    assert config.get("server.port") == 8765 and config.get("server.missing.key") is None
+
+
+def test_optional_sections_are_validated():
+    config = AppConfig.from_dict({**BASE, "logging": {"level": "debug", "directory": None, "max_bytes": 0}})
+    # 未给出的项由各模块按自己的默认值补齐；显式的 null 保留
+    assert config.logging.to_dict() == {"level": "debug", "directory": None, "max_bytes": 0}
+    assert config.section("logging") is config.logging
+
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "logging": {"level": "loud", "max_bytes": "10MB", "queue_size": 0,
+                                                 "console": "yes", "rate_limit_burst": 0}})
+    assert sorted(error.split(":")[0] for error in info.value.errors) == [
+        "logging.console", "logging.level", "logging.max_bytes", "logging.queue_size", "logging.rate_limit_burst"]
+
+    # probe_every 为 0 时会在取模时除零
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "selection": {"probe_every": 0, "failure_streak": "8", "stats_path": 3}})
+    assert sorted(error.split(":")[0] for error in info.value.errors) == [
+        "selection.failure_streak", "selection.probe_every", "selection.stats_path"]
+    assert AppConfig.from_dict({**BASE, "selection": {"stats_path": None}}).selection.to_dict() == {"stats_path": None}
+
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "text_pipeline": {"cache_size": -1, "batch_window_ms": "fast", "max_batch": 0,
+                                                       "hyphenation": "maybe"}})
+    assert sorted(error.split(":")[0] for error in info.value.errors) == [
+        "text_pipeline.batch_window_ms", "text_pipeline.cache_size", "text_pipeline.hyphenation",
+        "text_pipeline.max_batch"]
+
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "agent": {"url": "localhost:8765", "session_id": "a b", "max_pending": "64",
+                                               "reconnect_delay": 0}})
+    assert sorted(error.split(":")[0] for error in info.value.errors) == [
+        "agent.max_pending", "agent.reconnect_delay", "agent.session_id", "agent.url"]
+
+
+def test_reload_notifies_changed_sections_and_keeps_last_good(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, BASE)
+    loader = ConfigLoader(str(path))
+    events = []
+    loader.subscribe(lambda new, old: events.append(("hotkey", old.screenshot, new.screenshot)), "hotkey")
+    loader.subscribe(lambda new, old: events.append(("server", new.port)), "server")
+
+    _write(path, {**BASE, "hotkey": {"screenshot": "<ctrl>+<alt>+x"}})
+    assert loader.check_for_changes()
+    assert events == [("hotkey", "<alt>+q", "<ctrl>+<alt>+x")]
+
+    path.write_text("hotkey: [unclosed", encoding="utf-8")
+    assert loader.reload() is False
+    _write(path, {**BASE, "server": {"host": "127.0.0.1", "port": "eighty"}})
+    assert loader.reload() is False
+    assert "server.port" in loader.last_error
+    assert loader.config.hotkey.screenshot == "<ctrl>+<alt>+x" and len(events) == 1
+
+    _write(path, {**BASE, "server": {"host": "127.0.0.1", "port": 9000}})
+    assert loader.check_for_changes() and loader.last_error is None
+    assert events[-1] == ("server", 9000)
+
+
+def test_watch_thread_picks_up_changes(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, BASE)
+    loader = ConfigLoader(str(path))
+    changed = threading.Event()
+    loader.subscribe(lambda new, old: changed.set(), "screenshot")
+    shutdown = threading.Event()
+    watcher = threading.Thread(target=loader.watch, args=(shutdown, 0.05, 0.01), daemon=True)
+    watcher.start()
+
+    _write(path, {**BASE, "screenshot": {"overlay_alpha": 0.5}})
+    assert changed.wait(5.0)
+    shutdown.set()
+    watcher.join(timeout=5.0)
+    assert loader.config.screenshot.overlay_alpha == 0.5
+
+
+def test_hotkey_listener_reregisters():
+    with fake_backends() as backends:
+        config_schema = importlib.import_module("src.config_schema")
+        hotkey_listener = importlib.import_module("src.listeners.hotkey_listener")
+        shutdown = threading.Event()
+        listener = hotkey_listener.HotkeyListener(config_schema.AppConfig.from_dict(BASE), shutdown)
+        thread = threading.Thread(target=listener.run, daemon=True)
+        thread.start()
+        while not backends.hotkey_listeners:
+            time.sleep(0.001)
+
+        new = config_schema.AppConfig.from_dict({**BASE, "hotkey": {"screenshot": "<ctrl>+<shift>+s"},
+                                                 "screenshot": {"border_width": 5}})
+        listener.update_config(new)
+        shutdown.set()
+        thread.join(timeout=5.0)
+
+    first, second = backends.hotkey_listeners
+    assert list(first.hotkeys) == ["<alt>+q"] and not first.running
+    assert list(second.hotkeys) == ["<ctrl>+<shift>+s"]
+    assert listener._child_configs["screenshot"] == {"screenshot": new.screenshot.to_dict(),
+                                                     "profile": new.profiles["screenshot"].to_dict()}
+
+
+def test_server_rebinds_without_dropping_clients():
+    async def run(harness):
+        server = harness.server
+        async with websockets.connect(harness.url) as old_client:
+            # 压缩设置变化需要重新监听
+            future = server.update_settings(ServerConfig("127.0.0.1", 0, compression={"deflate": False},
+                                                         artifacts={"max_items": 2}))
+            assert await asyncio.wrap_future(future)
+            async with websockets.connect(f"ws://127.0.0.1:{server.port}") as new_client:
+                server.queue_message({"type": "text", "data": "hello", "metadata": {}})
+                return (await old_client.recv(), await new_client.recv(), server.artifacts.max_items,
+                        old_client.protocol.extensions, new_client.protocol.extensions)
+
+    with ServerHarness(WebSocketServer) as harness:
+        old_message, new_message, max_items, old_extensions, new_extensions = asyncio.run(run(harness))
+    assert old_message == new_message and max_items == 2
+    assert old_extensions and not new_extensions
+
+
+def test_invalid_compression_keeps_listening():
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "server": {**BASE["server"], "compression": {
+            "level": 0, "window_bits": 20, "min_size": -1, "zstd_level": 30, "per_type": {"text": "yes"}}}})
+    assert sorted(error.split(":")[0] for error in info.value.errors) == [
+        "server.compression.level", "server.compression.min_size", "server.compression.per_type",
+        "server.compression.window_bits", "server.compression.zstd_level"]
+
+    async def run(harness):
+        server = harness.server
+        # 绕过校验直接传入：构造压缩参数失败时不关闭原来的监听器
+        future = server.update_settings(ServerConfig("127.0.0.1", 0, compression={"window_bits": 20}))
+        assert not await asyncio.wrap_future(future)
+        # 反复重新监听不会累积已关闭的监听器
+        for index in range(3):
+            future = server.update_settings(ServerConfig("127.0.0.1", 0, compression={"deflate": index % 2 == 0}))
+            assert await asyncio.wrap_future(future)
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}") as client:
+            server.queue_message({"type": "text", "data": "still here", "metadata": {}})
+            return await client.recv(), len(server._servers)
+
+    with ServerHarness(WebSocketServer) as harness:
+        message, listeners = asyncio.run(run(harness))
+    assert "still here" in message and listeners == 1
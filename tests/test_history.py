@@ -0,0 +1,89 @@
+# tests/test_history.py
+import asyncio
+import json
+import queue
+import websockets
+from benchmarks.harness import ServerHarness
+from benchmarks.history import bench_history
+from src.server.history import HistoryQuery, HistoryStore
+from src.server.websocket_server import WebSocketServer
+
+
+def _text(data, app, timestamp="2025-10-16T12:00:00Z"):
+    return {"type": "text", "timestamp": timestamp, "data": data,
+            "metadata": {"source_app_name": app, "source_window_title": "Doc"}}
+
+
+def _image(x, y, timestamp="2025-10-16T12:00:00Z"):
+    return {"type": "image", "timestamp": timestamp, "data": "aGVsbG8=",
+            "metadata": {"format": "png", "capture_id": f"cap-{x}-{y}",
+                         "region": {"x": x, "y": y, "width": 100, "height": 100}}}
+
+
+def test_store_filters_and_pagination(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    for i in range(25):
+        store.record(_text(f"selection number {i}", "WINWORD.EXE", f"2025-10-16T12:{i:02d}:00Z"))
+    store.record(_text("本项目是一个高效的桌面信息捕获工具", "chrome.exe"))
+    store.record(_image(0, 0))
+    store.record(_image(500, 500))
+    store.flush()
+
+    items, cursor = store.query(HistoryQuery(source_app="winword.exe", since="2025-10-16T12:10:00Z"), limit=10)
+    assert [item["data"] for item in items] == [f"selection number {i}" for i in range(24, 14, -1)]
+    items, cursor = store.query(HistoryQuery(source_app="winword.exe", since="2025-10-16T12:10:00Z"), 10, cursor)
+    assert len(items) == 5 and cursor is None
+
+    items, _ = store.query(HistoryQuery(text="number 7"))
+    assert [item["data"] for item in items] == ["selection number 7"]
+    assert store.query(HistoryQuery(text="捕获工具"))[0][0]["source_app_name"] == "chrome.exe"
+
+    images, _ = store.query(HistoryQuery(region={"x": 450, "y": 450, "width": 100, "height": 100}))
+    assert [image["capture_id"] for image in images] == ["cap-500-500"]
+    assert images[0]["hash"] and images[0]["bytes"] == 5
+
+    pages = list(store.iter_query(HistoryQuery(types="text"), page_size=7))
+    assert [len(page) for page in pages] == [7, 7, 7, 5]
+
+    # 入队的是转换好的行：写线程积压时队列中没有图像数据
+    writer_queue, store._queue = store._queue, queue.Queue()
+    store.record(_image(1, 1))
+    row = store._queue.get_nowait()
+    assert isinstance(row, tuple) and "aGVsbG8=" not in row
+    store._queue = writer_queue
+    store.close()
+
+
+def test_server_history_query_and_stream(tmp_path):
+    async def run(harness):
+        for i in range(12):
+            harness.server.queue_message(_text(f"hello {i}", "WINWORD.EXE"))
+        while harness.server.history.count() < 12:
+            harness.server.history.flush()
+            await asyncio.sleep(0.01)
+
+        async with websockets.connect(harness.url + "/?types=image") as client:
+            await client.send(json.dumps({"action": "history", "request_id": 1, "page_size": 5,
+                                          "filters": {"types": ["text"], "text": "hello"}}))
+            page = json.loads(await client.recv())
+            await client.send(json.dumps({"action": "history", "request_id": 2, "page_size": 5,
+                                          "stream": True, "limit": 11}))
+            stream = [json.loads(await client.recv()) for _ in range(3)]
+            await client.send(json.dumps({"action": "history", "filters": {"since": "yesterday"}}))
+            error = json.loads(await client.recv())
+        return page, stream, error
+
+    with ServerHarness(WebSocketServer, history={"path": str(tmp_path / "history.db")}) as harness:
+        page, stream, error = asyncio.run(run(harness))
+
+    assert page["request_id"] == 1 and len(page["items"]) == 5 and page["next_cursor"] and page["done"]
+    assert page["items"][0]["data"] == "hello 11" and page["items"][0]["seq"] is None
+    assert [len(message["items"]) for message in stream] == [5, 5, 1]
+    assert [message["done"] for message in stream] == [False, False, True]
+    assert error["type"] == "error"
+
+
+def test_history_benchmark_smoke():
+    results = bench_history(records=2000, queries=3, log=lambda *_: None)
+    assert results["history[ingest,records=2000]"]["throughput_per_s"] > 0
+    assert results["history[query:fulltext]"]["samples"] == 3
@@ -0,0 +1,160 @@
+# tests/test_journal.py
+import asyncio
+import base64
+import json
+import os
+import threading
+from io import BytesIO
+import websockets
+from PIL import Image
+from benchmarks.harness import ServerHarness
+from src.server.journal import CaptureJournal
+from src.server.websocket_server import WebSocketServer
+
+
+def _append(journal, count, timestamp=None):
+    for _ in range(count):
+        seq = journal.reserve()
+        journal.append(seq, json.dumps({"type": "text", "seq": seq, "data": "x" * 100}), timestamp)
+
+
+def test_append_read_and_segments(tmp_path):
+    journal = CaptureJournal(str(tmp_path), segment_bytes=1024)
+    _append(journal, 30)
+
+    assert (journal.first_seq, journal.last_seq) == (1, 30)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".log")]) > 1
+    records = journal.read(5, limit=10)
+    assert [seq for seq, _ in records] == list(range(5, 15))
+    assert json.loads(records[0][1])["seq"] == 5
+    assert [seq for seq, _ in journal.read(28, until_seq=29)] == [28, 29]
+    journal.close()
+
+
+def test_reopen_recovers_unindexed_and_torn_records(tmp_path):
+    journal = CaptureJournal(str(tmp_path))
+    _append(journal, 5)
+    journal.close()
+
+    log_path = os.path.join(tmp_path, f"{1:020d}.log")
+    index_path = os.path.join(tmp_path, f"{1:020d}.idx")
+    # 模拟崩溃：索引少写了最后两项，日志末尾残留半条记录
+    with open(index_path, "r+b") as f:
+        f.truncate(os.path.getsize(index_path) - 2 * 20)
+    with open(log_path, "ab") as f:
+        f.write(b"\x06\x00\x00")
+
+    journal = CaptureJournal(str(tmp_path))
+    assert journal.last_seq == 5 and journal.next_seq == 6
+    _append(journal, 1)
+    assert [seq for seq, _ in journal.read(1)] == [1, 2, 3, 4, 5, 6]
+    journal.close()
+
+
+def test_retention_by_size_and_age(tmp_path):
+    journal = CaptureJournal(str(tmp_path), segment_bytes=1024, max_bytes=2048)
+    _append(journal, 50)
+    assert journal.size_bytes <= 2048 + 1024
+    assert journal.first_seq > 1 and journal.last_seq == 50
+    assert [seq for seq, _ in journal.read(1, limit=1)] == [journal.first_seq]
+    journal.close()
+
+    journal = CaptureJournal(str(tmp_path / "age"), segment_bytes=1024, max_age_hours=1)
+    _append(journal, 20, timestamp=0.0)
+    _append(journal, 20)
+    # 过期判断以整段为单位：只剩与新记录同段的旧记录
+    assert 1 < journal.first_seq <= 21 and journal.last_seq == 40
+    journal.close()
+
+
+def test_retention_without_size_rollover(tmp_path):
+    # 分段远未写满：写入时当前段跨越的时间超过存活时间即换段，旧段随之删除
+    journal = CaptureJournal(str(tmp_path), max_age_hours=1)
+    _append(journal, 5, timestamp=0.0)
+    _append(journal, 5, timestamp=3000.0)
+    _append(journal, 5, timestamp=3700.0)
+    assert (journal.first_seq, journal.last_seq) == (1, 15)
+    _append(journal, 1, timestamp=6700.0)
+    assert journal.first_seq == 11
+
+    # 没有新消息时由 expire() 清理；全部过期后从空段继续，重新打开后 seq 不会重复
+    journal.expire(now=20000.0)
+    assert (journal.first_seq, journal.last_seq, journal.size_bytes) == (0, 0, 0)
+    journal.close()
+    journal = CaptureJournal(str(tmp_path), max_age_hours=1)
+    assert journal.next_seq == 17
+    _append(journal, 1)
+    assert [seq for seq, _ in journal.read(1)] == [17]
+    journal.close()
+
+
+def test_client_resumes_missed_messages(tmp_path):
+    """
+    没有客户端在线时广播的消息写入日志；重连的客户端从 seq 2 开始补收，之后继续收到实时消息。
+    """
+    async def run(harness):
+        for i in range(3):
+            harness.server.queue_message({"type": "text", "data": f"missed {i}", "metadata": {}})
+        while harness.server.journal.next_seq <= 3:
+            await asyncio.sleep(0.01)
+
+        async with websockets.connect(harness.url + "/?types=text") as client:
+            await client.send(json.dumps({"action": "resume", "from_seq": 2, "request_id": "r1"}))
+            received = [json.loads(await client.recv())]
+            # 补发过程中到达的实时消息排在补发内容之后
+            harness.server.queue_message({"type": "text", "data": "live", "metadata": {}})
+            received += [json.loads(await client.recv()) for _ in range(3)]
+        async with websockets.connect(harness.url + "/?resume_from=3") as client:
+            replayed = json.loads(await client.recv())
+        return received, replayed
+
+    with ServerHarness(WebSocketServer, journal={"directory": str(tmp_path)}) as harness:
+        received, replayed = asyncio.run(run(harness))
+
+    assert [m.get("seq") for m in received[:2]] == [2, 3]
+    assert received[2]["type"] == "resumed" and received[2]["request_id"] == "r1"
+    assert received[2]["count"] == 2 and received[2]["truncated"] is False
+    assert received[3]["data"] == "live" and received[3]["seq"] == 4
+    assert replayed["seq"] == 3
+
+
+def test_resume_during_publish_does_not_duplicate(tmp_path):
+    """发布一条消息时在生成缩略图处挂起，此时请求补发：该消息只经补发送达一次。"""
+    buffered = BytesIO()
+    Image.new("RGB", (200, 100), (10, 120, 200)).save(buffered, format="PNG")
+    image = {"type": "image", "data": base64.b64encode(buffered.getvalue()).decode(), "metadata": {"format": "png"}}
+
+    async def run(harness):
+        server = harness.server
+        entered, gate = threading.Event(), threading.Event()
+        variant_message = server._variant_message
+
+        async def slow_variant_message(message, variant):
+            entered.set()
+            while not gate.is_set():
+                await asyncio.sleep(0.005)
+            return await variant_message(message, variant)
+
+        server._variant_message = slow_variant_message
+        async with websockets.connect(harness.url + "/?progressive=1&thumbnail_size=64", max_size=None) as client:
+            while not server.connected_clients:
+                await asyncio.sleep(0.001)
+            server.queue_message(image)
+            await asyncio.get_running_loop().run_in_executor(None, entered.wait, 5)
+            await client.send(json.dumps({"action": "resume", "from_seq": 1, "request_id": "r1"}))
+            await asyncio.sleep(0.2)
+            gate.set()
+            received = [json.loads(await client.recv())]
+            while received[-1]["type"] != "resumed":
+                received.append(json.loads(await client.recv()))
+            server.queue_message({"type": "text", "data": "live", "metadata": {}})
+            received.append(json.loads(await client.recv()))
+            return received
+
+    with ServerHarness(WebSocketServer, journal={"directory": str(tmp_path)}) as harness:
+        received = asyncio.run(run(harness))
+
+    assert [(m["type"], m.get("seq"), m["metadata"].get("thumbnail")) for m in received[:2]] == [
+        ("image", 1, True), ("image", 1, None)]
+    assert received[2]["type"] == "resumed" and received[2]["count"] == 2
+    assert received[3]["data"] == "live" and received[3]["seq"] == 2
@@ -0,0 +1,125 @@
+# tests/test_logging.py
+import importlib
+import io
+import json
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from benchmarks.fakes import fake_backends, simulate_region_capture
+from src.logging_config import LogPipeline, configure_child_logging
+
+
+class _BlockedStream(io.StringIO):
+    """模拟阻塞的控制台：write 在 release 之前一直等待。"""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait()
+        return super().write(text)
+
+
+def _pipeline(tmp_path, **overrides):
+    config = {"directory": str(tmp_path), "console": False, "json": True, **overrides}
+    return LogPipeline(config).start()
+
+
+def _child(log_queue, level):
+    configure_child_logging(log_queue, level)
+    log = logging.getLogger("child")
+    log.info("来自截图子进程的信息")
+    for _ in range(3):
+        log.warning("来自截图子进程的警告")
+
+
+def test_rate_limit_and_json_records(tmp_path):
+    pipeline = _pipeline(tmp_path, rate_limit_seconds=0.3)
+    try:
+        log = logging.getLogger("hotkey")
+        for index in range(6):
+            if index == 5:
+                time.sleep(0.35)
+            log.warning("截图进程已在运行中，请勿重复触发。")
+        log.info("截图 %s 完成", "abc", extra={"capture_id": "abc", "timings": {"total_ms": 12.5}})
+        assert pipeline.stats()["suppressed"] == 4
+    finally:
+        pipeline.stop()
+
+    lines = (tmp_path / "app.log").read_text(encoding="utf-8").splitlines()
+    warnings = [line for line in lines if "截图进程已在运行中" in line]
+    assert len(warnings) == 2 and "另有 4 条相同消息被抑制" in warnings[1]
+    records = [json.loads(line) for line in (tmp_path / "app.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert records[-1]["capture_id"] == "abc" and records[-1]["timings"] == {"total_ms": 12.5}
+    assert records[-1]["message"] == "截图 abc 完成" and "capture_id" not in records[0]
+
+
+def test_blocked_console_does_not_block_callers(tmp_path, monkeypatch):
+    stream = _BlockedStream()
+    monkeypatch.setattr("sys.stdout", stream)
+    pipeline = _pipeline(tmp_path, console=True, json=False, queue_size=10)
+    try:
+        started = time.perf_counter()
+        for index in range(200):
+            logging.info("消息 %d", index)
+        assert time.perf_counter() - started < 1.0
+        assert pipeline.stats()["dropped"] > 0
+    finally:
+        stream.release.set()
+        pipeline.stop()
+    assert "消息 0" in stream.getvalue()
+
+
+def test_child_process_logs_reach_parent_files(tmp_path):
+    # 子进程使用父进程配置的级别，其记录与主进程的一样经过限流
+    pipeline = _pipeline(tmp_path, level="WARNING", rate_limit_seconds=60)
+    try:
+        process = multiprocessing.Process(target=_child, args=(pipeline.child_queue, pipeline.level),
+                                          name="ScreenshotProcess")
+        process.start()
+        process.join(timeout=10)
+        assert process.exitcode == 0
+    finally:
+        pipeline.stop()
+    text = (tmp_path / "app.log").read_text(encoding="utf-8")
+    assert text.count("ScreenshotProcess/MainThread - 来自截图子进程的警告") == 1
+    assert "来自截图子进程的信息" not in text and pipeline.stats()["suppressed"] == 2
+
+
+def test_direct_capture_emits_structured_record(caplog):
+    caplog.set_level(logging.INFO)
+    with fake_backends(screen_size=(320, 240)):
+        direct = importlib.import_module("src.capture.direct")
+        capture = direct.DirectCapture(queue.Queue(), thumbnail_size=32)
+        message = capture.capture({"x": 0, "y": 0, "width": 160, "height": 120}, {"format": "jpeg"})
+        capture.close()
+
+    record = next(r for r in caplog.records if getattr(r, "capture_id", None) == message["metadata"]["capture_id"])
+    assert record.size == [160, 120] and record.format == "jpeg"
+    assert set(record.timings) == {"capture_ms", "deliver_ms", "total_ms"}
+    assert record.timings["total_ms"] >= record.timings["capture_ms"]
+
+
+def test_interactive_capture_and_selection_emit_structured_records(caplog, monkeypatch):
+    caplog.set_level(logging.INFO)
+    config = {"screenshot": {"thumbnail_size": 32}, "profile": {"preview": False}}
+    with fake_backends(screen_size=(320, 240)) as backends:
+        from src.capture.screenshot import ModernScreenshot
+        sink = queue.Queue()
+        app = ModernScreenshot(backends.tk.Tk(), config, sink)
+        simulate_region_capture(app, 10, 20, 100, 50)
+        message = sink.get_nowait()
+
+    record = next(r for r in caplog.records if getattr(r, "stage", None) == "interactive_capture")
+    assert record.capture_id == message["metadata"]["capture_id"] and record.size == [100, 50]
+    assert set(record.timings) == {"capture_ms", "encode_ms", "total_ms"}
+
+    from src.capture import text_selection
+    monkeypatch.setattr(text_selection, "_platform_getter", lambda: lambda: {
+        "type": "text", "data": "选中的文字", "metadata": {"method": "fake"}})
+    selection = text_selection.get_selected_text()
+    record = next(r for r in caplog.records if getattr(r, "stage", None) == "text_selection")
+    assert record.capture_id == selection["metadata"]["capture_id"] and record.size == 5
+    assert set(record.timings) == {"total_ms"}
@@ -0,0 +1,78 @@
+# tests/test_pixels.py
+import base64
+import importlib
+import os
+import queue
+from io import BytesIO
+import pytest
+from PIL import Image
+from benchmarks.fakes import fake_backends
+from benchmarks.pixels import bench_pixels
+
+np = pytest.importorskip("numpy")
+from src.capture.pixels import PixelFrame, changed_region  # noqa: E402
+
+
+def _frame(width=200, height=130):
+    raw = bytearray(os.urandom(width * height * 4))
+    return raw, Image.frombytes("RGB", (width, height), bytes(raw), "raw", "BGRX")
+
+
+def test_views_swizzle_and_gray_match_pillow():
+    raw, expected = _frame()
+    frame = PixelFrame(raw, 200, 130)
+    for box in ((0, 0, 200, 130), (13, 7, 90, 60), (110, 70, 90, 60)):
+        x, y, width, height = box
+        crop = frame.crop(*box)
+        reference = expected.crop((x, y, x + width, y + height))
+        assert np.shares_memory(crop.array, frame.array) and crop.to_image().tobytes() == reference.tobytes()
+        gray = np.asarray(crop.to_gray(), dtype=int) - np.asarray(reference.convert("L"), dtype=int)
+        assert np.abs(gray).max() <= 1
+    with pytest.raises(ValueError):
+        frame.crop(150, 0, 60, 10)
+
+    frame.swizzle_rgbx()
+    image = frame.to_image("RGBX")
+    # 映射而非复制：修改缓冲后图像随之变化
+    assert image.readonly and image.convert("RGB").tobytes() == expected.tobytes()
+    frame.fill(0, 0, 2, 1, (255, 0, 0))
+    assert image.getpixel((1, 0))[:3] == (255, 0, 0)
+    assert frame.to_image().getpixel((1, 0)) == (255, 0, 0)
+
+
+def test_block_hash_diff():
+    raw, _ = _frame(300, 200)
+    before = PixelFrame(bytes(raw), 300, 200).block_hashes(block=64)
+    assert before.shape == (4, 5)
+    # 第 4 个通道不参与比较
+    raw[3::4] = bytes(len(raw) // 4)
+    assert changed_region(before, PixelFrame(raw, 300, 200).block_hashes(block=64), 300, 200) is None
+    PixelFrame(raw, 300, 200).fill(290, 130, 5, 5, (1, 2, 3))
+    after = PixelFrame(raw, 300, 200).block_hashes(block=64)
+    assert changed_region(before, after, 300, 200) == {"x": 256, "y": 128, "width": 44, "height": 64}
+
+
+def test_direct_capture_reports_changes_and_reuses_encoding():
+    with fake_backends(screen_size=(640, 480)):
+        direct = importlib.import_module("src.capture.direct")
+        capture = direct.DirectCapture(queue.Queue(), thumbnail_size=64)
+        region = {"x": 0, "y": 0, "width": 320, "height": 200}
+        jpeg = {"format": "jpeg", "quality": 80}
+        first = capture.capture(region, jpeg, deliver=False)
+        second = capture.capture(region, jpeg, deliver=False)
+        png = capture.capture(region, {"format": "png"}, deliver=False)
+        capture.close()
+
+    assert "changed_region" not in first["metadata"]
+    assert second["metadata"]["changed_region"] is None and second["data"] is first["data"]
+    assert second["metadata"]["capture_id"] != first["metadata"]["capture_id"]
+    # 编码参数变化时重新编码
+    assert png["data"] != first["data"]
+    decoded = Image.open(BytesIO(base64.b64decode(first["data"])))
+    assert decoded.format == "JPEG" and decoded.size == (320, 200)
+
+
+def test_pixels_benchmark_smoke():
+    results = bench_pixels(sizes=((320, 180),), repeats=2, log=lambda *_: None)
+    assert set(results) == {f"pixels[{name},320x180]" for name in ("convert", "crop", "diff", "gray")}
+    assert all(row["numpy_ms"] > 0 and row["pillow_ms"] > 0 for row in results.values())
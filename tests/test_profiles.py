@@ -0,0 +1,112 @@
+# tests/test_profiles.py
+import base64
+import importlib
+import queue
+import threading
+import time
+from io import BytesIO
+import pytest
+from PIL import Image
+from benchmarks.fakes import fake_backends, simulate_region_capture
+from src.config_schema import AppConfig, ConfigError
+
+BASE = {
+    "hotkey": {"screenshot": "<alt>+q"},
+    "server": {"host": "127.0.0.1", "port": 8765},
+    "screenshot": {"overlay_alpha": 0.2, "border_color": "#007aff"},
+    "profiles": {
+        "repeat": {"hotkey": "<alt>+r", "action": "repeat_last_region", "format": "jpeg", "quality": 80},
+        "monitor": {"hotkey": "<alt>+m", "action": "monitor", "ocr": True},
+        "toggle": {"hotkey": "<alt>+s", "action": "toggle_selection"},
+    },
+}
+
+
+def test_profiles_compile_into_one_binding_map():
+    config = AppConfig.from_dict(BASE)
+    bindings = config.hotkey_bindings()
+    assert {hotkey: profile.name for hotkey, profile in bindings.items()} == {
+        "<alt>+q": "screenshot", "<alt>+r": "repeat", "<alt>+m": "monitor", "<alt>+s": "toggle"}
+    assert bindings["<alt>+r"].to_dict()["format"] == "jpeg"
+
+    # 组合键顺序不同也视为同一个快捷键
+    with pytest.raises(ConfigError) as info:
+        AppConfig.from_dict({**BASE, "profiles": {"a": {"hotkey": "q+<alt>"}, "b": {"hotkey": "<alt>+x", "format": "bmp"}}})
+    assert len(info.value.errors) == 2
+    assert any("冲突" in error for error in info.value.errors)
+
+
+def _start(backends, config, selection_listener=None):
+    hotkey_listener = importlib.import_module("src.listeners.hotkey_listener")
+    ipc_queue = importlib.import_module("src.ipc_queue").queue
+    shutdown = threading.Event()
+    listener = hotkey_listener.HotkeyListener(config, shutdown, selection_listener)
+    thread = threading.Thread(target=listener.run, daemon=True)
+    thread.start()
+    while not backends.hotkey_listeners:
+        time.sleep(0.001)
+    return listener, ipc_queue, shutdown, thread
+
+
+def test_direct_capture_profiles_skip_overlay():
+    with fake_backends(screen_size=(1280, 720)) as backends:
+        listener, ipc_queue, shutdown, thread = _start(backends, BASE)
+        hotkeys = backends.hotkey_listeners[0]
+
+        # 还没有框选过区域时，重复截取不做任何事
+        hotkeys.trigger("<alt>+r")
+        listener.direct_capture.submit(None, {}).result(timeout=5.0)
+        ipc_queue.get(timeout=5.0)
+
+        listener.last_region[:] = [10, 20, 300, 200]
+        start = time.perf_counter()
+        hotkeys.trigger("<alt>+r")
+        repeated = ipc_queue.get(timeout=5.0)
+        latency = time.perf_counter() - start
+
+        hotkeys.trigger("<alt>+m")
+        full = ipc_queue.get(timeout=5.0)
+        shutdown.set()
+        thread.join(timeout=5.0)
+
+    assert latency < 0.05
+    assert repeated["metadata"]["region"] == {"x": 10, "y": 20, "width": 300, "height": 200}
+    assert repeated["metadata"]["profile"] == "repeat" and repeated["metadata"]["format"] == "jpeg"
+    assert Image.open(BytesIO(base64.b64decode(repeated["data"]))).format == "JPEG"
+    assert full["metadata"]["region"] == {"x": 0, "y": 0, "width": 1280, "height": 720}
+    assert full["metadata"]["ocr_requested"] is True
+    assert "thumbnail" in full["artifacts"]
+
+
+def test_toggle_selection_and_region_child_config():
+    with fake_backends() as backends:
+        selection_listener = importlib.import_module("src.listeners.selection_listener")
+        texts = []
+        selection = selection_listener.SelectionListener(texts.append, threading.Event())
+        listener, _, shutdown, thread = _start(backends, BASE, selection)
+        backends.hotkey_listeners[0].trigger("<alt>+s")
+        disabled = not selection.enabled
+        backends.hotkey_listeners[0].trigger("<alt>+s")
+        shutdown.set()
+        thread.join(timeout=5.0)
+
+    assert disabled and selection.enabled
+    child = listener._child_configs["repeat"]
+    assert child["profile"]["quality"] == 80 and child["screenshot"]["border_color"] == "#007aff"
+
+
+def test_region_without_preview_delivers_immediately():
+    with fake_backends(screen_size=(800, 600)) as backends:
+        screenshot = importlib.import_module("src.capture.screenshot")
+        sink = queue.Queue()
+        last_region = [0, 0, 0, 0]
+        config = {"screenshot": {}, "profile": AppConfig.from_dict(
+            {**BASE, "profiles": {"quick": {"hotkey": "<alt>+w", "preview": False, "format": "webp"}}}
+        ).profiles["quick"].to_dict()}
+        app = screenshot.ModernScreenshot(backends.tk.Tk(), config, sink, last_region)
+        preview = simulate_region_capture(app, 50, 60, 120, 80)
+
+    message = sink.get_nowait()
+    assert preview is None
+    assert last_region == [50, 60, 120, 80]
+    assert message["metadata"]["format"] == "webp" and message["metadata"]["profile"] == "quick"
@@ -0,0 +1,114 @@
+# tests/test_remote_capture.py
+import asyncio
+import importlib
+import json
+import queue
+import time
+import websockets
+from benchmarks.fakes import fake_backends
+from benchmarks.harness import ServerHarness
+from src.server.text_pipeline import TextPipeline
+
+
+def _serve(backends, **remote_capture):
+    direct = importlib.import_module("src.capture.direct")
+    websocket_server = importlib.import_module("src.server.websocket_server")
+    direct_capture = direct.DirectCapture(queue.Queue(), thumbnail_size=64)
+    return ServerHarness(websocket_server.WebSocketServer, remote_capture={"enabled": True, **remote_capture},
+                         direct_capture=direct_capture), direct_capture
+
+
+async def _request(client, **request):
+    await client.send(json.dumps({"action": "capture", **request}))
+    return json.loads(await client.recv())
+
+
+def test_capture_reply_goes_to_requester_only():
+    async def run(url):
+        async with websockets.connect(url) as client, websockets.connect(url) as other:
+            await client.send(json.dumps({"action": "capture", "request_id": 1, "target": "region",
+                                          "region": {"x": 10, "y": 20, "width": 64, "height": 48}}))
+            await client.send(json.dumps({"action": "capture", "request_id": 2, "target": "monitor",
+                                          "monitor": 1, "format": "jpeg"}))
+            replies = {}
+            for _ in range(2):
+                reply = json.loads(await client.recv())
+                replies[reply["request_id"]] = reply
+            await client.send(json.dumps({"action": "fetch", "capture_id": replies[1]["metadata"]["capture_id"],
+                                          "scale": 0.5}))
+            fetched = json.loads(await client.recv())
+            invalid = await _request(client, request_id=3, target="region", region={"x": 0, "y": 0, "width": 0})
+            try:
+                leaked = await asyncio.wait_for(other.recv(), 0.2)
+            except asyncio.TimeoutError:
+                leaked = None
+            return replies, fetched, invalid, leaked
+
+    with fake_backends(screen_size=(640, 480)) as backends:
+        harness, direct_capture = _serve(backends)
+        with harness:
+            replies, fetched, invalid, leaked = asyncio.run(run(harness.url))
+        direct_capture.close()
+
+    assert replies[1]["type"] == "image" and replies[1]["action"] == "capture"
+    assert replies[1]["metadata"]["region"] == {"x": 10, "y": 20, "width": 64, "height": 48}
+    assert replies[2]["metadata"]["region"] == {"x": 0, "y": 0, "width": 640, "height": 480}
+    assert replies[2]["metadata"]["format"] == "jpeg"
+    assert fetched["type"] == "image" and fetched["metadata"]["size"] == {"width": 32, "height": 24}
+    assert invalid["type"] == "error" and invalid["code"] == "invalid" and invalid["request_id"] == 3
+    assert leaked is None
+    # 远程截图不经过快捷键的投递队列
+    assert direct_capture.sink.empty()
+
+
+def test_rate_limit_and_queue_bound():
+    async def run(url, server):
+        async with websockets.connect(url) as client:
+            rate_limited = [await _request(client, target="region", region={"x": 0, "y": 0, "width": 8, "height": 8})
+                            for _ in range(3)]
+
+            # 让抓取变慢，使后续请求排队
+            server.remote_capture.update({"rate": 1000, "burst": 1000})
+            grab = server.remote_capture.direct_capture.capture
+            server.remote_capture.direct_capture.capture = lambda *args: (time.sleep(0.05), grab(*args))[1]
+            for request_id in range(4):
+                await client.send(json.dumps({"action": "capture", "request_id": request_id, "target": "monitor"}))
+            queued = [json.loads(await client.recv()) for _ in range(4)]
+            return rate_limited, queued
+
+    with fake_backends(screen_size=(320, 240)) as backends:
+        harness, direct_capture = _serve(backends, rate=0.5, burst=2, max_per_client=2)
+        with harness:
+            rate_limited, queued = asyncio.run(run(harness.url, harness.server))
+        direct_capture.close()
+
+    assert [reply["type"] for reply in rate_limited] == ["image", "image", "error"]
+    assert rate_limited[2]["code"] == "rate_limited" and rate_limited[2]["retry_after"] > 0
+    busy = [reply for reply in queued if reply["type"] == "error"]
+    assert len(busy) == 2 and all(reply["code"] == "busy" for reply in busy)
+    assert sorted(reply["request_id"] for reply in queued if reply["type"] == "image") == [0, 1]
+
+
+def test_selection_request():
+    async def run(url, server):
+        async with websockets.connect(url) as client:
+            server.remote_capture.read_selection = lambda: {"type": "text", "data": "hello", "metadata": {}}
+            text = await _request(client, request_id="a", target="selection")
+            # 与划词监听共用处理阶段时，远程划词的结果同样被规范化 (不参与微批处理)
+            server.text_pipeline = TextPipeline(lambda message: None, batch_window_ms=10000)
+            server.remote_capture.read_selection = lambda: {"type": "text", "data": "exam-\nple", "metadata": {}}
+            processed = await _request(client, request_id="c", target="selection")
+            server.remote_capture.read_selection = lambda: None
+            empty = await _request(client, request_id="b", target="selection")
+            return text, processed, empty
+
+    with fake_backends() as backends:
+        harness, direct_capture = _serve(backends)
+        with harness:
+            text, processed, empty = asyncio.run(run(harness.url, harness.server))
+        direct_capture.close()
+
+    assert text == {"type": "text", "data": "hello", "metadata": {}, "action": "capture", "request_id": "a"}
+    assert processed["data"] == "example" and processed["metadata"]["sentences"] == [[0, 7]]
+    assert processed["request_id"] == "c"
+    assert empty["type"] == "error" and empty["request_id"] == "b"
@@ -0,0 +1,99 @@
+# tests/test_rpc.py
+import asyncio
+import json
+import websockets
+from benchmarks.harness import ServerHarness
+from benchmarks.rpc import bench_rpc
+from src.server.rpc import Param, RpcError, RpcRouter
+from src.server.websocket_server import WebSocketServer
+
+
+def test_router_validates_limits_and_times_out():
+    async def run():
+        replies = []
+
+        async def send(client, message):
+            replies.append((client, message))
+
+        release = asyncio.Event()
+
+        async def slow(call):
+            await release.wait()
+            return {"type": "slow", "value": call.get("value")}
+
+        async def never(call):
+            await asyncio.sleep(10)
+
+        async def fails(call):
+            raise RpcError("not_found", "没有", item=call.get("value"))
+
+        router = RpcRouter(send, max_in_flight=2, timeout=0.05)
+        router.register("slow", slow, timeout=None, schema={"value": Param(int, required=True, check=lambda v: v >= 0)})
+        router.register("never", never)
+        router.register("fails", fails)
+
+        await router.dispatch("a", "not json")
+        await router.handle("a", {"action": "slow", "request_id": 1})
+        await router.handle("a", {"action": "slow", "request_id": 2, "value": -1})
+        await router.handle("a", {"action": "slow", "request_id": 3, "value": True})
+        for request_id in (4, 5, 6):
+            await router.handle("a", {"action": "slow", "request_id": request_id, "value": request_id})
+        # 上限按连接计算，其他连接不受影响
+        await router.handle("b", {"action": "fails", "request_id": 7, "value": 1})
+        await router.handle("b", {"action": "never", "request_id": 8})
+        await router.handle("b", {"action": "missing"})
+        await router.handle("b", {"action": ["slow"], "request_id": 9})
+        await asyncio.sleep(0.1)
+        in_flight = router.in_flight("a")
+        release.set()
+        await asyncio.sleep(0.01)
+        return replies, in_flight, router.stats()
+
+    replies, in_flight, stats = asyncio.run(run())
+    by_id = {message.get("request_id"): message for _, message in replies}
+    assert replies[0][1]["code"] == "invalid"
+    assert by_id[1]["code"] == "invalid" and "缺少必填参数" in by_id[1]["error"]
+    assert by_id[2]["code"] == "invalid" and by_id[3]["code"] == "invalid"
+    assert by_id[6] == {"type": "error", "action": "slow", "request_id": 6, "code": "busy",
+                        "error": by_id[6]["error"]}
+    assert by_id[4] == {"type": "slow", "value": 4, "action": "slow", "request_id": 4}
+    assert by_id[7]["code"] == "not_found" and by_id[7]["item"] == 1
+    assert by_id[8]["code"] == "timeout"
+    assert by_id[None]["code"] == "unknown_action" and by_id[9]["code"] == "invalid"
+    assert in_flight == 2
+    assert stats == {"requests": 10, "errors": 9, "in_flight": 0}
+
+
+def test_requests_on_one_connection_run_concurrently():
+    async def run(url, server):
+        release = asyncio.Event()
+
+        async def blocked(call):
+            await release.wait()
+            return {"type": "blocked"}
+        server.rpc.register("blocked", blocked)
+
+        async with websockets.connect(url) as client:
+            await client.send(json.dumps({"action": "blocked", "request_id": 1}))
+            await client.send(json.dumps({"action": "ping", "request_id": 2}))
+            first = json.loads(await client.recv())
+            server._loop.call_soon_threadsafe(release.set)
+            second = json.loads(await client.recv())
+            await client.send(json.dumps({"action": "stats", "request_id": 3}))
+            stats = json.loads(await client.recv())
+            return first, second, stats
+
+    with ServerHarness(WebSocketServer) as harness:
+        first, second, stats = asyncio.run(run(harness.url, harness.server))
+
+    # 被阻塞的请求不影响同一连接上后续请求的回复
+    assert first == {"type": "pong", "action": "ping", "request_id": 2}
+    assert second == {"type": "blocked", "action": "blocked", "request_id": 1}
+    assert stats["stats"]["clients"] == 1 and stats["stats"]["rpc"]["requests"] == 3
+
+
+def test_rpc_benchmark_smoke():
+    results = bench_rpc(connection_counts=(1, 3), requests=60, pipeline=4, actions=("ping",), log=lambda *_: None)
+    assert set(results) == {"rpc[ping,connections=1,pipeline=4]", "rpc[ping,connections=3,pipeline=4]"}
+    for metrics in results.values():
+        assert metrics["samples"] == 60 and metrics["throughput_per_s"] > 0
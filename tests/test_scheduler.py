@@ -0,0 +1,134 @@
+# tests/test_scheduler.py
+import asyncio
+import json
+import time
+import websockets
+from benchmarks.harness import ServerHarness
+from benchmarks.scheduler import bench_scheduler
+from benchmarks.transport import _payload
+from src.server.scheduler import PriorityLanes, PriorityMessageQueue, SchedulerPolicy
+from src.server.websocket_server import WebSocketServer
+
+
+def test_priority_queue_order_and_aging():
+    queue = PriorityMessageQueue(SchedulerPolicy({"classes": {"ocr": "bulk"}}))
+    for message in ({"type": "ocr", "n": 1}, {"type": "image", "n": 2}, {"type": "text", "n": 3},
+                    {"type": "image", "n": 4}, {"type": "text", "n": 5}):
+        queue.put(message)
+    assert queue.depths() == {"interactive": 2, "capture": 2, "bulk": 1}
+    assert [queue.get()[0]["n"] for _ in range(5)] == [3, 5, 2, 4, 1]
+    queue.put(None)
+    assert queue.get(timeout=0.1) == (None, 0.0)
+
+    # 等待超过 max_delay 的低优先级消息不会被持续的高优先级流量饿死
+    lanes = PriorityLanes(max_delay=0.5)
+    lanes.push(2, "bulk", enqueued_at=time.monotonic() - 1.0)
+    lanes.push(0, "text")
+    assert lanes.pop()[1] == "bulk" and lanes.pop()[1] == "text"
+
+
+def test_text_is_interleaved_between_image_chunks():
+    image = _payload(16 * 1024 * 1024)
+
+    async def run(url, server):
+        # 客户端暂不读取，图像的分块积压在套接字缓冲中，发送任务停在图像中途
+        async with websockets.connect(url + "/?chunk_size=16384", max_size=None, max_queue=4) as client:
+            while not server.connected_clients:
+                await asyncio.sleep(0.001)
+            server.queue_message(image)
+            await asyncio.sleep(0.3)
+            server.queue_message({"type": "text", "data": "hover", "metadata": {}})
+            await asyncio.sleep(0.1)
+            received = [json.loads(await client.recv())]
+            while not (received[-1]["type"] == "chunk" and received[-1]["index"] + 1 == received[-1]["count"]):
+                received.append(json.loads(await client.recv()))
+            await client.send(json.dumps({"action": "stats"}))
+            stats = json.loads(await client.recv())
+            return received, stats["stats"]["scheduler"]
+
+    with ServerHarness(WebSocketServer) as harness:
+        received, stats = asyncio.run(run(harness.url, harness.server))
+
+    chunks = [message for message in received if message["type"] == "chunk"]
+    texts = [index for index, message in enumerate(received) if message["type"] == "text"]
+    assert len(texts) == 1 and texts[0] < len(received) - 1
+    assert [chunk["index"] for chunk in chunks] == list(range(chunks[0]["count"]))
+    assert json.loads("".join(chunk["data"] for chunk in chunks))["data"] == image["data"]
+    assert stats["latency"]["interactive"]["sent"] == 1 and stats["latency"]["capture"]["sent"] == 1
+    assert stats["latency"]["interactive"]["p50_ms"] < stats["latency"]["capture"]["p50_ms"]
+
+
+def test_resume_during_chunked_publish(tmp_path):
+    image = _payload(4 * 1024 * 1024)
+
+    async def run(url, server):
+        for i in range(3):
+            server.queue_message({"type": "text", "data": f"missed {i}", "metadata": {}})
+        while server.journal.next_seq <= 3:
+            await asyncio.sleep(0.01)
+        async with websockets.connect(url + "/?chunk_size=16384", max_size=None, max_queue=4) as client:
+            while not server.connected_clients:
+                await asyncio.sleep(0.001)
+            # 图像分块发送到一半时请求补发：补发的消息同样经发送队列排队与分块
+            server.queue_message(image)
+            await asyncio.sleep(0.3)
+            await client.send(json.dumps({"action": "resume", "from_seq": 1, "request_id": "r1"}))
+            received = [json.loads(await client.recv())]
+            while received[-1]["type"] != "resumed":
+                received.append(json.loads(await client.recv()))
+            return received
+
+    with ServerHarness(WebSocketServer, journal={"directory": str(tmp_path)}) as harness:
+        received = asyncio.run(run(harness.url, harness.server))
+
+    assert received[-1]["count"] == 4 and received[-1]["request_id"] == "r1"
+    texts = [index for index, message in enumerate(received) if message["type"] == "text"]
+    assert [received[index]["seq"] for index in texts] == [1, 2, 3]
+    chunks = {}
+    for message in received:
+        assert message["type"] in ("chunk", "text", "resumed")
+        if message["type"] == "chunk":
+            chunks.setdefault(message["chunk_id"], []).append(message)
+    # 实时发送与补发各一份完整的图像，每份的分块连续且不缺
+    assert len(chunks) == 2
+    for pieces in chunks.values():
+        assert [piece["index"] for piece in pieces] == list(range(pieces[0]["count"]))
+        assert json.loads("".join(piece["data"] for piece in pieces))["data"] == image["data"]
+    # 补发的文本按优先级插在进行中的图像分块之间
+    assert texts[-1] < len(received) - 2
+
+
+def test_slow_client_does_not_stall_publishing():
+    images = [_payload(4 * 1024 * 1024) for _ in range(4)]
+
+    async def run(url, server):
+        # 慢客户端从不读取；发布不等它，其积压超时后被断开
+        async with websockets.connect(url, max_size=None, max_queue=1, close_timeout=0.5):
+            async with websockets.connect(url + "/?types=text") as fast:
+                while len(server.connected_clients) < 2:
+                    await asyncio.sleep(0.001)
+                for image in images:
+                    server.queue_message(image)
+                started = time.monotonic()
+                for i in range(5):
+                    server.queue_message({"type": "text", "data": f"t{i}", "metadata": {}})
+                    assert json.loads(await fast.recv())["data"] == f"t{i}"
+                elapsed = time.monotonic() - started
+                while server.scheduler.slow_clients_closed == 0:
+                    await asyncio.sleep(0.01)
+                await fast.send(json.dumps({"action": "stats"}))
+                stats = json.loads(await fast.recv())["stats"]
+            return elapsed, stats
+
+    with ServerHarness(WebSocketServer, scheduler={"max_pending_bytes": 1024 * 1024,
+                                                   "slow_client_timeout_ms": 300}) as harness:
+        elapsed, stats = asyncio.run(run(harness.url, harness.server))
+
+    assert elapsed < 0.3
+    assert stats["scheduler"]["slow_clients_closed"] == 1
+
+
+def test_scheduler_benchmark_smoke():
+    results = bench_scheduler(image_mb=(0.5,), rounds=2, chunk_size=16384, log=lambda *_: None)
+    assert set(results) == {f"scheduler[{mode},0.5MB,{kind}]" for mode in ("whole", "chunked")
+                            for kind in ("text", "image")}
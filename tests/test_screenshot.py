@@ -1,10 +1,11 @@
-
 # tests/test_screenshot.py
+import base64
 import os
+import queue
 import time
 import pytest
+from benchmarks.fakes import fake_backends, simulate_region_capture
 from src.config_loader import ConfigLoader
-from src.capture.screenshot import take_screenshot
 
 @pytest.fixture(scope="module")
 def config():
@@ -15,8 +16,8 @@ def config():
 
 def test_take_screenshot(config):
     """
-    测试截图功能是否能成功创建文件。
-    注意：此测试是交互式的，需要手动选择一个区域。
+    测试截图功能是否能成功生成图像数据并写入文件。
+    使用假的 mss/tkinter 后端在无头环境中模拟一次拖拽选区。
     """
     output_dir = config['testing']['screenshot_output_path']
     if not os.path.exists(output_dir):
@@ -24,28 +25,42 @@ def test_take_screenshot(config):
 
     timestamp = time.strftime("%Y%m%d-%H%M%S")
     save_path = os.path.join(output_dir, f"test_screenshot_{timestamp}.png")
-    
-    print("\n[INFO] 准备进行交互式截图测试...")
-    print("[INFO] 请在 3 秒后出现的覆盖层中拖动鼠标选择一个区域。")
-    print("[INFO] 如果不选择或者选择区域过小，测试将失败。")
-    time.sleep(3)
 
-    # 调用截图函数，并传入保存路径
-    screenshot_data = take_screenshot(save_path=save_path)
+    with fake_backends(screen_size=(800, 600)) as backends:
+        from src.capture.screenshot import ModernScreenshot
+        sink = queue.Queue()
+        app = ModernScreenshot(backends.tk.Tk(), config, sink)
+        preview = simulate_region_capture(app, 100, 150, 320, 200)
+        app._confirm_and_send(preview)
 
     # 断言1: 函数应返回数据
+    screenshot_data = sink.get_nowait()
     assert screenshot_data is not None, "截图操作被取消或失败，未返回数据。"
     assert screenshot_data['type'] == 'image'
     assert 'data' in screenshot_data
     assert len(screenshot_data['data']) > 100 # Base64字符串不应为空
+    assert screenshot_data['metadata']['region'] == {"x": 100, "y": 150, "width": 320, "height": 200}
+
+    with open(save_path, "wb") as f:
+        f.write(base64.b64decode(screenshot_data['data']))
 
     # 断言2: 文件应被创建
     assert os.path.exists(save_path), f"截图文件未在 '{save_path}' 创建。"
-    
+
     # 断言3: 文件不应为空
     assert os.path.getsize(save_path) > 0, "截图文件为空。"
 
-    print(f"\n[SUCCESS] 截图测试成功，文件已保存至: {save_path}")
+    os.remove(save_path)
+
+def test_small_selection_is_ignored(config):
+    """
+    过小的选区 (<= 10px) 不应产生任何截图数据。
+    """
+    with fake_backends() as backends:
+        from src.capture.screenshot import ModernScreenshot
+        sink = queue.Queue()
+        app = ModernScreenshot(backends.tk.Tk(), config, sink)
+        preview = simulate_region_capture(app, 10, 10, 5, 5)
 
-    # 清理测试文件（可选）
-    # os.remove(save_path)
+    assert preview is None
+    assert sink.empty()
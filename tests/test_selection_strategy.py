@@ -0,0 +1,111 @@
+# tests/test_selection_strategy.py
+import asyncio
+import json
+import threading
+import websockets
+from benchmarks.harness import ServerHarness
+from src.capture.text_selection.strategy import SelectionPolicy, replay_trace, selection_policy
+from src.server.websocket_server import WebSocketServer
+
+
+def _calls(app, attempts, count):
+    """trace_path 格式的轨迹：每次调用按顺序列出各次尝试 (策略, 是否成功, 耗时毫秒)。"""
+    return [{"app": app, "time": 0, "attempts": [{"strategy": strategy, "success": success, "latency_ms": ms}
+                                                 for strategy, success, ms in attempts]}] * count
+
+
+# Windows 上录制的典型情形：Word 的焦点元素直接提供选区；资源管理器两种策略都取不到文本；
+# Electron 应用只有遍历子树才能找到选区
+TRACE = [record for round_ in range(10) for record in (
+    _calls("winword.exe", [("focused", True, 1.5)], 4)
+    + _calls("explorer.exe", [("focused", False, 0.8), ("tree", False, 45.0)], 4)
+    + _calls("code.exe", [("focused", False, 0.6), ("tree", True, 30.0)], 4))]
+
+
+def test_policy_skips_failing_strategies_and_saves_cost():
+    baseline = replay_trace(SelectionPolicy(adaptive=False), TRACE)
+    policy = SelectionPolicy(failure_streak=5, probe_every=10)
+    adaptive = replay_trace(policy, TRACE)
+
+    assert adaptive["hits"] == baseline["hits"] == 80
+    assert adaptive["latency_ms"] < baseline["latency_ms"] * 0.6
+    stats = policy.snapshot()
+    assert stats["explorer.exe"]["success_rate"] == 0 and stats["explorer.exe"]["skipped"] > 0
+    assert stats["code.exe"]["winner"] == "tree" and stats["winword.exe"]["success_rate"] == 1.0
+    assert stats["code.exe"]["strategies"]["tree"]["average_ms"] == 30.0
+    assert policy.plan("winword.exe") == ["focused", "tree"]
+    # 胜出的策略排在最前；连续失败的策略被跳过
+    assert policy.plan("code.exe") == ["tree", "focused"]
+    assert policy.plan("explorer.exe") == []
+
+
+def test_probe_recovers_and_stats_persist(tmp_path):
+    path = str(tmp_path / "selection_stats.json")
+    policy = SelectionPolicy(path=path, failure_streak=3, probe_every=5)
+    replay_trace(policy, _calls("app.exe", [("focused", False, 1.0), ("tree", False, 20.0)], 3))
+    plans = [policy.plan("app.exe") for _ in range(5)]
+    # 每 5 次调用试探一次被跳过的策略 (累计第 5 次)
+    assert plans == [[], ["focused", "tree"], [], [], []]
+    policy.record("app.exe", [("focused", False, 0.001), ("tree", True, 0.02)])
+    assert policy.plan("app.exe") == ["tree"]
+    policy.save()
+
+    restored = SelectionPolicy(path=path, failure_streak=3, probe_every=5)
+    assert restored.snapshot() == policy.snapshot()
+    assert restored.plan("app.exe") == ["tree", "focused"]
+
+    (tmp_path / "broken.json").write_text("{not json", encoding="utf-8")
+    assert SelectionPolicy(path=str(tmp_path / "broken.json")).snapshot() == {}
+
+
+def test_empty_selection_does_not_demote_strategies():
+    policy = SelectionPolicy(failure_streak=3, probe_every=10)
+    # 在 Word 里拖动窗口、滚动条：焦点元素有 TextPattern 但没有选中文字，不再尝试遍历子树
+    totals = replay_trace(policy, _calls("winword.exe", [("focused", None, 1.0), ("tree", False, 45.0)], 8))
+    assert totals["attempts"] == 8 and totals["hits"] == 0
+    stats = policy.snapshot()["winword.exe"]["strategies"]["focused"]
+    assert stats["empty"] == 8 and stats["failure_streak"] == 0 and stats["success_rate"] == 0.0
+    assert policy.plan("winword.exe") == ["focused", "tree"]
+
+    policy.record("winword.exe", [("focused", True, 0.001)])
+    assert policy.snapshot()["winword.exe"]["strategies"]["focused"]["success_rate"] == 1.0
+
+
+def test_concurrent_saves_keep_the_newest_snapshot(tmp_path):
+    path = str(tmp_path / "selection_stats.json")
+    policy = SelectionPolicy(path=path, save_interval=0)
+
+    def worker(index):
+        for _ in range(100):
+            policy.record(f"app{index}.exe", [("focused", True, 0.001)])
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 最后写出的文件包含全部记录：较早的快照不会在之后覆盖它
+    restored = SelectionPolicy(path=path)
+    assert {app: row["strategies"]["focused"]["attempts"] for app, row in restored.snapshot().items()} \
+        == {f"app{index}.exe": 100 for index in range(6)}
+    assert not (tmp_path / "selection_stats.json.tmp").exists()
+
+
+def test_trace_file_and_selection_stats_rpc(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    policy = SelectionPolicy(trace_path=str(trace))
+    policy.record("notepad.exe", [("focused", True, 0.002)])
+    records = [json.loads(line) for line in trace.read_text(encoding="utf-8").splitlines()]
+    assert records[0]["attempts"] == [{"strategy": "focused", "success": True, "latency_ms": 2.0}]
+    assert replay_trace(SelectionPolicy(), records)["hits"] == 1
+
+    selection_policy().record("notepad.exe", [("focused", True, 0.002)])
+
+    async def run(url):
+        async with websockets.connect(url) as client:
+            await client.send(json.dumps({"action": "selection_stats", "request_id": 1}))
+            return json.loads(await client.recv())
+
+    with ServerHarness(WebSocketServer) as harness:
+        reply = asyncio.run(run(harness.url))
+    assert reply["type"] == "selection_stats" and reply["request_id"] == 1
+    assert reply["apps"]["notepad.exe"]["strategies"]["focused"]["attempts"] >= 1
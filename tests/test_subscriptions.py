@@ -0,0 +1,95 @@
+# tests/test_subscriptions.py
+import asyncio
+import base64
+import json
+from io import BytesIO
+import pytest
+import websockets
+from PIL import Image
+from benchmarks.harness import ServerHarness
+from src.server.subscriptions import FULL, Subscription
+from src.server.websocket_server import WebSocketServer
+
+
+def _text(data, app="WINWORD.EXE"):
+    return {"type": "text", "timestamp": "", "data": data,
+            "metadata": {"source_app_name": app, "source_window_title": "Doc"}}
+
+
+def _image(width=640, height=480):
+    buffered = BytesIO()
+    Image.new("RGB", (width, height), (10, 120, 200)).save(buffered, format="PNG")
+    return {"type": "image", "timestamp": "", "data": base64.b64encode(buffered.getvalue()).decode(),
+            "metadata": {"format": "png", "encoding": "base64",
+                         "region": {"x": 0, "y": 0, "width": width, "height": height}}}
+
+
+def test_default_subscription_receives_everything():
+    subscription = Subscription()
+    assert subscription.variants(_text("a")) == (FULL,)
+    assert subscription.variants(_image(20, 20)) == (FULL,)
+
+
+def test_filters():
+    subscription = Subscription.from_request({
+        "types": ["text"], "filters": {"source_app": ["winword.exe"], "min_text_length": 3}})
+
+    assert subscription.variants(_text("hello")) == (FULL,)
+    assert subscription.variants(_text("hi")) == ()
+    assert subscription.variants(_text("hello", app="chrome.exe")) == ()
+    assert subscription.variants(_image(20, 20)) == ()
+
+
+def test_from_path_and_validation():
+    subscription = Subscription.from_path("/?types=image&thumbnail_only=1&thumbnail_size=64")
+    assert subscription.variants(_text("hello")) == ()
+    assert subscription.variants(_image(20, 20)) == ("thumbnail:64",)
+
+    progressive = Subscription.from_path("/?progressive=1&thumbnail_size=64")
+    assert progressive.variants(_image(20, 20)) == ("thumbnail:64", FULL)
+    assert progressive.variants(_text("hello")) == (FULL,)
+
+    with pytest.raises(ValueError):
+        Subscription.from_request({"types": ["video"]})
+    with pytest.raises(ValueError):
+        Subscription.from_request({"filters": {"thumbnail_size": 1}})
+    # 非字符串或不可哈希的条目按参数错误处理，而不是内部错误
+    for payload in ({"types": [["text"]]}, {"types": [1]}, {"filters": {"source_app": [1]}},
+                    {"filters": {"session": [{"id": "a"}]}}, {"filters": {"session": 3}}, {"filters": ["x"]}):
+        with pytest.raises(ValueError):
+            Subscription.from_request(payload)
+
+
+def test_server_filters_per_client():
+    """
+    纯文本客户端收不到截图；仅缩略图客户端收到缩小后的图像。
+    """
+    async def run(harness):
+        async with websockets.connect(harness.url + "/?types=text") as text_client, \
+                websockets.connect(harness.url, max_size=None) as thumb_client:
+            await thumb_client.send(json.dumps({"action": "subscribe", "types": ["image"],
+                                                "filters": {"thumbnail_only": True, "thumbnail_size": 64}}))
+            ack = json.loads(await thumb_client.recv())
+            await text_client.send(json.dumps({"action": "bogus"}))
+            error = json.loads(await text_client.recv())
+
+            harness.server.queue_message(_image())
+            harness.server.queue_message(_text("hello world"))
+            received = json.loads(await text_client.recv()), json.loads(await thumb_client.recv())
+            # 连接 URL 中的订阅参数无效时，回复与 subscribe 请求相同格式的错误
+            async with websockets.connect(harness.url + "/?types=video") as bad_client:
+                invalid = json.loads(await bad_client.recv())
+            return (ack, error, *received, invalid)
+
+    with ServerHarness(WebSocketServer) as harness:
+        ack, error, text_message, thumb_message, invalid = asyncio.run(run(harness))
+
+    assert ack["type"] == "subscribed" and ack["subscription"]["types"] == ["image"]
+    assert error["type"] == "error"
+    assert invalid["type"] == "error" and invalid["action"] == "subscribe" and invalid["code"] == "invalid"
+    assert text_message["type"] == "text"
+    assert thumb_message["type"] == "image"
+    assert thumb_message["metadata"]["thumbnail"] is True
+    assert thumb_message["metadata"]["original_size"] == {"width": 640, "height": 480}
+    with Image.open(BytesIO(base64.b64decode(thumb_message["data"]))) as thumb:
+        assert max(thumb.size) == 64
@@ -0,0 +1,102 @@
+# tests/test_text_pipeline.py
+import queue
+
+from benchmarks.text_pipeline import bench_text_pipeline
+from src.server.text_pipeline import TextPipeline, detect_language, normalize_text, split_sentences
+
+
+def _sentences(text):
+    return [text[start:end] for start, end in split_sentences(text)]
+
+
+def test_normalize_segment_and_detect():
+    # 从 PDF 复制的英文：硬换行与连字符断词
+    pdf = "Dr. Smith wrote an exam-\nple of hyphen-\n ated text. It costs 3.14\ndollars!  Really?\n\nNew​ paragraph."
+    text = normalize_text(pdf)
+    assert text == "Dr. Smith wrote an example of hyphenated text. It costs 3.14 dollars! Really?\nNew paragraph."
+    assert _sentences(text) == ["Dr. Smith wrote an example of hyphenated text.", "It costs 3.14 dollars!",
+                                "Really?", "New paragraph."]
+    assert detect_language(text) == "en"
+
+    # 中文的折行直接去掉，汉字与拉丁字母、数字之间留空格
+    text = normalize_text("我们使用Python\n3进行处理。还有 第二段？\r\n第三句")
+    assert text == "我们使用 Python 3 进行处理。还有第二段？第三句"
+    assert _sentences(text) == ["我们使用 Python 3 进行处理。", "还有第二段？", "第三句"]
+    assert normalize_text("中文English", cjk_latin_spacing=False) == "中文English"
+
+    # 复合词跨行时保留连字符；后半是后缀时仍是断词
+    compounds = "a well-\nknown and state-of-the-\nart method, high-\nly self-\nish"
+    assert normalize_text(compounds) == "a well-known and state-of-the-art method, highly selfish"
+    assert normalize_text(compounds, hyphenation="join") == "a wellknown and state-of-theart method, highly selfish"
+    assert normalize_text("exam-\nple", hyphenation="keep") == "exam-ple"
+
+    assert [detect_language(sample) for sample in ("这是中文。", "これは日本語です。", "안녕하세요 여러분",
+                                                   "Привет, мир", "Le chat est sur la table.", "12345")] \
+        == ["zh", "ja", "ko", "ru", "fr", "und"]
+
+
+def test_pipeline_memoizes_and_passes_other_messages():
+    sink = queue.Queue()
+    pipeline = TextPipeline(sink.put, cache_size=2, keep_raw=True)
+    image = {"type": "image", "data": "..."}
+    pipeline.submit(image)
+    for raw in ("第一句。第二句", "第一句。第二句", "other", "third", "第一句。第二句"):
+        pipeline.submit({"type": "text", "data": raw, "metadata": {"source_app_name": "a.exe"}})
+    pipeline.submit({"type": "text", "data": " ​\n", "metadata": {}})
+
+    assert sink.get_nowait() is image
+    message = sink.get_nowait()
+    assert message["data"] == "第一句。第二句" and message["metadata"]["source_app_name"] == "a.exe"
+    assert message["metadata"]["sentences"] == [[0, 4], [4, 7]] and message["metadata"]["language"] == "zh"
+    assert "raw_text" not in message["metadata"]
+    assert sink.qsize() == 4  # 规范化后为空的文本被丢弃
+    # 容量为 2：第二次重复命中，最后一次已被淘汰
+    assert pipeline.stats()["cache"] == {"entries": 2, "max_entries": 2, "hits": 1, "misses": 5, "evictions": 3}
+
+
+def test_micro_batching_groups_rapid_selections():
+    sink = queue.Queue()
+    pipeline = TextPipeline(sink.put, batch_window_ms=50)
+    for raw in ("It is the first line.", "Second\nline. Third.", "第三段"):
+        pipeline.submit({"type": "text", "data": raw, "timestamp": raw, "metadata": {"source_app_name": "a.exe"}})
+    # 换了应用：之前的批次立即发出
+    pipeline.submit({"type": "text", "data": "b", "metadata": {"source_app_name": "b.exe"}})
+
+    merged = sink.get(timeout=1)
+    assert merged["data"] == "It is the first line.\nSecond line. Third.\n第三段"
+    assert merged["timestamp"] == "第三段" and merged["metadata"]["language"] == "en"
+    assert [item["range"] for item in merged["metadata"]["batch"]] == [[0, 21], [22, 41], [42, 45]]
+    assert [merged["data"][start:end] for start, end in merged["metadata"]["sentences"]] \
+        == ["It is the first line.", "Second line.", "Third.", "第三段"]
+    # 时间窗到期后发出剩下的一条 (单条不带 batch)
+    single = sink.get(timeout=1)
+    assert single["data"] == "b" and "batch" not in single["metadata"]
+
+    # 换应用时发出的批次，其已触发的计时器不会再取走之后的批次
+    slow = TextPipeline(sink.put, batch_window_ms=10000)
+    slow.submit({"type": "text", "data": "x", "metadata": {"source_app_name": "a.exe"}})
+    stale = slow._generation
+    slow.submit({"type": "text", "data": "y", "metadata": {"source_app_name": "b.exe"}})
+    assert sink.get_nowait()["data"] == "x"
+    slow._expire(stale)
+    assert sink.empty() and slow.stats()["pending"] == 1
+    slow.close()
+    assert sink.get_nowait()["data"] == "y"
+
+    pipeline.submit({"type": "text", "data": "pending", "metadata": {}})
+    pipeline.close()
+    assert sink.get_nowait()["data"] == "pending" and pipeline.stats()["batches_sent"] == 3
+
+    # 热重载：正在合并的批次先发出，之后不再合并
+    pipeline.submit({"type": "text", "data": "before", "metadata": {}})
+    pipeline.update_config({"batch_window_ms": 0, "cjk_latin_spacing": False})
+    assert sink.get_nowait()["data"] == "before"
+    pipeline.submit({"type": "text", "data": "中文English", "metadata": {}})
+    assert sink.get_nowait()["data"] == "中文English"
+
+
+def test_text_pipeline_benchmark_smoke():
+    results = bench_text_pipeline(corpus_mb=0.05, repeat=0.5, log=lambda *_: None)
+    assert set(results) == {"text_pipeline[cache=off]", "text_pipeline[cache=on]"}
+    assert results["text_pipeline[cache=on]"]["cache_hits"] > 0 and results["text_pipeline[cache=off]"]["cache_hits"] == 0
+    assert all(row["mb_per_s"] > 0 for row in results.values())
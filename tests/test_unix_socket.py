@@ -0,0 +1,96 @@
+# tests/test_unix_socket.py
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import pytest
+import websockets
+from benchmarks.harness import ServerHarness
+from benchmarks.transport import bench_transport
+from src.config_schema import ServerConfig
+from src.server.websocket_server import WebSocketServer
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="需要 Unix 域套接字")
+
+
+def _connect(path):
+    return websockets.unix_connect(path, uri="ws://localhost/?types=text")
+
+
+def test_unix_socket_serves_alongside_tcp(tmp_path):
+    path = str(tmp_path / "ts.sock")
+    # 上次异常退出遗留的套接字文件
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    async def run(harness):
+        async with _connect(path) as unix_client, websockets.connect(harness.url) as tcp_client:
+            await unix_client.send(json.dumps({"action": "ping", "request_id": 1}))
+            pong = json.loads(await unix_client.recv())
+            harness.server.queue_message({"type": "text", "data": "hello", "metadata": {}})
+            return pong, json.loads(await unix_client.recv()), json.loads(await tcp_client.recv())
+
+    with ServerHarness(WebSocketServer, unix_socket={"enabled": True, "path": path}) as harness:
+        pong, unix_message, tcp_message = asyncio.run(run(harness))
+        mode = os.stat(path).st_mode & 0o777
+    assert pong == {"type": "pong", "action": "ping", "request_id": 1}
+    assert unix_message == tcp_message and unix_message["data"] == "hello"
+    assert mode == 0o600
+    assert not os.path.exists(path)
+
+
+def test_port_in_use_falls_back_to_unix_socket(tmp_path, caplog):
+    blocker = socket.socket()
+    blocker.bind(("127.0.0.1", 0))
+    blocker.listen()
+    port = blocker.getsockname()[1]
+    try:
+        # 没有 Unix 域套接字时启动失败，但不应因为读取 winerror 而崩溃
+        server = WebSocketServer("127.0.0.1", port)
+        with caplog.at_level(logging.ERROR):
+            server.run()
+        assert "已被占用" in caplog.text
+
+        path = str(tmp_path / "ts.sock")
+        server = WebSocketServer("127.0.0.1", port, unix_socket={"path": path})
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        assert server.ready.wait(5.0)
+
+        async def run():
+            async with _connect(path) as client:
+                await client.send(json.dumps({"action": "ping"}))
+                return json.loads(await client.recv())
+        try:
+            assert asyncio.run(run())["type"] == "pong"
+        finally:
+            server.stop()
+        thread.join(5.0)
+    finally:
+        blocker.close()
+
+
+def test_rebind_unix_socket(tmp_path):
+    old_path, new_path = str(tmp_path / "a.sock"), str(tmp_path / "b.sock")
+
+    async def run(harness):
+        async with _connect(old_path) as old_client:
+            future = harness.server.update_settings(ServerConfig("127.0.0.1", 0, unix_socket={"path": new_path}))
+            assert await asyncio.wrap_future(future)
+            async with _connect(new_path) as new_client:
+                harness.server.queue_message({"type": "text", "data": "moved", "metadata": {}})
+                return json.loads(await old_client.recv()), json.loads(await new_client.recv())
+
+    with ServerHarness(WebSocketServer, unix_socket={"path": old_path}) as harness:
+        old_message, new_message = asyncio.run(run(harness))
+        assert not os.path.exists(old_path) and os.path.exists(new_path)
+    assert old_message["data"] == new_message["data"] == "moved"
+
+
+def test_transport_benchmark_smoke():
+    results = bench_transport(sizes_mb=(0.1,), messages=3, log=lambda *_: None)
+    assert set(results) == {"transport[tcp,0.1MB]", "transport[uds,0.1MB]"}
+    assert all(row["mb_per_s"] > 0 for row in results.values())